@@ -22,10 +22,14 @@
 # =============================================================================
 import os
 import re
+import shutil
 import subprocess
+import time
+import zipfile
+from zlib import error as zlib_error
 
 from . import bass
-from .bolt import startupinfo, GPath, deprint, walkdir
+from .bolt import startupinfo, GPath, deprint, walkdir, PickleCache
 from .exception import StateError
 
 exe7z = u'7z.exe' if os.name == u'nt' else u'7z'
@@ -174,3 +178,186 @@ def list_archive(archive_path, parse_archive_line, __reList=reListArchive):
         maList = __reList.match(line)
         if maList:
             parse_archive_line(*(maList.groups()))
+
+#--Native zip support ---------------------------------------------------------
+# zips are read in process with zipfile, instead of spawning 7z and parsing
+# its output - the listing comes straight from the central directory
+_native_zip_methods = {zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED}
+
+def _zip_members(zip_file, include_dirs=False):
+    """Return a list of (ZipInfo, relative path) for the files (and the
+    directories if include_dirs) in zip_file, or None if some entry name
+    can't be handled the same way 7z would handle it - then 7z should be used
+    instead."""
+    members = []
+    for info in zip_file.infolist():
+        name = info.filename
+        if not isinstance(name, unicode):
+            # no utf-8 flag - 7z decodes those with the OEM codepage
+            try:
+                name = unicode(name, u'ascii')
+            except UnicodeDecodeError:
+                return None
+        if name.endswith(u'/') and not include_dirs: continue
+        rel_path = os.path.normpath(name.replace(u'/', os.sep))
+        if os.path.isabs(rel_path) or os.path.splitdrive(rel_path)[0] or \
+                rel_path.split(os.sep)[0] == os.pardir:
+            return None # let 7z sanitize these
+        members.append((info, rel_path))
+    return members
+
+def is_native_zip(archive_path):
+    """Return True if archive_path is a zip we can read with zipfile."""
+    return archive_path.cext == u'.zip' and zipfile.is_zipfile(
+        archive_path.s)
+
+def list_zip(archive_path):
+    """Return a list of (relative path, size, crc) for the files in the
+    zip archive_path, or None if it must be listed with 7z."""
+    with zipfile.ZipFile(archive_path.s) as zip_file:
+        members = _zip_members(zip_file)
+    if members is None: return None
+    return [(rel_path, info.file_size, info.CRC) for info, rel_path in
+            members]
+
+def list_zip_structure(archive_path):
+    """Return a list of (relative path, is directory) for the entries in the
+    zip archive_path, or None if it must be listed with 7z."""
+    with zipfile.ZipFile(archive_path.s) as zip_file:
+        members = _zip_members(zip_file, include_dirs=True)
+    if members is None: return None
+    return [(rel_path, info.filename.endswith(u'/')) for info, rel_path in
+            members]
+
+def extract_zip(src_archive, extract_dir, progress=None, recursive=False,
+                files_to_extract=()):
+    """Extract the specified files from the zip src_archive to extract_dir,
+    matching their relative paths case insensitively - if recursive, files
+    with those names in any subdirectory are extracted too, as with 7z's -r.
+    Return False without extracting anything if the zip must be extracted
+    with 7z instead."""
+    if any(u'*' in f or u'?' in f for f in files_to_extract):
+        return False # wildcards - leave those to 7z
+    wanted = {os.path.normpath(f).lower() for f in files_to_extract}
+    def _is_wanted(rel_path):
+        rel_path = rel_path.lower()
+        if rel_path in wanted: return True
+        if recursive:
+            parts = rel_path.split(os.sep)
+            return any(os.sep.join(parts[i:]) in wanted for i in
+                       xrange(1, len(parts)))
+        return False
+    with zipfile.ZipFile(src_archive.s) as zip_file:
+        members = _zip_members(zip_file)
+        if members is None: return False
+        members = [(info, rel_path) for info, rel_path in members if
+                   _is_wanted(rel_path)]
+        if any(info.flag_bits & 0x1 or info.compress_type not in
+               _native_zip_methods for info, _rel in members):
+            return False # encrypted or compressed with an exotic method
+        try:
+            for index, (info, rel_path) in enumerate(members):
+                if progress:
+                    progress(index, u'%s\n' % src_archive.tail + _(
+                        u'Extracting files...') + u'\n%s' % rel_path)
+                dest = os.path.join(extract_dir.s, rel_path)
+                dest_dir = os.path.dirname(dest)
+                if not os.path.isdir(dest_dir): os.makedirs(dest_dir)
+                with zip_file.open(info) as ins:
+                    with open(dest, u'wb') as out:
+                        shutil.copyfileobj(ins, out, 1048576)
+                try: # 7z keeps the modification times, do the same
+                    mtime = time.mktime(info.date_time + (0, 0, -1))
+                    os.utime(dest, (mtime, mtime))
+                except (OverflowError, ValueError):
+                    pass # invalid date in the zip
+        except (zipfile.BadZipfile, zlib_error, EnvironmentError) as e:
+            raise StateError(u'%s: Extraction failed:\n%s' % (
+                src_archive.tail, e))
+    return True
+
+def read_zip_heads(src_archive, rel_paths, head_size):
+    """Return a dict mapping the specified relative paths (matched case
+    insensitively) to (up to) the first head_size bytes of those files in the
+    zip src_archive, decompressing no more than that. Return None if the zip
+    must be handled with 7z instead."""
+    return read_zip_members(src_archive, rel_paths,
+                            lambda ins: ins.read(head_size))
+
+def read_zip_members(src_archive, rel_paths, read_member):
+    """Return a dict mapping the specified relative paths (matched case
+    insensitively, the keys are the paths as stored in the zip) to what
+    read_member returns when passed a file object reading that file from the
+    zip src_archive - only as much of the file is decompressed as
+    read_member reads. Return None if the zip must be handled with 7z
+    instead."""
+    wanted = {os.path.normpath(f).lower() for f in rel_paths}
+    with zipfile.ZipFile(src_archive.s) as zip_file:
+        members = _zip_members(zip_file)
+        if members is None: return None
+        members = [(info, rel_path) for info, rel_path in members if
+                   rel_path.lower() in wanted]
+        if any(info.flag_bits & 0x1 or info.compress_type not in
+               _native_zip_methods for info, _rel in members):
+            return None # encrypted or compressed with an exotic method
+        read_members = {}
+        try:
+            for info, rel_path in members:
+                with zip_file.open(info) as ins:
+                    read_members[rel_path] = read_member(ins)
+        except (zipfile.BadZipfile, zlib_error, EnvironmentError) as e:
+            raise StateError(u'%s: Reading failed:\n%s' % (
+                src_archive.tail, e))
+    return read_members
+
+def read_7z_member(src_archive, rel_path, read_member):
+    """Return what read_member returns when passed a file object reading the
+    file rel_path from the archive src_archive, streamed out of 7z instead of
+    being extracted to disk. 7z is stopped as soon as read_member returns, so
+    that no more of the archive is decompressed than needed - a read_member
+    that reads the whole file gets an empty file if there is no rel_path in
+    the archive."""
+    command = [exe7z, u'e', u'-so', u'-bsp0', u'-scsUTF-8', u'-sccUTF-8',
+               u'%s' % src_archive, rel_path]
+    # Nothing reads 7z's messages, so don't let them fill up a pipe
+    with open(os.devnull, u'wb') as devnull:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                stderr=devnull, stdin=subprocess.PIPE,
+                                startupinfo=startupinfo)
+        try:
+            with proc.stdout as ins:
+                return read_member(ins)
+        finally:
+            if proc.poll() is None:
+                proc.kill() # we got what we needed, don't decompress the rest
+            proc.stdin.close()
+            proc.wait()
+
+#--Listing cache --------------------------------------------------------------
+class ListingCache(PickleCache):
+    """Persistent cache of the listings of 7z/rar archives, so that archives
+    are only listed by 7z once. Entries are keyed by the size, modification
+    time and inode of the archives, so they survive renaming an archive and
+    are never used for an archive that was replaced or modified - all without
+    having to read the archive to hash it."""
+
+    def get_listing(self, arch_size, arch_mtime, arch_ino):
+        """Return the cached (is solid, [(path, size, crc)]) of the archive
+        with the specified attributes, or None if it's not cached."""
+        entry = self._get_entries().get((arch_size, arch_mtime, arch_ino))
+        if entry is None: return None
+        return entry[0], list(entry[1])
+
+    def set_listing(self, arch_size, arch_mtime, arch_ino, is_solid,
+                    listing):
+        self._set_entry((arch_size, arch_mtime, arch_ino),
+                        (is_solid, tuple(listing)))
+
+    def drop_stale(self, live_sizes_mtimes):
+        """Drop the listings of archives whose (size, modification time) is
+        not in live_sizes_mtimes, rewriting the cache file if any were."""
+        listings = self._get_entries()
+        stale = [k for k in listings if k[:2] not in live_sizes_mtimes]
+        if stale:
+            for arch_key in stale: del listings[arch_key]
+            self._compact()
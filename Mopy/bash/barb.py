@@ -74,7 +74,7 @@ def _init_settings_files(fsName_, root_prefix, mods_folder):
            u'Table.dat', },
         (dirs[u'bainData'],
          jo(root_prefix + u' Mods', u'Bash Installers', u'Bash')): {
-           u'Converters.dat', u'Installers.dat', },
+           u'Converters.dat', u'Installers.dat', u'Installers.db', },
         (dirs[u'saveBase'], jo(u'My Games', fsName_)): {
             u'BashProfiles.dat', u'BashSettings.dat', u'BashLoadOrders.dat'},
         # backup all files in Mopy\bash\l10n, Data\Bash Patches\,
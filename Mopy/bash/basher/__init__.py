@@ -3155,7 +3155,6 @@ def ShowPanel(self, canCancel=True, fullRefresh=False, scan_data_dir=False,
             self.refreshing = False
 
     @balt.conversation
-    @bosh.bain.projects_walk_cache
     def _refresh_installers_if_needed(self, canCancel, fullRefresh,
                                       scan_data_dir):
         if settings.get(u'bash.installers.updatedCRCs',True): #only checked here
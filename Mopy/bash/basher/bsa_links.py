@@ -23,11 +23,12 @@
 """Menu items for the _item_ menu of the BSAs tab - their window attribute
 points to BashFrame.bsaList singleton."""
 
-from .. import archives, bass, balt
-from ..balt import ItemLink, Progress
+from .. import archives, bass, balt, bosh, bush
+from ..balt import ItemLink, Progress, AppendableLink
 from ..bolt import GPath, SubProgress
 
-__all__ = [u'BSA_ExtractToProject', u'BSA_ListContents']
+__all__ = [u'BSA_ExtractToProject', u'BSA_ListContents',
+           u'BSA_UndoAlterations']
 
 class BSA_ExtractToProject(ItemLink):
     """Extracts one or more BSAs into projects."""
@@ -99,6 +100,25 @@ def Execute(self):
         for bsa_inf in self.iselected_infos():
             full_text += u'\n\n* %s:\n' % bsa_inf.abs_path.tail
             full_text += u'\n'.join(sorted(bsa_inf.assets))
+        bosh.bsa_assets_cache.save()
         full_text += u'\n[/spoiler]'
         balt.copyToClipboard(full_text)
         self._showLog(full_text, _(u'BSA Contents'))
+
+class BSA_UndoAlterations(AppendableLink, ItemLink):
+    """Undoes the changes BSA Alteration made to the hashes of one or more
+    BSAs."""
+    _text = _(u'Undo BSA Alteration...')
+    _help = _(u'Resets the hashes of the files in each selected BSA that BSA '
+              u'Alteration may have changed. BSAs whose hashes were already '
+              u'verified and that did not change since are skipped.')
+
+    def _append(self, window): return bush.game.displayName == u'Oblivion'
+
+    def Execute(self):
+        with Progress(_(u'Undoing BSA Alteration...'),
+                      u'\n' + u' ' * 60) as progress:
+            reset_count = bosh.bsaInfos.undo_alterations(
+                progress, bsa_names=self.selected)
+        self._showOk(_(u'Reset %u hashes.') % reset_count,
+                     _(u'BSA Alteration'))
@@ -301,6 +301,7 @@
     u'bash.installers.autoRefreshBethsoft': False,
     u'bash.installers.autoRefreshProjects': True,
     u'bash.installers.removeEmptyDirs': True,
+    u'bash.installers.linkProjects': False,
     u'bash.installers.skipScreenshots': False,
     u'bash.installers.skipScriptSources': False,
     u'bash.installers.skipImages': False,
@@ -44,7 +44,7 @@
     UIList_Rename, UIList_Hide
 from ..belt import InstallerWizard, generateTweakLines
 from ..bolt import GPath, SubProgress, LogFile, round_size, text_wrap
-from ..exception import CancelError, SkipError, StateError
+from ..exception import BSAError, CancelError, SkipError, StateError
 from ..gui import BusyCursor
 
 __all__ = [u'Installer_Open', u'Installer_Duplicate',
@@ -60,6 +60,7 @@
            u'InstallerArchive_Unpack', u'InstallerProject_ReleasePack',
            u'Installer_CopyConflicts', u'Installer_SyncFromData' ,
            u'InstallerProject_OmodConfig', u'Installer_ListStructure',
+           u'Installer_ListBsaContents',
            u'Installer_Espm_SelectAll', u'Installer_Espm_DeselectAll',
            u'Installer_Espm_List', u'Installer_Espm_Rename',
            u'Installer_Espm_Reset', u'Installer_Espm_ResetAll',
@@ -67,7 +68,8 @@
            u'Installer_Subs_ToggleSelection',
            u'Installer_Subs_ListSubPackages', u'Installer_OpenNexus',
            u'Installer_ExportAchlist', u'Installer_Espm_JumpToMod',
-           u'Installer_Fomod', u'Installer_InstallSmart']
+           u'Installer_Fomod', u'Installer_InstallSmart',
+           u'InstallerProject_PackToBsa']
 
 #------------------------------------------------------------------------------
 # Installer Links -------------------------------------------------------------
@@ -497,6 +499,8 @@ def Execute(self):
         installer = self._selected_info
         installer.skipRefresh ^= True
         if not installer.skipRefresh:
+            # files may have been edited in place while we were not looking
+            installer.drop_tree_snapshot()
             installer.refreshBasic(progress=None,
                                    recalculate_project_crc=False)
             installer.refreshStatus(self.idata)
@@ -585,6 +589,7 @@ class Installer_ListStructure(OneItemLink, _InstallerLink):
     _text = _(u'List Structure...')
     _help = _(u'Displays the folder structure of the selected installer (and '
               u'copies it to the system clipboard).')
+    _list_bsas = False
 
     def _enable(self):
         single_item = super(Installer_ListStructure, self)._enable()
@@ -592,12 +597,27 @@ def _enable(self):
 
     @balt.conversation ##: no use ! _showLog returns immediately
     def Execute(self):
-        source_list_txt = self._selected_info.listSource()
+        source_list_txt = self._selected_info.listSource(
+            list_bsas=self._list_bsas)
         #--Get masters list
         balt.copyToClipboard(source_list_txt)
         self._showLog(source_list_txt, title=_(u'Package Structure'),
                       fixedFont=False)
 
+class Installer_ListBsaContents(Installer_ListStructure):
+    """Copies folder structure of installer and the contents of its BSAs to
+    clipboard."""
+    _text = _(u'List Structure And BSA Contents...')
+    _help = _(u'Displays the folder structure of the selected installer and '
+              u'the contents of the BSAs in it (and copies them to the system '
+              u'clipboard). The BSAs are read from the package, which may '
+              u'take a while for large archives.')
+    _list_bsas = True
+
+    def _enable(self):
+        return super(Installer_ListBsaContents, self)._enable() and bool(
+            self._selected_info.packaged_bsas())
+
 class Installer_ExportAchlist(OneItemLink, _InstallerLink):
     """Write an achlist file with all the destinations files for this
     installer in this configuration."""
@@ -795,12 +815,15 @@ def _ok(msg): self._showOk(msg % self._selected_item)
         if not src_sizeCrc:
             return _ok(_(u'No files to install for %s'))
         src_order = self._selected_info.order
+        # Only installers sharing files with this one can conflict with it
+        sharing = self.idata.get_dest_index().get_sharing(self._selected_info)
         with balt.Progress(_(u'Scanning Packages...'),
                            u'\n' + u' ' * 60) as progress:
-            progress.setFull(len(self.idata))
+            progress.setFull(max(len(sharing), 1))
             numFiles = 0
             destDir = GPath(u'Conflicts - %03d' % src_order)
-            for i,(package, installer) in enumerate(self.idata.sorted_pairs()):
+            for i, (package, installer) in enumerate(self.idata.sorted_pairs(
+                    [GPath(inst.archive) for inst in sharing])):
                 curConflicts = set()
                 progress(i, _(u'Scanning Packages...') + u'\n%s' % package)
                 for z, y in installer.refreshDataSizeCrc().iteritems():
@@ -1069,6 +1092,8 @@ def Execute(self):
             projects = []
             for installer, project in to_unpack:
                 installer.unpackToProject(project,SubProgress(progress,0,0.8))
+                if project in self.idata: # we overwrote it
+                    self.idata[project].drop_tree_snapshot()
                 self.idata.refresh_installer(project, is_project=True,
                     progress=SubProgress(progress, 0.8, 0.99),
                     install_order=installer.order + 1, do_refresh=False)
@@ -1189,6 +1214,55 @@ class InstallerProject_ReleasePack(InstallerProject_Pack):
         u'Pack project to an archive for release. Ignores dev files/folders')
     release = True
 
+#------------------------------------------------------------------------------
+class InstallerProject_PackToBsa(_SingleProject):
+    """Pack the loose assets of a project into BSAs, in a new project."""
+    _text = _(u'Pack to BSA(s)...')
+    _help = _(u'Pack the loose assets of the project into BSAs named after '
+              u'its first plugin, in a new project')
+
+    def _enable(self):
+        return super(InstallerProject_PackToBsa, self)._enable() and bool(
+            self._selected_info.espms)
+
+    @balt.conversation
+    def Execute(self):
+        result = self._askText(_(u'Pack %s to Project:') % self._selected_item,
+                               default=self._selected_item.s + u' BSA')
+        if not result: return
+        # Error checking
+        project = GPath(result).tail
+        if not project.s or project.cext in archives.readExts:
+            self._showWarning(_(u'%s is not a valid project name.') % result)
+            return
+        if project == self._selected_item:
+            self._showWarning(_(u'Can not pack %s into itself.') % project)
+            return
+        if self.idata.store_dir.join(project).isfile():
+            self._showWarning(_(u'%s is a file.') % project)
+            return
+        if project in self.idata and not self._askYes(
+                _(u'%s already exists. Overwrite it?') % project,
+                default=False):
+            return
+        try:
+            with balt.Progress(_(u'Packing to BSA...'), u'\n' + u' ' * 60) \
+                    as progress:
+                self._selected_info.packToBsa(
+                    project, SubProgress(progress, 0, 0.8))
+                if project in self.idata: # we overwrote it
+                    self.idata[project].drop_tree_snapshot()
+                self.idata.refresh_installer(project, is_project=True,
+                    progress=SubProgress(progress, 0.8, 0.99),
+                    install_order=self._selected_info.order + 1,
+                    do_refresh=False)
+        except (BSAError, IOError, OSError) as e:
+            self._showError(u'%s' % e)
+            return
+        self.idata.irefresh(what=u'NS')
+        self.window.RefreshUI(detail_item=project)
+        self.window.SelectItemsNoCallback([project])
+
 #------------------------------------------------------------------------------
 class _InstallerConverter_Link(_InstallerLink):
 
@@ -33,14 +33,15 @@
 __all__ = [u'Installers_SortActive', u'Installers_SortProjects',
            u'Installers_RefreshData', u'Installers_AddMarker',
            u'Installers_CreateNewProject', u'Installers_MonitorInstall',
-           u'Installers_ListPackages', u'Installers_AnnealAll',
+           u'Installers_ListPackages', u'Installers_ListTextureMemory',
+           u'Installers_AnnealAll',
            u'Installers_UninstallAllPackages',
            u'Installers_UninstallAllUnknownFiles', u'Installers_AvoidOnStart',
            u'Installers_Enabled', u'Installers_AutoAnneal',
            u'Installers_AutoWizard', u'Installers_AutoRefreshProjects',
            u'Installers_AutoRefreshBethsoft',
            u'Installers_ApplyEmbeddedBCFs', u'Installers_BsaRedirection',
-           u'Installers_RemoveEmptyDirs',
+           u'Installers_RemoveEmptyDirs', u'Installers_LinkProjects',
            u'Installers_ConflictsReportShowsInactive',
            u'Installers_ConflictsReportShowsLower',
            u'Installers_ConflictsReportShowBSAConflicts',
@@ -182,6 +183,24 @@ def Execute(self):
         balt.copyToClipboard(package_list)
         self._showLog(package_list, title=_(u'BAIN Packages'), fixedFont=False)
 
+class Installers_ListTextureMemory(Installers_Link):
+    """Shows how much video memory the textures the game will load take
+    up."""
+    _text = _(u'List Texture Memory...')
+    _help = _(u'Shows how much video memory the textures in the %s folder '
+              u'and in the active BSAs take up, per package, and which '
+              u'textures are uncompressed or missing mipmaps.') % \
+            bush.game.mods_dir
+
+    @balt.conversation
+    def Execute(self):
+        with balt.Progress(_(u'Scanning Textures'),
+                           u'\n' + u' ' * 60) as progress:
+            texture_report = self.idata.get_texture_report(bosh.modInfos,
+                                                           progress)
+        self._showWryeLog(texture_report, title=_(u'Texture Memory'),
+                          asDialog=False)
+
 class Installers_AnnealAll(Installers_Link):
     """Anneal all packages."""
     _text = _(u'Anneal All')
@@ -420,15 +439,11 @@ def Execute(self):
             # Delete ArchiveInvalidation.txt, if it exists
             bosh.bsaInfos.remove_invalidation_file()
             if bush.game.displayName == u'Oblivion':
-                # For Oblivion, undo any alterations done to the textures BSA
-                # and reset the mtimes of vanilla BSAs ##: port to FO3/FNV?
-                bsaPath = bosh.modInfos.store_dir.join(
-                        bass.inisettings[u'OblivionTexturesBSAName'])
-                bsaFile = bosh.bsa_files.OblivionBsa(bsaPath, load_cache=True,
-                                                     names_only=False)
+                # For Oblivion, undo any alterations done to the BSAs and
+                # reset the mtimes of vanilla BSAs ##: port to FO3/FNV?
                 with balt.Progress(_(u'Enabling BSA Redirection...'),
                                    message=u'\n' + u' ' * 60) as progress:
-                    bsaFile.undo_alterations(progress)
+                    bosh.bsaInfos.undo_alterations(progress)
         bosh.oblivionIni.setBsaRedirection(bass.settings[self._bl_key])
 
 class Installers_ConflictsReportShowsInactive(_Installers_BoolLink_Refresh):
@@ -465,6 +480,15 @@ class Installers_RemoveEmptyDirs(BoolLink):
               u'directories when scanning the %s folder.') % bush.game.mods_dir
     _bl_key = u'bash.installers.removeEmptyDirs'
 
+class Installers_LinkProjects(BoolLink):
+    """Toggles option to link files from projects instead of copying."""
+    _text = _(u'Link Project Files')
+    _help = _(u'Toggles whether or not Wrye Bash will install the files of '
+              u'projects as links instead of copies, when the filesystem '
+              u'supports it. Files that are hard linked are shared with the '
+              u'project, so editing them in place edits the project too.')
+    _bl_key = u'bash.installers.linkProjects'
+
 # Sorting Links
 class _Installer_Sort(ItemLink):
     def Execute(self):
@@ -225,6 +225,7 @@ def InitInstallerLinks():
     InstallersList.column_links.append(Installers_AutoRefreshBethsoft())
     InstallersList.column_links.append(Installers_BsaRedirection())
     InstallersList.column_links.append(Installers_RemoveEmptyDirs())
+    InstallersList.column_links.append(Installers_LinkProjects())
     InstallersList.column_links.append(
         Installers_ConflictsReportShowsInactive())
     InstallersList.column_links.append(Installers_ConflictsReportShowsLower())
@@ -280,8 +281,10 @@ def InitInstallerLinks():
             packageMenu.links.append(Installer_ExportAchlist())
         packageMenu.links.append(InstallerProject_Pack())
         packageMenu.links.append(InstallerProject_ReleasePack())
+        packageMenu.links.append(InstallerProject_PackToBsa())
         packageMenu.links.append(SeparatorLink())
         packageMenu.links.append(Installer_ListStructure())
+        packageMenu.links.append(Installer_ListBsaContents())
         packageMenu.links.append(Installer_SyncFromData())
         packageMenu.links.append(InstallerArchive_Unpack())
         packageMenu.links.append(Installer_CopyConflicts())
@@ -343,6 +346,7 @@ def InitInstallerLinks():
     view_menu.append(ColumnsMenu())
     view_menu.append(SeparatorLink())
     view_menu.append(Installers_ListPackages())
+    view_menu.append(Installers_ListTextureMemory())
     view_menu.append(Installers_WizardOverlay())
     # Settings Menu
     settings_menu = InstallersList.global_links[_(u'Settings')]
@@ -360,6 +364,7 @@ def InitInstallerLinks():
     settings_menu.append(SeparatorLink())
     settings_menu.append(Installers_BsaRedirection())
     settings_menu.append(Installers_RemoveEmptyDirs())
+    settings_menu.append(Installers_LinkProjects())
     settings_menu.append(SeparatorLink())
     settings_menu.append(Installers_AutoRefreshBethsoft())
     settings_menu.append(Installers_GlobalSkips())
@@ -623,6 +628,8 @@ def InitModLinks():
     view_menu.append(Mods_ListMods())
     if bush.game.allTags:
         view_menu.append(Mods_ListBashTags())
+    if bush.game.Esp.canBash:
+        view_menu.append(Mods_ListConflicts())
     view_menu.append(Mods_ModChecker())
     # Settings Menu
     settings_menu = ModList.global_links[_(u'Settings')]
@@ -776,6 +783,7 @@ def InitBSALinks():
     BSAList.context_links.append(file_menu)
     BSAList.context_links.append(BSA_ExtractToProject())
     BSAList.context_links.append(BSA_ListContents())
+    BSAList.context_links.append(BSA_UndoAlterations())
     # BSAList: Global Links
     # File Menu
     file_menu = BSAList.global_links[_(u'File')]
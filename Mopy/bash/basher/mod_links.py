@@ -1207,16 +1207,19 @@ def _ignoreDirty(self, fileInfo): return self._check() ^ True
 class Mod_ScanDirty(ItemLink):
     """Give detailed printout of what Wrye Bash is detecting as UDR and ITM
     records"""
-    _text = _(u'Scan for UDRs')
+    _text = _(u'Scan for Dirty Edits')
     _help = _(u'Give detailed printout of what Wrye Bash is detecting as UDR'
-             u' and ITM records')
+             u' and ITM records and offer to remove the ITMs')
 
     def Execute(self):
         """Handle execution"""
         modInfos = [x for x in self.iselected_infos()]
         try:
             with balt.Progress(_(u'Dirty Edits'),u'\n'+u' '*60,abort=True) as progress:
-                ret = bosh.mods_metadata.ModCleaner.scan_Many(modInfos, progress=progress, detailed=True)
+                ret = bosh.mods_metadata.ModCleaner.scan_Many(modInfos,
+                    bosh.mods_metadata.ModCleaner.UDR |
+                    bosh.mods_metadata.ModCleaner.ITM, progress=progress,
+                    detailed=True)
         except CancelError:
             return
         log = bolt.LogFile(io.StringIO())
@@ -1233,6 +1236,7 @@ def strFid(form_id):
         dirty = []
         clean = []
         error = []
+        with_itms = []
         for i,modInfo in enumerate(modInfos):
             udrs,itms,fog = ret[i]
             if modInfo.name == GPath(u'Unofficial Oblivion Patch.esp'):
@@ -1265,6 +1269,12 @@ def strFid(form_id):
                         item = u'%s - %s attached to Exterior CELL (%s), attached to WRLD (%s)%s' % (
                             strFid(udr.fid),udr.type,parentStr,parentParentStr,atPos)
                     dirty[pos] += u'    * %s\n' % item
+                if itms:
+                    dirty[pos] += u'  * %s: %i\n' % (_(u'ITM'),len(itms))
+                    for master_name, object_id in sorted(itms):
+                        dirty[pos] += u'    * %s: %06X\n' % (master_name,
+                                                             object_id)
+                    with_itms.append((modInfo, itms))
             elif udrs is None or itms is None:
                 error.append(u'* __%s__' % modInfo)
             else:
@@ -1283,6 +1293,17 @@ def strFid(form_id):
             for mod in error: log(mod)
         self._showWryeLog(log.out.getvalue(),
                           title=_(u'Dirty Edit Scan Results'), asDialog=False)
+        if not with_itms or not self._askYes(
+                _(u'Remove the ITM records detected in %d mods? Backups of '
+                  u'the mods will be made first.') % len(with_itms),
+                title=_(u'Clean ITMs'), default=False): return
+        with balt.Progress(_(u'Clean ITMs')) as progress:
+            progress.setFull(len(with_itms))
+            for i, (modInfo, itms) in enumerate(with_itms):
+                progress(i, _(u'Cleaning %s') % modInfo)
+                cleaner = bosh.mods_metadata.ModCleaner(modInfo)
+                cleaner.itm = set(itms)
+                cleaner.remove_itms(SubProgress(progress, i, i + 1))
 
 #------------------------------------------------------------------------------
 class Mod_RemoveWorldOrphans(_NotObLink):
@@ -41,7 +41,7 @@
            u'Mods_ScanDirty', u'Mods_CrcRefresh', u'Mods_AutoESLFlagBP',
            u'Mods_LockActivePlugins', u'Mods_ModChecker',
            u'Mods_ExportBashTags', u'Mods_ImportBashTags',
-           u'Mods_ClearManualBashTags']
+           u'Mods_ClearManualBashTags', u'Mods_ListConflicts']
 
 # "Load" submenu --------------------------------------------------------------
 class _Mods_LoadListData(balt.ListEditorData):
@@ -263,6 +263,23 @@ def Execute(self):
         balt.copyToClipboard(tags_text)
         self._showLog(tags_text, title=_(u'Bash Tags'), fixedFont=False)
 
+#------------------------------------------------------------------------------
+class Mods_ListConflicts(ItemLink):
+    """Shows which records the active mods override and lose."""
+    _text = _(u'List Conflicts...')
+    _help = _(u'Shows how many records each active mod overrides and which '
+              u'of its records are overridden by later mods.')
+
+    def Execute(self):
+        override_index = bosh.modInfos.override_index
+        with balt.Progress(_(u'Indexing Records'),
+                           u'\n' + u' ' * 60) as progress:
+            override_index.refresh(bosh.modInfos, progress)
+        conflicts_text = override_index.conflicts_report(
+            load_order.cached_active_tuple())
+        self._showWryeLog(conflicts_text, title=_(u'Conflicts'),
+                          asDialog=False)
+
 #------------------------------------------------------------------------------
 class Mods_CleanDummyMasters(EnabledLink):
     """Clean up after using a 'Create Dummy Masters...' command."""
@@ -169,10 +169,12 @@ def PatchExecute(self):
             patchFile = PatchFile(self.patchInfo, bosh.modInfos)
             enabled_patchers = [p.get_patcher_instance(patchFile) for p in
                                 self._gui_patchers if p.isEnabled] ##: what happens if empty
-            patchFile.init_patchers_data(enabled_patchers, SubProgress(progress, 0, 0.1)) #try to speed this up!
-            patchFile.initFactories(SubProgress(progress,0.1,0.2)) #no speeding needed/really possible (less than 1/4 second even with large LO)
-            patchFile.scanLoadMods(SubProgress(progress,0.2,0.8)) #try to speed this up!
-            patchFile.buildPatch(log,SubProgress(progress,0.8,0.9))#no speeding needed/really possible (less than 1/4 second even with large LO)
+            # Share the strings decoded from the load order while building
+            with bolt.StringInterner():
+                patchFile.init_patchers_data(enabled_patchers, SubProgress(progress, 0, 0.1)) #try to speed this up!
+                patchFile.initFactories(SubProgress(progress,0.1,0.2)) #no speeding needed/really possible (less than 1/4 second even with large LO)
+                patchFile.scanLoadMods(SubProgress(progress,0.2,0.8)) #try to speed this up!
+                patchFile.buildPatch(log,SubProgress(progress,0.8,0.9))#no speeding needed/really possible (less than 1/4 second even with large LO)
             if patchFile.tes4.num_masters > bush.game.Esp.master_limit:
                 balt.showError(self,
                     _(u'The resulting Bashed Patch contains too many '
@@ -34,6 +34,7 @@
 import errno
 import io
 import os
+import Queue # PY3
 import re
 import shutil
 import stat
@@ -43,6 +44,8 @@
 import sys
 import tempfile
 import textwrap
+import threading
+import time
 import traceback
 from binascii import crc32
 from functools import partial
@@ -123,9 +126,18 @@ def getbestencoding(bitstream):
     #print('%s: %s (%s)' % (repr(bitstream),encoding,confidence))
     return encoding_,confidence
 
+# The StringInterner currently in effect, if any - see below
+_string_interner = None
+
 def decoder(byte_str, encoding=None, avoidEncodings=()):
-    """Decode a byte string to unicode, using heuristics on encoding."""
+    """Decode a byte string to unicode, using heuristics on encoding. While a
+    StringInterner is active, the result is looked up in its table first."""
     if isinstance(byte_str, unicode) or byte_str is None: return byte_str
+    if _string_interner is not None:
+        return _string_interner.decode(byte_str, encoding, avoidEncodings)
+    return _decode(byte_str, encoding, avoidEncodings)
+
+def _decode(byte_str, encoding, avoidEncodings):
     # Try the user specified encoding first
     if encoding:
         # TODO(ut) monkey patch
@@ -146,6 +158,54 @@ def decoder(byte_str, encoding=None, avoidEncodings=()):
         except UnicodeDecodeError: pass
     raise UnicodeDecodeError(u'Text could not be decoded using any method')
 
+class StringInterner(object):
+    """Intern table for the strings decoded while loading plugins. Use it as a
+    context manager around code that loads many plugins with overlapping
+    contents, e.g. a Bashed Patch build: EDIDs, names, model paths etc. get
+    repeated across thousands of overrides, so while the interner is active
+    each distinct byte string is decoded only once (skipping the encoding
+    detection) and all records share a single unicode object for it - which
+    saves memory and lets equality checks short-circuit on identity. The table
+    is dropped on exit, the decoded strings of course survive. The table is
+    shared by all threads, worker threads included, so it is locked."""
+    __slots__ = (u'_decoded', u'_prev_interner', u'_lock')
+
+    def __init__(self):
+        self._decoded = {}
+        self._prev_interner = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        global _string_interner
+        self._prev_interner, _string_interner = _string_interner, self
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        global _string_interner
+        _string_interner, self._prev_interner = self._prev_interner, None
+        with self._lock:
+            self._decoded.clear()
+
+    def decode(self, byte_str, encoding=None, avoidEncodings=()):
+        """Return the (shared) unicode object byte_str decodes to."""
+        with self._lock:
+            try:
+                decoded = self._decoded[encoding, avoidEncodings]
+            except KeyError:
+                decoded = self._decoded[encoding, avoidEncodings] = {}
+            text_str = decoded.get(byte_str)
+        if text_str is None:
+            # Decode outside the lock, encoding detection is slow - if another
+            # thread decoded the same string meanwhile, share its result
+            text_str = _decode(byte_str, encoding, avoidEncodings)
+            with self._lock:
+                text_str = decoded.setdefault(byte_str, text_str)
+        return text_str
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(d) for d in self._decoded.itervalues())
+
 def encode(text_str, encodings=encodingOrder, firstEncoding=None,
            returnEncoding=False):
     """Encode unicode string to byte string, using heuristics on encoding."""
@@ -703,11 +763,7 @@ def strippedVersion(self):
     @property
     def crc(self):
         """Calculates and returns crc value for self."""
-        crc = 0
-        with self.open(u'rb') as ins:
-            for block in iter(partial(ins.read, 2097152), b''):
-                crc = crc32(block, crc) # 2MB at a time, probably ok
-        return crc & 0xffffffff
+        return _file_crc(self._s)
 
     #--Path stuff -------------------------------------------------------
     #--New Paths, subpaths
@@ -1005,8 +1061,18 @@ def close(self):
 
 #------------------------------------------------------------------------------
 class Flags(object):
-    """Represents a flag field."""
-    __slots__ = [u'_names', u'_field', u'_unknown_is_unused']
+    """Represents a flag field. The first Flags instance created for a set of
+    names switches itself to a class generated (and cached) for those names,
+    which exposes each flag as a property over a single int. Clones created
+    by calling an instance (e.g. MreRecord.flags1_(header.flags1)) are then
+    just an int wrapped in that class, and flag checks are plain attribute
+    accesses."""
+    __slots__ = (u'_field',)
+    # Class variables, set on the classes generated by _flags_class
+    _names = None # type: dict
+    _unknown_is_unused = False
+    _used_mask = -1 # mask of the known flags if _unknown_is_unused else -1
+    _flags_classes = {}
 
     @staticmethod
     def getNames(*names):
@@ -1022,35 +1088,67 @@ def getNames(*names):
                 namesDict[flg_name] = index
         return namesDict
 
+    @classmethod
+    def _flags_class(cls, names, unknown_is_unused):
+        """Returns the subclass of cls generated for the specified names and
+        unknown_is_unused value, generating it if necessary."""
+        cache_key = (cls, frozenset(names.iteritems()), unknown_is_unused)
+        try:
+            return Flags._flags_classes[cache_key]
+        except KeyError:
+            pass
+        cls_dict = {u'__slots__': (), u'_names': names,
+                    u'_unknown_is_unused': unknown_is_unused}
+        if unknown_is_unused:
+            used_mask = 0
+            for flg_idx in names.itervalues():
+                used_mask |= 1 << flg_idx
+            cls_dict[u'_used_mask'] = used_mask
+        for flg_name, flg_idx in names.iteritems():
+            if hasattr(cls, flg_name):
+                raise SyntaxError(u"Flag name '%s' clashes with an attribute "
+                                  u'of %s' % (flg_name, cls.__name__))
+            cls_dict[flg_name] = Flags._flag_property(flg_idx)
+        flags_cls = Flags._flags_classes[cache_key] = type(
+            str(cls.__name__), (cls,), cls_dict)
+        return flags_cls
+
+    @staticmethod
+    def _flag_property(flg_idx):
+        """Returns a property getting and setting the flag at flg_idx -
+        setting goes through __setitem__, which subclasses may override."""
+        flg_mask = 1 << flg_idx
+        def _get_flag(self):
+            return (self._field & flg_mask) != 0
+        def _set_flag(self, value):
+            self[flg_idx] = value
+        return property(_get_flag, _set_flag)
+
     #--Generation
     def __init__(self, value=0, names=None, unknown_is_unused=False):
         """Initialize. Attrs, if present, is mapping of attribute names to
         indices. unknown_is_unused will discard unknown flags."""
-        object.__setattr__(self, u'_names', names or {})
-        object.__setattr__(self, u'_field', int(value))
-        object.__setattr__(self, u'_unknown_is_unused', unknown_is_unused)
+        if self._names is None:
+            self.__class__ = self._flags_class(names or {}, unknown_is_unused)
+        self._field = int(value)
         self._clean_unused_flags()
 
     def __call__(self,newValue=None):
         """Returns a clone of self, optionally with new value."""
-        if newValue is not None:
-            return Flags(int(newValue), self._names, self._unknown_is_unused)
-        else:
-            return Flags(self._field, self._names, self._unknown_is_unused)
+        # Skip __init__, the class of self already knows our names
+        flags_clone = object.__new__(self.__class__)
+        flags_clone._field = (self._field if newValue is None else
+                              int(newValue) & self._used_mask)
+        return flags_clone
 
     def __deepcopy__(self, memo):
-        newFlags = Flags(self._field, self._names, self._unknown_is_unused)
+        newFlags = self()
         memo[id(self)] = newFlags ##: huh?
         return newFlags
 
     def _clean_unused_flags(self):
         """Removes all unknown flags if that option was set in __init__."""
-        if self._unknown_is_unused:
-            final_flags = 0
-            for flg_name, flg_idx in self._names.iteritems():
-                if getattr(self, flg_name):
-                    final_flags |= 1 << flg_idx
-            self._field = final_flags
+        self._field &= self._used_mask
 
     #--As hex string
     def hex(self):
@@ -1068,13 +1166,15 @@ def __int__(self):
     def __index__(self):
         """Same as __int__, needed for packing in py3."""
         return self._field
-    def __getstate__(self): ##: do we even use this?
-        """Return values for pickling."""
-        return self._field, self._names
+    def __reduce__(self): ##: do we even use this?
+        """Return values for pickling - generated classes can't be pickled by
+        reference, so pickle a call to Flags instead."""
+        return Flags, (self._field, self._names, self._unknown_is_unused)
     def __setstate__(self,fields):
-        """Used by unpickler."""
+        """Used by unpickler for flags pickled before classes were
+        generated per set of names."""
+        self.__class__ = self._flags_class(fields[1], False)
         self._field = fields[0]
-        self._names = fields[1]
 
     #--As list
     def __getitem__(self, index):
@@ -1087,23 +1187,6 @@ def __setitem__(self,index,value):
         mask = 1 << index
         self._field = ((self._field & ~mask) | value)
 
-    #--As class
-    def __getattr__(self, attr_key):
-        """Get value by flag name. E.g. flags.isQuestItem"""
-        try:
-            names = object.__getattribute__(self, u'_names')
-            index = names[attr_key]
-            return (object.__getattribute__(self, u'_field') >> index) & 1 == 1
-        except KeyError:
-            raise AttributeError(attr_key)
-
-    def __setattr__(self, attr_key, value):
-        """Set value by flag name. E.g., flags.isQuestItem = False"""
-        if attr_key in (u'_field', u'_names'):
-            object.__setattr__(self, attr_key, value)
-        else:
-            self.__setitem__(self._names[attr_key], value)
-
     #--Native operations
     def __eq__( self, other):
         """Logical equals."""
@@ -1321,6 +1404,12 @@ def __init__(self, pkl_path, readOnly=False):
     def exists(self):
         return self._pkl_path.exists() or self.backup.exists()
 
+    def pkl_mtime(self):
+        """Return the modification time of the pickle file, or of its backup
+        if it does not exist."""
+        return (self._pkl_path if self._pkl_path.exists() else
+                self.backup).mtime
+
     class Mold(Exception):
         def __init__(self, moldedFile):
             msg = (u'Your settings in %s come from an ancient Bash version. '
@@ -1391,6 +1480,197 @@ def save(self):
         self._pkl_path.untemp(doBackup=True)
         return True
 
+#------------------------------------------------------------------------------
+class PickleCache(object):
+    """Base class of the persistent caches that pickle their (key, entry)
+    pairs one after the other to their cache file. The file is read the
+    first time an entry is needed and new entries are appended to it on
+    save, instead of rewriting the whole cache every time. As appending an
+    entry for an existing key leaves the old one in the file, it is
+    compacted on load once it has grown too much - or when it could only be
+    read in part. Subclasses add their own API on top of _get_entries and
+    _set_entry and may override _drop_stale."""
+    # entries over twice the live ones that make the file get compacted
+    _max_stale_entries = 1000
+
+    def __init__(self, cache_path):
+        self._cache_path = cache_path
+        self._entries = None # key -> entry, lazy
+        self._unsaved = []
+
+    def _get_entries(self):
+        if self._entries is None:
+            self._entries = {}
+            num_entries = 0
+            needs_compacting = False
+            try:
+                with self._cache_path.open(u'rb') as ins:
+                    while True:
+                        try:
+                            cache_key, entry = pickle.load(ins)
+                        except EOFError:
+                            break
+                        self._entries[cache_key] = entry
+                        num_entries += 1
+            except (IOError, OSError):
+                pass # no cache yet
+            except Exception: # e.g. a truncated entry - keep what we read
+                deprint(u'Error reading %s' % self._cache_path,
+                        traceback=True)
+                needs_compacting = True
+            if needs_compacting or num_entries > 2 * len(
+                    self._entries) + self._max_stale_entries:
+                self._compact()
+        return self._entries
+
+    def _drop_stale(self):
+        """Drop the entries that can't be used anymore, called on compacting
+        the cache file."""
+
+    def _compact(self):
+        """Rewrite the cache file with the current entries only."""
+        self._drop_stale()
+        with self._cache_path.temp.open(u'wb') as out:
+            for cache_entry in self._entries.iteritems():
+                pickle.dump(cache_entry, out, -1)
+        self._cache_path.untemp()
+        del self._unsaved[:]
+
+    def _set_entry(self, cache_key, entry):
+        entries = self._get_entries()
+        if entries.get(cache_key) != entry:
+            entries[cache_key] = entry
+            self._unsaved.append((cache_key, entry))
+
+    def save(self):
+        """Append the entries added since the last save to the cache file."""
+        if not self._unsaved: return
+        with self._cache_path.open(u'ab') as out:
+            for cache_entry in self._unsaved:
+                pickle.dump(cache_entry, out, -1)
+        del self._unsaved[:]
+
+class CrcCache(PickleCache):
+    """Persistent cache of file CRCs, shared by everything that needs them.
+    Entries are keyed by the normalized absolute paths of the files and are
+    only valid while the size, modification time and inode (where the OS
+    provides one) of the file stay the same - so a file that was hashed once
+    anywhere is never hashed again until it changes."""
+
+    @staticmethod
+    def _norm_key(file_path):
+        return os.path.normcase(os.path.abspath(Path.getNorm(file_path)))
+
+    def _drop_stale(self, __stat=os.stat):
+        # the entries of files that were deleted, renamed or changed
+        crcs = self._entries
+        for norm_key, entry in crcs.items():
+            try:
+                st = __stat(norm_key)
+            except OSError:
+                del crcs[norm_key]
+                continue
+            if entry[:3] != (st.st_size, st.st_mtime, st.st_ino):
+                del crcs[norm_key]
+
+    @staticmethod
+    def file_stat(file_path, __stat=os.stat):
+        """Return the (size, mtime, inode) of the specified file, which
+        identify the version of it a CRC is cached for, or None if it can't
+        be stat'ed. Call this *before* reading the file to hash it, so that a
+        change made while hashing invalidates the entry."""
+        try:
+            st = __stat(Path.getNorm(file_path))
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime, st.st_ino
+
+    def get_crc(self, file_path):
+        """Return the cached CRC of the specified file, or None if it's not
+        cached or the file changed since."""
+        file_stat = self.file_stat(file_path)
+        if file_stat is None: return None
+        entry = self._get_entries().get(self._norm_key(file_path))
+        if entry is not None and entry[:3] == file_stat:
+            return entry[3]
+        return None
+
+    def set_crc(self, file_path, crc, file_stat):
+        """Cache the CRC of the specified file, calculated after file_stat
+        (see file_stat) was taken."""
+        if file_stat is None: return
+        self._set_entry(self._norm_key(file_path), file_stat + (crc,))
+
+    def calc_crc(self, file_path, recalculate=False):
+        """Return the CRC of the specified file, calculating and caching it
+        if it's not cached, it changed, or recalculate is True."""
+        crc = None if recalculate else self.get_crc(file_path)
+        if crc is None:
+            file_stat = self.file_stat(file_path)
+            crc = _file_crc(Path.getNorm(file_path))
+            self.set_crc(file_path, crc, file_stat)
+        return crc
+
+#------------------------------------------------------------------------------
+class DirWatcher(object):
+    """Keeps track of the paths that changed in a directory tree, so that the
+    clients of the watcher can refresh only those instead of rescanning the
+    whole tree. Each client (identified by a key of its choice) gets its own
+    set of changes, see pop_changes.
+
+    This is the fallback implementation, used where the OS offers no way to
+    be notified of file changes - it never watches, so its clients always
+    fall back to polling (rescanning) the whole tree. See env for the OS
+    specific watchers."""
+
+    def __init__(self, root_dir, rescan_interval=600):
+        """:param root_dir: the directory to watch, as unicode
+        :param rescan_interval: the seconds after which pop_changes will ask
+            a client to do a full rescan anyway, as a consistency check"""
+        self._root = root_dir
+        self._rescan_interval = rescan_interval
+        self._client_changes = {} # client -> set of paths or None
+        self._last_rescan = {} # client -> time of its last full rescan
+
+    @property
+    def is_watching(self): return False
+
+    def start(self):
+        """Start watching the tree, return True on success."""
+        return False
+
+    def close(self):
+        """Stop watching the tree - all clients will rescan from now on."""
+
+    def pop_changes(self, client):
+        """Return the set of the paths (relative to the watched directory)
+        that changed since the last time client called this, or None if
+        client must rescan the whole tree. This is always the case on its
+        first call, if the watcher lost track of the changes and every
+        rescan_interval seconds. The paths may be of directories that were
+        deleted or moved away - their contents are gone too."""
+        self._read_events()
+        changes = self._client_changes.get(client)
+        now = time.time()
+        if not self.is_watching or now - self._last_rescan.get(
+                client, 0) > self._rescan_interval:
+            changes = None
+        if changes is None:
+            self._last_rescan[client] = now
+        self._client_changes[client] = set()
+        return changes
+
+    def _read_events(self):
+        """Process the pending change notifications - see _mark_changed."""
+
+    def _mark_changed(self, rel_path):
+        for changes in self._client_changes.itervalues():
+            if changes is not None: changes.add(rel_path)
+
+    def _mark_all_changed(self):
+        for client in self._client_changes:
+            self._client_changes[client] = None
+
 #------------------------------------------------------------------------------
 class Settings(DataDict):
     """Settings/configuration dictionary with persistent storage.
@@ -1906,6 +2186,361 @@ def __call__(self,state,message=u''):
         self.parent(self.baseFrom+self.scale*state/self.full,message)
         self.state = state
 
+#------------------------------------------------------------------------------
+def _file_crc(file_path, on_block=None):
+    """Calculate the CRC32 of the specified file, calling on_block with the
+    size of each block read, if given."""
+    crc = 0
+    with open(file_path, u'rb') as ins:
+        for block in iter(partial(ins.read, 2097152), b''):
+            crc = crc32(block, crc) # 2MB at a time, probably ok
+            if on_block is not None: on_block(len(block))
+    return crc & 0xFFFFFFFF
+
+def _get_max_workers(max_workers):
+    """Return max_workers, or one per core (but no more than 8) if it's 0."""
+    if max_workers <= 0:
+        try:
+            import multiprocessing
+            max_workers = min(multiprocessing.cpu_count(), 8)
+        except NotImplementedError:
+            max_workers = 1
+    return max_workers
+
+def calc_crcs(files, progress=None, progress_msg=u'', max_workers=0):
+    """Calculate the CRC32s of the specified files on a pool of up to
+    max_workers threads - file reads and crc32 release the GIL, so this scales
+    with the disk rather than a single core. Use many workers for SSDs and one
+    per spindle for HDDs, 0 meaning one per core (but no more than 8). Files
+    are handed out largest first, to balance the load between the workers.
+
+    :param files: a list of (file path, size, name to display) tuples
+    :param progress: a Progress, set up to go from 0 to the total size of the
+        files plus their number - it's only called from the calling thread
+    :param progress_msg: prefixed to the names of the files in progress
+    :return: a dict mapping the file paths to their CRCs - files that can't
+        be read are skipped"""
+    progress = progress or Progress()
+    files = sorted(files, key=lambda f: f[1], reverse=True)
+    num_workers = min(_get_max_workers(max_workers), len(files))
+    crcs = {}
+    done = 0
+    if num_workers <= 1: # Nothing to gain from threads
+        for file_path, siz, display_name in files:
+            progress(done, progress_msg + display_name)
+            sub = SubProgress(progress, done, done + siz + 1)
+            sub.setFull(siz + 1)
+            read = [0]
+            def _on_block(block_size):
+                read[0] += block_size
+                sub(read[0])
+            try:
+                crcs[file_path] = _file_crc(file_path, _on_block)
+            except (IOError, OSError):
+                deprint(u'Failed to calculate crc for %s - please report '
+                        u'this, and the following traceback:' % file_path,
+                        traceback=True)
+            done += siz + 1
+        return crcs
+    tasks = Queue.Queue()
+    for file_info in files: tasks.put(file_info)
+    # The workers post the sizes of the blocks they read and a
+    # (path, name, crc) tuple for each file they're done with
+    results = Queue.Queue()
+    stop = threading.Event()
+    def _on_block(block_size):
+        if stop.is_set(): raise exception.CancelError
+        results.put(block_size)
+    def _crc_worker():
+        while not stop.is_set():
+            try:
+                file_path, _siz, display_name = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            crc = None
+            try:
+                crc = _file_crc(file_path, _on_block)
+            except exception.CancelError:
+                return
+            except Exception:
+                deprint(u'Failed to calculate crc for %s - please report '
+                        u'this, and the following traceback:' % file_path,
+                        traceback=True)
+            results.put((file_path, display_name, crc))
+    workers = [threading.Thread(target=_crc_worker)
+               for _x in xrange(num_workers)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    remaining = len(files)
+    try:
+        while remaining:
+            result = results.get()
+            if isinstance(result, tuple):
+                file_path, display_name, crc = result
+                if crc is not None: crcs[file_path] = crc
+                remaining -= 1
+                done += 1
+                progress(done, progress_msg + display_name)
+            else:
+                done += result
+                progress(done)
+    finally: # e.g. the user canceled - stop the workers
+        stop.set()
+        for worker in workers: worker.join()
+    return crcs
+
+class ParallelMap(object):
+    """Call func on each of items on a pool of up to max_workers threads (0
+    meaning one per core, but no more than 8) and iterate over the (item,
+    result) pairs in the order of items. At most max_ahead items past the one
+    the calling thread is at are processed (by default twice the number of
+    workers), to bound the resources taken by results that are not consumed
+    yet. Exceptions raised by func are re-raised in the calling thread when
+    it gets to their item. Use as a context manager - on exit, for instance
+    if the user canceled via the progress, no more items are started and the
+    calling thread waits for the running ones to finish."""
+    def __init__(self, func, items, max_workers=0, max_ahead=0):
+        self._func = func
+        self._items = list(items)
+        self._num_workers = min(_get_max_workers(max_workers),
+                                len(self._items))
+        self._max_ahead = max_ahead or 2 * self._num_workers
+        self._results = {} # item index -> (result, exc_info)
+        self._cond = threading.Condition()
+        self._next_task = self._next_result = 0
+        self._stopped = False
+        self._workers = []
+
+    def __enter__(self):
+        if self._num_workers > 1: # else there is nothing to gain from threads
+            self._workers = [threading.Thread(target=self._worker)
+                             for _x in xrange(self._num_workers)]
+            for worker in self._workers:
+                worker.daemon = True
+                worker.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for worker in self._workers: worker.join()
+
+    def __iter__(self):
+        if not self._workers:
+            for item in self._items:
+                yield item, self._func(item)
+            return
+        cond = self._cond
+        for index, item in enumerate(self._items):
+            with cond:
+                while index not in self._results:
+                    cond.wait()
+                result, exc_info = self._results.pop(index)
+                self._next_result = index + 1
+                cond.notify_all() # there may be room for more items now
+            if exc_info is not None:
+                raise exc_info[0], exc_info[1], exc_info[2]
+            yield item, result
+
+    def _worker(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._stopped and self._next_task < len(
+                        self._items) and self._next_task - \
+                        self._next_result >= self._max_ahead:
+                    cond.wait()
+                if self._stopped or self._next_task >= len(self._items):
+                    return
+                index = self._next_task
+                self._next_task += 1
+            result = exc_info = None
+            try:
+                result = self._func(self._items[index])
+            except Exception:
+                exc_info = sys.exc_info()
+            with cond:
+                self._results[index] = (result, exc_info)
+                cond.notify_all()
+
+#------------------------------------------------------------------------------
+def list_files(dir_path):
+    """Return the names of the files (and not directories) in dir_path, or
+    an empty list if it does not exist. With scandir we get the type of the
+    entries for free, so we don't have to stat them."""
+    try:
+        if scandir is not None:
+            return [e.name for e in scandir.scandir(dir_path) if e.is_file()]
+        return [x for x in os.listdir(dir_path) if
+                os.path.isfile(os.path.join(dir_path, x))]
+    except OSError as e:
+        if e.errno != errno.ENOENT: raise
+        return []
+
+def _scan_dir(abs_dir):
+    """Return the names of the directories in abs_dir, the (path, mtime)
+    of the ones we should descend into (not symlinked, like walk), the
+    (name, size, mtime) of the rest of its entries and whether all of them
+    could be stat'ed. Entries that can't be are skipped, so one bad entry
+    does not hide the rest of the directory. With scandir the type of the
+    entries comes for free and on Windows so do their stat results."""
+    dir_names, sub_dirs, file_stats = [], [], []
+    complete = True
+    if scandir is not None:
+        entries = [(e.name, e.path, e) for e in scandir.scandir(abs_dir)]
+    else:
+        join = os.path.join
+        entries = [(n, join(abs_dir, n), None) for n in os.listdir(abs_dir)]
+    isdir, islink = os.path.isdir, os.path.islink
+    for entry_name, entry_path, entry in entries:
+        try:
+            if entry is not None: # scandir
+                if entry.is_dir():
+                    dir_names.append(entry_name)
+                    if not entry.is_symlink():
+                        sub_dirs.append((entry_path, entry.stat().st_mtime))
+                    continue
+                lstat = entry.stat(follow_symlinks=False)
+            else:
+                if isdir(entry_path):
+                    dir_names.append(entry_name)
+                    if not islink(entry_path):
+                        sub_dirs.append(
+                            (entry_path, os.path.getmtime(entry_path)))
+                    continue
+                lstat = os.lstat(entry_path)
+            file_stats.append((entry_name, lstat.st_size, lstat.st_mtime))
+        except OSError as e:
+            complete = False
+            if e.errno != errno.ENOENT: # else removed in the meantime
+                deprint(u'Skipping %s: %r' % (entry_path, e))
+    return dir_names, sub_dirs, file_stats, complete
+
+def _scan_subtree(abs_dir, dir_mtime, scanned, stop=None):
+    """Scan the tree under abs_dir, appending the scan_tree tuples of its
+    directories to scanned."""
+    pending = [(abs_dir, dir_mtime)]
+    while pending:
+        if stop is not None and stop.is_set(): return
+        abs_dir, dir_mtime = pending.pop()
+        try:
+            dir_names, sub_dirs, file_stats, _complete = _scan_dir(abs_dir)
+        except OSError: # like walk, skip directories we can't list
+            continue
+        scanned.append((abs_dir, dir_mtime, dir_names, file_stats))
+        pending.extend(reversed(sub_dirs))
+
+def rescan_tree(root_dir, snapshot):
+    """Like scan_tree, but reuse the entries of the directories in snapshot
+    whose mtime did not change since it was taken, so only the directories
+    need to be stat'ed. Note that editing a file in place does not change
+    the mtime of its directory - callers must drop the snapshot when that
+    may have happened. Return the scan_tree list and a new snapshot, a dict
+    mapping the paths of the directories (relative to root_dir) to their
+    mtime, the names of their (not symlinked) subdirectories and the stats
+    of their files."""
+    scanned, new_snapshot = [], {}
+    # directories modified right before or during the scan may be modified
+    # again within the resolution of their mtime, so never trust those
+    racy_mtime = time.time() - 2
+    pending = [(root_dir, u'')]
+    while pending:
+        abs_dir, rel_dir = pending.pop()
+        try:
+            dir_mtime = os.path.getmtime(abs_dir)
+            cached = snapshot.get(rel_dir)
+            complete = True
+            if cached is not None and cached[0] == dir_mtime:
+                sub_names, file_stats = cached[1], cached[2]
+            else:
+                __dir_names, sub_dirs, file_stats, complete = _scan_dir(
+                    abs_dir)
+                sub_names = [os.path.basename(d) for d, _m in sub_dirs]
+        except OSError: # like walk, skip directories we can't list
+            continue
+        # don't trust the entries of directories with entries we skipped
+        new_snapshot[rel_dir] = (dir_mtime if complete and
+                                 dir_mtime < racy_mtime else None,
+                                 sub_names, file_stats)
+        scanned.append((abs_dir, dir_mtime, sub_names, file_stats))
+        pending.extend((os.path.join(abs_dir, n), os.path.join(rel_dir, n))
+                       for n in reversed(sub_names))
+    return scanned, new_snapshot
+
+def scan_tree(root_dir, top_dirs_filter=None, progress=None, progress_msg=u'',
+              max_workers=1):
+    """Walk the tree under root_dir like walkdir, but also collect the sizes
+    and modification times of the files, so that callers don't need to stat
+    them one by one. Return a list of (absolute dir path, dir mtime, list of
+    dir names, list of (file name, size, mtime)) tuples, one per directory,
+    parents before children. Returns an empty list if root_dir can't be
+    listed. Entries that can't be stat'ed are skipped.
+
+    :param top_dirs_filter: called with a list of the names of the
+        directories in root_dir to remove in place the ones that should not
+        be scanned, like InstallersData._skips_in_data_dir - the names of
+        root_dir's entry list all of its directories regardless
+    :param progress: called with the paths (relative to root_dir) of the
+        scanned directories - only from the calling thread
+    :param max_workers: if more than one, the trees of the directories in
+        root_dir are scanned in parallel by up to that many threads (0 for one
+        per core) - worth it for cold caches and network drives"""
+    progress = progress or Progress()
+    rel_pos = len(root_dir) + 1
+    try:
+        dir_names, sub_dirs, file_stats, _complete = _scan_dir(root_dir)
+        scanned = [(root_dir, os.path.getmtime(root_dir), dir_names,
+                    file_stats)]
+    except OSError:
+        return []
+    if top_dirs_filter is not None:
+        kept = dir_names[:]
+        top_dirs_filter(kept)
+        kept = {n.lower() for n in kept}
+        sub_dirs = [(d, m) for d, m in sub_dirs if
+                    os.path.basename(d).lower() in kept]
+    num_workers = min(_get_max_workers(max_workers), len(sub_dirs))
+    if num_workers <= 1:
+        for sub_dir, sub_mtime in sub_dirs:
+            progress(0.05, progress_msg + sub_dir[rel_pos:])
+            _scan_subtree(sub_dir, sub_mtime, scanned)
+        return scanned
+    tasks = Queue.Queue()
+    for task in enumerate(sub_dirs): tasks.put(task)
+    results = Queue.Queue() # (index, scanned list or exception)
+    stop = threading.Event()
+    def _scan_worker():
+        while not stop.is_set():
+            try:
+                index, (sub_dir, sub_mtime) = tasks.get_nowait()
+            except Queue.Empty:
+                return
+            sub_scanned = []
+            try:
+                _scan_subtree(sub_dir, sub_mtime, sub_scanned, stop)
+            except Exception as e:
+                sub_scanned = e
+            results.put((index, sub_scanned))
+    workers = [threading.Thread(target=_scan_worker)
+               for _x in xrange(num_workers)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    sub_results = [None] * len(sub_dirs)
+    try:
+        for _x in xrange(len(sub_dirs)):
+            index, sub_scanned = results.get()
+            if isinstance(sub_scanned, Exception): raise sub_scanned
+            sub_results[index] = sub_scanned
+            progress(0.05, progress_msg + sub_dirs[index][0][rel_pos:])
+    finally: # e.g. the user canceled - stop the workers
+        stop.set()
+        for worker in workers: worker.join()
+    for sub_scanned in sub_results: scanned.extend(sub_scanned)
+    return scanned
+
 #------------------------------------------------------------------------------
 def readCString(ins, file_path):
     """Read null terminated string, dropping the final null byte."""
@@ -45,8 +45,9 @@
 #--Local
 from ._mergeability import isPBashMergeable, is_esl_capable
 from .loot_parser import LOOTParser, libloot_version
-from .mods_metadata import get_tags_from_dir
-from .. import bass, bolt, balt, bush, env, load_order, initialization
+from .mods_metadata import get_tags_from_dir, OverrideIndex
+from .. import archives, bass, bolt, balt, bush, env, load_order, \
+    initialization
 from ..archives import readExts
 from ..bass import dirs, inisettings
 from ..bolt import GPath, DataDict, deprint, Path, decoder, AFile, \
@@ -80,6 +81,13 @@
 screen_infos = None # type: ScreenInfos
 #--Config Helper files (LOOT Master List, etc.)
 lootDb = None # type: LOOTParser
+#--CRCs of mods, installers and Data files, shared by everyone
+crc_cache = None # type: bolt.CrcCache
+data_watcher = None # type: bolt.DirWatcher
+#--Listings of 7z/rar BAIN packages, so that they are only listed once
+listing_cache = None # type: archives.ListingCache
+#--Asset paths of BSAs, so that they are only parsed once
+bsa_assets_cache = None # type: bsa_files.BsaAssetsCache
 
 #--Header tags
 reVersion = re.compile(
@@ -452,13 +460,16 @@ def isInvertedMod(self):
 
     def calculate_crc(self, recalculate=False):
         cached_crc = self.get_table_prop(u'crc')
+        # if we were asked to recalculate don't trust the shared cache either
+        force_recalc = recalculate
         if not recalculate:
             recalculate = cached_crc is None \
                 or self._file_mod_time != self.get_table_prop(u'crc_mtime') \
                 or self._file_size != self.get_table_prop(u'crc_size')
         path_crc = cached_crc
         if recalculate:
-            path_crc = self.abs_path.crc
+            # saved by ModInfos.refresh, once for all mods
+            path_crc = crc_cache.calc_crc(self.abs_path, force_recalc)
             if path_crc != cached_crc:
                 self.set_table_prop(u'crc', path_crc)
                 self.set_table_prop(u'ignoreDirty', False)
@@ -825,27 +836,20 @@ def isMissingStrings(self, __debug=0):
         missing."""
         if not self.header.flags1.hasStrings: return False
         lang = oblivionIni.get_ini_language()
-        bsa_infos = self._find_string_bsas()
+        bsa_infos = None
         for assetPath in self._string_files_paths(lang):
             # Check loose files first
             if self.dir.join(assetPath).exists():
                 continue
             # Check in BSA's next
-            if __debug == 1:
-                deprint(u'Scanning BSAs for string files for %s' % self)
-                __debug = 2
-            for bsa_info in bsa_infos:
-                try:
-                    if bsa_info.has_assets({assetPath}):
-                        break # found
-                except (BSAError, OverflowError):
-                    print(u'Failed to parse %s:\n%s' % (
-                        bsa_info, traceback.format_exc()))
-                    continue
-                if __debug == 2:
-                    deprint(u'Asset %s not in %s' % (assetPath, bsa_info))
-            else: # not found
-                return True
+            if bsa_infos is None:
+                bsa_infos = modInfos.get_bsa_lo(for_plugins=[self.name])[0]
+                asset_index = bsaInfos.get_asset_index(bsa_infos)[0]
+            if __debug:
+                deprint(u'Looking up %s for %s in the BSAs' % (assetPath,
+                                                                 self))
+            if not asset_index.get_bsas(assetPath.cs, bsa_infos):
+                return True # not found
         return False
 
     def hasResources(self):
@@ -1407,8 +1411,13 @@ def new_info(self, fileName, _in_refresh=False, owner=None,
             self._notify_bain(changed={info.abs_path})
         return info
 
-    def _names(self): # performance intensive
-        return {x for x in self.store_dir.list() if
+    def _names(self, candidates=None): # performance intensive
+        """Return the names of the files in store_dir that belong to self,
+        checking only the names in candidates if given."""
+        if candidates is None: # no need to stat the files with scandir
+            return {GPath_no_norm(x) for x in
+                    bolt.list_files(self.store_dir.s) if self.rightFileType(x)}
+        return {x for x in candidates if
                 self.store_dir.join(x).isfile() and self.rightFileType(x)}
 
     #--Right File Type?
@@ -1483,6 +1492,7 @@ def _rename_operation(self, oldName, newName):
 
 class FileInfos(TableFileInfos):
     """Common superclass for mod, saves and bsa infos."""
+    _data_dir_watched = False # use data_watcher to only refresh changes ?
 
     def _initDB(self, dir_):
         super(FileInfos, self)._initDB(dir_)
@@ -1503,13 +1513,26 @@ def new_info(self, fileName, _in_refresh=False, owner=None,
             raise
 
     #--Refresh
+    def _changed_names(self):
+        """Return the names of the files in store_dir that may have changed
+        since the last refresh, or None if all of them must be checked."""
+        if not self._data_dir_watched or data_watcher is None: return None
+        changed = data_watcher.pop_changes(self.__class__.__name__)
+        if changed is None: return None
+        return {GPath(p) for p in changed if os.sep not in p}
+
     def refresh(self, refresh_infos=True, booting=False):
         """Refresh from file directory."""
         oldNames = set(self) | set(self.corrupted)
         _added = set()
         _updated = set()
-        newNames = self._names()
-        for new in newNames: #--Might have '.ghost' lopped off.
+        changed = self._changed_names()
+        if changed is None: # check every file in store_dir
+            newNames = scan_names = self._names()
+        else:
+            scan_names = self._names(changed)
+            newNames = (oldNames - changed) | scan_names
+        for new in scan_names: #--Might have '.ghost' lopped off.
             oldInfo = self.get(new) # None if new was in corrupted or new one
             try:
                 if oldInfo is not None:
@@ -1883,6 +1906,7 @@ def _modinfos_cache_wrapper(self, *args, **kwargs):
 #------------------------------------------------------------------------------
 class ModInfos(FileInfos):
     """Collection of modinfos. Represents mods in the Data directory."""
+    _data_dir_watched = True
 
     def __init__(self):
         self.__class__.file_pattern = re.compile(u'(' + u'|'.join(
@@ -1908,6 +1932,9 @@ def __init__(self):
         self.new_missing_strings = set() #--Set of new mods with missing .STRINGS files
         self.activeBad = set() #--Set of all mods with bad names that are active
         self.sse_form43 = set()
+        # Which plugins override which records - refresh before querying
+        self.override_index = OverrideIndex(
+            self.bash_dir.join(u'Overrides.dat'))
         # sentinel for calculating info sets when needed in gui and patcher
         # code, **after** self is refreshed
         self.__calculate = object()
@@ -2082,8 +2109,15 @@ def dropItems(self, dropItem, firstItem, lastItem): # MUTATES plugins CACHE
     def bash_dir(self): return dirs[u'modsBash']
 
     #--Refresh-----------------------------------------------------------------
-    def _names(self):
-        names = super(ModInfos, self)._names()
+    def _changed_names(self):
+        changed = super(ModInfos, self)._changed_names()
+        if changed is None: return None
+        # (un)ghosting a plugin changes its ghost and its normal name
+        return changed | {GPath(x.s[:-6]) for x in changed if
+                          x.cs[-6:] == u'.ghost'}
+
+    def _names(self, candidates=None):
+        names = super(ModInfos, self)._names(candidates)
         unghosted_names = set()
         for mname in sorted(names, key=lambda x: x.cext == u'.ghost'):
             if mname.cs[-6:] == u'.ghost': mname = GPath(mname.s[:-6])
@@ -2113,10 +2147,12 @@ def refresh(self, refresh_infos=True, booting=False, _modTimesChange=False):
             change = FileInfos.refresh(self, booting=booting)
             if change:
                 _added, _updated, deleted = change
+                self.reset_bsa_lo()
                 # If any plugins have been added, updated or deleted, we need
                 # to recalculate dependents
                 self._recalc_dependents()
             hasChanged = bool(change)
+            crc_cache.save() # the crcs of the added and updated mods
         # If refresh_infos is False and mods are added _do_ manually refresh
         _modTimesChange = _modTimesChange and not load_order.using_txt_file()
         lo_changed = self.refreshLoadOrder(
@@ -2304,6 +2340,7 @@ def refresh_crcs(self, mods=None): #TODO(ut) progress !
         for mod in (self if mods is None else mods):
             inf = self[mod]
             pairs[inf.name] = inf.calculate_crc(recalculate=True)
+        crc_cache.save()
         return pairs
 
     #--Refresh File
@@ -2668,7 +2705,6 @@ def generateNextBashedPatch(self, selected_mods):
                 return modName
         return None
 
-    ##: Maybe cache this? Invalidation would be tough
     # TODO(inf): Morrowind does not have attached BSAs, there is instead a
     #  'second load order' of BSAs in the INI
     def get_bsa_lo(self, for_plugins=None):
@@ -2678,56 +2714,100 @@ def get_bsa_lo(self, for_plugins=None):
         more than one bsa, their relative order is undefined.
 
         If for_plugins is not None, only returns plugin-name-specific BSAs for
-        those plugins. Otherwise, returns it for all plugins."""
+        those plugins. Otherwise, returns it for all plugins. The parts that
+        do not depend on for_plugins are cached, see _get_bsa_lo_parts."""
         if for_plugins is None: for_plugins = list(self)
+        (_ini_signature, ini_lo, ini_cause, available_bsas, plugin_bsas,
+         res_ov_bsas, res_ov_cause) = self._get_bsa_lo_parts()
+        # BSAs from INI files load first
+        bsa_lo = OrderedDict(ini_lo) # Final load order
+        bsa_cause = dict(ini_cause) # Reason each BSA was loaded
+        # They get overridden by BSAs loaded based on plugin name
+        for i, p in enumerate(for_plugins):
+            try:
+                p_bsas = plugin_bsas[p]
+            except KeyError:
+                p_bsas = plugin_bsas[p] = self[p].mod_bsas(available_bsas)
+            for b in p_bsas:
+                if b in bsa_lo: continue # an earlier plugin got it
+                bsa_lo[b] = i
+                bsa_cause[b] = p.s
+        # Finally, some games have INI settings that override plugin BSAs
+        ini_idx = sys.maxsize # Make sure they come last
+        for b in res_ov_bsas:
+            if b in bsa_lo: continue
+            bsa_lo[b] = ini_idx
+            bsa_cause[b] = res_ov_cause
+            ini_idx -= 1
+        return bsa_lo, bsa_cause
+
+    _bsa_lo_parts = None
+    def _get_bsa_lo_parts(self):
+        """Return the parts of the BSA load order that don't depend on the
+        plugins get_bsa_lo is called for: the signature of the INI settings
+        they were computed from, the BSAs loaded from INIs mapped to their
+        positions and to the reasons they were loaded, the BSAs left for
+        plugins to attach, a cache of the BSAs each plugin attaches (filled
+        in by get_bsa_lo), the BSAs loaded by the resource override INI
+        setting and the reason they were loaded. Recomputed when the INI
+        settings change and when reset_bsa_lo is called."""
+        ini_signature = self._bsa_ini_signature()
+        if self._bsa_lo_parts is not None and \
+                self._bsa_lo_parts[0] == ini_signature:
+            return self._bsa_lo_parts
         # We'll be removing BSAs from here once we've given them a position
         available_bsas = dict(bsaInfos.iteritems())
-        bsa_lo = OrderedDict() # Final load order, -1 means it came from an INI
-        bsa_cause = {} # Reason each BSA was loaded
+        ini_lo = OrderedDict() # -1 means it came from an INI
+        ini_cause = {}
         def _bsas_from_ini(i, k):
             r_bsas = (GPath_no_norm(x.strip()) for x in
                       i.getSetting(u'Archive', k, u'').split(u','))
             return (available_bsas[b] for b in r_bsas if b in available_bsas)
-        # BSAs from INI files load first
         ini_idx = -sys.maxsize - 1 # Make sure they come first
         for ini_k in bush.game.Ini.resource_archives_keys:
             for ini_f in self.ini_files():
                 if ini_f.has_setting(u'Archive', ini_k):
                     for b in _bsas_from_ini(ini_f, ini_k):
-                        bsa_lo[b] = ini_idx
-                        bsa_cause[b] = u'%s (%s)' % (ini_f.abs_path.stail,
+                        ini_lo[b] = ini_idx
+                        ini_cause[b] = u'%s (%s)' % (ini_f.abs_path.stail,
                                                      ini_k)
                         ini_idx += 1
                         del available_bsas[b.name]
                     break # The first INI with the key wins ##: Test this
-        # They get overridden by BSAs loaded based on plugin name
-        for i, p in enumerate(for_plugins):
-            for b in self[p].mod_bsas(available_bsas):
-                bsa_lo[b] = i
-                bsa_cause[b] = p.s
-                del available_bsas[b.name]
-        # Finally, some games have INI settings that override plugin BSAs
-        ini_idx = sys.maxsize # Make sure they come last
+        res_ov_bsas, res_ov_cause = [], u''
         res_ov_key = bush.game.Ini.resource_override_key
         if res_ov_key:
             # Start out with the defaults set by the engine
-            res_ov_bsas = [available_bsas[GPath_no_norm(b)] for b in
-                           bush.game.Bsa.resource_override_defaults]
+            res_ov_bsas = [available_bsas[b] for b in imap(
+                GPath_no_norm, bush.game.Bsa.resource_override_defaults)
+                           if b in available_bsas]
             res_ov_cause = u'%s (%s)' % (bush.game.Ini.dropdown_inis[0],
                                          res_ov_key)
             # Then look if any INIs overwrite them
             for ini_f in self.ini_files():
                 if ini_f.has_setting(u'Archive', res_ov_key):
-                    res_ov_bsas = _bsas_from_ini(ini_f, res_ov_key)
+                    res_ov_bsas = list(_bsas_from_ini(ini_f, res_ov_key))
                     res_ov_cause = u'%s (%s)' % (ini_f.abs_path.stail,
                                                  res_ov_key)
                     break # The first INI with the key wins ##: Test this
-            for b in res_ov_bsas:
-                bsa_lo[b] = ini_idx
-                bsa_cause[b] = res_ov_cause
-                ini_idx -= 1
-                del available_bsas[b.name]
-        return bsa_lo, bsa_cause
+        self._bsa_lo_parts = (ini_signature, ini_lo, ini_cause,
+                              available_bsas, {}, res_ov_bsas, res_ov_cause)
+        return self._bsa_lo_parts
+
+    def _bsa_ini_signature(self):
+        """Return the values of the INI settings that affect the BSA load
+        order, in the INIs that are currently in effect."""
+        bsa_keys = tuple(bush.game.Ini.resource_archives_keys)
+        if bush.game.Ini.resource_override_key:
+            bsa_keys += (bush.game.Ini.resource_override_key,)
+        return tuple((ini_f.abs_path, tuple(
+            ini_f.getSetting(u'Archive', k, None) for k in bsa_keys))
+                     for ini_f in self.ini_files())
+
+    def reset_bsa_lo(self):
+        """Drop the cached parts of the BSA load order - called when BSAs or
+        plugins are added, deleted or renamed."""
+        self._bsa_lo_parts = None
 
     def get_active_bsas(self):
         """Returns the load order of all active BSAs. See get_bsa_lo for more
@@ -3140,8 +3220,89 @@ def enable(self,fileName,value=True):
 #------------------------------------------------------------------------------
 from . import bsa_files
 
+class _BsaAssetIndex(object):
+    """Inverted index of the assets in the BSAs, mapping each asset path (in
+    lowercase, as in Path.cs) to the BSAs that contain it. Kept up to date
+    incrementally by sync: only the BSAs it is passed get (re)indexed, and
+    only when their assets are reset (see BSAInfo.readHeader), so other BSAs
+    may or may not be in the index. BSAs are dropped when they are deleted.
+    BSAs that fail to parse are retried only once they change on disk. The
+    BSA lists are not kept sorted, since the BSA load order depends on the
+    active plugins and INIs - get_bsas sorts them on demand."""
+
+    def __init__(self):
+        self._asset_bsas = {} # asset -> list of BSAs
+        self._indexed = {} # BSA -> the assets it's indexed by
+        self._failed = {} # BSA that failed to parse -> its (size, mtime)
+
+    def sync(self, bsa_infos, live_bsas):
+        """Update the index for bsa_infos, dropping the BSAs that are not in
+        live_bsas anymore. Return those of bsa_infos that failed to parse."""
+        asset_bsas = self._asset_bsas
+        indexed = self._indexed
+        failed = self._failed
+        failed_bsas = []
+        for bsa_info in bsa_infos:
+            if failed.get(bsa_info) == (bsa_info._file_size,
+                                        bsa_info._file_mod_time):
+                failed_bsas.append(bsa_info)
+                continue
+            try:
+                bsa_assets = bsa_info.assets
+            except (BSAError, OverflowError):
+                deprint(u'Failed to parse %s' % bsa_info, traceback=True)
+                failed[bsa_info] = (bsa_info._file_size,
+                                    bsa_info._file_mod_time)
+                failed_bsas.append(bsa_info)
+                bsa_assets = frozenset()
+            else:
+                failed.pop(bsa_info, None)
+            old_assets = indexed.get(bsa_info)
+            if old_assets is bsa_assets: continue
+            if old_assets is not None:
+                self._unindex(bsa_info, old_assets)
+            for asset in bsa_assets:
+                try:
+                    asset_bsas[asset].append(bsa_info)
+                except KeyError:
+                    asset_bsas[asset] = [bsa_info]
+            indexed[bsa_info] = bsa_assets
+        for bsa_info in [b for b in indexed if b not in live_bsas]:
+            self._unindex(bsa_info, indexed.pop(bsa_info))
+            failed.pop(bsa_info, None)
+        if bsa_assets_cache: bsa_assets_cache.save()
+        return failed_bsas
+
+    def _unindex(self, bsa_info, bsa_assets):
+        asset_bsas = self._asset_bsas
+        for asset in bsa_assets:
+            asset_owners = asset_bsas[asset]
+            asset_owners.remove(bsa_info)
+            if not asset_owners: del asset_bsas[asset]
+
+    def get_bsas(self, asset, bsa_lo=None):
+        """Return the BSAs that contain asset (a lowercase path, as in
+        Path.cs). If bsa_lo (see ModInfos.get_bsa_lo) is given, return only
+        the BSAs in it, sorted by load order - the last one wins."""
+        asset_owners = self._asset_bsas.get(asset, ())
+        if bsa_lo is None: return list(asset_owners)
+        return sorted((b for b in asset_owners if b in bsa_lo),
+                      key=bsa_lo.__getitem__)
+
+    def get_sharing(self, src_assets, bsas=None):
+        """Return a dict mapping the BSAs (out of bsas, if given) that
+        contain any of src_assets to sets of those assets."""
+        sharing = collections.defaultdict(set)
+        asset_bsas = self._asset_bsas
+        for asset in src_assets:
+            for bsa_info in asset_bsas.get(asset, ()):
+                if bsas is None or bsa_info in bsas:
+                    sharing[bsa_info].add(asset)
+        return sharing
+
 class BSAInfos(FileInfos):
     """BSAInfo collection. Represents bsa files in game's Data directory."""
+    _data_dir_watched = True
     # BSAs that have versions other than the one expected for the current game
     mismatched_versions = set()
     # Maps BA2 hashes to BA2 names, used to detect collisions
@@ -3177,8 +3338,9 @@ def do_update(self, raise_on_error=False):
                 self._reset_bsa_mtime()
                 return changed
 
-            def readHeader(self):  # just reset the cache
+            def readHeader(self):  # just reset the caches
                 self._assets = self.__class__._assets
+                self._asset_hashes = None
 
             def _reset_bsa_mtime(self):
                 if bush.game.Bsa.allow_reset_timestamps and inisettings[
@@ -3189,11 +3351,58 @@ def _reset_bsa_mtime(self):
                         self.setmtime(default_mtime)
 
         super(BSAInfos, self).__init__(dirs[u'mods'], factory=BSAInfo)
+        self._asset_index = _BsaAssetIndex()
+
+    def get_asset_index(self, bsa_infos):
+        """Return the index of which BSAs contain which assets, brought up to
+        date for the specified BSAs (e.g. the active ones) - only those are
+        parsed, so pass them to the lookups too. Also return those of them
+        that failed to parse."""
+        failed_bsas = self._asset_index.sync(bsa_infos,
+                                             set(self.itervalues()))
+        return self._asset_index, failed_bsas
+
+    def undo_alterations(self, progress, bsa_names=None):
+        """Undo the alterations BSA Alteration may have done to the specified
+        BSAs (default: all of them), see OblivionBsa.undo_alterations. BSAs
+        whose hashes were verified before and that did not change since are
+        skipped, the rest are checked concurrently, using up to BsaThreads
+        threads. Returns the number of hashes that were reset.
+
+        :param bsa_names: The names (as bolt.Path) of the BSAs to check."""
+        def _stat_key(bsa_inf):
+            return bsa_inf._file_size, bsa_inf._file_mod_time
+        to_check = [self[b] for b in (list(self) if bsa_names is None
+                                      else bsa_names)]
+        to_check = [b for b in to_check if self.table.getItem(
+            b.name, u'verified_hashes') != _stat_key(b)]
+        def _find_altered(bsa_inf):
+            try:
+                return bsa_inf.find_altered_hashes()
+            except BSAError:
+                deprint(u'Failed to verify the hashes of %s' % bsa_inf.name,
+                        traceback=True)
+                return None
+        reset_count = 0
+        progress.setFull(max(len(to_check), 1))
+        with bolt.ParallelMap(_find_altered, to_check,
+                              inisettings[u'BsaThreads']) as checked:
+            for index, (bsa_inf, altered_hashes) in enumerate(checked):
+                progress(index, _(u'Rebuilding Hashes...') + u'\n%s' %
+                         bsa_inf.name)
+                if altered_hashes is None: continue
+                if altered_hashes:
+                    reset_count += bsa_inf.reset_hashes(altered_hashes)
+                    bsa_inf.do_update() # writing to it changed its mtime
+                self.table.setItem(bsa_inf.name, u'verified_hashes',
+                                   _stat_key(bsa_inf))
+        return reset_count
 
     def new_info(self, fileName, _in_refresh=False, owner=None,
                  notify_bain=False):
         new_bsa = super(BSAInfos, self).new_info(fileName, _in_refresh, owner,
                                                  notify_bain)
+        self._reset_bsa_lo()
         new_bsa_name = new_bsa.name
         # Check if the BSA has a mismatched version - if so, schedule a warning
         if bush.game.Bsa.valid_versions: # If empty, skip checks for this game
@@ -3212,6 +3421,27 @@ def new_info(self, fileName, _in_refresh=False, owner=None,
                     b.s for b in ba2_entry)))
         return new_bsa
 
+    def refresh(self, refresh_infos=True, booting=False):
+        change = super(BSAInfos, self).refresh(refresh_infos, booting)
+        if change: self._reset_bsa_lo()
+        return change
+
+    def delete_refresh(self, deleted_keys, paths_to_keys, check_existence,
+                       _in_refresh=False):
+        deleted = super(BSAInfos, self).delete_refresh(
+            deleted_keys, paths_to_keys, check_existence, _in_refresh)
+        if deleted: self._reset_bsa_lo()
+        return deleted
+
+    def _rename_operation(self, oldName, newName):
+        super(BSAInfos, self)._rename_operation(oldName, newName)
+        self._reset_bsa_lo()
+
+    @staticmethod
+    def _reset_bsa_lo():
+        """The BSA load order depends on which BSAs exist, so drop it."""
+        if modInfos is not None: modInfos.reset_bsa_lo()
+
     @property
     def bash_dir(self): return dirs[u'modsBash'].join(u'BSA Data')
 
@@ -3392,6 +3622,12 @@ def initDefaultSettings():
     inisettings[u'PromptActivateBashedPatch'] = True
     inisettings[u'WarnTooManyFiles'] = True
     inisettings[u'SkippedBashInstallersDirs'] = u''
+    inisettings[u'CrcThreads'] = 0
+    inisettings[u'ScanThreads'] = 1
+    inisettings[u'ArchiveThreads'] = 0
+    inisettings[u'BsaThreads'] = 0
+    inisettings[u'WatchDataDir'] = True
+    inisettings[u'DataDirRescanInterval'] = 600
 
 __type_key_preffix = {  # Path is tooldirs only int does not appear in either!
     bolt.Path: u's', unicode: u's', list: u's', int: u'i', bool: u'b'}
@@ -3455,7 +3691,20 @@ def initBosh(bashIni, game_ini_path):
     gameInis.extend(IniFile(dirs[u'saveBase'].join(x), 'cp1252') for x in
                     bush.game.Ini.dropdown_inis[1:])
     load_order.initialize_load_order_files()
+    global crc_cache
+    crc_cache = bolt.CrcCache(dirs[u'modsBash'].join(u'CRCs.dat'))
+    global listing_cache
+    listing_cache = archives.ListingCache(
+        dirs[u'bainData'].join(u'Listings.dat'))
+    global bsa_assets_cache
+    bsa_assets_cache = bsa_files.BsaAssetsCache(
+        dirs[u'modsBash'].join(u'BSA Assets.dat'))
     initOptions(bashIni)
+    global data_watcher
+    data_watcher = env.DirWatcher(dirs[u'mods'].s,
+                                  inisettings[u'DataDirRescanInterval'])
+    if inisettings[u'WatchDataDir'] and data_watcher.start():
+        deprint(u'Watching %s for changes' % dirs[u'mods'])
     from .bain import Installer
     Installer.init_bain_dirs()
 
@@ -24,32 +24,184 @@
 
 from __future__ import print_function
 
+import cPickle as pickle  # PY3
 import collections
 import copy
 import errno
 import io
 import os
 import re
+import sqlite3
 import sys
 import time
+from array import array
 from binascii import crc32
-from functools import partial, wraps
+from functools import partial
 from itertools import groupby, imap, izip
 from operator import itemgetter, attrgetter
 
-from . import imageExts, DataStore, BestIniFile, InstallerConverter, ModInfos
+from . import imageExts, DataStore, BestIniFile, InstallerConverter, \
+    ModInfos, bsa_files
+from .dds_files import DDSFile
 from .. import balt, gui # YAK!
 from .. import bush, bass, bolt, env, archives
 from ..archives import readExts, defaultExt, list_archive, compress7z, \
-    extract7z, compressionSettings
+    extract7z, compressionSettings, is_native_zip, list_zip, \
+    list_zip_structure, extract_zip
 from ..bolt import Path, deprint, round_size, GPath, SubProgress, CIstr, \
-    LowerDict, AFile
+    LowerDict, AFile, struct_error
 from ..exception import AbstractError, ArgumentError, BSAError, CancelError, \
-    InstallerArchiveError, SkipError, StateError, FileError
+    InstallerArchiveError, SkipError, StateError, FileError, DDSError
 from ..ini_files import OBSEIniFile
 
 os_sep = unicode(os.path.sep) # PY3: already unicode
 
+class _FileTable(object):
+    """Compact, read only table of the files in an installer, iterating as
+    (path, size, crc) tuples - or (path, size, crc, date) ones if it has a
+    dates column - in place of a list of those. Each directory is stored
+    once and the file names in a single UTF-8 string, while the other
+    columns are arrays, so a table takes a fraction of the memory of the
+    equivalent list and pickles to a few strings. Lookups by path are case
+    insensitive and use an index that is built on first use. Unpickled
+    tables only decode their columns once they are used."""
+    __slots__ = (u'_dirs', u'_dir_indices', u'_names', u'_sizes', u'_crcs',
+                 u'_dates', u'_ci_index', u'_raw_state')
+
+    def __init__(self, rows=(), with_dates=False):
+        dirs, dir_index, names = [], {}, []
+        dir_indices = array('I')
+        # PY3: use 'Q' for the sizes - doubles are exact up to 8 PiB
+        sizes, crcs = array('d'), array('I')
+        dates = array('d') if with_dates else None
+        for row in rows:
+            path = row[0]
+            cut = path.rfind(os_sep) + 1
+            dir_path = path[:cut]
+            dir_idx = dir_index.get(dir_path)
+            if dir_idx is None:
+                dir_idx = dir_index[dir_path] = len(dirs)
+                dirs.append(dir_path)
+            dir_indices.append(dir_idx)
+            names.append(path[cut:])
+            sizes.append(row[1])
+            crcs.append(row[2])
+            if with_dates: dates.append(row[3])
+        self._set_columns(dirs, dir_indices, names, sizes, crcs, dates)
+
+    def _set_columns(self, dirs, dir_indices, names, sizes, crcs, dates):
+        self._dirs = dirs # directory paths, with their trailing separator
+        self._dir_indices = dir_indices
+        # file names can't contain nulls, so use them as separators
+        self._names = names if isinstance(names, bytes) else u'\0'.join(
+            names).encode(u'utf-8')
+        self._sizes = sizes
+        self._crcs = crcs
+        self._dates = dates
+        self._ci_index = None
+        self._raw_state = None
+
+    @classmethod
+    def from_dict(cls, path_attrs, with_dates=False):
+        """Build a table from a dict mapping paths to (size, crc) tuples -
+        or (size, crc, date) ones if with_dates is True."""
+        return cls(((u'%s' % p,) + v for p, v in path_attrs.iteritems()),
+                   with_dates)
+
+    def without_dates(self):
+        """Return a table of the same files without the dates column - it
+        shares the columns of this one, as tables are never edited in
+        place."""
+        self._decode()
+        table = _FileTable()
+        table._set_columns(self._dirs, self._dir_indices, self._names,
+                           self._sizes, self._crcs, None)
+        return table
+
+    def _iter_paths(self):
+        self._decode()
+        if not self._sizes: return iter(())
+        return imap(unicode.__add__, imap(self._dirs.__getitem__,
+            self._dir_indices), self._names.decode(u'utf-8').split(u'\0'))
+
+    def __len__(self):
+        self._decode()
+        return len(self._sizes)
+
+    def __iter__(self):
+        self._decode()
+        columns = [self._iter_paths(), imap(int, self._sizes), self._crcs]
+        if self._dates is not None: columns.append(self._dates)
+        return izip(*columns)
+
+    def iteritems(self):
+        """Iterate over the rows as (path, attributes) pairs, like over the
+        items of a dict mapping paths to their attributes."""
+        for row in self:
+            yield row[0], row[1:]
+
+    def _row_of(self, path):
+        if self._ci_index is None:
+            self._ci_index = {p.lower(): i for i, p in
+                              enumerate(self._iter_paths())}
+        return self._ci_index.get(path.lower())
+
+    def __contains__(self, path): return self._row_of(path) is not None
+
+    def get(self, path, default=None):
+        """Return the attributes of the file with the specified path, as in
+        iteritems, or default if it's not in this table."""
+        i = self._row_of(path) # decodes the table
+        if i is None: return default
+        if self._dates is None: return int(self._sizes[i]), self._crcs[i]
+        return int(self._sizes[i]), self._crcs[i], self._dates[i]
+
+    def sorted(self, key):
+        """Return a table of the same rows, sorted as by the sorted builtin -
+        it shares the dirs of this one."""
+        order = [i for i, _row in sorted(enumerate(self),
+                                         key=lambda x: key(x[1]))]
+        old_names = self._names.decode(u'utf-8').split(u'\0') \
+            if order else []
+        def _reorder(column):
+            if column is None: return None
+            return array(column.typecode, [column[i] for i in order])
+        table = _FileTable()
+        table._set_columns(self._dirs, _reorder(self._dir_indices),
+                           [old_names[i] for i in order],
+                           _reorder(self._sizes), _reorder(self._crcs),
+                           _reorder(self._dates))
+        return table
+
+    def __reduce__(self):
+        if self._raw_state is not None: # never decoded, pickle it back as is
+            return _FileTable, (), self._raw_state
+        # pickle the arrays as strings - arrays pickle as lists of numbers
+        return _FileTable, (), (u'\0'.join(self._dirs),
+            self._dir_indices.tostring(), self._names,
+            self._sizes.tostring(), self._crcs.tostring(),
+            None if self._dates is None else self._dates.tostring())
+
+    def __setstate__(self, state):
+        # the columns are only decoded on first use - see _decode
+        self._raw_state = state
+
+    def _decode(self):
+        """Decode the columns of an unpickled table, if not done already."""
+        state = self._raw_state
+        if state is None: return
+        dirs, dir_indices, names, sizes, crcs, dates = state
+        def _column(typecode, col_bytes):
+            column = array(typecode)
+            column.fromstring(col_bytes)
+            return column
+        self._set_columns(dirs.split(u'\0'), _column('I', dir_indices),
+            names, _column('d', sizes), _column('I', crcs),
+            None if dates is None else _column('d', dates))
+
+    def __repr__(self):
+        return u'%s<%d files>' % (self.__class__.__name__, len(self))
+
 class Installer(object):
     """Object representing an installer archive, its user configuration, and
     its installation state."""
@@ -62,8 +214,7 @@ class Installer(object):
     volatile = ('ci_dest_sizeCrc', 'skipExtFiles', 'skipDirFiles', 'status',
         'missingFiles', 'mismatchedFiles', 'project_refreshed',
         'mismatchedEspms', 'unSize', 'espms', 'underrides', 'hasWizard',
-        'espmMap', 'hasReadme', 'hasBCF', 'hasBethFiles', '_dir_dirs_files',
-        'has_fomod_conf')
+        'espmMap', 'hasReadme', 'hasBCF', 'hasBethFiles', 'has_fomod_conf')
     __slots__ = persistent + volatile
     #--Package analysis/porting.
     type_string = _(u'Unrecognized')
@@ -139,7 +290,8 @@ def final_update(new_sizeCrcDate, old_sizeCrcDate, pending, pending_size,
         changed = bool(pending) or (len(new_sizeCrcDate) != len(old_sizeCrcDate))
         #--Update crcs?
         Installer.calc_crcs(pending, pending_size, rootName,
-                            new_sizeCrcDate, progress)
+                            new_sizeCrcDate, progress,
+                            recalculate=recalculate_all_crcs)
         # drop _asFile
         old_sizeCrcDate.clear()
         for rpFile, (siz, crc, date, _asFile) in new_sizeCrcDate.iteritems():
@@ -147,34 +299,39 @@ def final_update(new_sizeCrcDate, old_sizeCrcDate, pending, pending_size,
         return changed
 
     @staticmethod
-    def calc_crcs(pending, pending_size, rootName, new_sizeCrcDate, progress):
+    def calc_crcs(pending, pending_size, rootName, new_sizeCrcDate, progress,
+                  recalculate=False):
+        """Calculate the crcs of the pending files and add them to
+        new_sizeCrcDate. Unless recalculate is True, crcs in the shared crc
+        cache are used if the files did not change since they were cached."""
         if not pending: return
-        done = 0
+        from . import crc_cache
+        if not recalculate:
+            for rpFile, (siz, _crc, date, asFile) in pending.items():
+                cached_crc = crc_cache.get_crc(asFile)
+                if cached_crc is not None:
+                    new_sizeCrcDate[rpFile] = (siz, cached_crc, date, asFile)
+                    del pending[rpFile]
+                    pending_size -= siz
+            if not pending: return
         progress_msg= rootName + u'\n' + _(u'Calculating CRCs...') + u'\n'
         progress(0, progress_msg)
         # each mod increments the progress bar by at least one, even if it
         # is size 0 - add len(pending) to the progress bar max to ensure we
         # don't hit 100% and cause the progress bar to prematurely disappear
         progress.setFull(pending_size + len(pending))
-        for rpFile, (siz, _crc, date, asFile) in iter(sorted(pending.items())):
-            progress(done, progress_msg + rpFile)
-            sub = bolt.SubProgress(progress, done, done + siz + 1)
-            sub.setFull(siz + 1)
-            crc = 0
+        file_stats = {asFile: crc_cache.file_stat(asFile) for (
+            _siz, _crc, _date, asFile) in pending.itervalues()}
+        crcs = bolt.calc_crcs([(asFile, siz, rpFile) for rpFile, (
+            siz, _crc, _date, asFile) in pending.iteritems()], progress,
+            progress_msg, bass.inisettings[u'CrcThreads'])
+        for rpFile, (siz, _crc, date, asFile) in pending.iteritems():
             try:
-                with open(asFile, u'rb') as ins:
-                    insTell = ins.tell
-                    for block in iter(partial(ins.read, 2097152), b''):
-                        crc = crc32(block, crc) # 2MB at a time, probably ok
-                        sub(insTell())
-            except IOError:
-                deprint(u'Failed to calculate crc for %s - please report '
-                        u'this, and the following traceback:' % asFile,
-                        traceback=True)
+                new_sizeCrcDate[rpFile] = (siz, crcs[asFile], date, asFile)
+            except KeyError: # failed to read it, calc_crcs logged it
                 continue
-            crc &= 0xFFFFFFFF
-            done += siz + 1
-            new_sizeCrcDate[rpFile] = (siz, crc, date, asFile)
+            crc_cache.set_crc(asFile, crcs[asFile], file_stats[asFile])
+        crc_cache.save()
 
     #--Initialization, etc ----------------------------------------------------
     def initDefault(self):
@@ -186,9 +343,9 @@ def initDefault(self):
         self.crc = 0 #--crc of archive
         self.isSolid = False #--package only - solid 7z archive
         self.blockSize = None #--package only - set here and there
-        self.fileSizeCrcs = [] #--list of tuples for _all_ files in installer
+        self.fileSizeCrcs = _FileTable() #--table of _all_ files in installer
         #--For InstallerProject's, cache if refresh projects is skipped
-        self.src_sizeCrcDate = bolt.LowerDict()
+        self.src_sizeCrcDate = _FileTable(with_dates=True)
         #--Set by refreshBasic
         self.fileRootIdex = 0 # len of the root path including the final separator
         self.type = 0 #--Package type: 0: unset/invalid; 1: simple; 2: complex
@@ -212,7 +369,6 @@ def initDefault(self):
         #--Volatiles (not pickled values)
         #--Volatiles: directory specific
         self.project_refreshed = False
-        self._dir_dirs_files = None
         #--Volatile: set by refreshDataSizeCrc
         # LowerDict mapping destinations (relative to Data/ directory) of files
         # in this installer to their size and crc - built in refreshDataSizeCrc
@@ -300,12 +456,8 @@ def __getstate__(self):
         return tuple(getter(self,x) for x in self.persistent)
 
     def _fixme_drop__for_loading_in_previous_versions(self):
-        self.src_sizeCrcDate = {GPath(x): y for x, y # FIXME: backwards compat!
-                                in self.src_sizeCrcDate.iteritems()}
-        self.dirty_sizeCrc = {GPath(x): y for x, y
+        self.dirty_sizeCrc = {GPath(x): y for x, y # FIXME: backwards compat!
                               in self.dirty_sizeCrc.iteritems()}
-        self.fileSizeCrcs = [(unicode(x), y, z) for x, y, z in
-                             self.fileSizeCrcs]
 
     def _fixme_drop__fomod_backwards_compat(self):
         # Keys and values in the fomod dict got inverted, name changed to
@@ -347,9 +499,11 @@ def __setstate(self,values):
         self.extras_dict = {unicode(k): v for k, v in self.extras_dict.iteritems()}
         if not self.abs_path.exists(): # pickled installer deleted outside bash
             return  # don't do anything should be deleted from our data soon
-        if not isinstance(self.src_sizeCrcDate, bolt.LowerDict):
-            self.src_sizeCrcDate = bolt.LowerDict(
-                ('%s' % x, y) for x, y in self.src_sizeCrcDate.iteritems())
+        if not isinstance(self.src_sizeCrcDate, _FileTable):
+            self.src_sizeCrcDate = _FileTable.from_dict(self.src_sizeCrcDate,
+                                                        with_dates=True)
+        if not isinstance(self.fileSizeCrcs, _FileTable):
+            self.fileSizeCrcs = _FileTable(self.fileSizeCrcs)
         if not isinstance(self.dirty_sizeCrc, bolt.LowerDict):
             self.dirty_sizeCrc = bolt.LowerDict(
                 ('%s' % x, y) for x, y in self.dirty_sizeCrc.iteritems())
@@ -829,7 +983,8 @@ def refreshDataSizeCrc(self, checkOBSE=False, splitExt=os.path.splitext):
     def _find_root_index(self, _os_sep=os_sep, skips_start=_silentSkipsStart):
         # basically just care for skips and complex/simple packages
         # Sort file names as (dir_path, filename) pairs
-        self.fileSizeCrcs.sort(key=lambda x: os.path.split(x[0].lower()))
+        self.fileSizeCrcs = self.fileSizeCrcs.sorted(
+            key=lambda x: os.path.split(x[0].lower()))
         #--Find correct starting point to treat as BAIN package
         self.extras_dict.pop(u'root_path', None)
         self.fileRootIdex = 0
@@ -1092,8 +1247,11 @@ def _do_sync_data(self, proj_dir, delta_files, progress):
                 full_dest.remove()
                 del_numb += 1
             else:
-                full_src.copyTo(full_dest)
+                # copy to a new file, breaking any hard link between the two
+                full_src.copyTo(full_dest.temp)
+                full_dest.untemp()
                 upt_numb += 1
+            self.drop_hardlinks([rel_src])
         if upt_numb or del_numb:
             # Remove empty directories from project directory
             empties = set()
@@ -1136,13 +1294,24 @@ def _open_txt_file(self, rel_path): raise AbstractError
     def wizard_file(self): raise AbstractError
     def fomod_file(self): raise AbstractError
 
+    def read_files(self, rel_paths, progress=None):
+        """Return a dict mapping the specified paths of files in this package
+        (relative to its root) to the contents of those files. Paths of files
+        that are not in the package are left out."""
+        raise AbstractError
+
+    def get_bsa_assets(self, rel_path):
+        """Return the assets (see ABsa.assets) of the BSA at the specified
+        path in this package, reading only the file table of the BSA."""
+        raise AbstractError
+
     def __repr__(self):
         return u'%s<%r>' % (self.__class__.__name__, self.archive)
 
     #--ABSTRACT ---------------------------------------------------------------
     def _refreshSource(self, progress, recalculate_project_crc):
         """Refresh fileSizeCrcs, size, and modified from source
-        archive/directory. fileSizeCrcs is a list of tuples, one for _each_
+        archive/directory. fileSizeCrcs is a _FileTable, with a row for _each_
         file in the archive or project directory. _refreshSource is called
         in refreshBasic only. In projects the src_sizeCrcDate cache is used to
         avoid recalculating crc's.
@@ -1150,17 +1319,24 @@ def _refreshSource(self, progress, recalculate_project_crc):
         """
         raise AbstractError
 
-    def install(self, destFiles, progress=None):
-        """Install specified files to Data directory."""
+    def install(self, destFiles, progress=None, unpack_dir=None):
+        """Install specified files to Data directory. If unpack_dir is not
+        None, the files were already extracted there by extract_files."""
+        dest_src = self.dest_sources(destFiles)
+        if not dest_src: return bolt.LowerDict(), set(), set(), set()
+        progress = progress if progress else bolt.Progress()
+        return self._install(dest_src, progress, unpack_dir)
+
+    def dest_sources(self, destFiles):
+        """Return a LowerDict mapping the specified destination files to
+        their source files in the package."""
         destFiles = set(destFiles)
         dest_src = self.refreshDataSizeCrc(True)
         for k in list(dest_src):
             if k not in destFiles: del dest_src[k]
-        if not dest_src: return bolt.LowerDict(), set(), set(), set()
-        progress = progress if progress else bolt.Progress()
-        return self._install(dest_src, progress)
+        return dest_src
 
-    def _install(self, dest_src, progress):
+    def _install(self, dest_src, progress, unpack_dir=None):
         raise AbstractError
 
     def _fs_install(self, dest_src, srcDirJoin, progress,
@@ -1171,7 +1347,7 @@ def _fs_install(self, dest_src, srcDirJoin, progress,
         data_sizeCrcDate_update = bolt.LowerDict()
         data_sizeCrc = self.ci_dest_sizeCrc
         mods, inis, bsas = set(), set(), set()
-        source_paths, dests = [], []
+        source_paths, dests, rel_dests = [], [], []
         add_source, add_dest = source_paths.append, dests.append
         installer_plugins = self.espms
         is_ini_tweak = InstallersData._is_ini_tweak
@@ -1193,25 +1369,81 @@ def _fs_install(self, dest_src, srcDirJoin, progress,
             # Append the ghost extension JIT since the FS operation below will
             # need the exact path to copy to
             add_dest(join_data_dir(norm_ghostGet(dest, dest)))
+            rel_dests.append(dest)
             subprogressPlus()
         #--Now Move
         try:
             if data_sizeCrcDate_update:
+                if not unpackDir and bass.settings[
+                        u'bash.installers.linkProjects']:
+                    source_paths, dests = self._link_files(
+                        source_paths, dests, rel_dests)
                 fs_operation = env.shellMove if unpackDir else env.shellCopy
-                fs_operation(source_paths, dests, progress.getParent())
+                if source_paths:
+                    fs_operation(source_paths, dests, progress.getParent())
         finally:
             #--Clean up unpack dir if we're an archive
             if unpackDir: bass.rmTempDir()
         #--Update Installers data
         return data_sizeCrcDate_update, mods, inis, bsas
 
-    def listSource(self):
-        """Return package structure as text."""
+    def _link_files(self, source_paths, dests, rel_dests):
+        """Link the files of a project to the Data dir instead of copying
+        them, where the filesystem allows it. Hard linked files are recorded
+        in extras_dict (a LowerDict used as a set), as editing them in place
+        edits the project too.
+        Return the source and destination paths that must be copied."""
+        link_types = env.link_files(source_paths, dests)
+        hardlinked = self.extras_dict.setdefault(u'hardlinked_files',
+                                                 bolt.LowerDict())
+        to_copy, to_copy_dests = [], []
+        for src, dest, rel_dest, link_type in izip(source_paths, dests,
+                                                   rel_dests, link_types):
+            if link_type == u'hardlink':
+                hardlinked[rel_dest] = True
+            else:
+                hardlinked.pop(rel_dest, None)
+                if link_type is None:
+                    to_copy.append(src)
+                    to_copy_dests.append(dest)
+        if not hardlinked: del self.extras_dict[u'hardlinked_files']
+        return to_copy, to_copy_dests
+
+    def drop_hardlinks(self, rel_dests):
+        """Forget that the specified Data files are hard linked to files of
+        this project - they were deleted, moved away or replaced."""
+        hardlinked = self.extras_dict.get(u'hardlinked_files')
+        if not hardlinked: return
+        for rel_dest in rel_dests:
+            hardlinked.pop(rel_dest, None)
+        if not hardlinked: del self.extras_dict[u'hardlinked_files']
+
+    def packaged_bsas(self):
+        """Return the sorted paths of the BSAs in this package."""
+        bsa_ext = bush.game.Bsa.bsa_extension
+        return sorted(x[0] for x in self.fileSizeCrcs if
+                      x[0].lower().endswith(bsa_ext))
+
+    def listSource(self, list_bsas=False):
+        """Return package structure as text, followed by the contents of the
+        BSAs in the package if list_bsas is True."""
         log = bolt.LogFile(io.StringIO())
         log.setHeader(u'%s ' % self.archive + _(u'Package Structure:'))
         log(u'[spoiler]\n', False)
         self._list_package(self.abs_path, log)
         log(u'[/spoiler]')
+        for bsa_path in (self.packaged_bsas() if list_bsas else ()):
+            try:
+                bsa_assets = self.get_bsa_assets(bsa_path)
+            except (BSAError, StateError, EnvironmentError):
+                deprint(u'%s: Failed to read %s' % (self.archive, bsa_path),
+                        traceback=True)
+                continue
+            log.setHeader(u'%s ' % bsa_path + _(u'Contents:'))
+            log(u'[spoiler]\n', False)
+            for asset in sorted(bsa_assets):
+                log(u'  ' + asset)
+            log(u'[/spoiler]')
         return bolt.winNewLines(log.out.getvalue())
 
     @staticmethod
@@ -1266,7 +1498,7 @@ def _refreshSource(self, progress, recalculate_project_crc):
         """Marker: size is -1, fileSizeCrcs empty, modified = creation time."""
         pass
 
-    def install(self, destFiles, progress=None):
+    def install(self, destFiles, progress=None, unpack_dir=None):
         """Install specified files to Data directory."""
         pass
 
@@ -1284,6 +1516,34 @@ def refreshBasic(self, progress, recalculate_project_crc=True):
         return bolt.LowerDict()
 
 #------------------------------------------------------------------------------
+class _ArchiveFilesCache(object):
+    """In-memory cache of the small files read from archives - wizards, FOMOD
+    configs, readmes and their images - and of the assets of the BSAs in
+    them, so that browsing a package does not go through its archive again
+    every time. Entries are keyed by the CRC of the archive, so they survive
+    renaming it and are never used once it changed. When the cached data
+    grows past max_size, the oldest entries are dropped."""
+    max_file_size = 0x80000 # 512 KiB, larger files are not worth caching
+    max_size = 0x2000000 # 32 MiB
+
+    def __init__(self):
+        # (archive crc, key) -> (size, cached value), oldest first
+        self._entries = collections.OrderedDict()
+        self._size = 0
+
+    def get(self, arch_crc, key):
+        return self._entries.get((arch_crc, key), (0, None))[1]
+
+    def set(self, arch_crc, key, value, value_size):
+        old_entry = self._entries.pop((arch_crc, key), None)
+        if old_entry is not None: self._size -= old_entry[0]
+        self._entries[(arch_crc, key)] = (value_size, value)
+        self._size += value_size
+        while self._size > self.max_size:
+            self._size -= self._entries.popitem(last=False)[1][0]
+
+_archive_files_cache = _ArchiveFilesCache()
+
 class InstallerArchive(Installer):
     """Represents an archive installer entry."""
     __slots__ = tuple() #--No new slots
@@ -1304,13 +1564,49 @@ def _refreshSource(self, progress, recalculate_project_crc):
         #--Basic file info
         self.size, self.modified = self.abs_path.size_mtime() ##: aka _file_size _file_mod_time
         #--Get fileSizeCrcs
-        fileSizeCrcs = self.fileSizeCrcs = []
-        self.isSolid = False
+        try:
+            fileSizeCrcs = self._list_zip() if is_native_zip(
+                self.abs_path) else None
+            if fileSizeCrcs is None:
+                fileSizeCrcs = self._list_archive()
+        except:
+            archive_msg = u"Unable to read archive '%s'." % self.abs_path
+            deprint(archive_msg, traceback=True)
+            raise InstallerArchiveError(archive_msg)
+        self.fileSizeCrcs = _FileTable(fileSizeCrcs)
+        self.crc = sum(crc for _path, _size, crc in fileSizeCrcs) & 0xFFFFFFFF
+
+    def _list_zip(self):
+        """Read the listing of a zip from its central directory - returns
+        None if the zip must be listed with 7z."""
+        fileSizeCrcs = list_zip(self.abs_path)
+        if fileSizeCrcs is not None: self.isSolid = False
+        return fileSizeCrcs
+
+    def _list_archive(self):
+        """Get the listing of the archive from the listing cache if it's
+        there, else list it with 7z and cache the listing."""
+        from . import listing_cache
+        arch_ino = self.abs_path.stat.st_ino
+        cached = listing_cache.get_listing(self.size, self.modified, arch_ino)
+        if cached is None:
+            cached = self.list_7z(self.abs_path)
+            listing_cache.set_listing(self.size, self.modified, arch_ino,
+                                      *cached)
+        self.isSolid, fileSizeCrcs = cached
+        return fileSizeCrcs
+
+    @staticmethod
+    def list_7z(apath):
+        """List the archive apath with 7z, returning whether it is solid and
+        its fileSizeCrcs. Can run on any thread."""
+        fileSizeCrcs = []
+        solid = [False] # PY3: nonlocal
         class _li(object): # line info - PY3: we really want nonlocal here
-            filepath = size = crc = isdir = cumCRC = 0
+            filepath = size = crc = isdir = 0
             __slots__ = ()
         def _parse_archive_line(key, value):
-            if   key == u'Solid': self.isSolid = (value[0] == u'+')
+            if   key == u'Solid': solid[0] = (value[0] == u'+')
             elif key == u'Path': _li.filepath = value.decode('utf8')
             elif key == u'Size': _li.size = int(value)
             elif key == u'Attributes': _li.isdir = value and (u'D' in value)
@@ -1319,50 +1615,57 @@ def _parse_archive_line(key, value):
                 if _li.filepath and not _li.isdir and _li.filepath != \
                         tempArch.s:
                     fileSizeCrcs.append((_li.filepath, _li.size, _li.crc))
-                    _li.cumCRC += _li.crc
                 _li.filepath = _li.size = _li.crc = _li.isdir = 0
-        with self.abs_path.unicodeSafe() as tempArch:
-            try:
-                list_archive(tempArch, _parse_archive_line)
-                self.crc = _li.cumCRC & 0xFFFFFFFF
-            except:
-                archive_msg = u"Unable to read archive '%s'." % self.abs_path
-                deprint(archive_msg, traceback=True)
-                raise InstallerArchiveError(archive_msg)
+        with apath.unicodeSafe() as tempArch:
+            list_archive(tempArch, _parse_archive_line)
+        return solid[0], fileSizeCrcs
 
     def unpackToTemp(self, fileNames, progress=None, recurse=False):
         """Erases all files from self.tempDir and then extracts specified files
         from archive to self.tempDir. progress will be zeroed so pass a
         SubProgress in.
         fileNames: File names (not paths)."""
+        #--Ensure temp dir empty
+        bass.rmTempDir()
+        unpack_dir = bass.getTempDir()
+        self.extract_files(fileNames, unpack_dir, self.tempList, progress,
+                           recurse)
+        #--Done -> don't clean out temp dir, it's going to be used soon
+        return unpack_dir
+
+    def extract_files(self, fileNames, unpack_dir, list_path, progress=None,
+                      recurse=False):
+        """Extract the specified files from the archive to unpack_dir, using
+        list_path to pass the list of files to 7z. Given different
+        unpack_dir and list_path and no progress, it can run on any thread."""
         if not fileNames: raise ArgumentError(
             u'No files to extract for %s.' % self.archive)
         # expand wildcards in fileNames to get actual count of files to extract
         #--Dump file list
-        with self.tempList.open(u'w', encoding=u'utf8') as out:
+        with list_path.open(u'w', encoding=u'utf8') as out:
             out.write(u'\n'.join(fileNames))
-        #--Ensure temp dir empty
-        bass.rmTempDir()
-        with self.abs_path.unicodeSafe() as arch:
-            if progress:
-                progress.state = 0
-                progress.setFull(len(fileNames))
-            #--Extract files
-            unpack_dir = bass.getTempDir()
-            try:
-                extract7z(arch, unpack_dir, progress, recursive=recurse,
-                          filelist_to_extract=self.tempList.s)
-            finally:
-                self.tempList.remove()
-                bolt.clearReadOnly(unpack_dir)
-        #--Done -> don't clean out temp dir, it's going to be used soon
-        return unpack_dir
+        if progress:
+            progress.state = 0
+            progress.setFull(len(fileNames))
+        #--Extract files
+        try:
+            if not (is_native_zip(self.abs_path) and extract_zip(
+                    self.abs_path, unpack_dir, progress, recursive=recurse,
+                    files_to_extract=fileNames)):
+                with self.abs_path.unicodeSafe() as arch:
+                    extract7z(arch, unpack_dir, progress, recursive=recurse,
+                              filelist_to_extract=list_path.s)
+        finally:
+            list_path.remove()
+            bolt.clearReadOnly(unpack_dir)
 
-    def _install(self, dest_src, progress):
+    def _install(self, dest_src, progress, unpack_dir=None):
         #--Extract
-        progress(0, self.archive + u'\n' + _(u'Extracting files...'))
-        unpackDir = self.unpackToTemp(dest_src.values(),
-                                      SubProgress(progress, 0, 0.9))
+        if unpack_dir is None:
+            progress(0, self.archive + u'\n' + _(u'Extracting files...'))
+            unpackDir = self.unpackToTemp(dest_src.values(),
+                                          SubProgress(progress, 0, 0.9))
+        else: unpackDir = unpack_dir # already extracted
         #--Rearrange files
         progress(0.9, self.archive + u'\n' + _(u'Organizing files...'))
         srcDirJoin = unpackDir.join
@@ -1399,6 +1702,19 @@ def unpackToProject(self, project, progress=None):
 
     @staticmethod
     def _list_package(apath, log):
+        list_text = None
+        if is_native_zip(apath):
+            list_text = list_zip_structure(apath)
+        if list_text is None:
+            list_text = InstallerArchive._list_7z_package(apath)
+        list_text.sort()
+        #--Output
+        for node, isdir in list_text:
+            log(u'  ' * node.count(os.sep) + os.path.split(node)[1] + (
+                os.sep if isdir else u''))
+
+    @staticmethod
+    def _list_7z_package(apath):
         with apath.unicodeSafe() as tempArch:
             filepath = [u''] # PY3: nonlocal
             list_text = []
@@ -1411,21 +1727,99 @@ def _parse_archive_line(key, value):
                 elif key == u'Method':
                     filepath[0] = u''
             list_archive(tempArch, _parse_archive_line)
-        list_text.sort()
-        #--Output
-        for node, isdir in list_text:
-            log(u'  ' * node.count(os.sep) + os.path.split(node)[1] + (
-                os.sep if isdir else u''))
+        return list_text
 
     def renameInstaller(self, name_new, idata_):
         return self._installer_rename(idata_,
                                       name_new.root + GPath(self.archive).ext)
 
+    def read_files(self, rel_paths, progress=None):
+        """Zips are read in process, without extracting anything - files in
+        other archives are extracted (all at once) to a temporary directory
+        and read from there. Small files are cached by the CRC of the
+        archive, so reading them again does not go through the archive."""
+        files_data, to_read = {}, []
+        for rel_path in rel_paths:
+            cached = _archive_files_cache.get(self.crc,
+                                              (u'file', rel_path.lower()))
+            if cached is None: to_read.append(rel_path)
+            else: files_data[rel_path] = cached
+        if not to_read: return files_data
+        read_data = None
+        if is_native_zip(self.abs_path):
+            read_data = archives.read_zip_members(self.abs_path, to_read,
+                                                  lambda ins: ins.read())
+        if read_data is None:
+            read_data = self._read_extracted(to_read, progress)
+        read_data = {k.lower(): v for k, v in read_data.iteritems()}
+        for rel_path in to_read:
+            try:
+                file_data = read_data[os.path.normpath(rel_path).lower()]
+            except KeyError:
+                continue # not in the archive
+            files_data[rel_path] = file_data
+            if len(file_data) <= _archive_files_cache.max_file_size:
+                _archive_files_cache.set(self.crc, (u'file', rel_path.lower()),
+                                         file_data, len(file_data))
+        return files_data
+
+    def _read_extracted(self, rel_paths, progress):
+        """Extract the specified files to a temporary directory and return a
+        dict mapping their paths to their contents."""
+        read_dir = Path.tempDir()
+        try:
+            self.extract_files(rel_paths, read_dir, self.tempList, progress)
+            files_data = {}
+            for rel_path in rel_paths:
+                try:
+                    with read_dir.join(rel_path).open(u'rb') as ins:
+                        files_data[os.path.normpath(rel_path)] = ins.read()
+                except EnvironmentError:
+                    continue # not in the archive
+            return files_data
+        finally:
+            read_dir.rmtree(safety=read_dir.stail)
+
+    def get_bsa_assets(self, rel_path):
+        """The BSA is streamed out of the archive, so that it does not have
+        to be extracted. The assets are cached by the CRC of the archive."""
+        cache_key = (u'bsa', rel_path.lower())
+        bsa_assets = _archive_files_cache.get(self.crc, cache_key)
+        if bsa_assets is not None: return bsa_assets
+        bsa_type = bsa_files.get_bsa_type(bush.game.fsName)
+        bsa_path = self.abs_path.join(rel_path) # for error messages
+        read_assets = lambda ins: bsa_type.load_stream_assets(ins, bsa_path)
+        zip_assets = None
+        if is_native_zip(self.abs_path):
+            zip_assets = archives.read_zip_members(self.abs_path, [rel_path],
+                                                   read_assets)
+        if zip_assets is None:
+            with self.abs_path.unicodeSafe() as arch:
+                bsa_assets = archives.read_7z_member(arch, rel_path,
+                                                     read_assets)
+        elif not zip_assets:
+            raise StateError(u'%s: %s not found' % (self.archive, rel_path))
+        else:
+            bsa_assets, = zip_assets.itervalues()
+        _archive_files_cache.set(self.crc, cache_key, bsa_assets,
+                                 sum(imap(len, bsa_assets)))
+        return bsa_assets
+
+    def _write_to_temp(self, files_data):
+        """Write out the specified files (see read_files) to the emptied temp
+        dir, keeping their relative paths, and return the temp dir."""
+        bass.rmTempDir()
+        unpack_dir = bass.getTempDir()
+        for rel_path, file_data in files_data.iteritems():
+            with unpack_dir.join(rel_path).open(u'wb') as out:
+                out.write(file_data)
+        return unpack_dir
+
     def _open_txt_file(self, rel_path):
         with gui.BusyCursor():
             # This is going to leave junk temp files behind...
             try:
-                unpack_dir = self.unpackToTemp([rel_path])
+                unpack_dir = self._write_to_temp(self.read_files([rel_path]))
                 unpack_dir.join(rel_path).start()
             except OSError:
                 # Don't clean up temp dir here.  Sometimes the editor
@@ -1445,8 +1839,8 @@ def _extract_wizard_files(self, wizard_file_name, wizard_prog_title):
                                         u'gif', u'pcx', u'pnm', u'tif',
                                         u'tiff', u'tga', u'iff', u'xpm',
                                         u'ico', u'cur', u'ani',)))
-            unpack_dir = self.unpackToTemp(files_to_extract, progress,
-                                           recurse=True)
+            unpack_dir = self._write_to_temp(self.read_files(
+                files_to_extract, progress))
         return unpack_dir.join(wizard_file_name)
 
     def wizard_file(self):
@@ -1516,19 +1910,17 @@ def _refresh_from_project_dir(self, progress=None,
         pending, pending_size = bolt.LowerDict(), 0
         new_sizeCrcDate = bolt.LowerDict()
         oldGet = self.src_sizeCrcDate.get
-        walk = self._dir_dirs_files if self._dir_dirs_files is not None else bolt.walkdir(asRoot)
-        for asDir, __sDirs, sFiles in walk:
+        # on boot and on full or user requested refreshes rescan everything
+        scanned = self._rescan_tree(
+            self.project_refreshed and not recalculate_all_crcs)
+        for asDir, dir_mtime, __sDirs, file_stats in scanned:
             rsDir = asDir[relPos:]
             progress(0.05, progress_msg + (u'\n%s' % rsDir))
-            get_mtime = os.path.getmtime(asDir)
-            max_mtime = max_mtime if max_mtime >= get_mtime else get_mtime
-            for sFile in sFiles:
+            max_mtime = max_mtime if max_mtime >= dir_mtime else dir_mtime
+            for sFile, size, date in file_stats:
                 asFile = os.path.join(asDir, sFile)
                 if len(asFile) > 255: continue # FIXME(inf) hacky workaround
                 rpFile = os.path.join(rsDir, sFile)
-                # below calls may now raise even if "werr.winerror = 123"
-                lstat = os.lstat(asFile)
-                size, date = lstat.st_size, lstat.st_mtime
                 max_mtime = max_mtime if max_mtime >= date else date
                 oSize, oCrc, oDate = oldGet(rpFile, (0, 0, 0))
                 if size == oSize and date == oDate:
@@ -1536,26 +1928,41 @@ def _refresh_from_project_dir(self, progress=None,
                 else:
                     pending[rpFile] = (size, oCrc, date, asFile)
                     pending_size += size
-        Installer.final_update(new_sizeCrcDate, self.src_sizeCrcDate, pending,
+        src_sizeCrcDate = bolt.LowerDict()
+        Installer.final_update(new_sizeCrcDate, src_sizeCrcDate, pending,
                                pending_size, progress, recalculate_all_crcs,
                                rootName)
+        self.src_sizeCrcDate = _FileTable.from_dict(src_sizeCrcDate,
+                                                    with_dates=True)
         #--Done
         return max_mtime
 
-    def size_or_mtime_changed(self, apath, _lstat=os.lstat):
+    def _rescan_tree(self, use_snapshot=True):
+        """Scan the project directory, reusing the persistent snapshot of
+        its tree (stored in extras_dict) for the directories whose mtime did
+        not change, and update the snapshot."""
+        snapshot = self.extras_dict.get(u'tree_snapshot', {}) \
+            if use_snapshot else {}
+        scanned, self.extras_dict[u'tree_snapshot'] = bolt.rescan_tree(
+            self.abs_path.s, snapshot)
+        return scanned
+
+    def drop_tree_snapshot(self):
+        """Make the next refresh rescan the whole project directory - must be
+        called after editing files in place, as that does not change the
+        mtimes of their directories."""
+        self.extras_dict.pop(u'tree_snapshot', None)
+
+    def size_or_mtime_changed(self, apath):
         #FIXME(ut): getmtime(True) won't detect all changes - for instance COBL
         # has 3/25/2020 8:02:00 AM modification time if unpacked and no
         # amount of internal shuffling won't change its apath.getmtime(True)
-        getM, join = os.path.getmtime, os.path.join
         c, size = [], 0
         cExtend, cAppend = c.extend, c.append
-        self._dir_dirs_files = []
-        for root, d, files in bolt.walkdir(apath.s):
-            cAppend(getM(root))
-            lstats = [_lstat(join(root, f)) for f in files]
-            cExtend(ls.st_mtime for ls in lstats)
-            size += sum(ls.st_size for ls in lstats)
-            self._dir_dirs_files.append((root, [], files)) # dirs is unused
+        for _root, dir_mtime, _dirs, file_stats in self._rescan_tree():
+            cAppend(dir_mtime)
+            cExtend(date for _f, _size, date in file_stats)
+            size += sum(siz for _f, siz, _date in file_stats)
         if self.size != size: return True
         # below is for the fix me - we need to add mtimes_str_crc extra persistent attribute to Installer
         # c.sort() # is this needed or os.walk will return the same order during program run
@@ -1575,9 +1982,8 @@ def _refreshSource(self, progress, recalculate_project_crc):
         cumCRC = 0
 ##        cumDate = 0
         cumSize = 0
-        fileSizeCrcs = self.fileSizeCrcs = []
-        for path, (size, crc, date) in self.src_sizeCrcDate.iteritems():
-            fileSizeCrcs.append((path, size, crc))
+        self.fileSizeCrcs = self.src_sizeCrcDate.without_dates()
+        for _path, size, crc in self.fileSizeCrcs:
 ##            cumDate = max(date,cumDate)
             cumCRC += crc
             cumSize += size
@@ -1585,7 +1991,7 @@ def _refreshSource(self, progress, recalculate_project_crc):
         self.crc = cumCRC & 0xFFFFFFFF
         self.project_refreshed = True
 
-    def _install(self, dest_src, progress):
+    def _install(self, dest_src, progress, unpack_dir=None):
         progress.setFull(len(dest_src))
         progress(0, self.archive + u'\n' + _(u'Moving files...'))
         progressPlus = progress.plus
@@ -1595,8 +2001,60 @@ def _install(self, dest_src, progress):
                                 None)
 
     def sync_from_data(self, delta_files, progress):
+        self.drop_tree_snapshot() # we overwrite files in place
         return self._do_sync_data(self.abs_path, delta_files, progress)
 
+    def packToBsa(self, project, progress=None):
+        """Create a new project with the files this project installs, packing
+        the loose assets into BSAs named after the first plugin of this
+        project. Returns the number of packed assets."""
+        progress = progress or bolt.Progress()
+        dest_src = self.refreshDataSizeCrc(True)
+        bsa_root = sorted(self.espms)[0].sroot
+        bsa_ext = bush.game.Bsa.bsa_extension
+        #--Files that must stay loose
+        loose_dirs = self.docDirs | {u'bash patches', u'bashtags', u'docs',
+                                     u'ini tweaks'}
+        if bush.game.Se.plugin_dir:
+            loose_dirs.add(bush.game.Se.plugin_dir.lower())
+        loose_exts = bush.game.espm_extensions | {u'.dll', u'.exe', u'.ini',
+                                                 bsa_ext}
+        srcDirJoin = self.abs_path.join
+        packed, loose = bolt.LowerDict(), bolt.LowerDict()
+        for dest, src in dest_src.iteritems():
+            top_dir, sep, _rest = dest.partition(os_sep)
+            if not sep or top_dir.lower() in loose_dirs or \
+                    os.path.splitext(dest)[1].lower() in loose_exts:
+                loose[dest] = src
+            else:
+                packed[dest] = srcDirJoin(src).s
+        #--Clear Project
+        destDir = bass.dirs[u'installers'].join(project)
+        destDir.rmtree(safety=u'Installers')
+        destDir.makedirs()
+        #--Pack, BA2s can't mix textures with other files
+        bsa_type = bsa_files.get_bsa_type(bush.game.fsName)
+        if bsa_ext == u'.ba2':
+            textures = bolt.LowerDict((k, v) for k, v in packed.iteritems()
+                                      if k.lower().endswith(u'.dds'))
+            bsa_sources = [(u' - Main', bolt.LowerDict(
+                (k, v) for k, v in packed.iteritems() if k not in textures)),
+                           (u' - Textures', textures)]
+        else:
+            bsa_sources = [(u'', packed)]
+        bsa_sources = [(bsa_root + s + bsa_ext, a) for s, a in bsa_sources
+                       if a]
+        for i, (bsa_name, asset_sources) in enumerate(bsa_sources):
+            bsa_type.pack_assets(destDir.join(bsa_name), asset_sources,
+                SubProgress(progress, 0.9 * i / len(bsa_sources),
+                            0.9 * (i + 1) / len(bsa_sources)))
+        #--Copy the files that stay loose
+        progress(0.9, u'%s\n' % project + _(u'Copying files...'))
+        destDirJoin = destDir.join
+        for dest, src in loose.iteritems():
+            srcDirJoin(src).copyTo(destDirJoin(dest))
+        return len(packed)
+
     @staticmethod
     def _list_package(apath, log):
         def walkPath(folder, depth):
@@ -1616,27 +2074,309 @@ def renameInstaller(self, name_new, idata_):
 
     def _open_txt_file(self, rel_path): self.abs_path.join(rel_path).start()
 
+    def read_files(self, rel_paths, progress=None):
+        files_data = {}
+        for rel_path in rel_paths:
+            try:
+                with self.abs_path.join(rel_path).open(u'rb') as ins:
+                    files_data[rel_path] = ins.read()
+            except EnvironmentError:
+                continue # not in the project
+        return files_data
+
+    def get_bsa_assets(self, rel_path):
+        bsa_path = self.abs_path.join(rel_path)
+        with bsa_path.open(u'rb') as ins:
+            return bsa_files.get_bsa_type(
+                bush.game.fsName).load_stream_assets(ins, bsa_path)
+
     def wizard_file(self): return self.abs_path.join(self.hasWizard)
 
     def fomod_file(self): return self.abs_path.join(self.has_fomod_conf)
 
-def projects_walk_cache(func): ##: HACK ! Profile
-    """Decorator to make sure I dont leak self._dir_dirs_files project cache.
-    Must decorate all methods that may call size_or_mtime_changed (only
-    called in scan_installers_dir). For self._dir_dirs_files to be of any use
-    the call to scan_installers_dir must be followed by refreshBasic calls
-    on the projects."""
-    @wraps(func)
-    def _projects_walk_cache_wrapper(self, *args, **kwargs):
+#------------------------------------------------------------------------------
+class _DestIndex(object):
+    """Inverted index of the files the installers would install, mapping
+    each destination path to the installers that have it. Kept up to date
+    incrementally by sync: installers get reindexed only when their
+    ci_dest_sizeCrc is replaced (see refreshDataSizeCrc) and dropped when they
+    are deleted. The installer lists are not kept sorted by order, as
+    installers are reordered much more often than conflicts are looked up -
+    they are usually very short, so get_owners sorts them on demand.
+
+    The underrides (get_underrides), the winners annealing restores files
+    from (get_winner) and the installers whose status must be refreshed
+    (pop_stale) are all computed from the index, so each destination is
+    looked at once, however many installers have it."""
+
+    def __init__(self):
+        self._dest_installers = bolt.LowerDict() # dest -> list of installers
+        self._indexed = {} # installer -> the ci_dest_sizeCrc it's indexed by
+        # Installers whose status was not refreshed since they were reindexed
+        self._reindexed = set()
+        # dest -> its state in the Data dir and its underride, as of the last
+        # status refresh, see pop_stale
+        self._status_dests = bolt.LowerDict()
+        self._status_types = {} # installer -> its type, ditto
+
+    def sync(self, installers):
+        """Update the index for the current installers."""
+        dest_installers = self._dest_installers
+        indexed = self._indexed
+        live = set()
+        for installer in installers:
+            live.add(installer)
+            dest_sizeCrc = installer.ci_dest_sizeCrc
+            old_sizeCrc = indexed.get(installer)
+            if old_sizeCrc is dest_sizeCrc: continue
+            if old_sizeCrc is not None:
+                self._unindex(installer, old_sizeCrc)
+            for dest in dest_sizeCrc:
+                try:
+                    dest_installers[dest].append(installer)
+                except KeyError:
+                    dest_installers[dest] = [installer]
+            indexed[installer] = dest_sizeCrc
+            self._reindexed.add(installer)
+        for installer in [i for i in indexed if i not in live]:
+            self._unindex(installer, indexed.pop(installer))
+            self._reindexed.discard(installer)
+            self._status_types.pop(installer, None)
+
+    def _unindex(self, installer, dest_sizeCrc):
+        dest_installers = self._dest_installers
+        for dest in dest_sizeCrc:
+            dest_owners = dest_installers[dest]
+            dest_owners.remove(installer)
+            if not dest_owners:
+                del dest_installers[dest]
+                self._status_dests.pop(dest, None)
+
+    def get_owners(self, dest):
+        """Return the installers that have dest, sorted by install order."""
+        return sorted(self._dest_installers.get(dest, ()),
+                      key=attrgetter(u'order'))
+
+    def get_winner(self, dest, skip=frozenset()):
+        """Return the highest order active installer that has dest and is
+        not in skip, or None if there is no such installer."""
+        winner = None
+        for installer in self._dest_installers.get(dest, ()):
+            if installer.is_active and installer not in skip and (
+                    winner is None or installer.order > winner.order):
+                winner = installer
+        return winner
+
+    def get_sharing(self, src_installer, dests=None):
+        """Return a dict mapping the installers that share any of dests
+        (default: all of src_installer's files) with src_installer to lists
+        of the shared dests."""
+        sharing = collections.defaultdict(list)
+        dest_installers = self._dest_installers
+        for dest in (src_installer.ci_dest_sizeCrc if dests is None
+                     else dests):
+            for installer in dest_installers.get(dest, ()):
+                if installer is not src_installer:
+                    sharing[installer].append(dest)
+        return sharing
+
+    def get_underrides(self, data_sizeCrcDate):
+        """Return a LowerDict mapping the files the active installers would
+        install that are in the Data dir, but not as the winning installer
+        would install them, to their size and crc in the Data dir."""
+        ci_underrides_sizeCrc = bolt.LowerDict()
+        data_get = data_sizeCrcDate.get
+        for dest, owners in self._dest_installers.iteritems():
+            sizeCrcDate = data_get(dest)
+            if not sizeCrcDate: continue
+            winner = None
+            for installer in owners:
+                if installer.is_active and (
+                        winner is None or installer.order > winner.order):
+                    winner = installer
+            if winner is not None and \
+                    winner.ci_dest_sizeCrc[dest] != sizeCrcDate[:2]:
+                # installed from a lower loading installer (or manually)
+                ci_underrides_sizeCrc[dest] = sizeCrcDate[:2]
+        return ci_underrides_sizeCrc
+
+    def pop_stale(self, data_sizeCrcDate, ci_underrides_sizeCrc):
+        """Return the installers whose status may have changed since the
+        last call: the ones reindexed or retyped since, those with dirty
+        files and the owners of the files whose state in the Data dir or
+        whose underride changed since."""
+        stale = self._reindexed
+        self._reindexed = set()
+        status_types = self._status_types
+        for installer in self._indexed:
+            if installer.dirty_sizeCrc or \
+                    status_types.get(installer) != installer.type:
+                stale.add(installer)
+                status_types[installer] = installer.type
+        status_dests = self._status_dests
+        data_get = data_sizeCrcDate.get
+        underride_get = ci_underrides_sizeCrc.get
+        for dest, owners in self._dest_installers.iteritems():
+            sizeCrcDate = data_get(dest)
+            dest_state = (sizeCrcDate and sizeCrcDate[:2], underride_get(dest))
+            if status_dests.get(dest) != dest_state:
+                status_dests[dest] = dest_state
+                stale.update(owners)
+        return stale
+
+#------------------------------------------------------------------------------
+class _InstallersDb(object):
+    """Stores the installers and the cached attributes of the files in the
+    Data directory in a sqlite database, one row per installer and per file.
+    Saving only writes the rows that changed since the last load or save,
+    instead of rewriting everything like a PickleDict would. The file tables
+    of the installers are stored in their own columns: they make up most of
+    the data but are replaced, never edited, when they change - so they are
+    only written when they were replaced."""
+    _schema = (
+        u'CREATE TABLE IF NOT EXISTS installers (key TEXT PRIMARY KEY, '
+        u'name TEXT NOT NULL, state BLOB NOT NULL, files BLOB NOT NULL, '
+        u'src_files BLOB NOT NULL)',
+        u'CREATE TABLE IF NOT EXISTS data_files (key TEXT PRIMARY KEY, '
+        u'path TEXT NOT NULL, size INTEGER, crc INTEGER, mtime REAL)',
+    )
+    _table_attrs = (u'fileSizeCrcs', u'src_sizeCrcDate')
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        # installer key -> ((len, crc) of its state, its saved file tables)
+        self._saved_states = {}
+        self._saved_data_files = {} # data path -> its saved (size, crc, date)
+        self._table_indices = [Installer.persistent.index(a) for a in
+                               self._table_attrs]
+
+    @staticmethod
+    def _pickle_state(state):
+        """Pickle state without using the memo, so that equal states always
+        pickle to the same bytes - with the memo, the result depends on which
+        of their attributes happen to share objects."""
+        out = io.BytesIO()
+        pickler = pickle.Pickler(out, -1)
+        pickler.fast = True # installers contain no cycles
+        pickler.dump(state)
+        return out.getvalue()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path.s)
+        with conn:
+            for statement in self._schema: conn.execute(statement)
+        return conn
+
+    def _load_installer(self, state, tables):
+        """Unpickle an installer from its state without the file tables and
+        the tables, as pickle would from a pickle of the whole installer.
+        Return it and its saved tables."""
+        cls, args, inst_state = pickle.loads(state)
+        inst_state = list(inst_state)
+        tables = [pickle.loads(t) for t in tables]
+        for i, table in izip(self._table_indices, tables):
+            inst_state[i] = table
+        installer = cls(*args)
+        installer.__setstate__(tuple(inst_state))
+        return installer, tables
+
+    def _split_installer(self, installer):
+        """Return the pickle of the state of installer without its file
+        tables, and the tables."""
+        cls, args, inst_state = installer.__reduce__()
+        inst_state = list(inst_state)
+        tables = [inst_state[i] for i in self._table_indices]
+        for i in self._table_indices:
+            inst_state[i] = None
+        return self._pickle_state((cls, args, tuple(inst_state))), tables
+
+    def load(self):
+        """Return a dict of the stored installers and a LowerDict of the
+        stored Data files attributes, or None if the database is missing or
+        corrupt - in the latter case it is moved out of the way."""
+        if not self.db_path.exists(): return None
         try:
-            return func(self, *args, **kwargs)
+            conn = self._connect()
+            try:
+                installers, states = {}, {}
+                for name, state, files, src_files in conn.execute(
+                        u'SELECT name, state, files, src_files FROM '
+                        u'installers'):
+                    state = str(state) # PY3: bytes
+                    name = GPath(name)
+                    try:
+                        installers[name], tables = self._load_installer(
+                            state, (str(files), str(src_files)))
+                    except Exception:
+                        deprint(u'Failed loading installer %s' % name,
+                                traceback=True)
+                        continue # let scan_installers_dir pick it up
+                    # if __setstate__ upgraded the installer, its state or
+                    # tables won't match those and it will be saved again
+                    states[name] = ((len(state), crc32(state)), tables)
+                data_sizeCrcDate = bolt.LowerDict(
+                    (path, (siz, crc, date)) for path, siz, crc, date in
+                    conn.execute(u'SELECT path, size, crc, mtime FROM '
+                                 u'data_files'))
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError:
+            corrupted = GPath(u'%s (%s).corrupted' % (
+                self.db_path, bolt.timestamp()))
+            deprint(u'Unable to load %s (will be moved to "%s")' % (
+                self.db_path, corrupted.tail), traceback=True)
+            self.db_path.moveTo(corrupted)
+            return None
+        self._saved_states = states
+        self._saved_data_files = dict(data_sizeCrcDate)
+        return installers, data_sizeCrcDate
+
+    def save(self, installers, data_sizeCrcDate):
+        """Write the installers and Data files attributes that changed since
+        the last load or save, in a single transaction. Only the small state
+        of each installer is pickled to check that - its file tables are only
+        pickled if they were replaced."""
+        states = {}
+        saved_states = self._saved_states
+        saved_data_files = self._saved_data_files
+        conn = self._connect()
+        try:
+            with conn:
+                for name, installer in installers.iteritems():
+                    state, tables = self._split_installer(installer)
+                    state_sig = (len(state), crc32(state))
+                    states[name] = (state_sig, tables)
+                    saved = saved_states.get(name)
+                    if saved is None:
+                        conn.execute(u'INSERT OR REPLACE INTO installers '
+                            u'VALUES (?, ?, ?, ?, ?)', (name.cs, name.s,
+                            buffer(state)) + tuple(buffer(
+                                self._pickle_state(t)) for t in tables))
+                        continue
+                    if saved[0] != state_sig:
+                        conn.execute(u'UPDATE installers SET name = ?, '
+                            u'state = ? WHERE key = ?',
+                            (name.s, buffer(state), name.cs))
+                    for column, table, saved_table in izip(
+                            (u'files', u'src_files'), tables, saved[1]):
+                        if table is not saved_table:
+                            conn.execute(u'UPDATE installers SET %s = ? '
+                                u'WHERE key = ?' % column, (buffer(
+                                    self._pickle_state(table)), name.cs))
+                conn.executemany(u'DELETE FROM installers WHERE key = ?',
+                    [(n.cs,) for n in saved_states if n not in states])
+                conn.executemany(u'INSERT OR REPLACE INTO data_files VALUES '
+                                 u'(?, ?, ?, ?, ?)',
+                    [(path.lower(), u'%s' % path, siz, crc, date) for
+                     path, (siz, crc, date) in data_sizeCrcDate.iteritems()
+                     if saved_data_files.get(path) != (siz, crc, date)])
+                conn.executemany(u'DELETE FROM data_files WHERE key = ?',
+                    [(path.lower(),) for path in saved_data_files if
+                     path not in data_sizeCrcDate])
         finally:
-            it = self.itervalues() if isinstance(self, InstallersData) else \
-                self.listData.itervalues()
-            for project in it:
-                if project.is_project():
-                    project._dir_dirs_files = None
-    return _projects_walk_cache_wrapper
+            conn.close()
+        self._saved_states = states
+        self._saved_data_files = dict(data_sizeCrcDate)
 
 #------------------------------------------------------------------------------
 class InstallersData(DataStore):
@@ -1662,6 +2402,9 @@ def __init__(self):
         self.store_dir = bass.dirs[u'installers']
         self.bash_dir.makedirs()
         #--Persistent data
+        self._installers_db = _InstallersDb(
+            self.bash_dir.join(u'Installers.db'))
+        # only read, to migrate to Installers.db
         self.dictFile = bolt.PickleDict(self.bash_dir.join(u'Installers.dat'))
         self._data = {}
         self.data_sizeCrcDate = bolt.LowerDict()
@@ -1671,6 +2414,7 @@ def __init__(self):
             bass.dirs[u'corruptBCFs'], bass.dirs[u'installers'])
         #--Volatile
         self.ci_underrides_sizeCrc = bolt.LowerDict() # underridden files
+        self._dest_index = _DestIndex()
         self.bcfPath_sizeCrcDate = {}
         self.hasChanged = False
         self.loaded = False
@@ -1728,13 +2472,24 @@ def irefresh(self, progress=None, what=u'DIONSC', fullRefresh=False,
 
     def __load(self, progress):
         progress(0, _(u'Loading Data...'))
-        self.dictFile.load()
         self.converters_data.load()
-        pickl_data = self.dictFile.pickled_data
-        self._data = pickl_data.get(u'installers', {}) or pickl_data.get(b'installers', {})
-        pickle = pickl_data.get(u'sizeCrcDate', {}) or pickl_data.get(b'sizeCrcDate', {})
-        self.data_sizeCrcDate = bolt.LowerDict(pickle) if not isinstance(
-            pickle, bolt.LowerDict) else pickle
+        db_path = self._installers_db.db_path
+        # migrate from Installers.dat, unless we already did - an older Bash
+        # version may have written it since, though
+        loaded = None
+        if not self.dictFile.exists() or (db_path.exists() and
+                db_path.mtime >= self.dictFile.pkl_mtime()):
+            loaded = self._installers_db.load()
+        if loaded is not None:
+            self._data, self.data_sizeCrcDate = loaded
+        else:
+            self.dictFile.load()
+            pickl_data = self.dictFile.pickled_data
+            self._data = pickl_data.get(u'installers', {}) or pickl_data.get(b'installers', {})
+            sizeCrcDate = pickl_data.get(u'sizeCrcDate', {}) or pickl_data.get(b'sizeCrcDate', {})
+            self.data_sizeCrcDate = bolt.LowerDict(sizeCrcDate) if not \
+                isinstance(sizeCrcDate, bolt.LowerDict) else sizeCrcDate
+            self.dictFile.pickled_data.clear() # irefresh will save to the db
         # fixup: all markers had their archive attribute set to u'===='
         for key, value in self.iteritems():
             if value.is_marker():
@@ -1743,17 +2498,13 @@ def __load(self, progress):
         return True
 
     def save(self):
-        """Saves to pickle file."""
+        """Saves the changed installers to Installers.db."""
         if self.hasChanged:
-            self.dictFile.pickled_data[u'installers'] = self._data
-            self.dictFile.pickled_data[u'sizeCrcDate'] = { # FIXME: backwards compat
-                GPath(x): y for x, y in self.data_sizeCrcDate.iteritems()}
-            # for backwards compatibility, drop
-            self.dictFile.pickled_data['crc_installer'] = {
-                x.crc: x for x in self.itervalues() if x.is_archive()}
-            self.dictFile.vdata['version'] = 1
-            self.dictFile.save()
+            self._installers_db.save(self._data, self.data_sizeCrcDate)
             self.converters_data.save()
+            from . import listing_cache
+            listing_cache.drop_stale({(x.size, x.modified) for x in
+                                      self.itervalues() if x.is_archive()})
             self.hasChanged = False
 
     def _rename_operation(self, oldName, newName):
@@ -1814,7 +2565,6 @@ def __init__(self, deleted=(), pending=(), projects=()):
         def refresh_needed(self):
             return bool(self.deleted or self.pending)
 
-    @projects_walk_cache
     def _refreshInstallers(self, progress, fullRefresh, refresh_info, deleted,
                            pending, projects):
         """Update given installers or scan the installers' directory. Any of
@@ -1849,13 +2599,55 @@ def _refreshInstallers(self, progress, fullRefresh, refresh_info, deleted,
                 (pending - projects, pending & projects), (False, True)):
             if not subPending: continue
             progress(0,_(u'Scanning Packages...'))
+            if not is_project and self._prefetch_listings(sorted(subPending),
+                                                          progress):
+                progress(0, _(u'Scanning Packages...'))
             progress.setFull(len(subPending))
             for index,package in enumerate(sorted(subPending)):
                 progress(index, _(u'Scanning Packages...') + u'\n%s' % package)
                 self.refresh_installer(package, is_project, progress,
                                        _index=index, _fullRefresh=fullRefresh)
+            if not is_project:
+                from . import listing_cache
+                listing_cache.save()
         return changed
 
+    def _prefetch_listings(self, packages, progress):
+        """List the specified archives that are not in the listing cache yet
+        concurrently, so that refreshing them one by one afterwards only hits
+        the cache. Zips are skipped, as listing them natively is cheap.
+        Return True if anything was done."""
+        num_workers = bolt._get_max_workers(
+            bass.inisettings[u'ArchiveThreads'])
+        installersJoin = bass.dirs[u'installers'].join
+        archives = [(package, installersJoin(package)) for package in
+                    packages]
+        archives = [(package, apath) for package, apath in archives if
+                    apath.isfile() and not is_native_zip(apath)]
+        if num_workers <= 1 or len(archives) <= 1: return False
+        from . import listing_cache
+        to_list = []
+        for package, apath in archives:
+            arch_size, arch_mtime = apath.size_mtime()
+            arch_key = (arch_size, arch_mtime, apath.stat.st_ino)
+            if listing_cache.get_listing(*arch_key) is None:
+                to_list.append((package, apath, arch_key))
+        if not to_list: return False
+        def _list(list_entry):
+            try:
+                return InstallerArchive.list_7z(list_entry[1])
+            except Exception:
+                return None # will fail again when refreshed, and be reported
+        progress.setFull(len(to_list))
+        with bolt.ParallelMap(_list, to_list, num_workers) as listings:
+            for index, ((package, _apath, arch_key), listing) in enumerate(
+                    listings):
+                progress(index, _(u'Scanning Packages...') + u'\n%s' %
+                         package)
+                if listing is not None:
+                    listing_cache.set_listing(*(arch_key + listing))
+        return True
+
     def refresh_installer(self, package, is_project, progress,
                           install_order=None, do_refresh=False, _index=None,
                           _fullRefresh=False):
@@ -2006,27 +2798,24 @@ def refreshOrder(self):
 
     def refreshNorm(self):
         """Populate self.ci_underrides_sizeCrc with all underridden files."""
-        active_sorted = (x for x in self.sorted_values() if x.is_active)
-        #--dict mapping all should-be-installed files to their attributes
-        norm_sizeCrc = bolt.LowerDict()
-        for package in active_sorted:
-            norm_sizeCrc.update(package.ci_dest_sizeCrc)
-        #--Abnorm
-        ci_underrides_sizeCrc = bolt.LowerDict()
-        dataGet = self.data_sizeCrcDate.get
-        for path,sizeCrc in norm_sizeCrc.iteritems():
-            sizeCrcDate = dataGet(path)
-            if sizeCrcDate and sizeCrc != sizeCrcDate[:2]: # file is installed
-                # in data dir, but from a lower loading installer (or manually)
-                ci_underrides_sizeCrc[path] = sizeCrcDate[:2]
+        ci_underrides_sizeCrc = self.get_dest_index().get_underrides(
+            self.data_sizeCrcDate)
         self.ci_underrides_sizeCrc, oldAbnorm_sizeCrc = \
             ci_underrides_sizeCrc, self.ci_underrides_sizeCrc
         return ci_underrides_sizeCrc != oldAbnorm_sizeCrc
 
+    def get_dest_index(self):
+        """Return the index of which installers have which destination files,
+        brought up to date."""
+        self._dest_index.sync(self.itervalues())
+        return self._dest_index
+
     def refreshInstallersStatus(self):
-        """Refresh installer status."""
+        """Refresh the status of the installers it may have changed for - see
+        _DestIndex.pop_stale."""
         changed = False
-        for installer in self.itervalues():
+        for installer in self.get_dest_index().pop_stale(
+                self.data_sizeCrcDate, self.ci_underrides_sizeCrc):
             changed |= installer.refreshStatus(self)
         return changed
 
@@ -2037,21 +2826,38 @@ def _refresh_from_data_dir(self, progress=None, recalculate_all_crcs=False):
         Recalculates crcs for all espms in Data/ directory and all other
         files whose cached date or size has changed. Will skip directories (
         but not files) specified in Installer global skips and remove empty
-        dirs if the setting is on."""
-        #--Scan for changed files
+        dirs if the setting is on. If the Data dir is watched for changes,
+        only the changed files are rescanned, save for the periodic full
+        rescans."""
+        from . import data_watcher
         progress = progress if progress else bolt.Progress()
+        # Files hard linked to projects may be edited through the projects,
+        # which the watcher can't see - and edits through the Data dir edit
+        # the projects too, so those must be rescanned
+        hardlinked = self._hardlinked_data_files()
+        old_hardlinked = {p: self.data_sizeCrcDate.get(p) for p in hardlinked}
+        changes = data_watcher and data_watcher.pop_changes(u'InstallersData')
+        if changes is not None and not recalculate_all_crcs:
+            changed = self._refresh_changed_data_files(
+                changes | set(hardlinked), progress)
+        else:
+            changed = self._scan_data_dir(progress, recalculate_all_crcs)
+        for rel_path, old_sizeCrcDate in old_hardlinked.iteritems():
+            if self.data_sizeCrcDate.get(rel_path) != old_sizeCrcDate:
+                hardlinked[rel_path].drop_tree_snapshot()
+        return changed
+
+    def _scan_data_dir(self, progress, recalculate_all_crcs):
+        """Rescan the whole Data dir - see _refresh_from_data_dir."""
+        #--Scan for changed files
         progress_msg = bass.dirs[u'mods'].stail + u': ' + _(u'Pre-Scanning...')
         progress(0, progress_msg + u'\n')
         progress.setFull(1)
-        dirDirsFiles, emptyDirs = [], set()
-        dirDirsFilesAppend, emptyDirsAdd = dirDirsFiles.append, emptyDirs.add
-        asRoot = bass.dirs[u'mods'].s
-        relPos = len(asRoot) + 1
-        for asDir, sDirs, sFiles in bolt.walkdir(asRoot):
-            progress(0.05, progress_msg + (u'\n%s' % asDir[relPos:]))
-            if not (sDirs or sFiles): emptyDirsAdd(GPath(asDir))
-            if asDir == asRoot: InstallersData._skips_in_data_dir(sDirs)
-            dirDirsFilesAppend((asDir, sDirs, sFiles))
+        dirDirsFiles = bolt.scan_tree(bass.dirs[u'mods'].s,
+            InstallersData._skips_in_data_dir, progress, progress_msg + u'\n',
+            bass.inisettings[u'ScanThreads'])
+        emptyDirs = {GPath(asDir) for asDir, _mtime, sDirs, file_stats in
+                     dirDirsFiles if not (sDirs or file_stats)}
         progress(0, _(u'%s: Scanning...') % bass.dirs[u'mods'].stail)
         new_sizeCrcDate, pending, pending_size = \
             self._process_data_dir(dirDirsFiles, progress)
@@ -2069,6 +2875,46 @@ def _refresh_from_data_dir(self, progress=None, recalculate_all_crcs=False):
         #--Done
         return changed
 
+    def _refresh_changed_data_files(self, changes, progress):
+        """Update self.data_sizeCrcDate for the paths (relative to the Data
+        dir) in changes, which may include deleted directories."""
+        if not changes: return False
+        # Skip the same top level directories as a full scan would
+        top_dirs = {p.split(os.sep, 1)[0] for p in changes if os.sep in p}
+        kept_dirs = list(top_dirs)
+        InstallersData._skips_in_data_dir(kept_dirs)
+        skipped_dirs = top_dirs.difference(kept_dirs)
+        dirty = set()
+        for rel_path in changes:
+            if os.sep not in rel_path:
+                dirty.add(rel_path)
+                # (un)ghosting a plugin changes its ghost and its normal name
+                if rel_path[-6:].lower() == u'.ghost':
+                    dirty.add(rel_path[:-6])
+            elif rel_path.split(os.sep, 1)[0] not in skipped_dirs:
+                dirty.add(rel_path)
+        # Directories that exist get their files reported separately, but
+        # the contents of deleted directories are gone too
+        data_dir = bass.dirs[u'mods'].s
+        existing_dirs = {p for p in dirty if
+                         os.path.isdir(os.path.join(data_dir, p))}
+        dirty -= existing_dirs
+        unknown = [p for p in dirty if p not in self.data_sizeCrcDate]
+        if unknown:
+            dir_prefixes = tuple(os.path.join(p, u'').lower() for p in unknown)
+            dirty.update(p for p in self.data_sizeCrcDate if
+                         p.lower().startswith(dir_prefixes))
+        old_sizeCrcDate = {p: self.data_sizeCrcDate.get(p) for p in
+                           dirty | existing_dirs}
+        for d in existing_dirs: # in case a file got replaced by a directory
+            self.data_sizeCrcDate.pop(d, None)
+        progress(0, _(u'%s: Scanning...') % bass.dirs[u'mods'].stail)
+        self.update_data_SizeCrcDate(dirty, progress)
+        self.update_for_overridden_skips(progress=progress)
+        dataGet = self.data_sizeCrcDate.get
+        return any(dataGet(p) != sizeCrcDate for p, sizeCrcDate in
+                   old_sizeCrcDate.iteritems())
+
     def _process_data_dir(self, dirDirsFiles, progress):
         """Construct dictionaries mapping the paths in dirDirsFiles to
         filesystem attributes. Old data_SizeCrcDate is used to decide which
@@ -2080,7 +2926,8 @@ def _process_data_dir(self, dirDirsFiles, progress):
         - the size of pending files used in displaying crc calculation progress
         Compare to similar code in InstallerProject._refresh_from_project_dir
 
-        :param dirDirsFiles: list of tuples in the format of the output of walk
+        :param dirDirsFiles: list of tuples in the format of the output of
+            bolt.scan_tree
         """
         from . import modInfos # to get the crcs for espms
         progress.setFull(1 + len(dirDirsFiles))
@@ -2097,10 +2944,11 @@ def _process_data_dir(self, dirDirsFiles, progress):
             bethFiles = LowerDict.fromkeys(beth_keys)
         skipExts = Installer.skipExts
         relPos = len(bass.dirs[u'mods'].s) + 1
-        for index, (asDir, __sDirs, sFiles) in enumerate(dirDirsFiles):
+        for index, (asDir, __mtime, __sDirs, file_stats) in enumerate(
+                dirDirsFiles):
             progress(index)
             rsDir = asDir[relPos:]
-            for sFile in sFiles:
+            for sFile, size, date in file_stats:
                 top_level_espm = False
                 if not rsDir:
                     rpFile = ghost_norm.get(sFile, sFile)
@@ -2110,27 +2958,20 @@ def _process_data_dir(self, dirDirsFiles, progress):
                     top_level_espm = ext in bush.game.espm_extensions
                 else: rpFile = os.path.join(rsDir, sFile)
                 asFile = os.path.join(asDir, sFile)
-                # below calls may now raise even if "werr.winerror = 123"
-                try:
-                    oSize, oCrc, oDate = oldGet(rpFile, (0, 0, 0.0))
-                    if top_level_espm: # modInfos MUST BE UPDATED
-                        try:
-                            modInfo = modInfos[GPath(rpFile)]
-                            new_sizeCrcDate[rpFile] = (modInfo.size,
-                               modInfo.cached_mod_crc(), modInfo.mtime, asFile)
-                            continue
-                        except KeyError:
-                            pass # corrupted/missing, let os.lstat decide
-                    lstat = os.lstat(asFile)
-                    size, date = lstat.st_size, lstat.st_mtime
-                    if size != oSize or date != oDate:
-                        pending[rpFile] = (size, oCrc, date, asFile)
-                        pending_size += size
-                    else:
-                        new_sizeCrcDate[rpFile] = (oSize, oCrc, oDate, asFile)
-                except OSError as e:
-                    if e.errno == errno.ENOENT: continue # file does not exist
-                    raise
+                oSize, oCrc, oDate = oldGet(rpFile, (0, 0, 0.0))
+                if top_level_espm: # modInfos MUST BE UPDATED
+                    try:
+                        modInfo = modInfos[GPath(rpFile)]
+                        new_sizeCrcDate[rpFile] = (modInfo.size,
+                            modInfo.cached_mod_crc(), modInfo.mtime, asFile)
+                        continue
+                    except KeyError:
+                        pass # corrupted/missing, use the scanned size/date
+                if size != oSize or date != oDate:
+                    pending[rpFile] = (size, oCrc, date, asFile)
+                    pending_size += size
+                else:
+                    new_sizeCrcDate[rpFile] = (oSize, oCrc, oDate, asFile)
         return new_sizeCrcDate, pending, pending_size
 
     def reset_refresh_flag_on_projects(self):
@@ -2188,7 +3029,16 @@ def update_data_SizeCrcDate(self, dest_paths, progress=None):
         root_dirs_files = []
         root_files.sort(key=itemgetter(0)) # must sort on same key as groupby
         for key, val in groupby(root_files, key=itemgetter(0)):
-            root_dirs_files.append((key, [], [j for i, j in val]))
+            file_stats = []
+            for __root, sFile in val:
+                # may raise even if "werr.winerror = 123"
+                try:
+                    lstat = os.lstat(os.path.join(key, sFile))
+                except OSError as e:
+                    if e.errno == errno.ENOENT: continue # file does not exist
+                    raise
+                file_stats.append((sFile, lstat.st_size, lstat.st_mtime))
+            root_dirs_files.append((key, 0.0, [], file_stats))
         progress = progress or bolt.Progress()
         new_sizeCrcDate, pending, pending_size = self._process_data_dir(
             root_dirs_files, progress)
@@ -2373,35 +3223,96 @@ def _install(self, packages, refresh_ui, progress=None, last=False,
             self.moveArchives(packages, len(self))
         to_install = {self[x] for x in packages}
         min_order = min(x.order for x in to_install)
-        #--Install packages in turn
-        progress.setFull(len(packages))
-        index = 0
+        #--Determine the files each package will install
+        install_plan = []
         for installer in self.sorted_values(reverse=True):
             if installer in to_install:
-                progress(index,installer.archive)
                 destFiles = set(installer.ci_dest_sizeCrc) - mask
                 if not override:
                     destFiles &= installer.missingFiles
-                if destFiles:
-                    self._createTweaks(destFiles, installer, tweaksCreated)
-                    self.__installer_install(installer, destFiles, index,
-                                             progress, refresh_ui)
-                index += 1 # increment after it's used in __installer_install
-                installer.is_active = True
+                install_plan.append((installer, destFiles))
                 if installer.order == min_order:
                     break # we are done
             #prevent lower packages from installing any files of this installer
-            if installer.is_active: mask |= set(installer.ci_dest_sizeCrc)
+            if installer in to_install or installer.is_active:
+                mask |= set(installer.ci_dest_sizeCrc)
+        #--Extract the archives ahead of installing them, concurrently - the
+        # installation itself stays sequential, in install order
+        num_workers = bolt._get_max_workers(
+            bass.inisettings[u'ArchiveThreads'])
+        to_extract = []
+        if num_workers > 1:
+            for installer, destFiles in install_plan:
+                if not destFiles or not installer.is_archive(): continue
+                dest_src = installer.dest_sources(destFiles)
+                if dest_src:
+                    to_extract.append((installer, dest_src.values()))
+        if len(to_extract) <= 1: to_extract = [] # nothing to gain
+        extract_root = Path.tempDir() if to_extract else None
+        def _extract(extract_entry):
+            installer, src_files = extract_entry
+            work_dir = extract_root.join(u'%d' % installer.order)
+            work_dir.makedirs()
+            installer.extract_files(src_files, work_dir.join(u'Data'),
+                                    work_dir.join(u'Files.txt'))
+            return work_dir
+        #--Install packages in turn
+        progress.setFull(len(packages))
+        try:
+            with bolt.ParallelMap(_extract, to_extract, num_workers) as \
+                    extractions:
+                extractions = iter(extractions)
+                pre_extracted = {inst for inst, _src_files in to_extract}
+                for index, (installer, destFiles) in enumerate(install_plan):
+                    progress(index, installer.archive)
+                    if destFiles:
+                        self._createTweaks(destFiles, installer,
+                                           tweaksCreated)
+                        work_dir = None
+                        if installer in pre_extracted:
+                            work_dir = next(extractions)[1]
+                        self.__installer_install(installer, destFiles, index,
+                            progress, refresh_ui,
+                            work_dir and work_dir.join(u'Data'))
+                        if work_dir: work_dir.rmtree(safety=extract_root.stail)
+                    installer.is_active = True
+        finally:
+            if extract_root is not None:
+                extract_root.rmtree(safety=extract_root.stail)
         if tweaksCreated:
             self._editTweaks(tweaksCreated)
             refresh_ui[1] |= bool(tweaksCreated)
         return tweaksCreated
 
+    def _hardlinked_data_files(self):
+        """Return a LowerDict mapping the files in the Data dir that are hard
+        linked to files in projects to the projects."""
+        hardlinked = bolt.LowerDict()
+        for installer in self.itervalues():
+            for rel_path in installer.extras_dict.get(u'hardlinked_files', ()):
+                hardlinked[rel_path] = installer
+        return hardlinked
+
+    def _unlink_data_files(self, destFiles):
+        """Remove those of destFiles that are hard linked to projects, so
+        that overwriting them does not overwrite the files in the projects."""
+        data_dir_join = bass.dirs[u'mods'].join
+        norm_ghost_get = Installer.getGhosted().get
+        for owner in self.itervalues():
+            owner_links = owner.extras_dict.get(u'hardlinked_files')
+            if not owner_links: continue
+            for dest in destFiles:
+                if dest not in owner_links: continue
+                data_dir_join(norm_ghost_get(dest, dest)).remove()
+                del owner_links[dest]
+            if not owner_links: del owner.extras_dict[u'hardlinked_files']
+
     def __installer_install(self, installer, destFiles, index, progress,
-                            refresh_ui):
+                            refresh_ui, unpack_dir=None):
         sub_progress = SubProgress(progress, index, index + 1)
+        self._unlink_data_files(destFiles)
         data_sizeCrcDate_update, mods, inis, bsas = installer.install(
-            destFiles, sub_progress)
+            destFiles, sub_progress, unpack_dir)
         refresh_ui[0] |= bool(mods)
         refresh_ui[1] |= bool(inis)
         # refresh modInfos, iniInfos adding new/modified mods
@@ -2540,6 +3451,8 @@ def _removeFiles(self, removes, refresh_ui, progress=None):
             data_sizeCrcDatePop = self.data_sizeCrcDate.pop
             for ci_relPath in removes:
                 data_sizeCrcDatePop(ci_relPath, None)
+            for installer in self.itervalues():
+                installer.drop_hardlinks(removes)
 
     def __restore(self, installer, removes, restores, cede_ownership):
         """Populate restores dict with files to be restored by this
@@ -2548,7 +3461,7 @@ def __restore(self, installer, removes, restores, cede_ownership):
         mod or ini is not restored (restore takes care of that).
 
         Returns all of the files this installer would install. Used by
-        'bain_uninstall' and 'bain_anneal'."""
+        'bain_uninstall' - 'bain_anneal' uses the dest index instead."""
         # get all destination files for this installer
         files = set(installer.ci_dest_sizeCrc)
         # keep those to be removed while not restored by a higher order package
@@ -2654,14 +3567,20 @@ def bain_anneal(self, anPackages, refresh_ui, progress=None):
                 removes |= installer.missingFiles # re-added in __restore
                 removes |= set(installer.dirty_sizeCrc)
             installer.dirty_sizeCrc.clear()
-        #--March through packages in reverse order...
+        #--The highest order active package that has a file may restore it
         restores = bolt.LowerDict()
         cede_ownership = collections.defaultdict(set)
-        for installer in self.sorted_values(reverse=True):
-            #--Other active package. May provide a restore file.
-            #  And/or may block later uninstalls.
-            if installer.is_active:
-                self.__restore(installer, removes, restores, cede_ownership)
+        dest_index = self.get_dest_index()
+        data_get = self.data_sizeCrcDate.get
+        for dest_file in list(removes):
+            winner = dest_index.get_winner(dest_file)
+            if winner is None: continue
+            if winner.ci_dest_sizeCrc[dest_file] != data_get(dest_file,
+                                                             (0, 0, 0))[:2]:
+                restores[dest_file] = GPath(winner.archive)
+            else:
+                cede_ownership[winner.archive].add(dest_file)
+            removes.discard(dest_file) # don't remove it anyway
         self._remove_restore(removes, restores, refresh_ui, cede_ownership,
                              progress)
 
@@ -2727,6 +3646,9 @@ def clean_data_dir(self, removes,  refresh_ui):
             for emptyDir in emptyDirs:
                 if emptyDir.isdir() and not emptyDir.list():
                     emptyDir.removedirs()
+            moved = [f for f in removes if f not in self.data_sizeCrcDate]
+            for installer in self.itervalues():
+                installer.drop_hardlinks(moved)
         finally:
             self.irefresh(what=u'NS')
 
@@ -2736,8 +3658,9 @@ def _filter_installer_bsas(inst, active_bsas):
         return [k for k in active_bsas if k.name.s in inst.ci_dest_sizeCrc]
 
     @staticmethod
-    def _parse_error(bsa_inf, reason):
-        deprint(u'Error parsing %s [%s]' % (bsa_inf, reason), traceback=True)
+    def _parse_error(bsa_inf, reason, traceback=True):
+        deprint(u'Error parsing %s [%s]' % (bsa_inf, reason),
+                traceback=traceback)
 
     ##: Maybe cache the result? Can take a bit of time to calculate
     def find_conflicts(self, src_installer, active_bsas=None, bsa_cause=None,
@@ -2779,15 +3702,19 @@ def find_conflicts(self, src_installer, active_bsas=None, bsa_cause=None,
             # Calculate all conflicts and save them in lower_bsa and higher_bsa
             asset_to_bsa, src_assets = self.find_src_assets(src_installer,
                                                             active_bsas)
+            # Only look at the active BSAs sharing assets with src_installer
+            from . import bsaInfos
+            asset_index, failed_bsas = bsaInfos.get_asset_index(active_bsas)
+            sharing = asset_index.get_sharing(src_assets, active_bsas)
+            failed_bsas = set(failed_bsas)
             remaining_bsas = copy.copy(active_bsas)
             def _process_bsa_conflicts(b_inf, b_source):
-                try: # conflicting assets from this installer active bsas
-                    curConflicts = b_inf.assets & src_assets
-                except BSAError:
-                    self._parse_error(b_inf, b_source)
-                    return
                 # We've used this BSA for a conflict, don't use it again
                 del remaining_bsas[b_inf]
+                if b_inf in failed_bsas: # the index logged the traceback
+                    self._parse_error(b_inf, b_source, traceback=False)
+                    return
+                curConflicts = sharing.get(b_inf)
                 if curConflicts:
                     lower_result, higher_result = set(), set()
                     add_to_lower = lower_result.add
@@ -2826,21 +3753,24 @@ def _sort_bsa_conflicts(bsa_conflict):
                 return active_bsas[bsa_conflict[1]]
             lower_bsa.sort(key=_sort_bsa_conflicts)
             higher_bsa.sort(key=_sort_bsa_conflicts)
-        # Calculate loose conflicts
+        # Calculate loose conflicts - only look at the installers sharing
+        # files with src_installer
         lower_loose, higher_loose = [], []
-        for package, installer in self.sorted_pairs():
+        sharing = self.get_dest_index().get_sharing(src_installer, mismatched)
+        for installer in sorted(sharing, key=attrgetter(u'order')):
             if installer.order == srcOrder or not (
                         showInactive or installer.is_active): continue
             if not showLower and installer.order < srcOrder: continue
-            curConflicts = bolt.sortFiles(
-                [x for x, y in installer.ci_dest_sizeCrc.iteritems()
-                if x in mismatched and y != src_sizeCrc[x]])
+            inst_sizeCrc = installer.ci_dest_sizeCrc
+            curConflicts = bolt.sortFiles([x for x in sharing[installer]
+                                           if inst_sizeCrc[x] != src_sizeCrc[x]])
             if curConflicts:
                 if installer.order < srcOrder:
                     conflict_type = lower_loose
                 else:
                     conflict_type = higher_loose
-                conflict_type.append((installer, package.s, curConflicts))
+                conflict_type.append((installer, installer.archive,
+                                      curConflicts))
         return lower_loose, higher_loose, lower_bsa, higher_bsa
 
     def find_src_assets(self, src_installer, active_bsas):
@@ -2865,6 +3795,8 @@ def find_src_assets(self, src_installer, active_bsas):
                 for b_asset in b_assets:
                     asset_to_bsa[b_asset] = b
                 src_assets |= b_assets
+        from . import bsa_assets_cache
+        if bsa_assets_cache: bsa_assets_cache.save()
         return asset_to_bsa, src_assets
 
     _ini_origin = re.compile(r'(\w+\.ini) \((\w+)\)', re.I | re.U)
@@ -2943,6 +3875,244 @@ def _print_loose_conflicts(conflicts, title=_(u'Lower')):
             report = _(u'No Underrides. Mod is not completely un-installed.')
         return report
 
+    #--Textures
+    @staticmethod
+    def _textures_stats(source, textures):
+        """Return a list of (texture path, stats) for the specified (texture
+        path, DDSFile) tuples, where the stats are the width, height, number
+        of mipmaps, number of missing mipmaps, format name, whether the format
+        is compressed and the video memory the texture takes up. Textures in
+        formats we don't know are skipped with a warning in the log."""
+        textures_stats = []
+        for tex_path, dds_file in textures:
+            dds_header = dds_file.dds_header
+            try:
+                dxgi_format = dds_file.get_dxgi_format()
+                tex_vram = dds_file.get_vram_size()
+            except DDSError as e:
+                deprint(u'%s: %s: %s' % (source, tex_path, e))
+                continue
+            textures_stats.append((tex_path, (
+                dds_header.dw_width, dds_header.dw_height,
+                max(dds_header.dw_mip_map_count, 1),
+                dds_file.get_missing_mips(), dxgi_format.fmt_name[12:],
+                dxgi_format.fmt_compressed, tex_vram)))
+        return textures_stats
+
+    @staticmethod
+    def _parse_texture_heads(source, tex_heads):
+        """Return a list of (texture path, DDSFile) tuples for the specified
+        (texture path, first bytes of the texture) tuples, with the headers of
+        the DDSFiles loaded from those bytes."""
+        textures = []
+        for tex_path, tex_head in tex_heads:
+            dds_file = DDSFile(u'')
+            try:
+                dds_file.load_headers(io.BytesIO(tex_head))
+            except (DDSError, struct_error) as e:
+                deprint(u'%s: Failed to read the header of %s: %r' % (
+                    source, tex_path, e))
+                continue
+            textures.append((tex_path, dds_file))
+        return textures
+
+    @staticmethod
+    def _read_texture_heads(src_dir, dest_src):
+        """Return a list of (destination path, first bytes of the texture)
+        tuples for the textures at the specified source paths in src_dir."""
+        tex_heads = []
+        for dest, src in dest_src:
+            try:
+                with open(src_dir.join(src).s, u'rb') as ins:
+                    tex_heads.append((dest, ins.read(
+                        DDSFile.headers_max_size)))
+            except EnvironmentError as e:
+                deprint(u'Failed to read %s: %r' % (src_dir.join(src), e))
+        return tex_heads
+
+    def scan_textures(self, modInfos, progress, include_inactive=True,
+                      __chunk_size=256):
+        """Scan the headers of the textures the game will load - the .dds
+        files in the Data folder and in the active BSAs, minus the ones a
+        loose file or a later BSA overrides - and, if include_inactive, of
+        the textures in inactive packages. Only the headers of the textures
+        are read, so no texture data is extracted or decompressed - 7z
+        archives are skipped for that reason, as they would have to be
+        extracted first. The loose files, BSAs and packages are read
+        concurrently, using up to ArchiveThreads threads.
+
+        :param modInfos: bosh.modInfos, to get the active BSAs from.
+        :return: A tuple of a list of (source, BSA name, texture path, stats)
+            for the textures the game will load and a list of (package,
+            texture path, stats) for the inactive ones, see _textures_stats
+            for the stats - the source is the active package that installed
+            the texture or BSA (None if there is none) and the BSA name is
+            None for loose textures. The third item is a list of the inactive
+            packages that were skipped."""
+        progress = progress or bolt.Progress()
+        dds_ext = u'.dds'
+        jobs = [] # (kind, source, job) - kind is 0: BSA, 1: loose, 2: package
+        active_bsas, _bsa_cause = modInfos.get_active_bsas()
+        for bsa_inf in sorted(active_bsas, key=active_bsas.__getitem__):
+            def _scan_bsa(b=bsa_inf):
+                try:
+                    return self._textures_stats(b, b.load_texture_headers())
+                except (BSAError, OverflowError):
+                    self._parse_error(b, u'load_texture_headers')
+                    return []
+            jobs.append((0, bsa_inf, _scan_bsa))
+        mods_dir = bass.dirs[u'mods']
+        loose = sorted(p for p in self.data_sizeCrcDate if
+                       p[-4:].lower() == dds_ext)
+        for i in xrange(0, len(loose), __chunk_size):
+            def _scan_loose(chunk=[(p, p) for p in loose[i:i + __chunk_size]]):
+                return self._textures_stats(mods_dir,
+                    self._parse_texture_heads(mods_dir,
+                        self._read_texture_heads(mods_dir, chunk)))
+            jobs.append((1, None, _scan_loose))
+        skipped = []
+        if include_inactive:
+            installers_dir = bass.dirs[u'installers']
+            for installer in self.sorted_values():
+                if installer.is_active or installer.is_marker(): continue
+                tex_dests = [d for d in installer.ci_dest_sizeCrc if
+                             d[-4:].lower() == dds_ext]
+                if not tex_dests: continue
+                package = installer.archive
+                dest_src = installer.dest_sources(tex_dests).items()
+                if installer.is_project():
+                    def _scan_project(package=package, dest_src=dest_src):
+                        return self._textures_stats(package,
+                            self._parse_texture_heads(package,
+                                self._read_texture_heads(
+                                    installers_dir.join(package), dest_src)))
+                    jobs.append((2, package, _scan_project))
+                elif is_native_zip(installers_dir.join(package)):
+                    def _scan_zip(package=package, dest_src=dest_src):
+                        src_dest = {os.path.normpath(s).lower(): d for d, s
+                                    in dest_src}
+                        try:
+                            src_heads = archives.read_zip_heads(
+                                installers_dir.join(package), src_dest,
+                                DDSFile.headers_max_size)
+                        except StateError as e:
+                            deprint(u'%s' % e)
+                            return None
+                        if src_heads is None: return None
+                        return self._textures_stats(package,
+                            self._parse_texture_heads(package, [
+                                (src_dest[s.lower()], h) for s, h in
+                                src_heads.iteritems()]))
+                    jobs.append((2, package, _scan_zip))
+                else:
+                    skipped.append(package)
+        #--Read the headers, overriding textures in (BSA and then loose)
+        # load order
+        dest_index = self.get_dest_index()
+        def _active_owner(dest):
+            owners = [i for i in dest_index.get_owners(dest) if i.is_active]
+            return owners[-1].archive if owners else None
+        loaded = LowerDict() # texture path -> (source, BSA name, stats)
+        inactive_textures = []
+        progress.setFull(max(len(jobs), 1))
+        num_workers = bolt._get_max_workers(
+            bass.inisettings[u'ArchiveThreads'])
+        with bolt.ParallelMap(lambda job: job[2](), jobs, num_workers) as \
+                scanned:
+            for index, ((kind, source, _job), textures) in enumerate(scanned):
+                progress(index, _(u'Scanning Textures...') + u'\n%s' % (
+                    source or mods_dir.stail))
+                if kind == 0:
+                    bsa_owner = _active_owner(source.name.s)
+                    for tex_path, tex_stats in textures:
+                        loaded[tex_path] = (bsa_owner, source.name.s,
+                                            tex_stats)
+                elif kind == 1:
+                    for tex_path, tex_stats in textures:
+                        loaded[tex_path] = (_active_owner(tex_path), None,
+                                            tex_stats)
+                elif textures is None:
+                    skipped.append(source)
+                else:
+                    inactive_textures.extend((source, tex_path, tex_stats) for
+                                             tex_path, tex_stats in textures)
+        loaded_textures = [(tex_source, tex_bsa, tex_path, tex_stats) for
+                           tex_path, (tex_source, tex_bsa, tex_stats) in
+                           loaded.iteritems()]
+        return loaded_textures, inactive_textures, sorted(skipped)
+
+    _texture_sort_keys = {
+        u'vram': lambda t: (-t[3][6], t[2].lower()),
+        u'dimensions': lambda t: (-t[3][0] * t[3][1], t[2].lower()),
+        u'path': lambda t: t[2].lower(),
+    }
+    def get_texture_report(self, modInfos, progress, sort_by=u'vram',
+                           include_inactive=True, __max_listed=100):
+        """Return a report of the video memory the textures the game will load
+        take up, per source and for the heaviest textures, flagging the
+        uncompressed ones and the ones missing mipmaps. See scan_textures.
+
+        :param sort_by: How to sort the listed textures, one of 'vram',
+            'dimensions' and 'path'."""
+        loaded, inactive, skipped = self.scan_textures(modInfos, progress,
+                                                       include_inactive)
+        def _totals(textures, get_source):
+            # source -> [vram, count, uncompressed, missing mipmaps]
+            totals = collections.defaultdict(lambda: [0, 0, 0, 0])
+            for tex in textures:
+                tex_stats = tex[-1]
+                source_totals = totals[get_source(tex)]
+                source_totals[0] += tex_stats[6]
+                source_totals[1] += 1
+                source_totals[2] += not tex_stats[5]
+                source_totals[3] += bool(tex_stats[3])
+            return sorted(totals.iteritems(), key=lambda x: (-x[1][0],
+                                                            u'%s' % x[0]))
+        def _log_totals(textures, get_source):
+            for source, (vram, count, uncompressed, no_mips) in _totals(
+                    textures, get_source):
+                log(u'* %s: %s - %s' % (source, round_size(vram), _(
+                    u'%(count)u textures, %(uncompressed)u uncompressed, '
+                    u'%(no_mips)u missing mipmaps') % {
+                    u'count': count, u'uncompressed': uncompressed,
+                    u'no_mips': no_mips}))
+        unmanaged = _(u'Unmanaged')
+        log = bolt.LogFile(io.StringIO())
+        log.setHeader(u'= ' + _(u'Texture Memory'))
+        log(_(u'%(count)u textures will be loaded, taking up %(vram)s of '
+              u'video memory.') % {u'count': len(loaded),
+            u'vram': round_size(sum(t[3][6] for t in loaded))})
+        log.setHeader(u'== ' + _(u'Per Source'))
+        def _loaded_source(tex):
+            tex_source, tex_bsa = tex[:2]
+            if tex_source is None: # a BSA we don't manage is its own source
+                return tex_bsa or unmanaged
+            return u'%s (%s)' % (tex_source, tex_bsa) if tex_bsa else \
+                u'%s' % tex_source
+        _log_totals(loaded, _loaded_source)
+        log.setHeader(u'== ' + _(u'Heaviest Textures'))
+        heaviest = sorted(loaded, key=self._texture_sort_keys[u'vram'])[
+                   :__max_listed]
+        for tex_source, tex_bsa, tex_path, (width, height, mips, no_mips,
+                fmt_name, compressed, vram) in sorted(
+                heaviest, key=self._texture_sort_keys[sort_by]):
+            log(u'* %s%s: %s - %ux%u %s, %u %s%s%s' % (
+                tex_path, u' (%s)' % tex_bsa if tex_bsa else u'',
+                round_size(vram), width, height, fmt_name, mips,
+                _(u'mipmaps'),
+                u'' if compressed else u', ' + _(u'uncompressed'),
+                u', ' + _(u'%u missing') % no_mips if no_mips else u''))
+        if inactive:
+            log.setHeader(u'== ' + _(u'Inactive Packages'))
+            _log_totals(inactive, itemgetter(0))
+        if skipped:
+            log.setHeader(u'== ' + _(u'Skipped Packages'))
+            log(_(u'The textures in these packages can only be read by '
+                  u'extracting them:'))
+            for package in skipped:
+                log(u'* %s' % package)
+        return log.out.getvalue()
+
     def getPackageList(self,showInactive=True):
         """Returns package list as text."""
         #--Setup
@@ -32,6 +32,8 @@
 
 import collections
 import errno
+import io
+import mmap
 import os
 import zlib
 from functools import partial
@@ -42,12 +44,13 @@
 import lz4.frame
 
 from .dds_files import DDSFile, mk_dxgi_fmt
+from .. import bass
 from ..bolt import deprint, Progress, struct_unpack, unpack_byte, \
-    unpack_string, unpack_int, Flags, AFile, structs_cache, struct_calcsize, \
-    struct_error
+    unpack_string, Flags, AFile, structs_cache, struct_calcsize, \
+    struct_error, Path, ParallelMap, PickleCache
 from ..exception import AbstractError, BSAError, BSADecodingError, \
     BSAFlagError, BSACompressionError, BSADecompressionError, \
-    BSADecompressionSizeError
+    BSADecompressionSizeError, DDSError
 
 _bsa_encoding = u'cp1252' #rumor has it that's the files/folders names encoding
 path_sep = u'\\'
@@ -77,11 +80,44 @@ def decompress_rec(compressed_data, decompressed_size, bsa_name):
         error. Returns the resulting decompressed data."""
         raise AbstractError()
 
+    @classmethod
+    def decompress_rec_prefix(cls, bsa_map, data_offset, data_size,
+                              prefix_size, bsa_name):
+        """Decompresses only (up to) the first prefix_size bytes of the
+        specified record data, which is read from the specified memory map
+        a block at a time, so that large records are not read in full. Raises
+        a BSAError if the underlying compression library raises an error."""
+        decompress = cls._new_decompressor()
+        prefix = b''
+        data_end = data_offset + data_size
+        try:
+            while len(prefix) < prefix_size and data_offset < data_end:
+                block_end = min(data_offset + 0x10000, data_end)
+                prefix += decompress(bsa_map[data_offset:block_end],
+                                     prefix_size - len(prefix))
+                data_offset = block_end
+        except cls._lib_errors as e:
+            raise BSADecompressionError(bsa_name, cls._lib_name, e)
+        return prefix
+
+    @staticmethod
+    def _new_decompressor():
+        """Returns the decompress method of a new streaming decompressor,
+        which takes the compressed data and a maximum output size."""
+        raise AbstractError()
+
 # Note that I mirrored BSArch here by simply leaving zlib and lz4 at their
 # defaults for compression
 class _Bsa_zlib(_BsaCompressionType):
     """Implements BSA record compression and decompression using zlib. Used for
     all games but SSE."""
+    _lib_name = u'zlib'
+    _lib_errors = zlib.error
+
+    @staticmethod
+    def _new_decompressor():
+        return zlib.decompressobj().decompress
+
     @staticmethod
     def compress_rec(decompressed_data, bsa_name):
         try:
@@ -103,6 +139,13 @@ def decompress_rec(compressed_data, decompressed_size, bsa_name):
 class _Bsa_lz4(_BsaCompressionType):
     """Implements BSA record compression and decompression using lz4. Used
     only for SSE."""
+    _lib_name = u'LZ4'
+    _lib_errors = RuntimeError # No custom lz4 exception for frames...
+
+    @staticmethod
+    def _new_decompressor():
+        return lz4.frame.LZ4FrameDecompressor().decompress
+
     @staticmethod
     def compress_rec(decompressed_data, bsa_name):
         try:
@@ -178,6 +221,80 @@ def _hash_ba2_string(ba2_string):
         ret = (ret >> 8) ^ _BA2_CRC_TABLE[(ret ^ ord(c)) & 0xFF]
     return ret
 
+# A dictionary mapping file extensions to hash components. Used by Oblivion
+# through Skyrim SE when hashing file names for their BSAs.
+_bsa_ext_lookup = collections.defaultdict(int)
+for _ext, _hash_part in [(u'.kf', 0x80), (u'.nif', 0x8000),
+                         (u'.dds', 0x8080), (u'.wav', 0x80000000)]:
+    _bsa_ext_lookup[_ext] = _hash_part
+del _ext, _hash_part
+
+def _hash_bsa_string(name_root, name_ext=u''):
+    """Calculates the hash used by Oblivion through Skyrim SE BSAs for the
+    provided lowercase file name (split into root and extension) or folder
+    path (no extension). The root must not be empty.
+    Based on Timeslips code with cleanup and pythonization.
+
+    See here for more information:
+    https://en.uesp.net/wiki/Tes4Mod:Hash_Calculation"""
+    chars = map(ord, name_root)
+    hash_part_1 = chars[-1] | ((len(chars) > 2 and chars[-2]) or 0) << 8 \
+                  | len(chars) << 16 | chars[0] << 24
+    hash_part_1 |= _bsa_ext_lookup[name_ext]
+    uint_mask, hash_part_2, hash_part_3 = 0xFFFFFFFF, 0, 0
+    for char in chars[1:-2]:
+        hash_part_2 = ((hash_part_2 * 0x1003F) + char) & uint_mask
+    for char in map(ord, name_ext):
+        hash_part_3 = ((hash_part_3 * 0x1003F) + char) & uint_mask
+    hash_part_2 = (hash_part_2 + hash_part_3) & uint_mask
+    return (hash_part_2 << 32) + hash_part_1
+
+def _split_asset_path(asset_path):
+    """Split the specified Path into its lowercase BSA path (using
+    backslashes), folder path, file root and file extension. Return None if
+    the path can't be hashed reliably - i.e. it's in the root folder or it
+    contains non-ASCII characters, which the games lowercase differently than
+    we do."""
+    bsa_path = asset_path.cs.replace(os.sep, path_sep)
+    try:
+        bsa_path.encode(u'ascii')
+    except UnicodeEncodeError:
+        return None
+    folder_path, _sep, file_name = bsa_path.rpartition(path_sep)
+    file_root, file_ext = os.path.splitext(file_name)
+    if not folder_path or not file_root: return None
+    return bsa_path, folder_path, file_root, file_ext
+
+def _hash_tes3_string(file_name):
+    """Calculates the hash used by Morrowind BSAs for the provided lowercase
+    file path, returning its two 32 bit halves. See here for more information:
+    https://en.uesp.net/wiki/Tes3Mod:BSA_File_Format"""
+    uint_mask = 0xFFFFFFFF
+    half_len = len(file_name) >> 1
+    hash_part_1 = hash_part_2 = shift = 0
+    for c in file_name[:half_len]:
+        hash_part_1 ^= (ord(c) << (shift & 0x1F)) & uint_mask
+        shift += 8
+    shift = 0
+    for c in file_name[half_len:]:
+        shifted = (ord(c) << (shift & 0x1F)) & uint_mask
+        hash_part_2 ^= shifted
+        rotate_by = shifted & 0x1F # rotate right by that many bits
+        hash_part_2 = ((hash_part_2 << (32 - rotate_by)) |
+                       (hash_part_2 >> rotate_by)) & uint_mask
+        shift += 8
+    return hash_part_1, hash_part_2
+
+def _encode_path(asset_path, bsa_name):
+    try:
+        return asset_path.encode(_bsa_encoding)
+    except UnicodeEncodeError:
+        raise BSAError(bsa_name, u'Path %r can not be encoded as %s' % (
+            asset_path, _bsa_encoding))
+
+# Files that the games stream, so they must not be compressed when packing
+_uncompressed_exts = {u'.fuz', u'.mp3', u'.ogg', u'.wav', u'.xwm'}
+
 # Headers ---------------------------------------------------------------------
 class _Header(object):
     __slots__ = (u'file_id', u'version')
@@ -270,20 +387,20 @@ def embed_filenames(self): return False
 # Records ---------------------------------------------------------------------
 class _HashedRecord(object):
     __slots__ = (u'record_hash',)
-    formats = [(u'Q', struct_calcsize(u'Q'))]
+    _hash_format = (u'Q', struct_calcsize(u'Q'))
 
     def load_record(self, ins):
-        f, f_size = _HashedRecord.formats[0]
+        f, f_size = self.__class__._hash_format
         self.record_hash, = struct_unpack(f, ins.read(f_size))
 
     def load_record_from_buffer(self, memview, start):
-        f, f_size = _HashedRecord.formats[0]
+        f, f_size = self.__class__._hash_format
         self.record_hash, = _unpack_from(f, memview, start)
         return start + f_size
 
     @classmethod
     def total_record_size(cls):
-        return _HashedRecord.formats[0][1]
+        return cls._hash_format[1]
 
     def __eq__(self, other):
         if isinstance(other, self.__class__):
@@ -330,10 +447,20 @@ class BSAFolderRecord(_BsaHashedRecord):
     __slots__ = (u'files_count', u'file_records_offset')
     formats = [(f, struct_calcsize(f)) for f in (u'I', u'I')]
 
+    @staticmethod
+    def dump_folder_record(folder_hash, files_count, file_records_offset,
+                           __pack=structs_cache[u'=Q2I'].pack):
+        return __pack(folder_hash, files_count, file_records_offset)
+
 class BSASkyrimSEFolderRecord(_BsaHashedRecord):
     __slots__ = (u'files_count', u'unknown_int', u'file_records_offset')
     formats = [(f, struct_calcsize(f)) for f in (u'I', u'I', u'Q')]
 
+    @staticmethod
+    def dump_folder_record(folder_hash, files_count, file_records_offset,
+                           __pack=structs_cache[u'=Q2IQ'].pack):
+        return __pack(folder_hash, files_count, 0, file_records_offset)
+
 class BSAFileRecord(_BsaHashedRecord):
     __slots__ = (u'file_size_flags', u'raw_file_data_offset')
     formats = [(f, struct_calcsize(f)) for f in (u'I', u'I')]
@@ -415,6 +542,7 @@ class Ba2FileRecordGeneral(_BsaHashedRecord):
     # unused1 is always BAADF00D
     __slots__ = (u'file_extension', u'dir_hash', u'unknown1', u'offset',
                  u'packed_size', u'unpacked_size', u'unused1')
+    _hash_format = (u'I', struct_calcsize(u'I')) # BA2 hashes are 32 bit
     formats = [(f, struct_calcsize(f)) for f in (u'4s', u'I', u'I', u'Q', u'I',
                                                  u'I', u'I')]
 
@@ -424,6 +552,7 @@ class Ba2FileRecordTexture(_BsaHashedRecord):
     __slots__ = (u'file_extension', u'dir_hash', u'unknown_tex',
                  u'num_chunks', u'chunk_header_size', u'height', u'width',
                  u'num_mips', u'dxgi_format', u'cube_maps', u'tex_chunks')
+    _hash_format = (u'I', struct_calcsize(u'I')) # BA2 hashes are 32 bit
     formats = [(f, struct_calcsize(f)) for f in (u'4s', u'I', u'B', u'B', u'H',
                                                  u'H', u'H', u'B', u'B', u'H')]
 
@@ -473,11 +602,55 @@ def _makedirs_exists_ok(target_dir):
         if e.errno != errno.EEXIST:
             raise
 
+class BsaAssetsCache(PickleCache):
+    """Persistent cache of the asset paths in BSAs/BA2s, so that an archive
+    needs to be parsed only once, instead of every time its assets are
+    needed. Entries are keyed by the normalized absolute paths of the archives
+    and are only valid while the size and modification time of the archive
+    stay the same."""
+    _max_stale_entries = 100
+
+    @staticmethod
+    def _norm_key(bsa_path):
+        return os.path.normcase(os.path.abspath(Path.getNorm(bsa_path)))
+
+    def _drop_stale(self):
+        # Forget about archives that are gone
+        for norm_key in [k for k in self._entries if not os.path.isfile(k)]:
+            del self._entries[norm_key]
+
+    def get_assets(self, bsa_path, __stat=os.stat):
+        """Return the cached lowercase asset paths of the specified archive,
+        or None if they are not cached or the archive changed since."""
+        try:
+            st = __stat(Path.getNorm(bsa_path))
+        except OSError:
+            return None
+        entry = self._get_entries().get(self._norm_key(bsa_path))
+        if entry is not None and entry[:2] == (st.st_size, st.st_mtime):
+            return entry[2]
+        return None
+
+    def set_assets(self, bsa_path, bsa_assets, __stat=os.stat):
+        """Cache the lowercase asset paths of the specified archive, which
+        must be up to date. Call save once done with a batch of archives."""
+        try:
+            st = __stat(Path.getNorm(bsa_path))
+        except OSError:
+            return
+        self._set_entry(self._norm_key(bsa_path), (
+            st.st_size, st.st_mtime, tuple(sorted(bsa_assets))))
+
 class ABsa(AFile):
     """:type bsa_folders: collections.OrderedDict[unicode, BSAFolder]"""
     _header_type = BsaHeader
     _assets = frozenset()
     _compression_type = _Bsa_zlib # type: _BsaCompressionType
+    # True if this type of BSA stores hashes we can use for lookups - see
+    # has_assets
+    _hashed_lookups = False
+    _asset_hashes = None
+    _table_buffer = None # see load_stream_assets
 
     def __init__(self, fullpath, load_cache=False, names_only=True):
         super(ABsa, self).__init__(fullpath)
@@ -498,6 +671,40 @@ def inspect_version(self):
                                               u'%r' % e)
             return self.bsa_header.version
 
+    def _open_bsa(self):
+        """Open this BSA for reading its file table, see load_stream_assets."""
+        if self._table_buffer is not None:
+            return io.BytesIO(self._table_buffer)
+        return open(u'%s' % self.abs_path, u'rb') # accept string or Path
+
+    @classmethod
+    def _read_table(cls, ins, bsa_name):
+        """Read the header and the file table of a BSA of this type from the
+        stream ins, positioned at the start of the BSA. Return them as bytes
+        that parse like the start of the BSA, reading no further into ins than
+        needed."""
+        raise AbstractError()
+
+    @classmethod
+    def load_stream_assets(cls, ins, bsa_path):
+        """Return the assets (see assets) of a BSA of this type, read from the
+        stream ins instead of from a file - e.g. for a BSA inside a package
+        archive, so that the archive does not have to be extracted. Only the
+        file table of the BSA is read.
+
+        :param bsa_path: The path of the BSA, used in error messages."""
+        from ..env import convert_separators
+        stream_bsa = cls(bsa_path)
+        try:
+            stream_bsa._table_buffer = cls._read_table(ins,
+                                                       stream_bsa.bsa_name)
+        except struct_error as e:
+            raise BSAError(stream_bsa.bsa_name,
+                           u'Error while unpacking header: %r' % e)
+        stream_bsa.__load(names_only=True)
+        return frozenset(convert_separators(f.lower()) for f in
+                         stream_bsa._filenames)
+
     def __load(self, names_only):
         try:
             if not names_only:
@@ -539,50 +746,143 @@ def extract_assets(self, asset_paths, dest_folder, progress=None):
         folder_to_assets = self._map_assets_to_folders(folder_files_dict)
         # unload the bsa
         self.bsa_folders.clear()
-        # get the data from the file
-        global_compression = self.bsa_header.is_compressed()
-        i = 0
+        self._extract_records(folder_to_assets, dest_folder,
+                              self._read_record_data, progress)
+
+    def _locate_record_data(self, bsa_map, record):
+        """Return the offset and size of the data of the specified file
+        record in the specified memory map of this BSA, past any embedded
+        file name, and its uncompressed size if it is compressed (else
+        None)."""
+        data_offset = record.raw_file_data_offset
+        data_size = record.raw_data_size()
+        if self.bsa_header.embed_filenames(): # use len(filename) ?
+            filename_len = ord(bsa_map[data_offset])
+            data_offset += filename_len + 1 # discard filename
+            data_size -= filename_len + 1
+        if self.bsa_header.is_compressed() != bool(
+                record.compression_toggle()):
+            # This is a compressed record, its size comes first
+            uncompressed_size, = _unpack_from(u'I', bsa_map, data_offset)
+            return data_offset + 4, data_size - 4, uncompressed_size
+        return data_offset, data_size, None
+
+    def _read_record_data(self, bsa_map, record):
+        """Return the (decompressed) data of the specified file record, read
+        from the specified memory map of this BSA. Called from the threads
+        of _extract_records, so it must not change the state of this BSA."""
+        data_offset, data_size, uncompressed_size = self._locate_record_data(
+            bsa_map, record)
+        if uncompressed_size is not None:
+            # This is a compressed record, so decompress it
+            try:
+                return self._compression_type.decompress_rec(
+                    bsa_map[data_offset:data_offset + data_size],
+                    uncompressed_size, self.bsa_name)
+            except BSAError:
+                # Ignore errors for Fallout - Misc.bsa - Bethesda probably
+                # used an old buggy zlib version when packing it (taken from
+                # BSArch sources)
+                if self.bsa_name == u'Fallout - Misc.bsa':
+                    return None
+                raise
+        # This is an uncompressed record, just read it
+        return bsa_map[data_offset:data_offset + data_size]
+
+    def _load_texture_header(self, bsa_map, record, dds_file):
+        """Load the headers of the texture in the specified file record into
+        dds_file, decompressing no more of it than needed for that."""
+        data_offset, data_size, uncompressed_size = self._locate_record_data(
+            bsa_map, record)
+        if uncompressed_size is not None:
+            dds_headers = self._compression_type.decompress_rec_prefix(
+                bsa_map, data_offset, data_size, DDSFile.headers_max_size,
+                self.bsa_name)
+        else:
+            dds_headers = bsa_map[data_offset:data_offset + min(
+                data_size, DDSFile.headers_max_size)]
+        dds_file.load_headers(io.BytesIO(dds_headers))
+
+    def _texture_records(self):
+        """Yield the paths (with the original case and the platform's path
+        separators) and the file records of the textures in this BSA - it
+        must have been loaded via _load_bsa."""
+        from ..env import convert_separators
+        for folder_path, bsa_folder in self.bsa_folders.iteritems():
+            for file_name, record in bsa_folder.folder_assets.iteritems():
+                if file_name[-4:].lower() == u'.dds':
+                    yield convert_separators(
+                        folder_path + path_sep + file_name), record
+
+    def load_texture_headers(self):
+        """Return a list of (asset path, DDSFile) tuples for the textures in
+        this BSA, with only the headers of the DDSFiles loaded - the texture
+        data is neither read nor decompressed, except for the few bytes the
+        headers are made of. Textures with broken headers are skipped with a
+        warning in the log."""
+        textures = []
+        self._load_bsa()
+        try:
+            with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+                bsa_map = mmap.mmap(bsa_file.fileno(), 0,
+                                    access=mmap.ACCESS_READ)
+            try:
+                for asset_path, record in self._texture_records():
+                    dds_file = DDSFile(u'')
+                    try:
+                        self._load_texture_header(bsa_map, record, dds_file)
+                    except (BSAError, DDSError, struct_error) as e:
+                        deprint(u'%s: Failed to read the header of %s: %r' % (
+                            self.bsa_name, asset_path, e))
+                        continue
+                    textures.append((asset_path, dds_file))
+            finally:
+                bsa_map.close()
+        finally: # unload the bsa
+            self.bsa_folders.clear()
+        return textures
+
+    def _extract_records(self, folder_to_assets, dest_folder, read_data,
+                         progress=None):
+        """Write out the data of the specified file records, grouped per
+        folder, into dest_folder. The BSA is memory mapped and the records
+        are read, decompressed and written out on a pool of threads (see the
+        BsaThreads ini setting).
+
+        :param folder_to_assets: Maps folders to lists of (file name, file
+            record) tuples.
+        :param read_data: Called with the memory map of the BSA and a file
+            record, returns the data to write out or None to skip the
+            file."""
+        extract_jobs = []
+        for folder, file_records in folder_to_assets.iteritems():
+            # BSA paths always have backslashes, so we need to convert them
+            # to the platform's path separators before we extract
+            target_dir = os.path.join(dest_folder, *folder.split(u'\\'))
+            _makedirs_exists_ok(target_dir)
+            extract_jobs.extend((folder, os.path.join(target_dir, filename),
+                                 record) for filename, record in file_records)
+        if not extract_jobs: return
         if progress:
-            progress.setFull(len(folder_to_assets))
+            progress.setFull(len(extract_jobs))
         with open(u'%s' % self.abs_path, u'rb') as bsa_file:
-            for folder, file_records in folder_to_assets.iteritems():
-                if progress:
-                    progress(i, u'Extracting %s...\n%s' % (
-                        self.bsa_name, folder))
-                    i += 1
-                # BSA paths always have backslashes, so we need to convert them
-                # to the platform's path separators before we extract
-                target_dir = os.path.join(dest_folder, *folder.split(u'\\'))
-                _makedirs_exists_ok(target_dir)
-                for filename, record in file_records:
-                    data_size = record.raw_data_size()
-                    bsa_file.seek(record.raw_file_data_offset)
-                    if self.bsa_header.embed_filenames(): # use len(filename) ?
-                        filename_len = unpack_byte(bsa_file)
-                        bsa_file.seek(filename_len, 1) # discard filename
-                        data_size -= filename_len + 1
-                    if global_compression ^ record.compression_toggle():
-                        # This is a compressed record, so decompress it
-                        uncompressed_size = unpack_int(bsa_file)
-                        data_size -= 4
-                        try:
-                            raw_data = self._compression_type.decompress_rec(
-                                bsa_file.read(data_size), uncompressed_size,
-                                self.bsa_name)
-                        except BSAError:
-                            # Ignore errors for Fallout - Misc.bsa - Bethesda
-                            # probably used an old buggy zlib version when
-                            # packing it (taken from BSArch sources)
-                            if self.bsa_name == u'Fallout - Misc.bsa':
-                                continue
-                            else:
-                                raise
-                    else:
-                        # This is an uncompressed record, just read it
-                        raw_data = bsa_file.read(data_size)
-                    with open(os.path.join(target_dir, filename),
-                              u'wb') as out:
-                        out.write(raw_data)
+            bsa_map = mmap.mmap(bsa_file.fileno(), 0, access=mmap.ACCESS_READ)
+        def _extract_record(extract_job):
+            raw_data = read_data(bsa_map, extract_job[2])
+            if raw_data is not None:
+                with open(extract_job[1], u'wb') as out:
+                    out.write(raw_data)
+        try:
+            with ParallelMap(_extract_record, extract_jobs,
+                             bass.inisettings[u'BsaThreads']) as jobs:
+                last_folder = None
+                for i, (extract_job, _none) in enumerate(jobs):
+                    if progress and extract_job[0] != last_folder:
+                        last_folder = extract_job[0]
+                        progress(i, u'Extracting %s...\n%s' % (
+                            self.bsa_name, last_folder))
+        finally:
+            bsa_map.close()
 
     def _map_assets_to_folders(self, folder_files_dict):
         folder_to_assets = collections.OrderedDict()
@@ -597,13 +897,146 @@ def _map_assets_to_folders(self, folder_files_dict):
                 file_records.append((filename, filerecord))
         return folder_to_assets
 
+    def _find_hashed_assets(self, split_paths):
+        """Return the lowercase paths in split_paths (which maps them to the
+        output of _split_asset_path) that are in this BSA. Only the names of
+        the files whose hashes match are decoded, to rule out collisions."""
+        if self._asset_hashes is None:
+            self._asset_hashes = self._load_asset_hashes()
+        hash_table, hash_collisions = self._asset_hashes[:2]
+        candidates = collections.defaultdict(list)
+        for a_cs, (bsa_path, folder_path, file_root,
+                   file_ext) in split_paths.iteritems():
+            hash_key = self._hash_key(folder_path, file_root, file_ext)
+            file_index = hash_table.get(hash_key)
+            if file_index is None: continue
+            candidates[file_index].append((a_cs, bsa_path))
+            for file_index in hash_collisions.get(hash_key, ()):
+                candidates[file_index].append((a_cs, bsa_path))
+        if not candidates: return set()
+        file_names = self._load_asset_names(candidates)
+        return {a_cs for file_index, wanted in candidates.iteritems()
+                for a_cs, bsa_path in wanted
+                if file_names[file_index] == bsa_path}
+
     # Abstract
     def _load_bsa(self): raise AbstractError()
     def _load_bsa_light(self): raise AbstractError()
+    def _load_asset_hashes(self):
+        """Return a dict mapping the hash keys of the files in this BSA to
+        the index of the (first) file with that key, followed by a dict
+        mapping colliding hash keys to the indices of the other files with
+        that key. Subclasses may append any data _load_asset_names needs."""
+        raise AbstractError()
+    @staticmethod
+    def _hash_key(folder_path, file_root, file_ext):
+        """Return the key _load_asset_hashes uses for the specified file."""
+        raise AbstractError()
+    def _load_asset_names(self, file_indices):
+        """Return a dict mapping the specified file indices to the lowercase
+        paths (using backslashes) of the corresponding files."""
+        raise AbstractError()
+
+    # Packing
+    @classmethod
+    def _split_packed_assets(cls, asset_sources, bsa_name):
+        """Return a list of (folder, file name, source path) tuples for the
+        specified assets, with the folder and file name in lowercase and
+        encoded. Assets in the root folder are not allowed."""
+        split_assets = []
+        for asset_path, src_path in asset_sources.iteritems():
+            folder_path, _sep, file_name = asset_path.replace(
+                u'/', path_sep).replace(os.sep, path_sep).strip(
+                path_sep).lower().rpartition(path_sep)
+            if not folder_path:
+                raise BSAError(bsa_name, u'Assets can not be packed into the '
+                                         u'root folder: %s' % asset_path)
+            split_assets.append((_encode_path(folder_path, bsa_name),
+                                 _encode_path(file_name, bsa_name), src_path))
+        return split_assets
+
+    @staticmethod
+    def _write_packed_assets(out, packed_assets, pack_asset, bsa_name,
+                             progress):
+        """Write out the data pack_asset returns for each of packed_assets,
+        in order. pack_asset is called on a pool of threads (see the
+        BsaThreads ini setting) and returns a tuple of a list of byte strings
+        to write out and any data about them the caller needs. Returns a list
+        of tuples of the (offset, size) of each of the byte strings and that
+        data, one per asset. The first item of each of packed_assets is used
+        in the progress messages."""
+        written_assets = []
+        if progress:
+            progress.setFull(max(len(packed_assets), 1))
+        with ParallelMap(pack_asset, packed_assets,
+                         bass.inisettings[u'BsaThreads']) as packed:
+            last_folder = None
+            for i, (packed_asset, (asset_chunks, asset_info)) in enumerate(
+                    packed):
+                if progress and packed_asset[0] != last_folder:
+                    last_folder = packed_asset[0]
+                    progress(i, u'Packing %s...\n%s' % (
+                        bsa_name, _decode_path(last_folder, bsa_name)))
+                written_chunks = []
+                for asset_chunk in asset_chunks:
+                    written_chunks.append((out.tell(), len(asset_chunk)))
+                    out.write(asset_chunk)
+                written_assets.append((written_chunks, asset_info))
+        if out.tell() > 0xFFFFFFFF:
+            raise BSAError(bsa_name, u'Packed files are too large to fit '
+                                     u'into a single archive')
+        return written_assets
+
+    @classmethod
+    def pack_assets(cls, bsa_path, asset_sources, progress=None):
+        """Create a new BSA of this type at bsa_path, containing the
+        specified assets. The assets are read and compressed on a pool of
+        threads (see the BsaThreads ini setting), then written out in the
+        order the games expect.
+
+        :param bsa_path: The path of the BSA to create, overwritten if it
+            exists.
+        :type bsa_path: bolt.Path
+        :param asset_sources: Maps the paths of the assets in the BSA
+            (relative to the Data folder) to the absolute paths of the files
+            to pack.
+        :param progress: The progress callback to use. None if unwanted."""
+        try:
+            with bsa_path.temp.open(u'wb') as out:
+                cls._pack_assets(out, asset_sources, bsa_path.stail, progress)
+        except (IOError, OSError, DDSError, struct_error) as e:
+            raise BSAError(bsa_path.stail, u'Error while packing: %r' % e)
+        bsa_path.untemp()
+
+    @classmethod
+    def _pack_assets(cls, out, asset_sources, bsa_name, progress):
+        raise AbstractError()
 
     # API - delegates to abstract methods above
     def has_assets(self, asset_paths):
-        return {a.cs for a in asset_paths} & self.assets
+        """Return the lowercase paths (as in Path.cs) of the specified asset
+        Paths that are in this BSA. Unless the names of the assets of this
+        BSA have already been loaded, this probes the file hashes the BSA
+        stores instead of decoding all the names in it.
+        :rtype: set[unicode]"""
+        if not self._hashed_lookups or (
+                self._assets is not self.__class__._assets):
+            return {a.cs for a in asset_paths} & self.assets
+        found_assets = set()
+        split_paths = {}
+        for a in asset_paths:
+            split_path = _split_asset_path(a)
+            if split_path is not None:
+                split_paths[a.cs] = split_path
+            elif a.cs in self.assets: # can't use its hash, check the names
+                found_assets.add(a.cs)
+        if split_paths:
+            try:
+                found_assets |= self._find_hashed_assets(split_paths)
+            except struct_error as e:
+                raise BSAError(self.bsa_name,
+                               u'Error while unpacking: %r' % e)
+        return found_assets
 
     @property
     def assets(self):
@@ -611,11 +1044,19 @@ def assets(self):
         :rtype: frozenset[unicode]
         """
         from ..env import convert_separators
+        from . import bsa_assets_cache
         if self._assets is self.__class__._assets:
+            cached = bsa_assets_cache and bsa_assets_cache.get_assets(
+                self.abs_path)
+            if cached is not None:
+                self._assets = frozenset(cached)
+                return self._assets
             self.__load(names_only=True)
             self._assets = frozenset(convert_separators(f.lower())
                                      for f in self._filenames)
             del self._filenames[:]
+            if bsa_assets_cache: # saved by the callers, once per batch
+                bsa_assets_cache.set_assets(self.abs_path, self._assets)
         return self._assets
 
 class BSA(ABsa):
@@ -625,6 +1066,15 @@ class BSA(ABsa):
     are embedded."""
     file_record_type = BSAFileRecord
     folder_record_type = BSAFolderRecord
+    _hashed_lookups = True
+    _packed_version = 0x68
+    # Maps file extensions to the content flags of the header, see
+    # _pack_assets - everything else is miscellaneous (0x100)
+    _content_flags = {u'.nif': 0x1, u'.dds': 0x2, u'.xml': 0x4, u'.wav': 0x8,
+                      u'.mp3': 0x10, u'.ogg': 0x10, u'.xwm': 0x10,
+                      u'.fuz': 0x10, u'.txt': 0x20, u'.html': 0x20,
+                      u'.bat': 0x20, u'.scc': 0x20, u'.spt': 0x40,
+                      u'.tex': 0x80, u'.fnt': 0x80}
 
     def _load_bsa(self):
         folder_records = [] # we need those to parse the folder names
@@ -670,7 +1120,7 @@ def _load_bsa_light(self):
 
     def _read_bsa_file(self, folder_records, read_file_records):
         total_names_length = 0
-        with open(u'%s' % self.abs_path, u'rb') as bsa_file: # accept string or Path
+        with self._open_bsa() as bsa_file:
             # load the header from input stream
             self.bsa_header.load_header(bsa_file, self.bsa_name)
             # load the folder records from input stream
@@ -704,8 +1154,141 @@ def _discard_file_records(self, bsa_file, folder_path, folder_record,
                       folder_record.files_count, 1)
         folders[folder_path] = folder_record
 
+    @classmethod
+    def _read_table(cls, ins, bsa_name):
+        table_start = ins.read(cls._header_type.header_size)
+        bsa_header = cls._header_type()
+        bsa_header.load_header(io.BytesIO(table_start), bsa_name)
+        # The folder records, then each folder name (prefixed by its length)
+        # followed by the file records of the folder, then the file names
+        return table_start + ins.read(bsa_header.folder_count * (
+            cls.folder_record_type.total_record_size() + 1) +
+            bsa_header.total_folder_name_length + bsa_header.file_count *
+            cls.file_record_type.total_record_size() +
+            bsa_header.total_file_name_length)
+
+    @staticmethod
+    def _hash_key(folder_path, file_root, file_ext):
+        return _hash_bsa_string(folder_path), _hash_bsa_string(file_root,
+                                                               file_ext)
+
+    @classmethod
+    def _pack_assets(cls, out, asset_sources, bsa_name, progress):
+        # Sort the folders and the files in each folder by hash, as the games
+        # look them up via binary search
+        folder_files = collections.defaultdict(list)
+        for folder_path, file_name, src_path in cls._split_packed_assets(
+                asset_sources, bsa_name):
+            folder_files[folder_path].append((_hash_bsa_string(
+                *os.path.splitext(file_name)), file_name, src_path))
+        sorted_folders = sorted((_hash_bsa_string(f), f, sorted(files))
+                                for f, files in folder_files.iteritems())
+        packed_assets = [(folder_path, file_name, src_path)
+                         for _hash, folder_path, files in sorted_folders
+                         for _file_hash, file_name, src_path in files]
+        file_names = b''.join(n + b'\x00' for _f, n, _s in packed_assets)
+        content_flags = 0
+        for _f, file_name, _s in packed_assets:
+            content_flags |= cls._content_flags.get(
+                os.path.splitext(file_name)[1], 0x100)
+        # Calculate the size of everything before the file data
+        folder_rec_size = cls.folder_record_type.total_record_size()
+        file_rec_size = cls.file_record_type.total_record_size()
+        folder_names_length = sum(len(f) + 1 for _h, f, _fs in sorted_folders)
+        data_offset = (BsaHeader.header_size + folder_rec_size * len(
+            sorted_folders) + len(sorted_folders) + folder_names_length +
+                       file_rec_size * len(packed_assets) + len(file_names))
+        def _pack_asset(packed_asset):
+            file_ext = os.path.splitext(packed_asset[1])[1]
+            with open(packed_asset[2], u'rb') as ins:
+                raw_data = ins.read()
+            if file_ext in _uncompressed_exts:
+                return [raw_data], True # toggle the compression off
+            return [structs_cache[u'=I'].pack(len(raw_data)),
+                    cls._compression_type.compress_rec(raw_data, bsa_name)
+                    ], False
+        out.seek(data_offset)
+        written_assets = cls._write_packed_assets(
+            out, packed_assets, _pack_asset, bsa_name, progress)
+        # Now that we know where the data ended up, write out the rest
+        out.seek(0)
+        out.write(structs_cache[u'=4s8I'].pack(
+            BsaHeader.bsa_magic, cls._packed_version, BsaHeader.header_size,
+            0x7, len(sorted_folders), # names for folders/files, compressed
+            len(packed_assets), folder_names_length, len(file_names),
+            content_flags))
+        # The offsets of the file records include the length of the file
+        # names, for some reason
+        records_offset = BsaHeader.header_size + folder_rec_size * len(
+            sorted_folders) + len(file_names)
+        for folder_hash, folder_path, files in sorted_folders:
+            out.write(cls.folder_record_type.dump_folder_record(
+                folder_hash, len(files), records_offset))
+            records_offset += len(folder_path) + 2 + file_rec_size * len(
+                files)
+        dump_file_record = structs_cache[u'=Q2I'].pack
+        written_assets = iter(written_assets)
+        for folder_hash, folder_path, files in sorted_folders:
+            out.write(structs_cache[u'=B'].pack(len(folder_path) + 1))
+            out.write(folder_path + b'\x00')
+            for file_hash, _file_name, _src_path in files:
+                written_chunks, toggle_compression = next(written_assets)
+                data_size = sum(s for _o, s in written_chunks)
+                if toggle_compression:
+                    data_size |= 0x40000000
+                out.write(dump_file_record(file_hash, data_size,
+                                           written_chunks[0][0]))
+        out.write(file_names)
+
+    def _load_asset_hashes(self):
+        # Read the raw hashes, skipping everything else - all folder records
+        # start with the folder hash and the number of files in the folder,
+        # all file records are two 8 byte values, the first being the hash
+        hash_table = {}
+        hash_collisions = collections.defaultdict(list)
+        folder_names = []
+        file_folders = [] # file index -> index of its folder in folder_names
+        folder_rec_size = self.folder_record_type.total_record_size()
+        file_rec_size = self.file_record_type.total_record_size()
+        unpack_folder_rec = structs_cache[u'QI'].unpack_from
+        my_header = self.bsa_header # type: BsaHeader
+        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+            my_header.load_header(bsa_file, self.bsa_name)
+            folder_block = bsa_file.read(
+                folder_rec_size * my_header.folder_count)
+            file_index = 0
+            for folder_index in xrange(my_header.folder_count):
+                folder_hash, files_count = unpack_folder_rec(
+                    folder_block, folder_index * folder_rec_size)
+                name_size = unpack_byte(bsa_file)
+                folder_names.append(bsa_file.read(name_size)[:-1])
+                file_hashes = _unpack_from(u'%dQ' % (2 * files_count),
+                    bsa_file.read(file_rec_size * files_count))[::2]
+                for file_hash in file_hashes:
+                    hash_key = (folder_hash, file_hash)
+                    if hash_table.setdefault(hash_key,
+                                             file_index) != file_index:
+                        hash_collisions[hash_key].append(file_index)
+                    file_index += 1
+                file_folders.extend([folder_index] * files_count)
+            names_offset = bsa_file.tell()
+        return hash_table, hash_collisions, folder_names, file_folders, \
+               names_offset
+
+    def _load_asset_names(self, file_indices):
+        folder_names, file_folders, names_offset = self._asset_hashes[2:]
+        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+            bsa_file.seek(names_offset)
+            file_names = bsa_file.read(
+                self.bsa_header.total_file_name_length).split(b'\00')
+        return {i: _decode_path(b'\\'.join((
+            folder_names[file_folders[i]], file_names[i])),
+            self.bsa_name).lower() for i in file_indices}
+
 class BA2(ABsa):
     _header_type = Ba2Header
+    _hashed_lookups = True
+    _packed_version = 0x01
 
     def extract_assets(self, asset_paths, dest_folder, progress=None):
         # map files to folders
@@ -713,81 +1296,77 @@ def extract_assets(self, asset_paths, dest_folder, progress=None):
         del asset_paths # forget about this
         # load the bsa - this should be reworked to load only needed records
         self._load_bsa()
-        my_header = self.bsa_header # type: Ba2Header
-        is_dx10 = my_header.ba2_files_type == b'DX10'
         folder_to_assets = self._map_assets_to_folders(folder_files_dict)
         # unload the bsa
         self.bsa_folders.clear()
-        # get the data from the file
-        i = 0
-        if progress:
-            progress.setFull(len(folder_to_assets))
-        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
-            def _read_rec_or_chunk(record):
-                """Helper method, handles reading both compressed and
-                uncompressed records (or texture chunks)."""
-                bsa_file.seek(record.offset)
-                if record.packed_size:
-                    # This is a compressed record, so decompress it
-                    return self._compression_type.decompress_rec(
-                        bsa_file.read(record.packed_size),
-                        record.unpacked_size, self.bsa_name)
-                else:
-                    # This is an uncompressed record, just read it
-                    return bsa_file.read(record.unpacked_size)
-            def _build_dds_header(dds_file, record):
-                """Helper method, sets up a functional DDS header for the
-                specified DDS file based on the specified record."""
-                dds_file.dds_header.dw_height = record.height
-                dds_file.dds_header.dw_width = record.width
-                dds_file.dds_header.dw_mip_map_count = record.num_mips
-                dds_file.dds_header.dw_depth = 1
-                # 3 == DDS_DIMENSION_TEXTURE2D - PY3: enum!
-                dds_file.dds_dxt10.resource_dimension = 3
-                dds_file.dds_dxt10.array_size = 1
-                if record.cube_maps == 2049:
-                    dds_file.dds_header.dw_caps.DDSCAPS_COMPLEX = True
-                    # All but DDSCAPS2_VOLUME or'd together
-                    # Archive.exe sticks these into dwCaps, which is 100%
-                    # wrong, but that's DDS for you...
-                    dds_file.dds_header.dw_caps2 = 0xFE00
-                    # 0x4 == DDS_RESOURCE_MISC_TEXTURECUBE
-                    dds_file.dds_dxt10.misc_flag = 0x4
-                # This needs to be last, it uses the header's width and height
-                record.dxgi_format.setup_file(
-                    dds_file, use_legacy_formats=True)
-            for folder, file_records in folder_to_assets.iteritems():
-                if progress:
-                    progress(i, u'Extracting %s...\n%s' % (
-                        self.bsa_name, folder))
-                    i += 1
-                # BSA paths always have backslashes, so we need to convert them
-                # to the platform's path separators before we extract
-                target_dir = os.path.join(dest_folder, *folder.split(u'\\'))
-                _makedirs_exists_ok(target_dir)
-                for filename, record in file_records:
-                    if is_dx10:
-                        # We're dealing with a DX10 BA2, need to combine all
-                        # the texture chunks in the record first
-                        dds_data = b''
-                        for tex_chunk in record.tex_chunks:
-                            dds_data += _read_rec_or_chunk(tex_chunk)
-                        # Add a DDS header based on the data in the record,
-                        # then dump the resulting DDS file - cf. BSArch
-                        dds_file = DDSFile(u'')
-                        _build_dds_header(dds_file, record)
-                        dds_file.dds_contents = dds_data
-                        raw_data = dds_file.dump_file()
-                    else:
-                        # Otherwise, we're dealing with a GNRL BA2, just
-                        # read/decompress/write the record directly
-                        raw_data = _read_rec_or_chunk(record)
-                    with open(os.path.join(target_dir, filename),
-                              u'wb') as out:
-                        out.write(raw_data)
+        if self.bsa_header.ba2_files_type == b'DX10':
+            read_data = self._read_texture_data
+        else:
+            read_data = self._read_rec_or_chunk
+        self._extract_records(folder_to_assets, dest_folder, read_data,
+                              progress)
+
+    def _read_rec_or_chunk(self, bsa_map, record):
+        """Helper method, handles reading both compressed and uncompressed
+        records (or texture chunks)."""
+        data_offset = record.offset
+        if record.packed_size:
+            # This is a compressed record, so decompress it
+            return self._compression_type.decompress_rec(
+                bsa_map[data_offset:data_offset + record.packed_size],
+                record.unpacked_size, self.bsa_name)
+        # This is an uncompressed record, just read it
+        return bsa_map[data_offset:data_offset + record.unpacked_size]
+
+    def _load_texture_header(self, bsa_map, record, dds_file):
+        if self.bsa_header.ba2_files_type == b'DX10':
+            # The record has everything we need, no need to read anything
+            self._build_dds_header(dds_file, record)
+            return
+        headers_size = DDSFile.headers_max_size
+        if record.packed_size:
+            dds_headers = self._compression_type.decompress_rec_prefix(
+                bsa_map, record.offset, record.packed_size, headers_size,
+                self.bsa_name)
+        else:
+            dds_headers = bsa_map[record.offset:record.offset + min(
+                record.unpacked_size, headers_size)]
+        dds_file.load_headers(io.BytesIO(dds_headers))
+
+    def _read_texture_data(self, bsa_map, record):
+        """We're dealing with a DX10 BA2, need to combine all the texture
+        chunks in the record first. Then add a DDS header based on the data
+        in the record and dump the resulting DDS file - cf. BSArch."""
+        dds_file = DDSFile(u'')
+        self._build_dds_header(dds_file, record)
+        dds_file.dds_contents = b''.join([self._read_rec_or_chunk(
+            bsa_map, tex_chunk) for tex_chunk in record.tex_chunks])
+        return dds_file.dump_file()
+
+    @staticmethod
+    def _build_dds_header(dds_file, record):
+        """Helper method, sets up a functional DDS header for the specified
+        DDS file based on the specified record."""
+        dds_file.dds_header.dw_height = record.height
+        dds_file.dds_header.dw_width = record.width
+        dds_file.dds_header.dw_mip_map_count = record.num_mips
+        dds_file.dds_header.dw_depth = 1
+        # 3 == DDS_DIMENSION_TEXTURE2D - PY3: enum!
+        dds_file.dds_dxt10.resource_dimension = 3
+        dds_file.dds_dxt10.array_size = 1
+        if record.cube_maps == 2049:
+            dds_file.dds_header.dw_caps.DDSCAPS_COMPLEX = True
+            # All but DDSCAPS2_VOLUME or'd together
+            # Archive.exe sticks these into dwCaps, which is 100% wrong, but
+            # that's DDS for you...
+            dds_file.dds_header.dw_caps2 = 0xFE00
+            # 0x4 == DDS_RESOURCE_MISC_TEXTURECUBE
+            dds_file.dds_dxt10.misc_flag = 0x4
+        # This needs to be last, it uses the header's width and height
+        record.dxgi_format.setup_file(dds_file, use_legacy_formats=True)
 
     def _load_bsa(self):
-        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+        with self._open_bsa() as bsa_file:
             # load the header from input stream
             my_header = self.bsa_header # type: Ba2Header
             my_header.load_header(bsa_file, self.bsa_name)
@@ -825,7 +1404,7 @@ def _load_bsa(self):
 
     def _load_bsa_light(self):
         my_header = self.bsa_header # type: Ba2Header
-        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+        with self._open_bsa() as bsa_file:
             # load the header from input stream
             my_header.load_header(bsa_file, self.bsa_name)
             # load the file names block
@@ -841,6 +1420,199 @@ def _load_bsa_light(self):
             file_names_block = file_names_block[name_size + 2:]
         self._filenames = _filenames
 
+    @classmethod
+    def _read_table(cls, ins, bsa_name):
+        table_start = ins.read(cls._header_type.header_size)
+        ba2_header = cls._header_type()
+        ba2_header.load_header(io.BytesIO(table_start), bsa_name)
+        # The file names come last, after all the data - skip to them (we
+        # can't seek in a stream) and make the name table offset in the
+        # header point right past it, where we put the names
+        to_skip = ba2_header.ba2_name_table_offset - len(table_start)
+        while to_skip > 0:
+            skipped = len(ins.read(min(to_skip, 0x100000)))
+            if not skipped: break # truncated, we'll fail parsing the names
+            to_skip -= skipped
+        return table_start[:16] + structs_cache[u'=Q'].pack(
+            len(table_start)) + ins.read()
+
+    @staticmethod
+    def _hash_key(folder_path, file_root, file_ext):
+        # Extensions are stored without the dot and padded/cut to 4 bytes
+        return _hash_ba2_string(folder_path), _hash_ba2_string(file_root), \
+               file_ext[1:5].encode(u'ascii')
+
+    def _load_asset_hashes(self):
+        # Read the raw hashes, skipping everything else - all file records
+        # start with the name hash, extension and folder hash. Texture records
+        # are followed by a variable number of texture chunks
+        hash_table = {}
+        hash_collisions = collections.defaultdict(list)
+        my_header = self.bsa_header # type: Ba2Header
+        unpack_hashes = structs_cache[u'I4sI'].unpack_from
+        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+            my_header.load_header(bsa_file, self.bsa_name)
+            if my_header.ba2_files_type == b'GNRL':
+                rec_size = 36
+                recs_block = bsa_file.read(rec_size * my_header.ba2_num_files)
+                def _next_record(file_index):
+                    return unpack_hashes(recs_block, file_index * rec_size)
+            else:
+                rec_size = 24
+                def _next_record(file_index):
+                    tex_record = bsa_file.read(rec_size)
+                    # Discard the texture chunks, 24 bytes each
+                    bsa_file.read(24 * ord(tex_record[13]))
+                    return unpack_hashes(tex_record)
+            for file_index in xrange(my_header.ba2_num_files):
+                name_hash, file_ext, dir_hash = _next_record(file_index)
+                hash_key = (dir_hash, name_hash, file_ext.rstrip(b'\x00'))
+                if hash_table.setdefault(hash_key, file_index) != file_index:
+                    hash_collisions[hash_key].append(file_index)
+        return hash_table, hash_collisions
+
+    def _load_asset_names(self, file_indices):
+        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+            bsa_file.seek(self.bsa_header.ba2_name_table_offset)
+            file_names_block = bsa_file.read()
+        file_names = {}
+        # Names are not null-terminated but prefixed with their size, so we
+        # have to walk the names table up to the last name we need
+        unpack_size = structs_cache[u'H'].unpack_from
+        last_index = max(file_indices)
+        name_offset = 0
+        for file_index in xrange(last_index + 1):
+            name_size, = unpack_size(file_names_block, name_offset)
+            name_offset += 2
+            if file_index in file_indices:
+                file_names[file_index] = _decode_path(file_names_block[
+                    name_offset:name_offset + name_size],
+                    self.bsa_name).lower()
+            name_offset += name_size
+        return file_names
+
+    @classmethod
+    def _pack_assets(cls, out, asset_sources, bsa_name, progress):
+        # Textures must be packed into DX10 BA2s, everything else into GNRL
+        # ones - we can't have both in the same BA2
+        is_dx10 = all(a.lower().endswith(u'.dds') for a in asset_sources)
+        packed_assets = []
+        for asset_path, src_path in sorted(asset_sources.iteritems()):
+            ba2_path = asset_path.replace(u'/', path_sep).replace(
+                os.sep, path_sep).strip(path_sep)
+            folder_path, _sep, file_name = ba2_path.rpartition(path_sep)
+            if not folder_path:
+                raise BSAError(bsa_name, u'Assets can not be packed into the '
+                                         u'root folder: %s' % asset_path)
+            file_root, file_ext = os.path.splitext(file_name.lower())
+            try:
+                hash_key = cls._hash_key(folder_path.lower(), file_root,
+                                         file_ext)
+            except UnicodeEncodeError:
+                raise BSAError(bsa_name, u'Extension of %r is not ASCII' %
+                               asset_path)
+            # Read the DDS headers right away, since texture records are
+            # followed by a variable number of texture chunks
+            packed_assets.append((_encode_path(folder_path, bsa_name),
+                _encode_path(ba2_path, bsa_name), src_path, hash_key,
+                cls._plan_texture(src_path) if is_dx10 else None))
+        if is_dx10:
+            records_size = sum(24 + 24 * len(a[4][-1]) for a in packed_assets)
+            def _pack_asset(packed_asset):
+                headers_size, tex_chunks = packed_asset[4][0::6]
+                with open(packed_asset[2], u'rb') as ins:
+                    ins.seek(headers_size)
+                    tex_data = ins.read()
+                packed_chunks = [cls._compression_type.compress_rec(
+                    tex_data[start:start + size], bsa_name)
+                    for _s, _e, start, size in tex_chunks]
+                return packed_chunks, [size for _s, _e, _st, size
+                                       in tex_chunks]
+        else:
+            records_size = 36 * len(packed_assets)
+            def _pack_asset(packed_asset):
+                with open(packed_asset[2], u'rb') as ins:
+                    raw_data = ins.read()
+                if os.path.splitext(packed_asset[1])[1].lower() in \
+                        _uncompressed_exts:
+                    return [raw_data], [len(raw_data)]
+                return [cls._compression_type.compress_rec(
+                    raw_data, bsa_name)], [len(raw_data)]
+        out.seek(Ba2Header.header_size + records_size)
+        written_assets = cls._write_packed_assets(
+            out, packed_assets, _pack_asset, bsa_name, progress)
+        name_table_offset = out.tell()
+        for packed_asset in packed_assets:
+            out.write(structs_cache[u'=H'].pack(len(packed_asset[1])))
+            out.write(packed_asset[1])
+        out.seek(0)
+        out.write(structs_cache[u'=4sI4sIQ'].pack(
+            Ba2Header.bsa_magic, cls._packed_version,
+            b'DX10' if is_dx10 else b'GNRL', len(packed_assets),
+            name_table_offset))
+        # Hash keys are (dir hash, name hash, extension)
+        dump_hashes = structs_cache[u'=I4sI'].pack
+        for packed_asset, (written_chunks, unpacked_sizes) in izip(
+                packed_assets, written_assets):
+            dir_hash, name_hash, file_ext = packed_asset[3]
+            out.write(dump_hashes(name_hash, file_ext, dir_hash))
+            if is_dx10:
+                (_headers_size, height, width, num_mips, dxgi_index,
+                 is_cubemap, tex_chunks) = packed_asset[4]
+                out.write(structs_cache[u'=2B3H2BH'].pack(
+                    0, len(tex_chunks), 24, height, width, num_mips,
+                    dxgi_index, 2049 if is_cubemap else 2048))
+                for (offset, packed_size), unpacked_size, tex_chunk in izip(
+                        written_chunks, unpacked_sizes, tex_chunks):
+                    out.write(structs_cache[u'=Q2I2HI'].pack(
+                        offset, packed_size, unpacked_size, tex_chunk[0],
+                        tex_chunk[1], 0xBAADF00D))
+            else:
+                (offset, packed_size), = written_chunks
+                unpacked_size, = unpacked_sizes
+                if os.path.splitext(packed_asset[1])[1].lower() in \
+                        _uncompressed_exts:
+                    packed_size = 0 # stored uncompressed
+                out.write(structs_cache[u'=IQ3I'].pack(
+                    0x00100100, offset, packed_size, unpacked_size,
+                    0xBAADF00D))
+
+    @staticmethod
+    def _plan_texture(src_path):
+        """Read the DDS headers of the specified texture and split its data
+        into texture chunks - each mipmap that is at least 512x512 gets its
+        own chunk, the smaller ones share the last one. Returns the size of
+        the DDS headers, the fields of the texture record and a list of
+        (first mip, last mip, data offset, data size) per chunk."""
+        dds_file = DDSFile(src_path)
+        with open(src_path, u'rb') as ins:
+            headers_size = dds_file.load_headers(ins)
+            ins.seek(0, os.SEEK_END)
+            data_size = ins.tell() - headers_size
+        dds_header = dds_file.dds_header
+        dxgi_format = dds_file.get_dxgi_format()
+        width, height = dds_header.dw_width, dds_header.dw_height
+        num_mips = max(dds_header.dw_mip_map_count, 1)
+        is_cubemap = bool(int(dds_header.dw_caps2) & 0x200)
+        mip_sizes = [dxgi_format.compute_slice_pitch(
+            max(width >> m, 1), max(height >> m, 1)) for m in xrange(num_mips)]
+        if is_cubemap or sum(mip_sizes) != data_size:
+            # All faces/slices are stored one after the other, each with all
+            # their mipmaps - keep it all in a single chunk
+            tex_chunks = [(0, num_mips - 1, 0, data_size)]
+        else:
+            tex_chunks = []
+            chunk_start = 0
+            for mip, mip_size in enumerate(mip_sizes):
+                if min(width >> mip, height >> mip) < 512: break
+                tex_chunks.append((mip, mip, chunk_start, mip_size))
+                chunk_start += mip_size
+            if len(tex_chunks) < num_mips:
+                tex_chunks.append((len(tex_chunks), num_mips - 1, chunk_start,
+                                   data_size - chunk_start))
+        return (headers_size, height, width, num_mips, dxgi_format.fmt_index,
+                is_cubemap, tex_chunks)
+
     def ba2_hash(self):
         """Calculates Bethesda's nonstandard CRC hash for the filename of this
         BA2. Only the filename needs to be compared, since the extension is
@@ -853,7 +1625,7 @@ class MorrowindBsa(ABsa):
 
     def _load_bsa_light(self):
         self.file_records = []
-        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
+        with self._open_bsa() as bsa_file:
             # load the header from input stream
             self.bsa_header.load_header(bsa_file, self.bsa_name)
             # load each file record
@@ -878,70 +1650,101 @@ def _load_bsa_light(self):
 
     _load_bsa = _load_bsa_light
 
+    @classmethod
+    def _read_table(cls, ins, bsa_name):
+        table_start = ins.read(12)
+        bsa_header = cls._header_type()
+        bsa_header.load_header(io.BytesIO(table_start), bsa_name)
+        # The file records, name offsets and names come before the hashes
+        return table_start + ins.read(bsa_header.hash_offset +
+                                      8 * bsa_header.file_count)
+
     # We override this because Morrowind has no folder records, so we can
     # achieve better performance with a dedicated method
     def extract_assets(self, asset_paths, dest_folder, progress=None):
-        # Speed up target_records construction
-        if not isinstance(asset_paths, (frozenset, set)):
-            asset_paths = frozenset(asset_paths)
+        # Match the paths case insensitively, like the other BSA types do
+        asset_paths = frozenset(imap(unicode.lower, asset_paths))
         self._load_bsa()
-        # Keep only the file records that correspond to asset_paths
-        target_records = [x for x in self.file_records
-                          if x.file_name in asset_paths]
-        i = 0
-        if progress:
-            progress.setFull(len(target_records))
-        with open(u'%s' % self.abs_path, u'rb') as bsa_file:
-            for file_record in target_records:
-                rec_name = file_record.file_name
-                if progress:
-                    # No folder records, simulate them to avoid updating the
-                    # progress bar too frequently
-                    progress(i, u'Extracting %s...\n%s' % (
-                        self.bsa_name, os.path.dirname(rec_name)))
-                    i += 1
-                # There is no compression for Morrowind BSAs, but all offsets
-                # are relative to the final_offset we read earlier
-                bsa_file.seek(self.final_offset + file_record.relative_offset)
-                # Finally, simply read from the BSA file and write out the
-                # result, making sure to create any needed directories
-                raw_data = bsa_file.read(file_record.file_size)
-                out_path = os.path.join(dest_folder, rec_name)
-                _makedirs_exists_ok(os.path.dirname(out_path))
-                with open(out_path, u'wb') as out:
-                    out.write(raw_data)
+        # Keep only the file records that correspond to asset_paths and
+        # simulate folders to avoid updating the progress bar too frequently
+        folder_to_assets = collections.OrderedDict()
+        for file_record in self.file_records:
+            if file_record.file_name.lower() not in asset_paths: continue
+            folder, _sep, filename = file_record.file_name.rpartition(
+                path_sep)
+            folder_to_assets.setdefault(folder, []).append(
+                (filename, file_record))
+        self._extract_records(folder_to_assets, dest_folder,
+                              self._read_record_data, progress)
+
+    @classmethod
+    def _pack_assets(cls, out, asset_sources, bsa_name, progress):
+        # No folders or compression, just files sorted by hash
+        packed_assets = sorted((_hash_tes3_string(folder_path + b'\\' +
+                                                  file_name),
+                                folder_path + b'\\' + file_name, src_path)
+                               for folder_path, file_name, src_path
+                               in cls._split_packed_assets(asset_sources,
+                                                           bsa_name))
+        file_names = [p for _h, p, _s in packed_assets]
+        num_files = len(packed_assets)
+        names_length = sum(len(n) + 1 for n in file_names)
+        # The hash table offset is relative to the end of the header
+        hash_offset = 12 * num_files + names_length
+        data_start = 12 + hash_offset + 8 * num_files
+        def _pack_asset(packed_asset):
+            with open(packed_asset[2], u'rb') as ins:
+                return [ins.read()], None
+        out.seek(data_start)
+        written_assets = cls._write_packed_assets(
+            out, [(p.rpartition(b'\\')[0], p, s) for _h, p, s
+                  in packed_assets], _pack_asset, bsa_name, progress)
+        out.seek(0)
+        out.write(structs_cache[u'=4s2I'].pack(
+            MorrowindBsaHeader.bsa_magic, hash_offset, num_files))
+        for written_chunks, _none in written_assets:
+            (offset, size), = written_chunks
+            out.write(structs_cache[u'=2I'].pack(size, offset - data_start))
+        name_offset = 0
+        for file_name in file_names:
+            out.write(structs_cache[u'=I'].pack(name_offset))
+            name_offset += len(file_name) + 1
+        for file_name in file_names:
+            out.write(file_name + b'\x00')
+        for (hash_part_1, hash_part_2), _p, _s in packed_assets:
+            out.write(structs_cache[u'=2I'].pack(hash_part_1, hash_part_2))
+
+    def _read_record_data(self, bsa_map, file_record):
+        # There is no compression for Morrowind BSAs, but all offsets are
+        # relative to the final_offset we read earlier
+        data_offset = self.final_offset + file_record.relative_offset
+        return bsa_map[data_offset:data_offset + file_record.file_size]
+
+    def _load_texture_header(self, bsa_map, file_record, dds_file):
+        data_offset = self.final_offset + file_record.relative_offset
+        dds_file.load_headers(io.BytesIO(bsa_map[data_offset:data_offset + min(
+            file_record.file_size, DDSFile.headers_max_size)]))
+
+    def _texture_records(self):
+        from ..env import convert_separators
+        for file_record in self.file_records:
+            if file_record.file_name[-4:].lower() == u'.dds':
+                yield convert_separators(file_record.file_name), file_record
 
 class OblivionBsa(BSA):
     _header_type = OblivionBsaHeader
     file_record_type = BSAOblivionFileRecord
-    # A dictionary mapping file extensions to hash components. Used by Oblivion
-    # when hashing file names for its BSAs.
-    _bsa_ext_lookup = collections.defaultdict(int)
-    for ext, hash_part in [(u'.kf', 0x80), (u'.nif', 0x8000),
-                           (u'.dds', 0x8080), (u'.wav', 0x80000000)]:
-        _bsa_ext_lookup[ext] = hash_part
+    _packed_version = 0x67
+    # BSA Alteration changes the hashes of files in Oblivion BSAs, so they
+    # can't be trusted for lookups - see undo_alterations
+    _hashed_lookups = False
 
     @staticmethod
     def calculate_hash(file_name):
         """Calculates the hash used by Oblivion BSAs for the provided file
-        name.
-        Based on Timeslips code with cleanup and pythonization.
-
-        See here for more information:
-        https://en.uesp.net/wiki/Tes4Mod:Hash_Calculation"""
+        name."""
         #--NOTE: fileName is NOT a Path object!
-        root, ext = os.path.splitext(file_name.lower())
-        chars = map(ord, root)
-        hash_part_1 = chars[-1] | ((len(chars) > 2 and chars[-2]) or 0) << 8 \
-                      | len(chars) << 16 | chars[0] << 24
-        hash_part_1 |= OblivionBsa._bsa_ext_lookup[ext]
-        uint_mask, hash_part_2, hash_part_3 = 0xFFFFFFFF, 0, 0
-        for char in chars[1:-2]:
-            hash_part_2 = ((hash_part_2 * 0x1003F) + char) & uint_mask
-        for char in map(ord, ext):
-            hash_part_3 = ((hash_part_3 * 0x1003F) + char) & uint_mask
-        hash_part_2 = (hash_part_2 + hash_part_3) & uint_mask
-        return (hash_part_2 << 32) + hash_part_1
+        return _hash_bsa_string(*os.path.splitext(file_name.lower()))
 
     def undo_alterations(self, progress=Progress()):
         """Undoes any alterations that previously applied BSA Alteration may
@@ -957,25 +1760,48 @@ def undo_alterations(self, progress=Progress()):
         http://devnull.sweetdanger.com/archiveinvalidation.html
 
         :param progress: The progress indicator to use for this process."""
-        progress.setFull(self.bsa_header.folder_count)
-        with open(self.abs_path.s, u'r+b') as bsa_file:
-            reset_count = 0
-            for folder_name, folder in self.bsa_folders.iteritems():
-                for file_name, file_info in folder.folder_assets.iteritems():
-                    rebuilt_hash = self.calculate_hash(file_name)
-                    if file_info.record_hash != rebuilt_hash:
-                        bsa_file.seek(file_info.file_pos)
-                        bsa_file.write(
-                            structs_cache[_HashedRecord.formats[0][0]].pack(
-                                rebuilt_hash))
-                        reset_count += 1
-                progress(progress.state + 1, u'Rebuilding Hashes...\n' +
-                         folder_name)
-        return reset_count
+        progress.setFull(1)
+        progress(0, u'Rebuilding Hashes...\n' + self.bsa_name)
+        return self.reset_hashes(self._altered_hashes())
+
+    def find_altered_hashes(self):
+        """Return a list of (position, correct hash) tuples for the file
+        records of this BSA whose hashes don't match their file names, see
+        undo_alterations. This loads the BSA fully, but doesn't change it and
+        unloads it again, so it can run on a worker thread."""
+        try:
+            self._load_bsa()
+        except struct_error as e:
+            raise BSAError(self.bsa_name, u'Error while unpacking: %r' % e)
+        try:
+            return self._altered_hashes()
+        finally: # unload the bsa
+            self.bsa_folders.clear()
+
+    def _altered_hashes(self):
+        altered_hashes = []
+        for folder in self.bsa_folders.itervalues():
+            for file_name, file_info in folder.folder_assets.iteritems():
+                rebuilt_hash = self.calculate_hash(file_name)
+                if file_info.record_hash != rebuilt_hash:
+                    altered_hashes.append((file_info.file_pos, rebuilt_hash))
+        return altered_hashes
+
+    def reset_hashes(self, altered_hashes):
+        """Write the specified hashes (see find_altered_hashes) to this BSA,
+        returning how many hashes were reset."""
+        if altered_hashes:
+            pack_hash = structs_cache[_HashedRecord._hash_format[0]].pack
+            with open(self.abs_path.s, u'r+b') as bsa_file:
+                for file_pos, rebuilt_hash in altered_hashes:
+                    bsa_file.seek(file_pos)
+                    bsa_file.write(pack_hash(rebuilt_hash))
+        return len(altered_hashes)
 
 class SkyrimSeBsa(BSA):
     folder_record_type = BSASkyrimSEFolderRecord
     _compression_type = _Bsa_lz4
+    _packed_version = 0x69
 
 # Factory
 def get_bsa_type(game_fsName):
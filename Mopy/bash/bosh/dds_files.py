@@ -246,13 +246,24 @@ def fmt_index(self):
         """Returns the index of this DXGI format, for writing to a DDS file."""
         return self._fmt_index
 
+    @property
+    def fmt_name(self):
+        """Returns the name of this DXGI format, e.g. DXGI_FORMAT_BC1_UNORM."""
+        return self._fmt_name
+
+    @property
+    def fmt_compressed(self):
+        """Returns True if this is a block-compressed DXGI format."""
+        return self._fmt_compressed
+
     def setup_file(self, dds_file, use_legacy_formats=False):
         """Sets up the specified DDS file to work with this DXGI format.
 
         :type dds_file: DDSFile
         :param use_legacy_formats: If set to True, use non-DXT10 legacy formats
-            that are equivalent instead."""
-        target_pf = self._fmt_ddspf if use_legacy_formats else _DDSPF_DXT10
+            that are equivalent instead, if there are any."""
+        target_pf = (self._fmt_ddspf if use_legacy_formats and self._fmt_ddspf
+                     else _DDSPF_DXT10)
         dds_file.dds_header.ddspf = copy.copy(target_pf)
         row_pitch, slice_pitch = _compute_pitch[self._fmt_name](
             self._fmt_bpp, dds_file.dds_header.dw_width,
@@ -265,9 +276,14 @@ def setup_file(self, dds_file, use_legacy_formats=False):
             dds_file.dds_header.dw_flags.DDSD_PITCH = True
             dds_file.dds_header.dw_flags.DDSD_LINEARSIZE = False
             dds_file.dds_header.dw_pitch_or_linear_size = row_pitch
-        if self._fmt_ddspf.needs_dxt10:
+        if target_pf.needs_dxt10:
             dds_file.dds_dxt10.dxgi_format = copy.copy(self)
 
+    def compute_slice_pitch(self, width, height):
+        """Returns the size in bytes of an image (e.g. a mipmap) with the
+        specified dimensions in this DXGI format."""
+        return _compute_pitch[self._fmt_name](self._fmt_bpp, width, height)[1]
+
     def __repr__(self):
         return u'%s (%u)' % (self._fmt_name, self._fmt_index)
 
@@ -275,8 +291,6 @@ def __repr__(self):
 # cf. https://docs.microsoft.com/en-us/windows/win32/api/dxgiformat/ne-dxgiformat-dxgi_format
 # and https://github.com/microsoft/DirectXTex/blob/master/DirectXTex/DirectXTexDDS.cpp
 # and https://github.com/microsoft/DirectXTex/blob/master/DirectXTex/DirectXTexUtil.cpp
-##: Mirror the bi-map set up in the link above, i.e. support converting from
-# legacy to DXGI format as well
 _DXGIFormat(u'DXGI_FORMAT_UNKNOWN')
 _DXGIFormat(u'DXGI_FORMAT_R32G32B32A32_TYPELESS', fmt_bpp=128)
 _DXGIFormat(u'DXGI_FORMAT_R32G32B32A32_FLOAT', fmt_bpp=128)
@@ -404,6 +418,23 @@ def __repr__(self):
 _DXGIFormat(u'DXGI_FORMAT_V208', fmt_bpp=16)
 _DXGIFormat(u'DXGI_FORMAT_V408', fmt_bpp=24)
 
+# Mirror the bi-map set up in the link above, i.e. support converting from
+# legacy to DXGI format as well
+def _pf_key(ddspf):
+    """Returns a key identifying the specified legacy pixel format."""
+    if ddspf.pf_flags.DDPF_FOURCC:
+        return ddspf.pf_four_cc
+    return (int(ddspf.pf_flags), ddspf.pf_rgb_bit_count, ddspf.pf_r_bit_mask,
+            ddspf.pf_g_bit_mask, ddspf.pf_b_bit_mask, ddspf.pf_a_bit_mask)
+_legacy_to_dxgi = {_pf_key(f._fmt_ddspf): f for f
+                   in _DXGIFormat.index_to_fmt.itervalues()
+                   if f._fmt_ddspf and not f._fmt_ddspf.needs_dxt10}
+# Legacy fourccs that have no pixel format of their own above
+for _four_cc, _fmt_index in ((b'DXT2', 74), (b'DXT4', 77), (b'ATI1', 80),
+                             (b'ATI2', 83)):
+    _legacy_to_dxgi[_four_cc] = _DXGIFormat.index_to_fmt[_fmt_index]
+del _four_cc, _fmt_index
+
 # Pitch calculations
 # https://docs.microsoft.com/en-us/windows/win32/direct3ddds/dx-graphics-dds-pguide
 # https://github.com/microsoft/DirectXTex/blob/master/DirectXTex/DirectXTexUtil.cpp
@@ -598,6 +629,9 @@ class DDSFile(AFile):
     """A DDS file, currently just reads the DDS and DX10 headers, if
     present, then reads and stores the rest of the stream."""
     __slots__ = (u'dds_header', u'dds_dxt10', u'dds_contents')
+    # The most bytes load_headers will read
+    headers_max_size = _HEADER_SIZE + 4 + 20 # magic and DXT10 header
+
     def load_file(self):
         """Load the entire DDS file from the file that this DDSFile instance
         was created with."""
@@ -613,6 +647,57 @@ def load_from_stream(self, ins):
         # Read and store the rest of the stream
         self.dds_contents = ins.read()
 
+    def load_headers(self, ins):
+        """Load only the DDS header and the DXT10 header, if present, from the
+        specified stream. Returns the size of the headers."""
+        self.dds_header.load_header(ins)
+        if self.dds_header.ddspf.needs_dxt10:
+            self.dds_dxt10.load_header(ins)
+            return self.headers_max_size
+        return _HEADER_SIZE + 4 # magic
+
+    def get_dxgi_format(self):
+        """Returns the DXGI format of this DDS file, converting legacy pixel
+        formats to their DXGI equivalents. Raises a DDSError if there is no
+        such equivalent."""
+        if self.dds_header.ddspf.needs_dxt10:
+            return self.dds_dxt10.dxgi_format
+        try:
+            return _legacy_to_dxgi[_pf_key(self.dds_header.ddspf)]
+        except KeyError:
+            raise DDSError(u'Unsupported legacy pixel format: %r' %
+                           (_pf_key(self.dds_header.ddspf),))
+
+    def get_missing_mips(self):
+        """Returns how many mipmaps this DDS file lacks compared to a full
+        mipmap chain, i.e. one going all the way down to 1x1."""
+        full_chain = max(self.dds_header.dw_width, self.dds_header.dw_height,
+                         1).bit_length()
+        return max(full_chain - max(self.dds_header.dw_mip_map_count, 1), 0)
+
+    def get_vram_size(self):
+        """Returns the size in bytes of the data of this DDS file, i.e. of
+        all its mipmaps, faces and slices, based only on its headers. This is
+        roughly how much video memory it takes up once loaded. Raises a
+        DDSError if its format is not supported."""
+        dds_header = self.dds_header
+        caps2 = _CAPS2_FLAGS(dds_header.dw_caps2)
+        num_images = 1
+        if caps2.DDSCAPS2_CUBEMAP:
+            num_images = 6
+        if dds_header.ddspf.needs_dxt10:
+            num_images = max(self.dds_dxt10.array_size, 1) * (
+                6 if self.dds_dxt10.misc_flag & 0x4 else num_images)
+        depth = dds_header.dw_depth if caps2.DDSCAPS2_VOLUME else 1
+        width, height = dds_header.dw_width, dds_header.dw_height
+        dxgi_format = self.get_dxgi_format()
+        vram_size = 0
+        for mip in xrange(max(dds_header.dw_mip_map_count, 1)):
+            vram_size += dxgi_format.compute_slice_pitch(
+                max(width >> mip, 1), max(height >> mip, 1)) * max(
+                depth >> mip, 1)
+        return vram_size * num_images
+
     def dump_file(self):
         """Dumps this DDS file to a bytestring and returns the result."""
         out_data = self.dds_header.dump_header()
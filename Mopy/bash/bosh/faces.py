@@ -495,7 +495,7 @@ def mod_addFace(modInfo,face):
             npc.unused2 = face.unused2
         if face.attributes: npc.attributes = face.attributes
         npc.setChanged()
-        modFile.tops[b'NPC_'].records.append(npc)
+        modFile.tops[b'NPC_'].setRecord(npc)
         #--Save
         modFile.safeSave()
         return npc
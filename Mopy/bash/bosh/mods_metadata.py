@@ -24,13 +24,16 @@
 
 import io
 import zlib
+from array import array
+from bisect import bisect_left
 from collections import defaultdict
 
 from ._mergeability import is_esl_capable
 from .. import balt, bolt, bush, bass, load_order
-from ..bolt import GPath, deprint, structs_cache
+from ..bolt import GPath, deprint, structs_cache, struct_error
 from ..brec import ModReader, MreRecord, RecordHeader, SubrecordBlob, null1
-from ..exception import CancelError, ModError
+from ..exception import CancelError, ModError, StateError
+from ..mod_files import ModHeaderReader
 
 # BashTags dir ----------------------------------------------------------------
 def get_tags_from_dir(plugin_name):
@@ -150,7 +153,8 @@ def checkMods(showModList=False, showCRC=False, showVersion=True,
     if mod_checker:
         try:
             with balt.Progress(_(u'Scanning for Dirty Edits...'),u'\n'+u' '*60, parent=mod_checker, abort=True) as progress:
-                ret = ModCleaner.scan_Many(scan,ModCleaner.ITM|ModCleaner.UDR,progress)
+                # ITM scanning reads every master, so only look for UDRs here
+                ret = ModCleaner.scan_Many(scan,ModCleaner.UDR,progress)
                 for i,mod in enumerate(scan):
                     udrs,itms,fog = ret[i]
                     if mod.name == GPath(u'Unofficial Oblivion Patch.esp'): itms.discard((GPath(u'Oblivion.esm'),0x00AA3C))
@@ -275,14 +279,18 @@ def checkMods(showModList=False, showCRC=False, showVersion=True,
 
 #------------------------------------------------------------------------------
 _wrld_types = frozenset((b'CELL', b'WRLD'))
+def _master_table(modInfo):
+    """Return the names the mod indices of modInfo's FormIDs refer to."""
+    return tuple(modInfo.masterNames) + (modInfo.name,)
+
 class ModCleaner(object):
-    """Class for cleaning ITM and UDR edits from mods. ITM detection does not
-    currently work with PBash."""
+    """Class for cleaning ITM and UDR edits from mods. ITMs are detected by
+    comparing content hashes of the raw records, see scan_Many."""
     UDR     = 0x01  # Deleted references
     ITM     = 0x02  # Identical to master records
     FOG     = 0x04  # Nvidia Fog Fix
     ALL = UDR|ITM|FOG
-    DEFAULT = UDR|ITM
+    DEFAULT = UDR # ITM scanning reads all the masters, so it's opt-in
 
     class UdrInfo(object):
         # UDR info
@@ -338,13 +346,15 @@ def scan_Many(modInfos, what=DEFAULT, progress=bolt.Progress(),
         __wrld_types=_wrld_types, __unpacker2=structs_cache[u'2i'].unpack):
         """Scan multiple mods for dirty edits"""
         if len(modInfos) == 0: return []
-        if not (what & (ModCleaner.UDR|ModCleaner.FOG)):
+        if not (what & ModCleaner.ALL):
             return [(set(), set(), set())] * len(modInfos)
-        # Python can't do ITM scanning
         doUDR = what & ModCleaner.UDR
+        doITM = what & ModCleaner.ITM
         doFog = what & ModCleaner.FOG
-        progress.setFull(max(len(modInfos),1))
+        # ITM scanning needs a second pass over the masters, see below
+        progress.setFull(max(len(modInfos) * (2 if doITM else 1), 1))
         ret = []
+        itm_scans = []
         for i,modInfo in enumerate(modInfos):
             progress(i,_(u'Scanning...') + u'\n%s' % modInfo.name)
             itm = set()
@@ -352,6 +362,12 @@ def scan_Many(modInfos, what=DEFAULT, progress=bolt.Progress(),
             #--UDR stuff
             udr = {}
             parents_to_scan = defaultdict(set)
+            #--ITM stuff: content hashes of the overrides, keyed by long fid
+            overrides = {}
+            override_tops = set()
+            itm_parents = set() # parents of child groups can't be removed
+            master_table = _master_table(modInfo)
+            max_index = len(master_table) - 1
             if len(modInfo.masterNames) > 0:
                 subprogress = bolt.SubProgress(progress,i,i+1)
                 if detailed:
@@ -362,6 +378,7 @@ def scan_Many(modInfos, what=DEFAULT, progress=bolt.Progress(),
                 parentType = None
                 parentFid = None
                 parentParentFid = None
+                top_sig = None
                 # Location (Interior = #, Exteror = (X,Y)
                 with ModReader(modInfo.name,modInfo.getPath().open(u'rb')) as ins:
                     try:
@@ -376,10 +393,20 @@ def scan_Many(modInfos, what=DEFAULT, progress=bolt.Progress(),
                             #(type,size,flags,fid,uint2) = ins.unpackRecHeader()
                             if rtype == b'GRUP':
                                 groupType = header.groupType
-                                if groupType == 0 and header.label not in __wrld_types:
+                                if groupType == 0:
+                                    top_sig = header.label
+                                if groupType == 0 and not doITM and \
+                                        header.label not in __wrld_types:
                                     # Skip Tops except for WRLD and CELL groups
                                     header.skip_group(ins)
-                                elif detailed:
+                                    continue
+                                if doITM and groupType in {1, 6, 7}:
+                                    # World, Cell and Topic Children
+                                    label = header.label
+                                    itm_parents.add((master_table[min(
+                                        label >> 24, max_index)],
+                                                     label & 0xFFFFFF))
+                                if detailed:
                                     if groupType == 1:
                                         # World Children
                                         parentParentFid = header.label
@@ -397,6 +424,16 @@ def scan_Many(modInfos, what=DEFAULT, progress=bolt.Progress(),
                                         pass
                             else:
                                 header_fid = header.fid
+                                if doITM and header_fid >> 24 < max_index:
+                                    # An override - hash it, then rewind for
+                                    # the checks below
+                                    rec_pos = insTell()
+                                    overrides[(
+                                        master_table[header_fid >> 24],
+                                        header_fid & 0xFFFFFF)] = MreRecord(
+                                        header, ins).content_hash()
+                                    override_tops.add(top_sig)
+                                    ins_seek(rec_pos)
                                 if doUDR and header.flags1 & 0x20 and rtype in (
                                     b'ACRE',               #--Oblivion only
                                     b'ACHR',b'REFR',        #--Both
@@ -462,9 +499,155 @@ def scan_Many(modInfos, what=DEFAULT, progress=bolt.Progress(),
                         deprint(u'Error scanning %s, file read pos: %i:\n' % (modInfo, ins.tell()), traceback=True)
                         udr = itm = fog = None
                 #--Done
+            if doITM and itm is not None and overrides:
+                itm_scans.append((itm, master_table, overrides,
+                                  override_tops, itm_parents))
             ret.append((udr.values() if udr is not None else None,itm,fog))
+        if itm_scans:
+            ModCleaner._find_itms(itm_scans, bolt.SubProgress(
+                progress, len(modInfos), len(modInfos) * 2))
         return ret
 
+    @staticmethod
+    def _find_itms(itm_scans, progress):
+        """Compare the overrides hashed by scan_Many to the winning versions
+        of the records among the masters of each mod, populating the itm sets.
+        Only the needed records of each master are hashed and each master is
+        read once, however many of the scanned mods depend on it. Overrides
+        are only compared when the FormIDs in both versions were saved against
+        the same master table - otherwise we'd have to decode them, so we
+        play it safe and never flag those."""
+        from . import modInfos
+        wanted = defaultdict(set)
+        wanted_tops = defaultdict(set)
+        for itm, master_table, overrides, override_tops, itm_parents in \
+                itm_scans:
+            for master in master_table[:-1]:
+                if master not in modInfos: continue
+                owners = set(_master_table(modInfos[master]))
+                wanted[master].update(
+                    f for f in overrides if f[0] in owners)
+                wanted_tops[master] |= override_tops
+        progress.setFull(max(len(wanted), 1))
+        master_hashes = {}
+        for i, master in enumerate(sorted(wanted)):
+            progress(i, _(u'Scanning...') + u'\n%s' % master)
+            master_hashes[master] = ModCleaner._hash_records(
+                modInfos[master], wanted[master], wanted_tops[master],
+                bolt.SubProgress(progress, i, i + 1))
+        for itm, master_table, overrides, override_tops, itm_parents in \
+                itm_scans:
+            for long_fid, rec_hash in overrides.iteritems():
+                if long_fid in itm_parents: continue
+                # The winning version is the one in the last master
+                for master in reversed(master_table[:-1]):
+                    master_hash = master_hashes.get(master, {}).get(long_fid)
+                    if master_hash is None: continue
+                    winner_table = _master_table(modInfos[master])
+                    if master_hash == rec_hash and master_table[
+                            :len(winner_table)] == winner_table:
+                        itm.add(long_fid)
+                    break
+
+    @staticmethod
+    def _hash_records(modInfo, long_fids, top_sigs, progress):
+        """Return a dict mapping those of long_fids found in modInfo to the
+        content hashes of their records. Only top groups in top_sigs are
+        scanned."""
+        master_table = _master_table(modInfo)
+        max_index = len(master_table) - 1
+        rec_hashes = {}
+        progress.setFull(max(modInfo.size, 1))
+        try:
+            with ModReader(modInfo.name,
+                           modInfo.getPath().open(u'rb')) as ins:
+                insAtEnd = ins.atEnd
+                insTell = ins.tell
+                insUnpackRecHeader = ins.unpackRecHeader
+                ins_seek = ins.seek
+                while not insAtEnd():
+                    progress(insTell())
+                    header = insUnpackRecHeader()
+                    if header.recType == b'GRUP':
+                        if header.groupType == 0 and \
+                                header.label not in top_sigs:
+                            header.skip_group(ins)
+                        continue # else descend into the group
+                    header_fid = header.fid
+                    long_fid = (master_table[min(header_fid >> 24, max_index)],
+                                header_fid & 0xFFFFFF)
+                    if long_fid in long_fids:
+                        rec_hashes[long_fid] = MreRecord(
+                            header, ins).content_hash()
+                    else:
+                        ins_seek(header.size, 1)
+        except CancelError:
+            raise
+        except:
+            deprint(u'Error scanning %s for ITM detection:' % modInfo,
+                    traceback=True)
+            return {} # can't tell, so don't flag anything
+        return rec_hashes
+
+    def remove_itms(self, progress=bolt.Progress(),
+                    __packer=structs_cache[u'I'].pack):
+        """Rewrite the mod without the ITM records found by the last scan,
+        dropping any groups left empty. Returns the number of records
+        removed."""
+        to_remove = self.itm
+        if not to_remove: return 0
+        minfo_path = self.modInfo.getPath()
+        master_table = _master_table(self.modInfo)
+        max_index = len(master_table) - 1
+        hsize = RecordHeader.rec_header_size
+        removed = [0, 0] # records, groups
+        progress.setFull(max(self.modInfo.size, 1))
+        def copy_records(end_pos):
+            """Copy the raw records and groups up to end_pos, minus the ITMs,
+            and return them."""
+            out = io.BytesIO()
+            while ins.tell() < end_pos:
+                head_pos = ins.tell()
+                progress(head_pos)
+                header = ins.unpackRecHeader()
+                if header.recType == b'GRUP':
+                    ins.seek(head_pos)
+                    raw_head = ins.read(hsize)
+                    grup_body = copy_records(head_pos + header.size)
+                    if grup_body or header.size == hsize:
+                        out.write(raw_head[:4] + __packer(
+                            hsize + len(grup_body)) + raw_head[8:])
+                        out.write(grup_body)
+                    else:
+                        removed[1] += 1
+                    continue
+                header_fid = header.fid
+                if (master_table[min(header_fid >> 24, max_index)],
+                        header_fid & 0xFFFFFF) in to_remove:
+                    ins.seek(header.size, 1)
+                    removed[0] += 1
+                else:
+                    ins.seek(head_pos)
+                    out.write(ins.read(hsize + header.size))
+            return out.getvalue()
+        with ModReader(self.modInfo.name, minfo_path.open(u'rb')) as ins:
+            tes4_rec = bush.game.plugin_header_class(ins.unpackRecHeader(),
+                                                     ins, True)
+            body = copy_records(ins.size)
+        if not removed[0]: return 0
+        # The record count in the header includes groups
+        tes4_rec.numRecords = max(tes4_rec.numRecords - sum(removed), 0)
+        tes4_rec.setChanged()
+        tes4_rec.getSize()
+        with minfo_path.temp.open(u'wb') as out:
+            tes4_rec.dump(out)
+            out.write(body)
+        self.modInfo.makeBackup()
+        minfo_path.untemp()
+        self.modInfo.setmtime(crc_changed=True) # removed ITMs
+        self.itm = set()
+        return removed[0]
+
 #------------------------------------------------------------------------------
 class NvidiaFogFixer(object):
     """Fixes cells to avoid nvidia fog problem."""
@@ -579,3 +762,208 @@ def getRecordReader(flags, size):
                     records.append((header.fid, eid))
                     ins.seek(next_record) # we may have break'd at EDID
         del group_records[bush.game.Esp.plugin_header_sig]
+
+#------------------------------------------------------------------------------
+class OverrideIndex(object):
+    """Index of which plugins contain which records, i.e. who overrides what.
+    Maps the long FormIDs of the records of all plugins in modInfos to the
+    versions of them in those plugins - tuples of plugin name, record
+    signature and content hash (see MreRecord.content_hash), in load order.
+
+    The data comes from header level scans of the plugins (see
+    ModHeaderReader.read_record_hashes), so no plugins need to be loaded. It
+    is cached in Overrides.dat - refresh only rescans plugins that changed.
+    For each plugin we cache compact tables of its overrides and of its own
+    new records, sorted by FormID so they can be bisected."""
+    _cache_version = 1
+    _hash_size = 20 # size of MreRecord.content_hash digests
+
+    def __init__(self, pkl_path):
+        self._pickle_dict = bolt.PickleDict(pkl_path)
+        # plugin name -> (size and mtime, master table, override records,
+        # new records) - records are (raw fids array, sigs, hashes) tuples
+        self._plugin_records = None
+        # long fid -> list of versions, see _build_index
+        self._fid_versions = None
+        # the load order _fid_versions was built for
+        self._lo_signature = None
+
+    def refresh(self, mod_infos, progress=None):
+        """Rescan the plugins in mod_infos that were added or changed since
+        the last refresh and forget deleted ones. Return True if anything
+        changed."""
+        progress = progress or bolt.Progress()
+        if self._plugin_records is None:
+            self._pickle_dict.load()
+            if self._pickle_dict.vdata.get(
+                    u'version') == self._cache_version:
+                self._plugin_records = self._pickle_dict.pickled_data.copy()
+            else: # outdated cache or no cache at all
+                self._plugin_records = {}
+        plugin_records = self._plugin_records
+        to_scan = [p for p, minf in mod_infos.iteritems() if
+                   plugin_records.get(p, (None,))[0] != (minf.size,
+                                                         minf.mtime)]
+        deleted = set(plugin_records) - set(mod_infos)
+        progress.setFull(max(len(to_scan), 1))
+        for i, plugin in enumerate(load_order.get_ordered(to_scan)):
+            progress(i, _(u'Scanning %s') % plugin)
+            try:
+                plugin_records[plugin] = self._scan_plugin(mod_infos[plugin])
+            except (ModError, zlib.error, struct_error):
+                deprint(u'Failed to index %s' % plugin, traceback=True)
+                deleted.add(plugin)
+        for plugin in deleted:
+            plugin_records.pop(plugin, None)
+        if not (to_scan or deleted): return False
+        self._fid_versions = None
+        self._pickle_dict.vdata[u'version'] = self._cache_version
+        self._pickle_dict.pickled_data.clear()
+        self._pickle_dict.pickled_data.update(plugin_records)
+        self._pickle_dict.save()
+        return True
+
+    @staticmethod
+    def _scan_plugin(mod_info):
+        master_table = tuple(mod_info.masterNames) + (mod_info.name,)
+        num_masters = len(master_table) - 1
+        plugin_header_sig = bush.game.Esp.plugin_header_sig
+        override_recs, new_recs = [], []
+        for header, rec_hash in ModHeaderReader.read_record_hashes(mod_info):
+            rec_sig = header.recType
+            if rec_sig == plugin_header_sig: continue
+            header_fid = header.fid
+            (override_recs if header_fid >> 24 < num_masters else new_recs
+             ).append((header_fid, rec_sig, rec_hash))
+        def _pack_records(recs):
+            recs.sort(key=lambda r: r[0])
+            return (array(u'I', [r[0] for r in recs]),
+                    b''.join([r[1] for r in recs]),
+                    b''.join([r[2] for r in recs]))
+        return ((mod_info.size, mod_info.mtime), master_table,
+                _pack_records(override_recs), _pack_records(new_recs))
+
+    def _build_index(self):
+        """Build the long fid -> versions mapping. Only overridden records
+        are included, in load order - the plugin that added the record
+        comes first."""
+        self._lo_signature = load_order.cached_lo_tuple()
+        fid_versions = defaultdict(list)
+        plugin_records = self._plugin_records
+        hash_size = self._hash_size
+        for plugin in load_order.get_ordered(plugin_records):
+            master_table, (fids, sigs, hashes) = plugin_records[plugin][1:3]
+            max_index = len(master_table) - 1
+            for i, fid in enumerate(fids):
+                fid_versions[(master_table[min(fid >> 24, max_index)],
+                              fid & 0xFFFFFF)].append(
+                    (plugin, sigs[4 * i:4 * i + 4],
+                     hashes[hash_size * i:hash_size * (i + 1)]))
+        for long_fid, versions in fid_versions.iteritems():
+            original = self._get_new_record(*long_fid)
+            if original is not None: versions.insert(0, original)
+        self._fid_versions = fid_versions
+
+    def _get_new_record(self, plugin, object_id):
+        """Return the version of the record plugin added with the specified
+        object index, or None if plugin is unknown or has no such record."""
+        try:
+            master_table, _overrides, (fids, sigs, hashes) = \
+                self._plugin_records[plugin][1:]
+        except KeyError:
+            return None
+        raw_fid = (len(master_table) - 1) << 24 | object_id
+        i = bisect_left(fids, raw_fid)
+        if i == len(fids) or fids[i] != raw_fid: return None
+        return (plugin, sigs[4 * i:4 * i + 4],
+                hashes[self._hash_size * i:self._hash_size * (i + 1)])
+
+    # Query API ---------------------------------------------------------------
+    def _get_fid_versions(self):
+        if self._plugin_records is None:
+            raise StateError(u'OverrideIndex queried before refresh')
+        # the winners change when the plugins are reordered
+        if self._fid_versions is None or \
+                self._lo_signature != load_order.cached_lo_tuple():
+            self._build_index()
+        return self._fid_versions
+
+    def get_versions(self, long_fid, plugins=None):
+        """Return the versions of the record with the specified long fid as a
+        list of (plugin, signature, hash) tuples in load order, optionally
+        only those in the plugins set. Records that are not overridden by any
+        plugin are not indexed - an empty list is returned for them."""
+        versions = self._get_fid_versions().get(long_fid, [])
+        if plugins is None: return list(versions)
+        return [v for v in versions if v[0] in plugins]
+
+    def get_overrides(self, plugin):
+        """Return the long fids of all records plugin overrides."""
+        try:
+            master_table, (fids, _sigs, _hashes) = \
+                self._plugin_records[plugin][1:3]
+        except KeyError:
+            return []
+        max_index = len(master_table) - 1
+        return [(master_table[min(fid >> 24, max_index)], fid & 0xFFFFFF)
+                for fid in fids]
+
+    def get_conflicts(self, plugins):
+        """Return two dicts mapping each plugin in plugins to lists of the
+        records it adds or overrides that a later plugin in plugins
+        overrides, as (long fid, signature, winning plugin) tuples. The first
+        dict holds the records it loses - those the winner overrides with
+        different contents, so ITM overrides don't count. The second one
+        holds the records whose versions can't be compared, since the
+        FormIDs in them were saved against different master tables - as in
+        ModCleaner._find_itms, they are only compared when the master table
+        of one plugin is a prefix of the other's."""
+        plugins = set(plugins)
+        plugin_records = self._plugin_records
+        losers, unknown = defaultdict(list), defaultdict(list)
+        for long_fid, versions in self._get_fid_versions().iteritems():
+            versions = [v for v in versions if v[0] in plugins]
+            if len(versions) < 2: continue
+            winner, win_sig, win_hash = versions[-1]
+            win_table = plugin_records[winner][1]
+            for plugin, rec_sig, rec_hash in versions[:-1]:
+                rec_table = plugin_records[plugin][1]
+                common_len = min(len(rec_table), len(win_table))
+                if rec_table[:common_len] != win_table[:common_len]:
+                    unknown[plugin].append((long_fid, rec_sig, winner))
+                elif rec_hash != win_hash:
+                    losers[plugin].append((long_fid, rec_sig, winner))
+        return losers, unknown
+
+    def conflicts_report(self, plugins):
+        """Return a wtxt report of the override counts, the losing records
+        and the records that can't be compared of plugins - see
+        get_conflicts."""
+        losers, unknown = self.get_conflicts(plugins)
+        log = bolt.LogFile(io.StringIO())
+        log.setHeader(u'= ' + _(u'Conflicts'))
+        log(_(u'This is a report of the records each mod overrides and of '
+              u'those it adds or overrides that lose to a later mod.') + u' ' +
+            _(u'Records whose versions use different master lists cannot be '
+              u'compared, so they are listed as unknown.') + u'\n')
+        for plugin in load_order.get_ordered(plugins):
+            num_overrides = len(self._plugin_records.get(
+                plugin, (None, None, ((),)))[2][0])
+            plugin_losers = losers.get(plugin, [])
+            plugin_unknown = unknown.get(plugin, [])
+            log(u'* __%s__: %s' % (plugin, _(
+                u'%(num_overrides)d overrides, %(num_losers)d losing, '
+                u'%(num_unknown)d unknown') % {
+                u'num_overrides': num_overrides,
+                u'num_losers': len(plugin_losers),
+                u'num_unknown': len(plugin_unknown)}))
+            for rec_status, plugin_recs in (
+                    (_(u'loses to %s'), plugin_losers),
+                    (_(u'unknown, cannot be compared with %s'),
+                     plugin_unknown)):
+                for (master_name, object_id), rec_sig, winner in sorted(
+                        plugin_recs):
+                    log(u'  * %s %s: %06X - %s' % (
+                        rec_sig.decode(u'ascii'), master_name, object_id,
+                        rec_status % winner))
+        return log.out.getvalue()
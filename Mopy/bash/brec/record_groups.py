@@ -29,11 +29,12 @@
 from collections import deque
 from itertools import chain, izip
 from operator import itemgetter, attrgetter
+from weakref import ref
 
 # Wrye Bash imports
 from .mod_io import GrupHeader, ModReader, RecordHeader, TopGrupHeader
 from .utils_constants import group_types
-from ..bolt import GPath, pack_int, structs_cache
+from ..bolt import GPath, structs_cache
 from ..exception import AbstractError, ModError, ModFidMismatchError
 
 class MobBase(object):
@@ -42,7 +43,8 @@ class MobBase(object):
 
     __slots__ = [u'header',u'size',u'label',u'groupType', u'stamp', u'debug',
                  u'data', u'changed', u'numRecords', u'loadFactory',
-                 u'inName'] ##: nice collection of forbidden names, including header -> group_header
+                 u'inName', u'_parent_ref', u'_size_cache', u'_num_cache',
+                 u'__weakref__'] ##: nice collection of forbidden names, including header -> group_header
 
     def __init__(self, header, loadFactory, ins=None, do_unpack=False):
         self.header = header
@@ -60,6 +62,11 @@ def __init__(self, header, loadFactory, ins=None, do_unpack=False):
         self.numRecords = -1
         self.loadFactory = loadFactory
         self.inName = ins and ins.inName
+        # Weak reference to the block containing us and our cached size and
+        # record counts - see invalidate_caches
+        self._parent_ref = None
+        self._size_cache = None
+        self._num_cache = {}
         if ins: self.load_rec_group(ins, do_unpack)
 
     def load_rec_group(self, ins=None, do_unpack=False):
@@ -85,6 +92,33 @@ def load_rec_group(self, ins=None, do_unpack=False):
     def setChanged(self,value=True):
         """Sets changed attribute to value. [Default = True.]"""
         self.changed = value
+        self.invalidate_caches()
+
+    def invalidate_caches(self):
+        """Drops the cached sizes and record counts of this block and of all
+        blocks containing it. Called whenever a record of ours is changed,
+        added, removed or replaced."""
+        block = self
+        while block is not None:
+            block._drop_caches()
+            parent_ref = block._parent_ref
+            block = parent_ref() if parent_ref is not None else None
+
+    def _drop_caches(self):
+        """Drops the cached values of this block only. Subclasses that cache
+        more than their total size and record count should extend this."""
+        self._size_cache = None
+        self._num_cache.clear()
+
+    def _adopt(self, children):
+        """Links the specified records and/or blocks to this block, so that
+        changing them invalidates our caches. Called while computing cached
+        values, which guarantees that everything that contributed to a cached
+        value will invalidate it. Returns children for convenience."""
+        self_ref = ref(self)
+        for child in children:
+            child._parent_ref = self_ref
+        return children
 
     def getSize(self):
         """Returns size (including size of any group headers)."""
@@ -242,10 +276,12 @@ def getSize(self):
         """Returns size (including size of any group headers)."""
         if not self.changed:
             return self.size
-        else:
+        if self._size_cache is None:
             hsize = RecordHeader.rec_header_size
-            return hsize + sum(
-                (hsize + record.getSize()) for record in self.records)
+            self._size_cache = hsize + sum(
+                (hsize + record.getSize())
+                for record in self._adopt(self.records))
+        return self._size_cache
 
     def dump(self,out):
         """Dumps group header and then records."""
@@ -272,6 +308,7 @@ def convertFids(self,mapper,toLong):
         for record in self.records:
             record.convertFids(mapper,toLong)
         self.id_records.clear()
+        self.invalidate_caches()
 
     def indexRecords(self):
         """Indexes records by fid."""
@@ -304,6 +341,7 @@ def setRecord(self,record):
         else:
             self_recs.append(record)
         self_id_recs[record_id] = record
+        self.invalidate_caches()
 
     def copy_records(self, records):
         """Copies the specified records into this block, overwriting existing
@@ -380,6 +418,7 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
         # filtered out here.
         block.records = filtered
         block.indexRecords()
+        block.invalidate_caches()
 
     def iter_records(self):
         return iter(self.records)
@@ -420,12 +459,15 @@ def _load_rec_group(self, ins, endPos):
         self.setChanged()
 
     def getSize(self):
-        hsize = RecordHeader.rec_header_size
-        size = hsize + self.dial.getSize()
-        if self.records:
-            # First hsize is for the single GRUP header before the INFOs
-            size += hsize + sum(hsize + i.getSize() for i in self.records)
-        return size
+        if self._size_cache is None:
+            hsize = RecordHeader.rec_header_size
+            size = hsize + self._adopt((self.dial,))[0].getSize()
+            if self.records:
+                # First hsize is for the single GRUP header before the INFOs
+                size += hsize + sum(
+                    hsize + i.getSize() for i in self._adopt(self.records))
+            self._size_cache = size
+        return self._size_cache
 
     def getNumRecords(self,includeGroups=True):
         # DIAL record + GRUP + INFOs
@@ -446,9 +488,10 @@ def dump(self, out):
             if not self.records: return
             # Sort our INFOs by PNAM just before writing them out
             self.records = self._sort_by_pnam()
-            # Now we're ready to dump out the headers and each INFO child
+            # Now we're ready to dump out the headers and each INFO child -
+            # the INFO GRUP is everything but the DIAL record and its header
             hsize = RecordHeader.rec_header_size
-            infos_size = hsize + sum(hsize + i.getSize() for i in self.records)
+            infos_size = self.getSize() - hsize - self.dial.getSize()
             # Write out a GRUP header (needed in order to know the number of
             # bytes to read for all the INFOs), then dump all the INFOs
             out.write(GrupHeader(infos_size, self.dial.fid, 7, self.stamp,
@@ -503,6 +546,7 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
                 # a copy into ourselves
                 mergeIdsAdd(src_dial_fid)
                 self.dial = src_dial.getTypeCopy()
+                self.invalidate_caches()
             # Now we're ready to filter and merge the INFO children
             super(MobDial, self).merge_records(block, loadSet, mergeIds,
                 iiSkipMerge, doFilter)
@@ -524,6 +568,7 @@ def updateRecords(self, srcBlock, mergeIds):
         if not src_dial.flags1.ignored:
             self.dial = src_dial.getTypeCopy()
             mergeIds.discard(src_dial_fid)
+            self.invalidate_caches()
         super(MobDial, self).updateRecords(srcBlock, mergeIds)
 
     def _sort_by_pnam(self):
@@ -640,18 +685,24 @@ def _load_rec_group(self, ins, endPos):
 
     def getSize(self):
         """Returns size of records plus group and record headers."""
-        size = RecordHeader.rec_header_size
-        for dialogue in self.dialogues:
-            # Resynchronize the stamps (##: unsure if needed)
-            dialogue.stamp = self.stamp
-            size += dialogue.getSize()
-        return size
+        if self._size_cache is None:
+            size = RecordHeader.rec_header_size
+            for dialogue in self._adopt(self.dialogues):
+                # Resynchronize the stamps (##: unsure if needed)
+                dialogue.stamp = self.stamp
+                size += dialogue.getSize()
+            self._size_cache = size
+        return self._size_cache
 
     def getNumRecords(self,includeGroups=True):
         """Returns number of records, including self plus info records."""
-        self.numRecords = sum(d.getNumRecords(includeGroups)
-                              for d in self.dialogues)
-        self.numRecords += includeGroups # top DIAL GRUP
+        try:
+            self.numRecords = self._num_cache[includeGroups]
+        except KeyError:
+            self.numRecords = sum(d.getNumRecords(includeGroups)
+                                  for d in self._adopt(self.dialogues))
+            self.numRecords += includeGroups # top DIAL GRUP
+            self._num_cache[includeGroups] = self.numRecords
         return self.numRecords
 
     def dump(self, out):
@@ -669,6 +720,7 @@ def dump(self, out):
     def convertFids(self, mapper, toLong):
         for dialogue in self.dialogues:
             dialogue.convertFids(mapper, toLong)
+        self.invalidate_caches()
 
     def get_all_signatures(self):
         return set(chain.from_iterable(d.get_all_signatures()
@@ -730,6 +782,7 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
         # Apply any merge filtering we've done above to the record block
         block.dialogues = filtered_dials
         block.indexRecords()
+        block.invalidate_caches()
 
     def remove_dialogue(self, dialogue):
         """Removes the specified DIAL from this block. The exact DIAL object
@@ -738,6 +791,7 @@ def remove_dialogue(self, dialogue):
             self.indexRecords()
         self.dialogues.remove(dialogue)
         del self.id_dialogues[dialogue.fid]
+        self.invalidate_caches()
 
     def set_dialogue(self, dialogue):
         """Adds the specified DIAL to self, overriding an existing one with
@@ -746,13 +800,16 @@ def set_dialogue(self, dialogue):
             self.indexRecords()
         dial_fid = dialogue.fid
         if dial_fid in self.id_dialogues:
-            self.id_dialogues[dial_fid].dial = dialogue
+            dial_block = self.id_dialogues[dial_fid]
+            dial_block.dial = dialogue
+            dial_block.invalidate_caches()
         else:
             dial_block = MobDial(GrupHeader(0, 0, 7, self.stamp),
                 self.loadFactory, dialogue)
             dial_block.setChanged()
             self.dialogues.append(dial_block)
             self.id_dialogues[dial_fid] = dial_block
+            self.invalidate_caches()
 
     def updateMasters(self, masterset_add):
         for dialogue in self.dialogues:
@@ -776,7 +833,7 @@ class MobCell(MobBase):
     """Represents cell block structure -- including the cell and all
     subrecords."""
     __slots__ = [u'cell', u'persistent_refs', u'distant_refs', u'temp_refs',
-                 u'land', u'pgrd']
+                 u'land', u'pgrd', u'_children_sizes']
 
     def __init__(self, header, loadFactory, cell, ins=None, do_unpack=False):
         self.cell = cell
@@ -785,6 +842,7 @@ def __init__(self, header, loadFactory, cell, ins=None, do_unpack=False):
         self.temp_refs = []
         self.land = None
         self.pgrd = None
+        self._children_sizes = None
         super(MobCell, self).__init__(header, loadFactory, ins, do_unpack)
 
     def _load_rec_group(self, ins, endPos):
@@ -832,40 +890,53 @@ def _load_rec_group(self, ins, endPos):
                 self.pgrd = recClass(header, ins, True)
         self.setChanged()
 
+    def _drop_caches(self):
+        super(MobCell, self)._drop_caches()
+        self._children_sizes = None
+
     def getSize(self):
         """Returns size (including size of any group headers)."""
-        return RecordHeader.rec_header_size + self.cell.getSize() + \
-               self.getChildrenSize()
+        if self._size_cache is None:
+            self._size_cache = (RecordHeader.rec_header_size +
+                                self._adopt((self.cell,))[0].getSize() +
+                                self.getChildrenSize())
+        return self._size_cache
 
     def getChildrenSize(self):
         """Returns size of all children, including the group header.  This
         does not include the cell itself."""
-        size = self.getPersistentSize() + self.getTempSize() + \
-               self.getDistantSize()
+        size = sum(self._get_children_sizes())
         return size + RecordHeader.rec_header_size * bool(size)
 
     def getPersistentSize(self):
         """Returns size of all persistent children, including the persistent
         children group."""
-        hsize = RecordHeader.rec_header_size
-        size = sum(hsize + x.getSize() for x in self.persistent_refs)
-        return size + hsize * bool(size)
+        return self._get_children_sizes()[0]
 
     def getTempSize(self):
         """Returns size of all temporary children, including the temporary
         children group."""
-        hsize = RecordHeader.rec_header_size
-        size = sum(hsize + x.getSize() for x in self.temp_refs)
-        if self.pgrd: size += hsize + self.pgrd.getSize()
-        if self.land: size += hsize + self.land.getSize()
-        return size + hsize * bool(size)
+        return self._get_children_sizes()[1]
 
     def getDistantSize(self):
         """Returns size of all distant children, including the distant
         children group."""
-        hsize = RecordHeader.rec_header_size
-        size = sum(hsize + x.getSize() for x in self.distant_refs)
-        return size + hsize * bool(size)
+        return self._get_children_sizes()[2]
+
+    def _get_children_sizes(self):
+        """Returns a tuple of the sizes of the persistent, temporary and
+        distant children groups, computing and caching them if needed."""
+        if self._children_sizes is None:
+            hsize = RecordHeader.rec_header_size
+            def _group_size(records):
+                size = sum(hsize + x.getSize() for x in self._adopt(records))
+                return size + hsize * bool(size)
+            self._children_sizes = (
+                _group_size(self.persistent_refs),
+                _group_size([x for x in (self.pgrd, self.land) if x] +
+                            self.temp_refs),
+                _group_size(self.distant_refs))
+        return self._children_sizes
 
     def getNumRecords(self,includeGroups=True):
         """Returns number of records, including self and all children."""
@@ -942,6 +1013,7 @@ def convertFids(self,mapper,toLong):
             self.land.convertFids(mapper,toLong)
         if self.pgrd:
             self.pgrd.convertFids(mapper,toLong)
+        self.invalidate_caches()
 
     def get_all_signatures(self):
         cell_sigs = {self.cell.recType}
@@ -989,6 +1061,7 @@ def updateRecords(self, srcBlock, mergeIds, __attrget=attrgetter(
                 if not record.flags1.ignored and src_fid in fids:
                     self_rec_list[fids[src_fid]] = record.getTypeCopy()
                     mergeDiscard(src_fid)
+        self.invalidate_caches()
 
     def iter_records(self):
         single_recs = [x for x in (self.cell, self.pgrd, self.land) if x]
@@ -1072,6 +1145,8 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
                     append_to_dest(rec_copy)
             # Apply any merge filtering we've done here
             setattr(block, list_attr, filtered_list)
+        self.invalidate_caches()
+        block.invalidate_caches()
 
     def __repr__(self):
         return (u'<CELL (%r): %u persistent record(s), %u distant record(s), '
@@ -1095,6 +1170,7 @@ def __init__(self, header, loadFactory, ins=None, do_unpack=False):
         self.cellBlocks = [] #--Each cellBlock is a cell and its related
         # records.
         self.id_cellBlock = {}
+        self._bsb_sizes = None
         super(MobCells, self).__init__(header, loadFactory, ins, do_unpack)
 
     def indexRecords(self):
@@ -1107,13 +1183,16 @@ def setCell(self,cell):
             self.indexRecords()
         fid = cell.fid
         if fid in self.id_cellBlock:
-            self.id_cellBlock[fid].cell = cell
+            cellBlock = self.id_cellBlock[fid]
+            cellBlock.cell = cell
+            cellBlock.invalidate_caches()
         else:
             cellBlock = MobCell(GrupHeader(0, 0, 6, self.stamp), ##: Note label is 0 here - specialized GrupHeader subclass?
                                 self.loadFactory, cell)
             cellBlock.setChanged()
             self.cellBlocks.append(cellBlock)
             self.id_cellBlock[fid] = cellBlock
+            self.invalidate_caches()
 
     def remove_cell(self, cell):
         """Removes the specified cell from this block. The exact cell object
@@ -1122,6 +1201,7 @@ def remove_cell(self, cell):
             self.indexRecords()
         self.cellBlocks.remove(cell)
         del self.id_cellBlock[cell.fid]
+        self.invalidate_caches()
 
     def getUsedBlocks(self):
         """Returns a set of blocks that exist in this group."""
@@ -1131,10 +1211,22 @@ def getUsedSubblocks(self):
         """Returns a set of block/sub-blocks that exist in this group."""
         return {x.getBsb() for x in self.cellBlocks}
 
+    def _drop_caches(self):
+        super(MobCells, self)._drop_caches()
+        self._bsb_sizes = None
+
     def getBsbSizes(self):
         """Returns the total size of the block, but also returns a
-        dictionary containing the sizes of the individual block,subblocks."""
-        bsbCellBlocks = [(x.getBsb(),x) for x in self.cellBlocks]
+        dictionary containing the sizes of the individual block,subblocks.
+        The result is cached until this block or one of its cells changes, so
+        it must not be modified."""
+        if self._bsb_sizes is None:
+            self._bsb_sizes = self._calc_bsb_sizes()
+        return self._bsb_sizes
+
+    def _calc_bsb_sizes(self):
+        """Computes the result of getBsbSizes."""
+        bsbCellBlocks = [(x.getBsb(),x) for x in self._adopt(self.cellBlocks)]
         bsbCellBlocks.sort(key=lambda y: y[1].cell.fid)
         bsbCellBlocks.sort(key=itemgetter(0))
         bsb_size = {}
@@ -1176,11 +1268,16 @@ def dumpBlocks(self,out,bsbCellBlocks,bsb_size,blockGroupType,
 
     def getNumRecords(self,includeGroups=True):
         """Returns number of records, including self and all children."""
-        count = sum(x.getNumRecords(includeGroups) for x in self.cellBlocks)
-        if count and includeGroups:
-            count += 1 + len(self.getUsedBlocks()) + len(
-                self.getUsedSubblocks())
-        return count
+        try:
+            return self._num_cache[includeGroups]
+        except KeyError:
+            count = sum(x.getNumRecords(includeGroups)
+                        for x in self._adopt(self.cellBlocks))
+            if count and includeGroups:
+                count += 1 + len(self.getUsedBlocks()) + len(
+                    self.getUsedSubblocks())
+            self._num_cache[includeGroups] = count
+            return count
 
     #--Fid manipulation, record filtering ----------------------------------
     def get_all_signatures(self):
@@ -1243,6 +1340,7 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
         # Apply any merge filtering we've done above to the record block
         block.cellBlocks = filtered_cell_blocks
         block.indexRecords()
+        block.invalidate_caches()
 
     def convertFids(self,mapper,toLong):
         """Converts fids between formats according to mapper.
@@ -1250,6 +1348,7 @@ def convertFids(self,mapper,toLong):
         converting to short format."""
         for cellBlock in self.cellBlocks:
             cellBlock.convertFids(mapper,toLong)
+        self.invalidate_caches()
 
     def updateRecords(self, srcBlock, mergeIds):
         """Updates any records in 'self' that exist in 'srcBlock'."""
@@ -1475,10 +1574,37 @@ def getNumRecords(self,includeGroups=True):
         count = 1 # self.world, always present
         count += bool(self.road)
         if self.worldCellBlock:
-            count += self.worldCellBlock.getNumRecords(includeGroups)
+            count += self._adopt((self.worldCellBlock,))[0].getNumRecords(
+                includeGroups)
         count += super(MobWorld, self).getNumRecords(includeGroups)
         return count
 
+    def getSize(self):
+        """Returns size of the world record plus, if present, the size of
+        the world children group."""
+        if self._size_cache is None:
+            hsize = RecordHeader.rec_header_size
+            world_size = self._adopt((self.world,))[0].getSize() + hsize
+            if not self.changed:
+                self._size_cache = self.size + world_size
+            elif self.cellBlocks or self.road or self.worldCellBlock:
+                self._size_cache = self._get_children_size() + world_size
+            else:
+                self._size_cache = world_size
+        return self._size_cache
+
+    def _get_children_size(self):
+        """Returns the size of the world children group, including its
+        header."""
+        hsize = RecordHeader.rec_header_size
+        children_size = self.getBsbSizes()[0]
+        if self.road:
+            children_size += self._adopt((self.road,))[0].getSize() + hsize
+        if self.worldCellBlock:
+            children_size += self._adopt(
+                (self.worldCellBlock,))[0].getSize()
+        return children_size
+
     def dump(self,out):
         """Dumps group header and then records.  Returns the total size of
         the world block."""
@@ -1490,11 +1616,8 @@ def dump(self,out):
             out.write(self.data)
             return self.size + worldSize
         elif self.cellBlocks or self.road or self.worldCellBlock:
-            (totalSize, bsb_size, blocks) = self.getBsbSizes()
-            if self.road:
-                totalSize += self.road.getSize() + hsize
-            if self.worldCellBlock:
-                totalSize += self.worldCellBlock.getSize()
+            bsb_size, blocks = self.getBsbSizes()[1:]
+            totalSize = self._get_children_size()
             self.header.size = totalSize
             self.header.label = self.world.fid
             self.header.groupType = 1
@@ -1555,6 +1678,7 @@ def updateRecords(self, srcBlock, mergeIds):
             self.worldCellBlock.updateRecords(srcBlock.worldCellBlock,
                 mergeIds)
         super(MobWorld, self).updateRecords(srcBlock, mergeIds)
+        self.invalidate_caches()
 
     def iter_records(self):
         single_recs = [x for x in (self.world, self.road) if x]
@@ -1628,6 +1752,7 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
                         self.worldCellBlock = None
         super(MobWorld, self).merge_records(block, loadSet, mergeIds,
             iiSkipMerge, doFilter)
+        self.invalidate_caches()
 
     def __repr__(self):
         return u'<WRLD (%r): %u record(s), %s, %s>' % (
@@ -1711,8 +1836,12 @@ def _load_rec_group(self, ins, endPos):
 
     def getSize(self):
         """Returns size (including size of any group headers)."""
-        return RecordHeader.rec_header_size + sum(
-            x.getSize() for x in self.worldBlocks)
+        if not self.changed:
+            return self.size
+        if self._size_cache is None:
+            self._size_cache = RecordHeader.rec_header_size + sum(
+                x.getSize() for x in self._adopt(self.worldBlocks))
+        return self._size_cache
 
     def dump(self,out):
         """Dumps group header and then records."""
@@ -1721,19 +1850,21 @@ def dump(self,out):
             out.write(self.data)
         else:
             if not self.worldBlocks: return
-            worldHeaderPos = out.tell()
-            header = TopGrupHeader(0, self.label, 0, self.stamp)
-            out.write(header.pack_head())
-            totalSize = RecordHeader.rec_header_size + sum(
-                x.dump(out) for x in self.worldBlocks)
-            out.seek(worldHeaderPos + 4)
-            pack_int(out, totalSize)
-            out.seek(worldHeaderPos + totalSize)
+            out.write(TopGrupHeader(self.getSize(), self.label, 0,
+                                    self.stamp).pack_head())
+            for worldBlock in self.worldBlocks:
+                worldBlock.dump(out)
 
     def getNumRecords(self,includeGroups=True):
         """Returns number of records, including self and all children."""
-        count = sum(x.getNumRecords(includeGroups) for x in self.worldBlocks)
-        return count + includeGroups * bool(count)
+        try:
+            return self._num_cache[includeGroups]
+        except KeyError:
+            count = sum(x.getNumRecords(includeGroups)
+                        for x in self._adopt(self.worldBlocks))
+            count += includeGroups * bool(count)
+            self._num_cache[includeGroups] = count
+            return count
 
     def convertFids(self,mapper,toLong):
         """Converts fids between formats according to mapper.
@@ -1741,6 +1872,7 @@ def convertFids(self,mapper,toLong):
         converting to short format."""
         for worldBlock in self.worldBlocks:
             worldBlock.convertFids(mapper,toLong)
+        self.invalidate_caches()
 
     def get_all_signatures(self):
         return set(chain.from_iterable(w.get_all_signatures()
@@ -1772,13 +1904,16 @@ def setWorld(self, world):
             self.indexRecords()
         fid = world.fid
         if fid in self.id_worldBlocks:
-            self.id_worldBlocks[fid].world = world
+            worldBlock = self.id_worldBlocks[fid]
+            worldBlock.world = world
+            worldBlock.invalidate_caches()
         else:
             worldBlock = MobWorld(GrupHeader(0, 0, 1, self.stamp), ##: groupType = 1
                                   self.loadFactory, world)
             worldBlock.setChanged()
             self.worldBlocks.append(worldBlock)
             self.id_worldBlocks[fid] = worldBlock
+            self.invalidate_caches()
 
     def remove_world(self, world):
         """Removes the specified world from this block. The exact world object
@@ -1787,6 +1922,7 @@ def remove_world(self, world):
             self.indexRecords()
         self.worldBlocks.remove(world)
         del self.id_worldBlocks[world.fid]
+        self.invalidate_caches()
 
     def iter_records(self):
         return chain.from_iterable(w.iter_records() for w in self.worldBlocks)
@@ -1843,6 +1979,7 @@ def merge_records(self, block, loadSet, mergeIds, iiSkipMerge, doFilter):
         # Apply any merge filtering we've done above to the record block
         block.worldBlocks = filtered_world_blocks
         block.indexRecords()
+        block.invalidate_caches()
 
     def __repr__(self):
         return u'<WRLD GRUP: %u record(s)>' % len(self.worldBlocks)
@@ -26,6 +26,7 @@
 from __future__ import division, print_function
 
 import copy
+import hashlib
 import io
 import zlib
 from functools import partial
@@ -291,7 +292,12 @@ class MreRecord(object):
         # MultiBound
         (31,'multiBound'), # {0x80000000}
         ))
-    __slots__ = ['header','recType','fid','flags1','size','flags2','changed','data','inName','longFids',]
+    # Masks for the flags checked while loading and dumping every record,
+    # which must not have to create a flags1 view
+    _compressed_mask = 1 << flags1_._names[u'compressed']
+    _deleted_mask = 1 << flags1_._names[u'deleted']
+    __slots__ = ['header','recType','fid','_flags1_val','_flags1_view','size','flags2','changed','data','inName','longFids',
+                 '_parent_ref']
     #--Set at end of class data definitions.
     type_class = None
     simpleTypes = None
@@ -301,15 +307,40 @@ def __init__(self, header, ins=None, do_unpack=False):
         self.header = header
         self.recType = header.recType
         self.fid = header.fid
-        self.flags1 = MreRecord.flags1_(header.flags1)
+        # Keep the raw int - see the flags1 property
+        self._flags1_val = header.flags1
+        self._flags1_view = None
         self.size = header.size
         self.flags2 = header.flags2
         self.longFids = False #--False: Short (numeric); True: Long (espname,objectindex)
         self.changed = False
         self.data = None
         self.inName = ins and ins.inName
+        # Weak reference to the record group whose cached size includes ours,
+        # set by that group - see MobBase.invalidate_caches
+        self._parent_ref = None
         if ins: self.load(ins, do_unpack)
 
+    @property
+    def flags1(self):
+        """The record flags, as a view created from the raw int on first
+        access - most records never have theirs checked."""
+        flags_view = self._flags1_view
+        if flags_view is None:
+            flags_view = self._flags1_view = self.flags1_(self._flags1_val)
+        return flags_view
+
+    @flags1.setter
+    def flags1(self, new_flags):
+        if not isinstance(new_flags, bolt.Flags):
+            new_flags = self.flags1_(new_flags)
+        self._flags1_view = new_flags
+
+    def _flags1_int(self):
+        """Returns the record flags as an int, without creating a view."""
+        flags_view = self._flags1_view
+        return self._flags1_val if flags_view is None else int(flags_view)
+
     def __repr__(self):
         return u'<%(eid)s[%(signature)s:%(fid)s]>' % {
             u'signature': self.recType,
@@ -329,6 +360,7 @@ def getTypeCopy(self):
             myCopy = copy.deepcopy(self)
         myCopy.changed = True
         myCopy.data = None
+        myCopy._parent_ref = None
         return myCopy
 
     def mergeFilter(self,modSet):
@@ -340,7 +372,7 @@ def mergeFilter(self,modSet):
 
     def getDecompressed(self, __unpacker=_int_unpacker):
         """Return self.data, first decompressing it if necessary."""
-        if not self.flags1.compressed: return self.data
+        if not self._flags1_int() & self._compressed_mask: return self.data
         decompressed_size, = __unpacker(self.data[:4])
         decomp = zlib.decompress(self.data[4:])
         if len(decomp) != decompressed_size:
@@ -356,7 +388,7 @@ def load(self, ins=None, do_unpack=False):
         if not do_unpack:
             self.data = ins.read(self.size,type)
         #--Unbuffered analysis?
-        elif ins and not self.flags1.compressed:
+        elif ins and not self._flags1_int() & self._compressed_mask:
             inPos = ins.tell()
             self.data = ins.read(self.size,type)
             ins.seek(inPos,0,type+'_REWIND') # type+'_REWIND' is just for debug
@@ -375,6 +407,19 @@ def load(self, ins=None, do_unpack=False):
             self.data = None
             self.changed = True
 
+    def content_hash(self, __sha1=hashlib.sha1):
+        """Return a digest of this record's contents - its signature, its flags
+        (except the compressed flag) and its decompressed subrecord data -
+        packing it first if it has been changed. No unpacking of the data is
+        done. Note that FormIDs are hashed as they are stored, so two versions
+        of a record are only comparable if they were saved against the same
+        master table."""
+        if self.changed: self.getSize()
+        hasher = __sha1(struct_pack(u'=4sI', self.recType,
+            self._flags1_int() & ~self._compressed_mask))
+        hasher.update(self.getDecompressed())
+        return hasher.digest()
+
     def loadData(self,ins,endPos):
         """Loads data from input stream. Called by load().
 
@@ -408,8 +453,13 @@ def updateMasters(self, masterset_add):
                                       u'%s' % self.recType)
 
     def setChanged(self,value=True):
-        """Sets changed attribute to value. [Default = True.]"""
+        """Sets changed attribute to value. [Default = True.] Marking the
+        record as changed invalidates the cached sizes of the groups that
+        contain it."""
         self.changed = value
+        if value and self._parent_ref is not None:
+            parent = self._parent_ref()
+            if parent is not None: parent.invalidate_caches()
 
     def getSize(self):
         """Return size of self.data, after, if necessary, packing it."""
@@ -421,7 +471,7 @@ def getSize(self):
         out = io.BytesIO()
         self.dumpData(out)
         self.data = out.getvalue()
-        if self.flags1.compressed:
+        if self._flags1_int() & self._compressed_mask:
             dataLen = len(self.data)
             comp = zlib.compress(self.data,6)
             self.data = struct_pack('=I', dataLen) + comp
@@ -441,12 +491,13 @@ def dumpData(self,out):
     def dump(self,out):
         """Dumps all data to output stream."""
         if self.changed: raise exception.StateError(u'Data changed: ' + self.recType)
-        if not self.data and not self.flags1.deleted and self.size > 0:
+        flags1_int = self._flags1_int()
+        if not self.data and not flags1_int & self._deleted_mask and self.size > 0:
             raise exception.StateError(u'Data undefined: ' + self.recType + u' ' + hex(self.fid))
         #--Update the header so it 'packs' correctly
         self.header.size = self.size
         if self.recType != 'GRUP':
-            self.header.flags1 = self.flags1
+            self.header.flags1 = flags1_int
             self.header.fid = self.fid
         out.write(self.header.pack_head())
         if self.size > 0: out.write(self.data)
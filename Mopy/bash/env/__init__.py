@@ -220,6 +220,49 @@ def shellCopy(filesFrom, filesTo, parent=None, askOverwrite=False,
                           confirm=askOverwrite, renameOnCollision=autoRename,
                           silent=False, parent=parent)
 
+# Errors meaning that a kind of link is not possible between two directories
+_link_unsupported = {errno.EXDEV, errno.EPERM, errno.EINVAL, errno.ENOSYS,
+                     getattr(errno, u'EOPNOTSUPP', errno.ENOSYS),
+                     getattr(errno, u'ENOTSUP', errno.ENOSYS)}
+
+def link_files(filesFrom, filesTo, hardlink=True):
+    """Link each of filesFrom to the respective path in filesTo, replacing
+    it if it exists. A copy-on-write clone (reflink) is tried first, which
+    behaves like a copy but shares the data on disk, then - if hardlink is
+    True - a hard link. Return a list with the kind of link made for each
+    file: u'reflink', u'hardlink' or None if the file could not be linked
+    (e.g. because the paths are on different filesystems) and should be
+    copied instead.
+
+    :type filesFrom: list[Path]
+    :type filesTo: list[Path]"""
+    link_ops = [(u'reflink', clone_file)]
+    if hardlink: link_ops.append((u'hardlink', hardlink_file))
+    link_types = []
+    for fileFrom, fileTo in izip(filesFrom, filesTo):
+        link_type = None
+        for link_op in link_ops[:]:
+            # link next to the destination, Path.temp may be on another drive
+            tmp = GPath(fileTo.s + u'.tmp')
+            try:
+                fileTo.head.makedirs()
+                tmp.remove()
+                link_op[1](fileFrom.s, tmp.s)
+                if link_op[0] == u'reflink': # behave like a copy
+                    shutil.copystat(fileFrom.s, tmp.s)
+                fileTo.remove()
+                os.rename(tmp.s, fileTo.s)
+            except EnvironmentError as e:
+                try: tmp.remove()
+                except OSError: pass
+                if e.errno in _link_unsupported: # don't try this one again
+                    link_ops.remove(link_op)
+                continue
+            link_type = link_op[0]
+            break
+        link_types.append(link_type)
+    return link_types
+
 def shellMakeDirs(dirs, parent=None):
     if not dirs: return
     dirs = [dirs] if not isinstance(dirs, (list, tuple, set)) else dirs
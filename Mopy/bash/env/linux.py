@@ -22,11 +22,16 @@
 # =============================================================================
 """Encapsulates Linux-specific classes and methods."""
 
+import ctypes
+import ctypes.util
+import errno
+import fcntl
 import os
 import subprocess
 import sys
 
-from ..bolt import decoder, deprint, GPath, structs_cache
+from ..bolt import decoder, deprint, GPath, structs_cache, \
+    DirWatcher as _DirWatcher
 from ..exception import EnvError
 
 # API - Constants =============================================================
@@ -57,6 +62,47 @@ def _getShellPath(folderKey): ##: mkdirs
     return GPath({u'Personal': home,
                   u'Local AppData': home + u'/.local/share'}[folderKey])
 
+_libc = None
+def _get_libc():
+    """Load the C library, returns None if that fails or if it does not
+    provide inotify."""
+    global _libc
+    if _libc is None:
+        _libc = False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                               use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p,
+                                               ctypes.c_uint32]
+            libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+            _libc = libc
+        except (OSError, AttributeError):
+            deprint(u'inotify is not available', traceback=True)
+    return _libc or None
+
+# inotify constants, see inotify(7)
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_DONT_FOLLOW = 0x02000000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+_WATCH_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM |
+               _IN_MOVED_TO | _IN_CREATE | _IN_DELETE | _IN_DELETE_SELF |
+               _IN_MOVE_SELF | _IN_ONLYDIR | _IN_DONT_FOLLOW)
+
+_FICLONE = 0x40049409 # _IOW(0x94, 9, int), see ioctl_ficlone(2)
+
 def _get_error_info():
     try:
         sErrorInfo = u'\n'.join(u'  %s: %s' % (key, os.environ[key])
@@ -188,6 +234,21 @@ def _pad(num):
             return _find_version(f, version_pos, 0)[1]
         return ()
 
+def clone_file(src_path, dest_path):
+    """Create dest_path as a copy-on-write clone (reflink) of src_path. Only
+    supported by some filesystems (btrfs, xfs, ...) and within a single
+    filesystem - raises OSError otherwise."""
+    with open(src_path, u'rb') as ins:
+        with open(dest_path, u'wb') as out:
+            try:
+                fcntl.ioctl(out.fileno(), _FICLONE, ins.fileno())
+            except IOError as e: # PY3: ioctl raises OSError
+                raise OSError(e.errno, e.strerror, dest_path)
+
+def hardlink_file(src_path, dest_path):
+    """Create dest_path as a hard link to src_path."""
+    os.link(src_path, dest_path)
+
 def mark_high_dpi_aware():
     pass ##: Equivalent on Linux? Not needed?
 
@@ -210,6 +271,133 @@ def convert_separators(p):
     return p.replace(u'\\', u'/')
 
 # API - Classes ===============================================================
+class DirWatcher(_DirWatcher):
+    """Uses inotify to keep track of the paths that changed in the watched
+    tree. inotify is not recursive, so every directory in the tree gets its
+    own watch. Like walk, it does not follow symlinked directories. If adding
+    the watches fails (e.g. because we ran out of watches, see
+    /proc/sys/fs/inotify/max_user_watches) the watcher stops and its clients
+    fall back to rescanning."""
+
+    def __init__(self, root_dir, rescan_interval=600):
+        super(DirWatcher, self).__init__(root_dir, rescan_interval)
+        self._fd = None
+        self._real_root = root_dir # the root, with symlinks resolved
+        self._wd_dir = {} # watch descriptor -> dir path relative to root
+
+    @property
+    def is_watching(self): return self._fd is not None
+
+    def start(self):
+        libc = _get_libc()
+        if libc is None: return False
+        fd = libc.inotify_init1(os.O_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            deprint(u'inotify_init1 failed: %s' % os.strerror(
+                ctypes.get_errno()))
+            return False
+        self._fd = fd
+        self._real_root = os.path.realpath(self._root)
+        try:
+            self._watch_tree(u'')
+        except (OSError, UnicodeError) as e:
+            deprint(u'Failed to watch %s: %s' % (self._root, e))
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._wd_dir.clear()
+            self._mark_all_changed()
+
+    def _watch_tree(self, rel_dir, mark_files=False):
+        """Add watches for rel_dir and all directories below it. If
+        mark_files is True, mark all the files found as changed - used for
+        directories created in or moved into the tree."""
+        libc = _get_libc()
+        fs_enc = sys.getfilesystemencoding()
+        pending = [rel_dir]
+        while pending:
+            rel_path = pending.pop()
+            abs_dir = os.path.join(self._real_root, rel_path)
+            # add the watch before listing, so no new entries can slip by
+            wd = libc.inotify_add_watch(self._fd, abs_dir.encode(fs_enc),
+                                        _WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if rel_path and err in (errno.ENOENT, errno.ENOTDIR):
+                    continue # removed (or replaced) in the meantime
+                raise OSError(err, os.strerror(err), abs_dir)
+            self._wd_dir[wd] = rel_path
+            try:
+                entries = os.listdir(abs_dir)
+            except OSError:
+                continue # removed in the meantime, we'll get notified
+            for entry in entries:
+                rel_entry = os.path.join(rel_path, entry)
+                abs_entry = os.path.join(abs_dir, entry)
+                if os.path.isdir(abs_entry) and not os.path.islink(abs_entry):
+                    pending.append(rel_entry)
+                elif mark_files:
+                    self._mark_changed(rel_entry)
+
+    def _unwatch_tree(self, rel_dir):
+        """Remove the watches for rel_dir and all directories below it."""
+        libc = _get_libc()
+        rel_prefix = os.path.join(rel_dir, u'')
+        for wd, rel_path in self._wd_dir.items():
+            if rel_path == rel_dir or rel_path.startswith(rel_prefix):
+                libc.inotify_rm_watch(self._fd, wd) # IN_IGNORED will follow
+                del self._wd_dir[wd]
+
+    def _read_events(self, __unpack=structs_cache[u'iIII'].unpack_from):
+        fs_enc = sys.getfilesystemencoding()
+        while self._fd is not None:
+            try:
+                buff = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EINTR): return
+                raise
+            pos, buff_len = 0, len(buff)
+            while pos < buff_len:
+                wd, mask, _cookie, name_len = __unpack(buff, pos)
+                name = buff[pos + 16:pos + 16 + name_len].rstrip(b'\0')
+                pos += 16 + name_len
+                try:
+                    self._process_event(wd, mask, name.decode(fs_enc))
+                except (OSError, UnicodeError) as e:
+                    deprint(u'Stopped watching %s: %r' % (self._root, e))
+                    self.close()
+                    return
+
+    def _process_event(self, wd, mask, name):
+        if mask & _IN_Q_OVERFLOW: # we lost events - also rewatch, in case
+            self._mark_all_changed() # we missed directory creations
+            self._watch_tree(u'')
+            return
+        rel_dir = self._wd_dir.get(wd)
+        if rel_dir is None: return # removed by us or a stale event
+        if mask & _IN_IGNORED: # the directory was deleted or unmounted
+            del self._wd_dir[wd]
+            return
+        if mask & (_IN_DELETE_SELF | _IN_MOVE_SELF):
+            # the parent gets notified about its children
+            if not rel_dir: raise OSError(errno.ENOENT,
+                u'the watched directory was removed', self._root)
+            return
+        rel_path = os.path.join(rel_dir, name)
+        if mask & _IN_ISDIR:
+            if mask & (_IN_CREATE | _IN_MOVED_TO):
+                self._watch_tree(rel_path, mark_files=True)
+            elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                self._unwatch_tree(rel_path)
+                self._mark_changed(rel_path)
+        else:
+            self._mark_changed(rel_path)
+
 class TaskDialog(object):
     def __init__(self, _title, _heading, _content, _buttons=(),
                  _main_icon=None, _parenthwnd=None, _footer=None):
@@ -24,13 +24,14 @@
 
 from __future__ import print_function
 
+import errno
 import os
 import re
 import sys
 import _winreg as winreg  # PY3
 from ctypes import byref, c_wchar_p, c_void_p, POINTER, Structure, windll, \
     wintypes, WINFUNCTYPE, c_uint, c_long, Union, c_ushort, c_int, \
-    c_longlong, c_ulong, c_wchar, sizeof, wstring_at, ARRAY
+    c_longlong, c_ulong, c_wchar, sizeof, wstring_at, ARRAY, WinError
 from uuid import UUID
 
 import win32api
@@ -38,6 +39,8 @@
 import win32gui
 
 from ..bolt import GPath, deprint, Path
+##: Use ReadDirectoryChangesW - this one just polls
+from ..bolt import DirWatcher
 from ..exception import AccessDeniedError, BoltError, NonExistentDriveError
 
 # API - Constants =============================================================
@@ -745,6 +748,16 @@ def getJava(): # PY3: cache this
         java_bin_path = sys_root.join(u'syswow64', u'javaw.exe')
     return java_bin_path
 
+def clone_file(src_path, dest_path):
+    """Create dest_path as a copy-on-write clone (reflink) of src_path."""
+    ##: Use FSCTL_DUPLICATE_EXTENTS_TO_FILE on ReFS volumes
+    raise OSError(errno.ENOSYS, u'Cloning files is not supported', dest_path)
+
+def hardlink_file(src_path, dest_path):
+    """Create dest_path as a hard link to src_path."""
+    if not windll.kernel32.CreateHardLinkW(dest_path, src_path, None):
+        raise WinError()
+
 def mark_high_dpi_aware():
     """Marks the current process as High DPI-aware."""
     try:
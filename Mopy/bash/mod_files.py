@@ -444,6 +444,30 @@ def read_mod_headers(mod_info):
                     u"pos: %i\nCaused by: '%r'" % (mod_info, ins.tell(), e))
         return ret_headers
 
+    @staticmethod
+    def read_record_hashes(mod_info):
+        """Reads the headers of every record in the specified mod, along with
+        the content hashes of the records (see MreRecord.content_hash). The
+        record data is read, but not unpacked. Returns them as a list of
+        (header, hash) tuples, in the order they appear in the file.
+
+        :rtype: list[tuple[RecordHeader, bytes]]"""
+        ret_hashes = []
+        with ModReader(mod_info.name, mod_info.abs_path.open(u'rb')) as ins:
+            ins_at_end = ins.atEnd
+            ins_unpack_rec_header = ins.unpackRecHeader
+            try:
+                while not ins_at_end():
+                    header = ins_unpack_rec_header()
+                    # Skip GRUPs themselves, only process their records
+                    if header.recType != b'GRUP':
+                        ret_hashes.append(
+                            (header, MreRecord(header, ins).content_hash()))
+            except (OSError, struct_error) as e:
+                raise ModError(ins.inName, u'Error scanning %s, file read '
+                    u"pos: %i\nCaused by: '%r'" % (mod_info, ins.tell(), e))
+        return ret_hashes
+
     ##: The method above has to be very fast, but this one can afford to be
     # much slower. Should eventually be absorbed by refactored ModFile API.
     @staticmethod
@@ -1243,7 +1243,7 @@ def writeToMod(self, modInfo, makeNew=False):
                 newScript.eid = eid
                 newScript.script_source = newText
                 newScript.setChanged()
-                modFile.tops[b'SCPT'].records.append(newScript)
+                modFile.tops[b'SCPT'].setRecord(newScript)
                 added.append(eid)
         if changed or added: modFile.safeSave()
         return changed, added
@@ -255,7 +255,7 @@ def scanModFile(self,modFile,progress):
             for cellBlock in modFile.tops[b'CELL'].cellBlocks:
                 cellImported = False
                 if cellBlock.cell.fid in patchCells.id_cellBlock:
-                    patchCells.id_cellBlock[cellBlock.cell.fid].cell = cellBlock.cell
+                    patchCells.setCell(cellBlock.cell)
                     cellImported = True
                 for record in cellBlock.temp_refs:
                     if record.base in self.old_new:
@@ -269,6 +269,7 @@ def scanModFile(self,modFile,progress):
                                 break
                         else:
                             patchCells.id_cellBlock[cellBlock.cell.fid].temp_refs.append(record)
+                        patchCells.id_cellBlock[cellBlock.cell.fid].invalidate_caches()
                 for record in cellBlock.persistent_refs:
                     if record.base in self.old_new:
                         if not cellImported:
@@ -281,16 +282,17 @@ def scanModFile(self,modFile,progress):
                                 break
                         else:
                             patchCells.id_cellBlock[cellBlock.cell.fid].persistent_refs.append(record)
+                        patchCells.id_cellBlock[cellBlock.cell.fid].invalidate_caches()
         if b'WRLD' in modFile.tops:
             for worldBlock in modFile.tops[b'WRLD'].worldBlocks:
                 worldImported = False
                 if worldBlock.world.fid in patchWorlds.id_worldBlocks:
-                    patchWorlds.id_worldBlocks[worldBlock.world.fid].world = worldBlock.world
+                    patchWorlds.setWorld(worldBlock.world)
                     worldImported = True
                 for cellBlock in worldBlock.cellBlocks:
                     cellImported = False
                     if worldBlock.world.fid in patchWorlds.id_worldBlocks and cellBlock.cell.fid in patchWorlds.id_worldBlocks[worldBlock.world.fid].id_cellBlock:
-                        patchWorlds.id_worldBlocks[worldBlock.world.fid].id_cellBlock[cellBlock.cell.fid].cell = cellBlock.cell
+                        patchWorlds.id_worldBlocks[worldBlock.world.fid].setCell(cellBlock.cell)
                         cellImported = True
                     for record in cellBlock.temp_refs:
                         if record.base in self.old_new:
@@ -307,6 +309,7 @@ def scanModFile(self,modFile,progress):
                                     break
                             else:
                                 patchWorlds.id_worldBlocks[worldBlock.world.fid].id_cellBlock[cellBlock.cell.fid].temp_refs.append(record)
+                            patchWorlds.id_worldBlocks[worldBlock.world.fid].id_cellBlock[cellBlock.cell.fid].invalidate_caches()
                     for record in cellBlock.persistent_refs:
                         if record.base in self.old_new:
                             if not worldImported:
@@ -322,6 +325,7 @@ def scanModFile(self,modFile,progress):
                                     break
                             else:
                                 patchWorlds.id_worldBlocks[worldBlock.world.fid].id_cellBlock[cellBlock.cell.fid].persistent_refs.append(record)
+                            patchWorlds.id_worldBlocks[worldBlock.world.fid].id_cellBlock[cellBlock.cell.fid].invalidate_caches()
 
     def buildPatch(self,log,progress):
         """Adds merged fids to patchfile."""
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests the native zip support, the streaming of files out of 7z and the
+listing cache of archives.py."""
+import os
+import subprocess
+import zipfile
+from distutils.spawn import find_executable
+from zlib import crc32
+
+import pytest
+
+from ..archives import ListingCache, is_native_zip, list_zip, \
+    list_zip_structure, extract_zip, read_zip_heads, read_7z_member, exe7z
+from ..bolt import GPath
+
+_FILES = [(u'a.esp', b'plugin'), (u'Textures/b.dds', b'texture' * 10)]
+
+def _write_zip(zip_path, files=_FILES):
+    with zipfile.ZipFile(zip_path.s, u'w', zipfile.ZIP_DEFLATED) as out:
+        for rel_path, data in files:
+            out.writestr(rel_path, data)
+    return zip_path
+
+def _native(rel_path): return rel_path.replace(u'/', os.sep)
+
+class TestNativeZip(object):
+    def test_list_zip(self, tmpdir):
+        zip_path = _write_zip(GPath(u'%s' % tmpdir.join(u'a.zip')))
+        assert is_native_zip(zip_path)
+        assert list_zip(zip_path) == [
+            (_native(p), len(d), crc32(d) & 0xFFFFFFFF) for p, d in _FILES]
+        assert list_zip_structure(zip_path) == [
+            (_native(p), False) for p, _d in _FILES]
+
+    def test_not_native(self, tmpdir):
+        """Tests that zips with names 7z should sanitize are left to it."""
+        zip_path = _write_zip(GPath(u'%s' % tmpdir.join(u'a.zip')),
+                              [(u'../evil.esp', b'')])
+        assert list_zip(zip_path) is None
+        assert extract_zip(zip_path, GPath(u'%s' % tmpdir),
+                           files_to_extract=[u'evil.esp']) is False
+        not_zip = GPath(u'%s' % tmpdir.join(u'a.7z'))
+        not_zip.open(u'wb').close()
+        assert not is_native_zip(not_zip)
+
+    def test_extract_zip(self, tmpdir):
+        zip_path = _write_zip(GPath(u'%s' % tmpdir.join(u'a.zip')))
+        out_dir = tmpdir.join(u'out')
+        assert extract_zip(zip_path, GPath(u'%s' % out_dir),
+                           files_to_extract=[u'B.DDS'], recursive=True)
+        assert out_dir.join(u'Textures', u'b.dds').read_binary() == \
+               _FILES[1][1]
+        assert not out_dir.join(u'a.esp').check()
+
+    def test_read_zip_heads(self, tmpdir):
+        zip_path = _write_zip(GPath(u'%s' % tmpdir.join(u'a.zip')))
+        assert read_zip_heads(zip_path, [u'TEXTURES/B.DDS', u'missing'],
+                              4) == {_native(u'Textures/b.dds'): b'text'}
+
+@pytest.mark.skipif(find_executable(exe7z) is None,
+                    reason=u'7z is not available')
+class TestRead7zMember(object):
+    def _write_7z(self, tmpdir):
+        src_dir = tmpdir.join(u'src')
+        for rel_path, data in _FILES:
+            src_dir.join(*rel_path.split(u'/')).write_binary(data,
+                                                             ensure=True)
+        src_dir.join(u'big.bin').write_binary(os.urandom(1 << 22))
+        arch_path = tmpdir.join(u'a.7z')
+        with open(os.devnull, u'wb') as devnull:
+            subprocess.check_call([exe7z, u'a', u'%s' % arch_path, u'.'],
+                                  cwd=u'%s' % src_dir, stdout=devnull)
+        return GPath(u'%s' % arch_path), src_dir
+
+    def test_read_member(self, tmpdir):
+        arch_path, _src_dir = self._write_7z(tmpdir)
+        for rel_path, data in _FILES:
+            assert read_7z_member(arch_path, _native(rel_path),
+                                  lambda ins: ins.read()) == data
+
+    def test_read_head(self, tmpdir):
+        """Tests that reading only the start of a large member works, and
+        that 7z is stopped instead of being waited on."""
+        arch_path, src_dir = self._write_7z(tmpdir)
+        assert read_7z_member(arch_path, u'big.bin',
+                              lambda ins: ins.read(16)) == \
+               src_dir.join(u'big.bin').read_binary()[:16]
+
+    def test_missing_member(self, tmpdir):
+        arch_path, _src_dir = self._write_7z(tmpdir)
+        assert read_7z_member(arch_path, u'missing.esp',
+                              lambda ins: ins.read()) == b''
+
+class TestListingCache(object):
+    _listing = [(u'a.esp', 1, 2)]
+
+    def test_round_trip(self, tmpdir):
+        cache_path = GPath(u'%s' % tmpdir.join(u'listings.pkl'))
+        cache = ListingCache(cache_path)
+        assert cache.get_listing(10, 1.0, 3) is None
+        cache.set_listing(10, 1.0, 3, True, self._listing)
+        cache.save()
+        cache = ListingCache(cache_path)
+        assert cache.get_listing(10, 1.0, 3) == (True, self._listing)
+        # replacing or changing the archive is a miss
+        assert cache.get_listing(10, 1.0, 4) is None
+        assert cache.get_listing(11, 1.0, 3) is None
+
+    def test_append(self, tmpdir):
+        """Tests that saving appends only the new entries."""
+        cache_path = GPath(u'%s' % tmpdir.join(u'listings.pkl'))
+        cache = ListingCache(cache_path)
+        cache.set_listing(10, 1.0, 3, True, self._listing)
+        cache.save()
+        size = cache_path.size
+        cache.set_listing(10, 1.0, 3, True, self._listing) # unchanged
+        cache.save()
+        assert cache_path.size == size
+        cache.set_listing(20, 2.0, 5, False, [])
+        cache.save()
+        assert cache_path.size > size
+        cache = ListingCache(cache_path)
+        assert cache.get_listing(10, 1.0, 3) == (True, self._listing)
+        assert cache.get_listing(20, 2.0, 5) == (False, [])
+
+    def test_drop_stale(self, tmpdir):
+        cache_path = GPath(u'%s' % tmpdir.join(u'listings.pkl'))
+        cache = ListingCache(cache_path)
+        cache.set_listing(10, 1.0, 3, True, self._listing)
+        cache.set_listing(20, 2.0, 5, False, [])
+        cache.save()
+        cache.drop_stale({(20, 2.0)})
+        cache = ListingCache(cache_path)
+        assert cache.get_listing(10, 1.0, 3) is None
+        assert cache.get_listing(20, 2.0, 5) == (False, [])
+
+    def test_corrupt(self, tmpdir):
+        """Tests that the entries before a corrupt one are kept."""
+        cache_path = GPath(u'%s' % tmpdir.join(u'listings.pkl'))
+        cache = ListingCache(cache_path)
+        cache.set_listing(10, 1.0, 3, True, self._listing)
+        cache.save()
+        size = cache_path.size
+        with cache_path.open(u'ab') as out:
+            out.write(b'\xff')
+        cache = ListingCache(cache_path)
+        assert cache.get_listing(10, 1.0, 3) == (True, self._listing)
+        assert cache_path.size <= size # the corrupt entry was dropped
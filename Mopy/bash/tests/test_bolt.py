@@ -20,12 +20,22 @@
 #  https://github.com/wrye-bash
 #
 # =============================================================================
+import copy
+import errno
+import os
+import threading
+import time
 from collections import OrderedDict
+from itertools import izip
+from zlib import crc32
 
 import pytest
 
 from ..bolt import LowerDict, DefaultLowerDict, OrderedLowerDict, decoder, \
-    encode, getbestencoding, GPath, Path
+    encode, getbestencoding, GPath, Path, Flags, StringInterner, Progress, \
+    calc_crcs, CrcCache, DirWatcher, scan_tree, rescan_tree, ParallelMap
+from .. import bolt
+from ..exception import CancelError
 
 def test_getbestencoding():
     """Tests getbestencoding. Keep this one small, we don't want to test
@@ -132,6 +142,36 @@ def decode_already_decoded(self):
         assert decoder(u'Внимание') == u'Внимание' # Russian
         assert decoder(None) is None
 
+    def test_decoder_interned(self):
+        """Tests that equal byte strings decode to the same object while a
+        StringInterner is active, and only then."""
+        with StringInterner() as interner:
+            first = decoder(b'IronSword', encoding=u'cp1252')
+            assert decoder(b'IronSword', encoding=u'cp1252') is first
+            assert decoder(b'\xc2\xed\xe8\xec\xe0\xed\xe8\xe5',
+                           encoding=u'cp1251') == u'Внимание'
+            assert len(interner) == 2
+        assert len(interner) == 0
+        assert decoder(b'IronSword', encoding=u'cp1252') == first
+
+    def test_decoder_interned_threads(self):
+        """Tests that threads decoding the same byte strings while a
+        StringInterner is active all get the same objects."""
+        byte_strs = [b'Record%d' % (i % 50) for i in xrange(2000)]
+        results = []
+        def _decode_all():
+            results.append([decoder(b, encoding=u'cp1252') for b in
+                            byte_strs])
+        with StringInterner() as interner:
+            threads = [threading.Thread(target=_decode_all) for _t in
+                       xrange(8)]
+            for t in threads: t.start()
+            for t in threads: t.join()
+            assert len(interner) == 50
+        assert len(results) == 8
+        for decoded in results:
+            assert all(x is y for x, y in izip(decoded, results[0]))
+
 class TestEncode(object):
     def test_encode_basics(self):
         """Tries encoding a bunch of words and checks the chosen encoding to
@@ -427,3 +467,358 @@ def test_dict_keys(self):
         dd = {u'c:/random/path.txt': 1}
         assert not GPath(u'c:/random/path.txt') in dd
         assert not GPath(u'' r'c:\random\path.txt') in dd
+
+class TestFlags(object):
+    _names = Flags.getNames(u'first', None, (4, u'fifth'))
+
+    def test_flags_attrs(self):
+        flags = Flags(0x11, self._names)
+        assert flags.first and flags.fifth
+        flags.first = False
+        assert not flags.first and int(flags) == 0x10
+        flags[1] = True
+        assert flags == 0x12
+        with pytest.raises(AttributeError): assert flags.second
+
+    def test_flags_clones(self):
+        proto = Flags(0, self._names)
+        clone = proto(0x1)
+        assert type(clone) is type(proto) # one generated class per names
+        assert type(Flags(0, Flags.getNames(u'first', None,
+                                            (4, u'fifth')))) is type(proto)
+        clone.fifth = True
+        assert proto == 0 and clone == 0x11
+        assert copy.deepcopy(clone) == clone
+
+    def test_flags_unknown_is_unused(self):
+        flags = Flags(0xFF, self._names, unknown_is_unused=True)
+        assert int(flags) == 0x11
+        assert int(flags(0x3)) == 0x1
+
+    def test_flags_subclass_overrides(self):
+        class _LinkedFlags(Flags):
+            """Setting the first flag sets the fifth one too, and the two
+            are only kept if both are set."""
+            def __setitem__(self, index, value):
+                super(_LinkedFlags, self).__setitem__(index, value)
+                if index == 0:
+                    super(_LinkedFlags, self).__setitem__(4, value)
+            def _clean_unused_flags(self):
+                if self.first != self.fifth:
+                    self._field &= ~0x11
+                super(_LinkedFlags, self)._clean_unused_flags()
+        assert _LinkedFlags(0x1, self._names) == 0 # cleaned in __init__
+        assert _LinkedFlags(0x11, self._names) == 0x11
+        flags = _LinkedFlags(0, self._names)
+        flags.first = True # goes through __setitem__
+        assert flags == 0x11
+        flags.first = False
+        assert flags == 0
+
+class _RecordingProgress(Progress):
+    """Records the states it is set to, optionally canceling on the nth
+    call."""
+    def __init__(self, cancel_at=None):
+        super(_RecordingProgress, self).__init__()
+        self.states = []
+        self.threads = set()
+        self._cancel_at = cancel_at
+
+    def _do_progress(self, state, message):
+        self.states.append(self.state)
+        self.threads.add(threading.current_thread())
+        if len(self.states) == self._cancel_at: raise CancelError
+
+class TestCalcCrcs(object):
+    def _files(self, tmpdir):
+        """Write some files of various sizes, one of them larger than the 2MB
+        read block size, and return them along with their CRCs."""
+        files, expected = [], {}
+        for i, siz in enumerate((0, 1, 4096, 3 * 1024 * 1024, 100, 7)):
+            contents = os.urandom(siz)
+            file_path = u'%s' % tmpdir.join(u'file%d.bin' % i)
+            with open(file_path, u'wb') as out: out.write(contents)
+            files.append((file_path, siz, u'file%d.bin' % i))
+            expected[file_path] = crc32(contents) & 0xFFFFFFFF
+        return files, expected
+
+    @pytest.mark.parametrize(u'max_workers', [1, 4])
+    def test_calc_crcs(self, tmpdir, max_workers):
+        files, expected = self._files(tmpdir)
+        progress = _RecordingProgress()
+        total = sum(f[1] + 1 for f in files)
+        progress.setFull(total)
+        assert calc_crcs(files, progress, max_workers=max_workers) == expected
+        # the progress is only driven from the calling thread
+        assert progress.threads == {threading.current_thread()}
+        assert progress.states == sorted(progress.states)
+        assert progress.states[-1] <= total
+
+    @pytest.mark.parametrize(u'max_workers', [1, 4])
+    def test_missing_file(self, tmpdir, max_workers):
+        files, expected = self._files(tmpdir)
+        files.append((u'%s' % tmpdir.join(u'missing.bin'), 10, u'missing'))
+        assert calc_crcs(files, max_workers=max_workers) == expected
+
+    def test_cancel(self, tmpdir):
+        files, _expected = self._files(tmpdir)
+        progress = _RecordingProgress(cancel_at=2)
+        progress.setFull(sum(f[1] + 1 for f in files))
+        num_threads = threading.active_count()
+        with pytest.raises(CancelError):
+            calc_crcs(files, progress, max_workers=4)
+        # the workers were stopped and joined before the error propagated
+        assert threading.active_count() == num_threads
+
+class TestCrcCache(object):
+    def _write(self, tmpdir, file_name, contents):
+        file_path = GPath(u'%s' % tmpdir.join(file_name))
+        with file_path.open(u'wb') as out: out.write(contents)
+        return file_path
+
+    def _cache(self, tmpdir):
+        return CrcCache(GPath(u'%s' % tmpdir.join(u'CRCs.dat')))
+
+    def test_persisted(self, tmpdir):
+        """Tests that saved CRCs are loaded back and only while the files
+        stay the same."""
+        cache = self._cache(tmpdir)
+        first = self._write(tmpdir, u'first.bin', b'first')
+        second = self._write(tmpdir, u'second.bin', b'second')
+        assert cache.calc_crc(first) == crc32(b'first') & 0xFFFFFFFF
+        assert cache.calc_crc(second) == crc32(b'second') & 0xFFFFFFFF
+        cache.save()
+        self._write(tmpdir, u'second.bin', b'changed')
+        cache = self._cache(tmpdir)
+        assert cache.get_crc(first) == crc32(b'first') & 0xFFFFFFFF
+        assert cache.get_crc(second) is None
+
+    def test_stat_before_hashing(self, tmpdir):
+        """Tests that a file changing after it was stat'ed invalidates the
+        CRC cached for it."""
+        cache = self._cache(tmpdir)
+        file_path = self._write(tmpdir, u'file.bin', b'old')
+        file_stat = cache.file_stat(file_path)
+        self._write(tmpdir, u'file.bin', b'new contents')
+        cache.set_crc(file_path, 0x1234, file_stat)
+        assert cache.get_crc(file_path) is None
+        assert cache.calc_crc(file_path) == \
+               crc32(b'new contents') & 0xFFFFFFFF
+
+    def test_compact_drops_stale(self, tmpdir):
+        """Tests that compacting the cache file drops the entries of deleted,
+        renamed and changed files."""
+        cache = self._cache(tmpdir)
+        kept = self._write(tmpdir, u'kept.bin', b'kept')
+        deleted = self._write(tmpdir, u'deleted.bin', b'deleted')
+        renamed = self._write(tmpdir, u'renamed.bin', b'renamed')
+        changed = self._write(tmpdir, u'changed.bin', b'changed')
+        for file_path in (kept, deleted, renamed, changed):
+            cache.calc_crc(file_path)
+        cache.save()
+        deleted.remove()
+        renamed.moveTo(GPath(u'%s' % tmpdir.join(u'moved.bin')))
+        self._write(tmpdir, u'changed.bin', b'changed again')
+        # a corrupt entry forces the file to be compacted on load
+        with cache._cache_path.open(u'ab') as out: out.write(b'\xff')
+        cache = self._cache(tmpdir)
+        assert cache.get_crc(kept) == crc32(b'kept') & 0xFFFFFFFF
+        assert list(cache._get_entries()) == [cache._norm_key(kept)]
+        assert list(self._cache(tmpdir)._get_entries()) == [
+            cache._norm_key(kept)]
+
+class _FakeWatcher(DirWatcher):
+    """A watcher that is told about the changes by the test."""
+    @property
+    def is_watching(self): return True
+
+class TestDirWatcher(object):
+    def test_fallback_always_rescans(self):
+        watcher = DirWatcher(u'Data')
+        assert not watcher.start()
+        assert watcher.pop_changes(u'client') is None
+        watcher._mark_changed(u'a.esp')
+        assert watcher.pop_changes(u'client') is None
+
+    def test_client_changes(self):
+        """Tests that each client gets the changes since its last call, after
+        a first full rescan."""
+        watcher = _FakeWatcher(u'Data')
+        assert watcher.pop_changes(u'mods') is None
+        watcher._mark_changed(u'a.esp')
+        assert watcher.pop_changes(u'bain') is None # first call
+        watcher._mark_changed(u'b.esp')
+        assert watcher.pop_changes(u'mods') == {u'a.esp', u'b.esp'}
+        assert watcher.pop_changes(u'bain') == {u'b.esp'}
+        assert watcher.pop_changes(u'mods') == set()
+
+    def test_lost_changes(self):
+        """Tests that all clients rescan once the watcher lost track of the
+        changes."""
+        watcher = _FakeWatcher(u'Data')
+        watcher.pop_changes(u'mods')
+        watcher.pop_changes(u'bain')
+        watcher._mark_changed(u'a.esp')
+        watcher._mark_all_changed()
+        watcher._mark_changed(u'b.esp')
+        assert watcher.pop_changes(u'mods') is None
+        assert watcher.pop_changes(u'bain') is None
+        assert watcher.pop_changes(u'mods') == set()
+
+    def test_rescan_interval(self, monkeypatch):
+        watcher = _FakeWatcher(u'Data', rescan_interval=600)
+        now = [1000.0]
+        monkeypatch.setattr(u'bash.bolt.time.time', lambda: now[0])
+        assert watcher.pop_changes(u'mods') is None
+        now[0] += 599
+        assert watcher.pop_changes(u'mods') == set()
+        now[0] += 2
+        assert watcher.pop_changes(u'mods') is None
+
+class TestScanTree(object):
+    def _tree(self, tmpdir):
+        """Data/{a.esp, b.esp, Meshes/c.nif, Skipped/d.nif, Empty/}"""
+        root = tmpdir.mkdir(u'Data')
+        root.join(u'a.esp').write(b'a')
+        root.join(u'b.esp').write(b'bb')
+        root.mkdir(u'Meshes').join(u'c.nif').write(b'ccc')
+        root.mkdir(u'Skipped').join(u'd.nif').write(b'dddd')
+        root.mkdir(u'Empty')
+        return u'%s' % root
+
+    @staticmethod
+    def _skip(dir_names):
+        dir_names.remove(u'Skipped')
+
+    def _files(self, scanned, root):
+        return {os.path.join(d[len(root) + 1:], f): siz for d, _m, _d, stats in
+                scanned for f, siz, _mtime in stats}
+
+    @pytest.fixture(params=[True, False], ids=[u'scandir', u'listdir'])
+    def use_scandir(self, request, monkeypatch):
+        if not request.param:
+            monkeypatch.setattr(bolt, u'scandir', None)
+        elif bolt.scandir is None:
+            pytest.skip(u'scandir is not installed')
+        return request.param
+
+    def test_scan_tree(self, tmpdir, use_scandir):
+        root = self._tree(tmpdir)
+        scanned = scan_tree(root, self._skip)
+        assert self._files(scanned, root) == {
+            u'a.esp': 1, u'b.esp': 2, os.path.join(u'Meshes', u'c.nif'): 3}
+        # the root lists all its directories, so that it's never considered
+        # empty if it has skipped ones
+        assert scanned[0][0] == root
+        assert sorted(scanned[0][2]) == [u'Empty', u'Meshes', u'Skipped']
+        assert [d[len(root) + 1:] for d, _m, sub_dirs, stats in scanned
+                if not (sub_dirs or stats)] == [u'Empty']
+
+    def test_empty_root(self, tmpdir, use_scandir):
+        root = u'%s' % tmpdir.mkdir(u'Data')
+        assert [d for d, _m, sub_dirs, stats in scan_tree(root)
+                if not (sub_dirs or stats)] == [root]
+
+    def test_bad_entry(self, tmpdir, monkeypatch):
+        """Tests that an entry that can't be stat'ed is skipped, but not the
+        rest of its directory."""
+        monkeypatch.setattr(bolt, u'scandir', None)
+        root = self._tree(tmpdir)
+        real_lstat = os.lstat
+        def _lstat(path):
+            if os.path.basename(path) == u'a.esp':
+                raise OSError(errno.EACCES, u'Access denied', path)
+            return real_lstat(path)
+        monkeypatch.setattr(os, u'lstat', _lstat)
+        assert self._files(scan_tree(root, self._skip), root) == {
+            u'b.esp': 2, os.path.join(u'Meshes', u'c.nif'): 3}
+
+class TestRescanTree(object):
+    def _tree(self, tmpdir):
+        root = tmpdir.mkdir(u'Project')
+        root.join(u'a.esp').write(b'a')
+        root.mkdir(u'Meshes').join(u'c.nif').write(b'ccc')
+        return u'%s' % root
+
+    @staticmethod
+    def _age(root, seconds=60):
+        """Make the directories under root look modified a while ago, so that
+        the snapshot trusts their mtimes."""
+        for dir_path, _dirs, _files in os.walk(root):
+            mtime = os.path.getmtime(dir_path) - seconds
+            os.utime(dir_path, (mtime, mtime))
+
+    def _files(self, scanned, root):
+        return {os.path.join(d[len(root) + 1:], f): siz for d, _m, _d, stats
+                in scanned for f, siz, _mtime in stats}
+
+    def test_snapshot_reused(self, tmpdir, monkeypatch):
+        """Tests that unchanged directories are not listed again."""
+        root = self._tree(tmpdir)
+        self._age(root)
+        scanned, snapshot = rescan_tree(root, {})
+        assert self._files(scanned, root) == self._files(scan_tree(root),
+                                                         root)
+        def _fail(abs_dir): raise AssertionError(abs_dir)
+        monkeypatch.setattr(bolt, u'_scan_dir', _fail)
+        rescanned, new_snapshot = rescan_tree(root, snapshot)
+        assert rescanned == scanned
+        assert new_snapshot == snapshot
+
+    def test_changed_dirs_rescanned(self, tmpdir):
+        """Tests that added files and directories are picked up."""
+        root = self._tree(tmpdir)
+        self._age(root)
+        scanned, snapshot = rescan_tree(root, {})
+        tmpdir.join(u'Project', u'Meshes', u'd.nif').write(b'dddd')
+        tmpdir.join(u'Project').mkdir(u'Textures').join(u'e.dds').write(b'e')
+        rescanned, snapshot = rescan_tree(root, snapshot)
+        assert self._files(rescanned, root) == {
+            u'a.esp': 1, os.path.join(u'Meshes', u'c.nif'): 3,
+            os.path.join(u'Meshes', u'd.nif'): 4,
+            os.path.join(u'Textures', u'e.dds'): 1}
+
+    def test_racy_dirs_not_trusted(self, tmpdir):
+        """Tests that directories modified right before the scan are not
+        trusted, as they may change again within their mtime resolution."""
+        root = self._tree(tmpdir)
+        _scanned, snapshot = rescan_tree(root, {})
+        assert all(entry[0] is None for entry in snapshot.itervalues())
+
+class TestParallelMap(object):
+    @staticmethod
+    def _slow_square(x):
+        # the later items finish first, so the results arrive out of order
+        time.sleep((10 - x) * 0.002)
+        return x * x
+
+    def test_order(self):
+        for workers in (1, 4):
+            with ParallelMap(self._slow_square, xrange(10), workers) as pmap:
+                assert list(pmap) == [(x, x * x) for x in xrange(10)]
+
+    def test_exception(self):
+        """Tests that an exception is raised when its item is reached, after
+        the results of the previous items."""
+        def _func(x):
+            if x == 3: raise ValueError(x)
+            return self._slow_square(x)
+        results = []
+        with pytest.raises(ValueError):
+            with ParallelMap(_func, xrange(10), 4) as pmap:
+                for item, result in pmap:
+                    results.append(result)
+        assert results == [0, 1, 4]
+
+    def test_max_ahead(self):
+        """Tests that workers don't run more than max_ahead items past the
+        one being consumed, and that leaving the block stops them."""
+        started, lock = [], threading.Lock()
+        def _func(x):
+            with lock: started.append(x)
+            return x
+        with ParallelMap(_func, xrange(100), 4, max_ahead=3) as pmap:
+            for item, _result in pmap:
+                with lock: assert max(started) < item + 1 + 3
+                if item == 5: break
+        assert len(started) < 100
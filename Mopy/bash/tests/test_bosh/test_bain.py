@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests the BAIN data structures that don't need a Data dir."""
+import cPickle as pickle  # PY3
+import os
+import sys
+import zipfile
+
+import pytest
+
+from ... import bass
+from ...bolt import GPath, LowerDict
+from ...bosh import InstallerArchive, InstallerProject
+from ...bosh.bain import _DestIndex, _FileTable, _InstallersDb
+from ...bosh.bsa_files import OblivionBsa
+
+class _Inst(object):
+    """Just enough of an Installer for _DestIndex."""
+    def __init__(self, archive, order, files, is_active=True):
+        self.archive = archive
+        self.order = order
+        self.is_active = is_active
+        self.type = 1
+        self.ci_dest_sizeCrc = LowerDict(files)
+        self.dirty_sizeCrc = {}
+
+    def __repr__(self): return u'_Inst(%s)' % self.archive
+
+class TestDestIndex(object):
+    def _setup(self):
+        low = _Inst(u'low', 0, {u'a.esp': (1, 1), u'b.dds': (2, 2)})
+        high = _Inst(u'high', 2, {u'A.esp': (1, 10), u'c.nif': (3, 3)})
+        inactive = _Inst(u'inactive', 1, {u'a.esp': (1, 20)},
+                         is_active=False)
+        index = _DestIndex()
+        index.sync([low, high, inactive])
+        return index, low, high, inactive
+
+    def test_owners(self):
+        index, low, high, inactive = self._setup()
+        assert index.get_owners(u'a.ESP') == [low, inactive, high]
+        assert index.get_winner(u'a.esp') is high
+        assert index.get_winner(u'a.esp', skip={high}) is low
+        assert index.get_winner(u'missing.esp') is None
+        assert dict(index.get_sharing(low)) == {high: [u'a.esp'],
+                                                inactive: [u'a.esp']}
+
+    def test_resync(self):
+        """Tests that replaced file dicts are reindexed and deleted
+        installers dropped."""
+        index, low, high, inactive = self._setup()
+        high.ci_dest_sizeCrc = LowerDict({u'c.nif': (3, 3)})
+        index.sync([low, high])
+        assert index.get_owners(u'a.esp') == [low]
+        assert index.get_owners(u'c.nif') == [high]
+
+    def test_underrides(self):
+        index, low, high, inactive = self._setup()
+        data = LowerDict({u'a.esp': (1, 1, 0), u'b.dds': (2, 2, 0),
+                          u'c.nif': (3, 4, 0)})
+        # a.esp is low's version, c.nif was edited - b.dds is fine
+        assert index.get_underrides(data) == {u'a.esp': (1, 1),
+                                              u'c.nif': (3, 4)}
+        high.is_active = False
+        assert index.get_underrides(data) == {}
+
+    def test_pop_stale(self):
+        """Tests that only the installers a change concerns are stale."""
+        index, low, high, inactive = self._setup()
+        data = LowerDict({u'a.esp': (1, 10, 0), u'b.dds': (2, 2, 0)})
+        assert index.pop_stale(data, LowerDict()) == {low, high, inactive}
+        assert index.pop_stale(data, LowerDict()) == set()
+        data[u'b.dds'] = (2, 3, 0)
+        assert index.pop_stale(data, LowerDict()) == {low}
+        underrides = LowerDict({u'c.nif': (3, 4)})
+        assert index.pop_stale(data, underrides) == {high}
+        high.ci_dest_sizeCrc = LowerDict(high.ci_dest_sizeCrc)
+        index.sync([low, high, inactive])
+        assert index.pop_stale(data, underrides) == {high}
+        inactive.dirty_sizeCrc[u'd.esp'] = (4, 4)
+        assert index.pop_stale(data, underrides) == {inactive}
+
+def _sep(rel_path): return rel_path.replace(u'\\', os.sep)
+
+_ROWS = [(_sep(u'a.esp'), 1, 2), (_sep(u'Textures\\b.dds'), 3 << 40, 4),
+         (_sep(u'Textures\\Sub\\\u00e9.dds'), 5, 0xFFFFFFFF),
+         (_sep(u'textures\\c.dds'), 0, 6)]
+_DATED_ROWS = [r + (1.5 * i,) for i, r in enumerate(_ROWS)]
+
+class TestFileTable(object):
+    @pytest.mark.parametrize(u'rows, with_dates', [
+        (_ROWS, False), (_DATED_ROWS, True), ([], False), ([], True)])
+    @pytest.mark.parametrize(u'protocol', [0, 2])
+    def test_pickle_round_trip(self, rows, with_dates, protocol):
+        loaded = pickle.loads(pickle.dumps(_FileTable(rows, with_dates),
+                                           protocol))
+        assert loaded._raw_state is not None # not decoded yet
+        # pickling it again without decoding it keeps it as is
+        reloaded = pickle.loads(pickle.dumps(loaded, protocol))
+        assert reloaded._raw_state == loaded._raw_state
+        for table in (loaded, reloaded):
+            assert list(table) == rows
+            assert len(table) == len(rows)
+        for row in rows:
+            assert loaded.get(row[0].upper()) == row[1:]
+        assert loaded.get(u'missing.esp', 7) == 7
+
+    def test_lookups(self):
+        table = _FileTable.from_dict(
+            {GPath(r[0]): r[1:] for r in _DATED_ROWS}, with_dates=True)
+        assert sorted(table) == sorted(_DATED_ROWS)
+        assert _sep(u'TEXTURES\\B.DDS') in table
+        assert _sep(u'textures\\d.dds') not in table
+        assert list(table.without_dates()) == [r[:3] for r in table]
+        by_size = table.sorted(key=lambda r: r[1])
+        assert list(by_size) == sorted(_DATED_ROWS, key=lambda r: r[1])
+        assert list(table.iteritems()) == [(r[0], r[1:]) for r in table]
+
+    def test_size(self):
+        """Tests that a table takes much less memory and pickles smaller
+        than the list of tuples it replaces."""
+        rows = [(os.path.join(u'Textures', u'Dir%03d' % (i // 100),
+                              u'File%04d.dds' % i), 1000 + i, i * 2654435761
+                 & 0xFFFFFFFF) for i in xrange(5000)]
+        def _list_size(rows_list):
+            return sys.getsizeof(rows_list) + sum(
+                sys.getsizeof(r) + sum(map(sys.getsizeof, r))
+                for r in rows_list)
+        table = _FileTable(rows)
+        table_size = sum(map(sys.getsizeof, (
+            table, table._dirs, table._dir_indices, table._names,
+            table._sizes, table._crcs))) + sum(map(sys.getsizeof,
+                                                   table._dirs))
+        assert table_size * 4 < _list_size(rows)
+        assert len(pickle.dumps(table, 2)) < len(pickle.dumps(rows, 2))
+
+class TestOldPickles(object):
+    """Tests that installers pickled with plain lists and dicts get
+    tables."""
+    def _old_state(self, installer, **old_attrs):
+        state = list(installer.__reduce__()[2])
+        for attr, old_value in old_attrs.iteritems():
+            state[installer.persistent.index(attr)] = old_value
+        return tuple(state)
+
+    def test_archive(self, tmpdir, monkeypatch):
+        monkeypatch.setitem(bass.dirs, u'installers', GPath(u'%s' % tmpdir))
+        tmpdir.join(u'a.7z').write(b'')
+        installer = InstallerArchive(GPath(u'a.7z'))
+        installer.__setstate__(self._old_state(
+            installer, fileSizeCrcs=list(_ROWS), src_sizeCrcDate={}))
+        assert isinstance(installer.fileSizeCrcs, _FileTable)
+        assert list(installer.fileSizeCrcs) == _ROWS
+        assert isinstance(installer.src_sizeCrcDate, _FileTable)
+        assert not installer.src_sizeCrcDate
+
+    def test_project(self, tmpdir, monkeypatch):
+        monkeypatch.setitem(bass.dirs, u'installers', GPath(u'%s' % tmpdir))
+        tmpdir.join(u'proj').ensure(dir=True)
+        installer = InstallerProject(GPath(u'proj'))
+        installer.__setstate__(self._old_state(
+            installer, fileSizeCrcs=[r[:3] for r in _DATED_ROWS],
+            src_sizeCrcDate=LowerDict((r[0], r[1:]) for r in _DATED_ROWS)))
+        assert sorted(installer.src_sizeCrcDate) == sorted(_DATED_ROWS)
+        assert list(installer.fileSizeCrcs) == _ROWS
+
+    def test_missing_package(self, tmpdir, monkeypatch):
+        """Installers whose package is gone are left alone, to be dropped
+        on the next refresh."""
+        monkeypatch.setitem(bass.dirs, u'installers', GPath(u'%s' % tmpdir))
+        installer = InstallerArchive(GPath(u'gone.7z'))
+        installer.__setstate__(self._old_state(installer,
+                                               fileSizeCrcs=list(_ROWS)))
+        assert installer.fileSizeCrcs == list(_ROWS)
+
+class TestInstallersDb(object):
+    def _setup(self, tmpdir, monkeypatch):
+        monkeypatch.setitem(bass.dirs, u'installers', GPath(u'%s' % tmpdir))
+        tmpdir.join(u'a.7z').write(b'')
+        installer = InstallerArchive(GPath(u'a.7z'))
+        installer.fileSizeCrcs = _FileTable([(u'a.esp', 1, 2)])
+        installer.src_sizeCrcDate = _FileTable([(u'a.esp', 1, 2, 3.0)],
+                                               with_dates=True)
+        db = _InstallersDb(GPath(u'%s' % tmpdir.join(u'Installers.db')))
+        db.save({GPath(installer.archive): installer}, LowerDict())
+        pickled = []
+        def _pickle_state(state):
+            pickled.append(state)
+            return orig_pickle(state)
+        orig_pickle = _InstallersDb._pickle_state
+        monkeypatch.setattr(_InstallersDb, u'_pickle_state',
+                            staticmethod(_pickle_state))
+        return db, installer, pickled
+
+    def _pickled_tables(self, pickled):
+        return [p for p in pickled if isinstance(p, _FileTable)]
+
+    def test_round_trip(self, tmpdir, monkeypatch):
+        db, installer, pickled = self._setup(tmpdir, monkeypatch)
+        installers, data_sizeCrcDate = db.load()
+        loaded = installers[GPath(u'a.7z')]
+        assert isinstance(loaded, InstallerArchive)
+        assert list(loaded.fileSizeCrcs) == [(u'a.esp', 1, 2)]
+        # the source table is only decoded when used
+        assert loaded.src_sizeCrcDate._raw_state is not None
+        assert list(loaded.src_sizeCrcDate) == [(u'a.esp', 1, 2, 3.0)]
+        assert not pickled # loading pickles nothing
+
+    def test_unchanged_tables(self, tmpdir, monkeypatch):
+        """Tests that only replaced tables are pickled on save."""
+        db, installer, pickled = self._setup(tmpdir, monkeypatch)
+        installers = {GPath(installer.archive): installer}
+        db.save(installers, LowerDict())
+        assert not self._pickled_tables(pickled)
+        installer.fileSizeCrcs = _FileTable([(u'b.esp', 4, 5)])
+        installer.order = 3
+        db.save(installers, LowerDict())
+        assert self._pickled_tables(pickled) == [installer.fileSizeCrcs]
+        del pickled[:]
+        loaded = db.load()[0][GPath(u'a.7z')]
+        assert list(loaded.fileSizeCrcs) == [(u'b.esp', 4, 5)]
+        assert loaded.order == 3
+        db.save({GPath(loaded.archive): loaded}, LowerDict())
+        assert not self._pickled_tables(pickled)
+
+def test_drop_hardlinks():
+    installer = InstallerArchive(GPath(u'a.7z'))
+    installer.extras_dict[u'hardlinked_files'] = LowerDict(
+        {u'a.esp': True, u'Textures\\b.dds': True})
+    installer.drop_hardlinks([u'A.ESP', u'missing.esp'])
+    assert list(installer.extras_dict[u'hardlinked_files']) == [
+        u'Textures\\b.dds']
+    installer.drop_hardlinks([u'textures\\b.dds'])
+    assert u'hardlinked_files' not in installer.extras_dict
+    installer.drop_hardlinks([u'a.esp']) # no links left, nothing to do
+
+def test_list_source_bsas(tmpdir, monkeypatch):
+    """Tests that the contents of packaged BSAs are only listed on demand."""
+    monkeypatch.setitem(bass.dirs, u'installers', GPath(u'%s' % tmpdir))
+    monkeypatch.setitem(bass.inisettings, u'BsaThreads', 1)
+    tmpdir.join(u'src', u'a.nif').write_binary(b'nif data', ensure=True)
+    bsa_path = tmpdir.join(u'test.bsa')
+    OblivionBsa.pack_assets(GPath(u'%s' % bsa_path),
+                            {u'meshes\\a.nif': u'%s' % tmpdir.join(u'src',
+                                                                u'a.nif')})
+    with zipfile.ZipFile(u'%s' % tmpdir.join(u'a.zip'), u'w') as out:
+        out.writestr(u'a.esp', b'plugin')
+        out.write(u'%s' % bsa_path, u'test.bsa')
+    installer = InstallerArchive(GPath(u'a.zip'))
+    installer.fileSizeCrcs = _FileTable([(u'a.esp', 6, 1),
+                                         (u'test.bsa', bsa_path.size(), 2)])
+    installer.crc = 3
+    assert installer.packaged_bsas() == [u'test.bsa']
+    structure = installer.listSource()
+    assert u'test.bsa' in structure
+    assert u'a.nif' not in structure
+    assert u'a.nif' in installer.listSource(list_bsas=True)
@@ -0,0 +1,386 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests BSA/BA2 packing and reading on small generated archives."""
+import io
+import os
+
+import pytest
+
+from ... import bass
+from ...bolt import GPath, DataTable, PickleDict, Progress
+from ...bosh import BSAInfos, _BsaAssetIndex
+from ...bosh.bsa_files import BSA, BA2, MorrowindBsa, OblivionBsa, \
+    SkyrimSeBsa
+from ...bosh.dds_files import DDSFile, mk_dxgi_fmt
+from ...exception import BSAError, DDSError
+
+@pytest.fixture(autouse=True)
+def _bsa_threads(monkeypatch):
+    monkeypatch.setitem(bass.inisettings, u'BsaThreads', 2)
+
+def _pack(tmpdir, bsa_type, assets, bsa_name=u'test.bsa'):
+    """Pack the specified assets, given as a dict mapping their paths to
+    their data, into a new archive of type bsa_type and return it."""
+    asset_sources = {}
+    for i, (asset_path, asset_data) in enumerate(sorted(assets.items())):
+        src = tmpdir.join(u'src', u'%d' % i)
+        src.write_binary(asset_data, ensure=True)
+        asset_sources[asset_path] = u'%s' % src
+    bsa_path = GPath(u'%s' % tmpdir.join(bsa_name))
+    bsa_type.pack_assets(bsa_path, asset_sources)
+    return bsa_type(bsa_path)
+
+def _os_paths(*asset_paths):
+    """Return the specified paths, using the separator of this OS - as
+    has_assets and assets do."""
+    return {a.replace(u'\\', os.sep) for a in asset_paths}
+
+def _gpaths(*asset_paths):
+    return [GPath(a) for a in _os_paths(*asset_paths)]
+
+def _read_tree(out_dir):
+    """Return a dict mapping the lowercase paths (using backslashes) of the
+    files in out_dir to their contents."""
+    return {f.relto(out_dir).replace(os.sep, u'\\').lower(): f.read_binary()
+            for f in out_dir.visit(lambda f: f.check(file=True))}
+
+_ASSETS = {u'meshes\\a.nif': b'nif data',
+           u'Meshes\\Sub\\b.nif': b'other nif',
+           u'sound\\c.wav': b'wav data' * 50}
+
+class TestHashedLookups(object):
+    @pytest.mark.parametrize(u'bsa_type', [BSA, BA2])
+    def test_has_assets(self, tmpdir, bsa_type):
+        bsa = _pack(tmpdir, bsa_type, _ASSETS)
+        wanted = _gpaths(u'Meshes\\A.nif', u'meshes\\sub\\b.nif',
+                         u'meshes\\c.nif', u'sound\\a.nif')
+        found = _os_paths(u'meshes\\a.nif', u'meshes\\sub\\b.nif')
+        assert bsa.has_assets(wanted) == found
+        # the names of all the assets were not decoded to find those
+        assert bsa._assets is bsa_type._assets
+        # files in the root folder can't be looked up by hash
+        assert bsa.has_assets(_gpaths(u'root.nif')) == set()
+        assert bsa.assets == found | _os_paths(u'sound\\c.wav')
+        # with the names loaded, those are used instead - to the same result
+        assert bsa.has_assets(wanted) == found
+
+    @pytest.mark.parametrize(u'bsa_type', [BSA, BA2])
+    def test_non_ascii(self, tmpdir, bsa_type):
+        """Tests that paths that can't be hashed reliably are looked up by
+        name."""
+        bsa = _pack(tmpdir, bsa_type, {u'meshes\\\xe9t\xe9.nif': b'nif'})
+        assert bsa.has_assets(_gpaths(u'Meshes\\\xc9t\xe9.nif')) == \
+               _os_paths(u'meshes\\\xe9t\xe9.nif')
+
+# enough files, over a few folders, for the workers to finish out of order
+_MANY_ASSETS = {u'meshes\\m%d\\f%02d.nif' % (i % 4, i): b'%02d' % i * (
+    i + 1) * 40 for i in xrange(30)}
+_MANY_ASSETS[u'sound\\s.wav'] = b'wav data' * 50 # stored uncompressed
+
+class TestExtractAssets(object):
+    @pytest.mark.parametrize(u'bsa_threads', [1, 4])
+    @pytest.mark.parametrize(u'bsa_type', [BSA, SkyrimSeBsa, BA2,
+                                           MorrowindBsa])
+    def test_extract(self, tmpdir, monkeypatch, bsa_type, bsa_threads):
+        monkeypatch.setitem(bass.inisettings, u'BsaThreads', bsa_threads)
+        bsa = _pack(tmpdir, bsa_type, _MANY_ASSETS)
+        wanted = sorted(_MANY_ASSETS)[::2]
+        out_dir = tmpdir.join(u'out')
+        bsa.extract_assets(wanted, u'%s' % out_dir)
+        assert _read_tree(out_dir) == {a: _MANY_ASSETS[a] for a in wanted}
+
+    def test_corrupt_record(self, tmpdir, monkeypatch):
+        """Tests that an error in a worker thread is raised in the caller."""
+        monkeypatch.setitem(bass.inisettings, u'BsaThreads', 4)
+        bsa = _pack(tmpdir, BSA, _MANY_ASSETS)
+        bsa_data = tmpdir.join(u'test.bsa').read_binary()
+        # zlib streams start with 0x78 - break the first one
+        zlib_start = bsa_data.index(b'\x78\x9c')
+        tmpdir.join(u'test.bsa').write_binary(
+            bsa_data[:zlib_start] + b'\xff\xff' + bsa_data[zlib_start + 2:])
+        with pytest.raises(BSAError):
+            bsa.extract_assets(sorted(_MANY_ASSETS), u'%s' % tmpdir.join(
+                u'out'))
+
+_BC1_UNORM = 71 # the index of DXGI_FORMAT_BC1_UNORM
+
+def _make_dds(width, height, num_mips, dxgi_index=_BC1_UNORM):
+    """Return the bytes of a DDS file with the specified dimensions, number
+    of mipmaps and format, using a legacy header if the format has one, and
+    its texture data."""
+    dds_file = DDSFile(u'')
+    dds_header = dds_file.dds_header
+    dds_header.dw_width, dds_header.dw_height = width, height
+    dds_header.dw_mip_map_count = num_mips
+    dxgi_format = mk_dxgi_fmt(dxgi_index)
+    dxgi_format.setup_file(dds_file, use_legacy_formats=True)
+    data_size = sum(dxgi_format.compute_slice_pitch(
+        max(width >> m, 1), max(height >> m, 1)) for m in xrange(num_mips))
+    dds_file.dds_contents = bytes(bytearray(i * 7 & 0xFF for i in xrange(
+        data_size)))
+    return dds_file.dump_file(), dds_file.dds_contents
+
+class TestPackRoundTrip(object):
+    @pytest.mark.parametrize(u'bsa_type', [OblivionBsa, BSA, SkyrimSeBsa,
+                                           BA2, MorrowindBsa])
+    def test_round_trip(self, tmpdir, bsa_type):
+        _pack(tmpdir, bsa_type, _ASSETS)
+        # read it back with a new instance, nothing cached
+        bsa = bsa_type(GPath(u'%s' % tmpdir.join(u'test.bsa')))
+        if bsa_type is not MorrowindBsa: # has no version
+            assert bsa.inspect_version() == bsa_type._packed_version
+        assert bsa.assets == _os_paths(*(a.lower() for a in _ASSETS))
+        out_dir = tmpdir.join(u'out')
+        bsa.extract_assets(list(_ASSETS), u'%s' % out_dir)
+        assert _read_tree(out_dir) == {a.lower(): d for a, d in
+                                       _ASSETS.iteritems()}
+
+    def test_dx10(self, tmpdir):
+        """Tests that textures are split into chunks and come back out with
+        equivalent headers."""
+        textures = {u'textures\\big.dds': _make_dds(1024, 1024, 11),
+                    u'textures\\sub\\small.dds': _make_dds(64, 32, 1)}
+        bsa = _pack(tmpdir, BA2, {k: v[0] for k, v in textures.items()})
+        assert bsa.inspect_version() == BA2._packed_version
+        assert bsa.bsa_header.ba2_files_type == b'DX10'
+        assert bsa.assets == _os_paths(*textures)
+        bsa._load_bsa()
+        big_record = bsa.bsa_folders[u'textures'].folder_assets[u'big.dds']
+        # the 1024x1024 and 512x512 mips get their own chunks
+        assert [(c.start_mip, c.end_mip) for c in big_record.tex_chunks] == [
+            (0, 0), (1, 1), (2, 10)]
+        bsa.bsa_folders.clear()
+        out_dir = tmpdir.join(u'out')
+        bsa.extract_assets(list(textures), u'%s' % out_dir)
+        for asset_path, (_dds_bytes, tex_data) in textures.iteritems():
+            out_dds = DDSFile(u'')
+            out_dds.load_from_stream(io.BytesIO(out_dir.join(
+                *asset_path.split(u'\\')).read_binary()))
+            src_dds = DDSFile(u'')
+            src_dds.load_from_stream(io.BytesIO(_dds_bytes))
+            for attr in (u'dw_width', u'dw_height', u'dw_mip_map_count'):
+                assert getattr(out_dds.dds_header, attr) == getattr(
+                    src_dds.dds_header, attr)
+            assert out_dds.get_dxgi_format() is mk_dxgi_fmt(_BC1_UNORM)
+            assert out_dds.dds_contents == tex_data
+
+    @pytest.mark.parametrize(u'bsa_type', [BSA, BA2, MorrowindBsa])
+    def test_root_folder(self, tmpdir, bsa_type):
+        with pytest.raises(BSAError):
+            _pack(tmpdir, bsa_type, {u'root.nif': b'nif'})
+        assert not tmpdir.join(u'test.bsa').check()
+
+class _FakeBsa(object):
+    """Just enough of a BSAInfo for _BsaAssetIndex."""
+    def __init__(self, name, bsa_assets):
+        self.name = name
+        self._assets = frozenset(bsa_assets)
+        self._file_size, self._file_mod_time = 1, 1.0
+        self.parses = 0
+
+    @property
+    def assets(self):
+        self.parses += 1
+        if self._assets is None: raise BSAError(self.name, u'corrupt')
+        return self._assets
+
+    def __repr__(self): return u'_FakeBsa(%s)' % self.name
+
+class TestBsaAssetIndex(object):
+    def test_partial_sync(self):
+        """Tests that only the BSAs passed to sync are parsed, and that
+        deleted ones are dropped."""
+        a = _FakeBsa(u'a', [u'x.nif', u'y.nif'])
+        b = _FakeBsa(u'b', [u'y.nif'])
+        index = _BsaAssetIndex()
+        assert index.sync([a], {a, b}) == []
+        assert (a.parses, b.parses) == (1, 0)
+        assert index.get_bsas(u'y.nif') == [a]
+        index.sync([a, b], {a, b})
+        assert (a.parses, b.parses) == (2, 1)
+        assert index.get_bsas(u'y.nif', {a: 1, b: 0}) == [b, a]
+        assert dict(index.get_sharing({u'x.nif', u'y.nif'}, {b: 0})) == {
+            b: {u'y.nif'}}
+        index.sync([a], {a})
+        assert index.get_bsas(u'y.nif') == [a]
+
+    def test_failed(self):
+        """Tests that BSAs that fail to parse are reported on every sync, but
+        only parsed again once they changed."""
+        bad = _FakeBsa(u'bad', [])
+        bad._assets = None
+        index = _BsaAssetIndex()
+        assert index.sync([bad], {bad}) == [bad]
+        assert index.sync([bad], {bad}) == [bad]
+        assert bad.parses == 1
+        bad._file_mod_time = 2.0
+        bad._assets = frozenset([u'x.nif'])
+        assert index.sync([bad], {bad}) == []
+        assert index.get_bsas(u'x.nif') == [bad]
+
+_BC7_UNORM = 98 # has no legacy equivalent, so gets a DXT10 header
+_R8G8B8A8_UNORM = 28 # uncompressed
+
+def _load_headers(dds_bytes):
+    """Return a DDSFile with only the headers loaded from the specified DDS
+    file bytes."""
+    dds_file = DDSFile(u'')
+    dds_file.load_headers(io.BytesIO(dds_bytes[:DDSFile.headers_max_size]))
+    return dds_file
+
+class TestTextureHeaders(object):
+    @pytest.mark.parametrize(u'width, height, num_mips, dxgi_index', [
+        (256, 128, 9, _BC1_UNORM), (256, 128, 1, _BC1_UNORM),
+        (2, 2, 2, _BC1_UNORM), (64, 64, 7, _BC7_UNORM),
+        (32, 16, 6, _R8G8B8A8_UNORM)])
+    def test_vram_size(self, width, height, num_mips, dxgi_index):
+        dds_bytes, tex_data = _make_dds(width, height, num_mips, dxgi_index)
+        dds_file = _load_headers(dds_bytes)
+        assert dds_file.get_dxgi_format() is mk_dxgi_fmt(dxgi_index)
+        # the size of the data is computed from the headers alone
+        assert dds_file.get_vram_size() == len(tex_data)
+
+    def test_vram_size_faces(self):
+        dds_bytes, tex_data = _make_dds(64, 64, 7, _BC7_UNORM)
+        dds_file = _load_headers(dds_bytes)
+        dds_file.dds_dxt10.array_size = 3
+        assert dds_file.get_vram_size() == 3 * len(tex_data)
+        dds_file.dds_dxt10.misc_flag = 0x4 # an array of cubemaps
+        assert dds_file.get_vram_size() == 18 * len(tex_data)
+
+    def test_vram_size_unknown_format(self):
+        dds_file = _load_headers(_make_dds(4, 4, 1)[0])
+        dds_file.dds_header.ddspf.pf_four_cc = b'XXXX'
+        with pytest.raises(DDSError):
+            dds_file.get_vram_size()
+
+    @pytest.mark.parametrize(u'width, height, num_mips, missing_mips', [
+        (256, 128, 9, 0), (256, 128, 1, 8), (256, 128, 0, 8),
+        (128, 256, 5, 4), (1, 1, 1, 0)])
+    def test_missing_mips(self, width, height, num_mips, missing_mips):
+        dds_file = _load_headers(_make_dds(width, height, max(num_mips, 1))[0])
+        dds_file.dds_header.dw_mip_map_count = num_mips
+        assert dds_file.get_missing_mips() == missing_mips
+
+    @pytest.mark.parametrize(u'bsa_type', [BSA, SkyrimSeBsa, BA2,
+                                           MorrowindBsa])
+    def test_load_texture_headers(self, tmpdir, bsa_type):
+        textures = {u'textures\\big.dds': _make_dds(256, 256, 9),
+                    u'textures\\sub\\small.dds': _make_dds(64, 32, 1)}
+        assets = {k: v[0] for k, v in textures.items()}
+        if bsa_type is not BA2: # DX10 BA2s only hold textures
+            assets[u'textures\\broken.dds'] = b'not a texture'
+        bsa = _pack(tmpdir, bsa_type, assets)
+        loaded = dict(bsa.load_texture_headers())
+        # the broken texture is skipped
+        assert set(loaded) == _os_paths(*textures)
+        for asset_path, (dds_bytes, tex_data) in textures.iteritems():
+            dds_file = loaded[asset_path.replace(u'\\', os.sep)]
+            src_dds = _load_headers(dds_bytes)
+            for attr in (u'dw_width', u'dw_height', u'dw_mip_map_count'):
+                assert getattr(dds_file.dds_header, attr) == getattr(
+                    src_dds.dds_header, attr)
+            assert dds_file.get_vram_size() == len(tex_data)
+        # the BSA was unloaded again
+        assert not getattr(bsa, u'bsa_folders', None)
+
+def _alter_hashes(bsa, asset_paths):
+    """Overwrite the hashes of the specified assets in the specified
+    OblivionBsa, like BSA Alteration does. Returns the positions of those
+    hashes."""
+    bsa._load_bsa()
+    hash_positions = []
+    for asset_path in asset_paths:
+        folder_path, file_name = asset_path.lower().rsplit(u'\\', 1)
+        hash_positions.append(bsa.bsa_folders[folder_path].folder_assets[
+            file_name].file_pos)
+    bsa.bsa_folders.clear()
+    with open(u'%s' % bsa.abs_path, u'r+b') as bsa_file:
+        for hash_pos in hash_positions:
+            bsa_file.seek(hash_pos)
+            bsa_file.write(b'\xff' * 8)
+    return hash_positions
+
+class TestUndoAlterations(object):
+    def test_find_and_reset(self, tmpdir):
+        bsa = _pack(tmpdir, OblivionBsa, _ASSETS)
+        assert bsa.find_altered_hashes() == []
+        altered = [u'meshes\\a.nif', u'sound\\c.wav']
+        hash_positions = _alter_hashes(bsa, altered)
+        altered_hashes = bsa.find_altered_hashes()
+        assert sorted(altered_hashes) == sorted(zip(hash_positions, (
+            OblivionBsa.calculate_hash(a.rsplit(u'\\', 1)[1])
+            for a in altered)))
+        assert not bsa.bsa_folders # unloaded again
+        assert bsa.reset_hashes(altered_hashes) == 2
+        assert bsa.find_altered_hashes() == []
+        out_dir = tmpdir.join(u'out')
+        bsa.extract_assets(list(_ASSETS), u'%s' % out_dir)
+        assert _read_tree(out_dir) == {a.lower(): d for a, d in
+                                       _ASSETS.iteritems()}
+
+    def test_undo_alterations(self, tmpdir):
+        bsa = _pack(tmpdir, OblivionBsa, _ASSETS)
+        _alter_hashes(bsa, [u'Meshes\\Sub\\b.nif'])
+        loaded_bsa = OblivionBsa(bsa.abs_path, load_cache=True,
+                                 names_only=False)
+        assert loaded_bsa.undo_alterations() == 1
+        assert bsa.find_altered_hashes() == []
+
+    def test_bsa_infos(self, tmpdir, monkeypatch):
+        """Tests that BSAInfos only checks the BSAs that changed since they
+        were last verified."""
+        checked = []
+        class _BsaInfo(OblivionBsa):
+            @property
+            def name(self): return self.abs_path.tail
+            def find_altered_hashes(self):
+                checked.append(self.name.s)
+                return super(_BsaInfo, self).find_altered_hashes()
+        bsa_infos = BSAInfos.__new__(BSAInfos)
+        bsa_infos._data = {}
+        for bsa_name in (u'a.bsa', u'b.bsa'):
+            _pack(tmpdir, OblivionBsa, _ASSETS, bsa_name=bsa_name)
+            bsa_inf = _BsaInfo(GPath(u'%s' % tmpdir.join(bsa_name)))
+            bsa_infos[bsa_inf.name] = bsa_inf
+        bsa_infos.table = DataTable(PickleDict(GPath(u'%s' % tmpdir.join(
+            u'Table.dat'))))
+        a_bsa = bsa_infos[GPath(u'a.bsa')]
+        _alter_hashes(a_bsa, [u'meshes\\a.nif'])
+        assert bsa_infos.undo_alterations(Progress()) == 1
+        assert sorted(checked) == [u'a.bsa', u'b.bsa']
+        assert a_bsa.find_altered_hashes() == []
+        del checked[:]
+        # nothing changed, so nothing is checked again
+        assert bsa_infos.undo_alterations(Progress()) == 0
+        assert not checked
+        _alter_hashes(a_bsa, [u'sound\\c.wav'])
+        mtime = a_bsa.abs_path.mtime + 10
+        os.utime(u'%s' % a_bsa.abs_path, (mtime, mtime))
+        a_bsa.do_update()
+        # only selected BSAs are checked
+        assert bsa_infos.undo_alterations(
+            Progress(), bsa_names=[GPath(u'b.bsa')]) == 0
+        assert not checked
+        assert bsa_infos.undo_alterations(Progress()) == 1
+        assert checked == [u'a.bsa']
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests the caching of the BSA load order in ModInfos."""
+from collections import OrderedDict
+
+import pytest
+
+from ... import bosh, bush
+from ...bolt import GPath
+from ...bosh import ModInfos
+
+class _FakeIni(object):
+    """Just enough of an IniFile for get_bsa_lo."""
+    def __init__(self, ini_name, settings):
+        self.abs_path = GPath(ini_name)
+        self.settings = settings # dict mapping keys in [Archive] to values
+
+    def has_setting(self, section, key):
+        return section == u'Archive' and key in self.settings
+
+    def getSetting(self, section, key, default):
+        if section != u'Archive': return default
+        return self.settings.get(key, default)
+
+class _FakeBsa(object):
+    def __init__(self, bsa_name): self.name = GPath(bsa_name)
+
+class _FakePlugin(object):
+    """Attaches the BSAs whose name starts with its own name and counts how
+    many times it was asked for them."""
+    def __init__(self, plugin_name):
+        self.name = GPath(plugin_name)
+        self.mod_bsas_calls = 0
+
+    def mod_bsas(self, bsa_infos):
+        self.mod_bsas_calls += 1
+        return [b for b_name, b in bsa_infos.iteritems()
+                if b_name.sbody.lower().startswith(self.name.sbody.lower())]
+
+_ARCHIVE_KEY = u'sArchiveList'
+
+@pytest.fixture
+def bsa_env(monkeypatch):
+    """Set up a ModInfos with two plugins, a game INI loading one BSA and
+    one BSA attached to each plugin. Returns the ModInfos and the dict of
+    BSAs, keyed by name."""
+    monkeypatch.setattr(bush.game.Ini, u'resource_archives_keys',
+                        (_ARCHIVE_KEY,))
+    monkeypatch.setattr(bush.game.Ini, u'resource_override_key', u'')
+    bsas = {b.name: b for b in map(_FakeBsa, (
+        u'Vanilla.bsa', u'First.bsa', u'Second.bsa'))}
+    monkeypatch.setattr(bosh, u'bsaInfos', bsas)
+    monkeypatch.setattr(bosh, u'oblivionIni', _FakeIni(
+        u'Oblivion.ini', {_ARCHIVE_KEY: u'Vanilla.bsa'}))
+    mod_infos = ModInfos.__new__(ModInfos)
+    mod_infos._data = OrderedDict((p.name, p) for p in map(_FakePlugin, (
+        u'First.esp', u'Second.esp')))
+    mod_infos._plugin_inis = OrderedDict()
+    monkeypatch.setattr(bosh, u'modInfos', mod_infos)
+    return mod_infos, bsas
+
+def _lo_names(bsa_lo):
+    return [b.name.s for b in bsa_lo]
+
+class TestBsaLoCache(object):
+    def test_load_order(self, bsa_env):
+        mod_infos, _bsas = bsa_env
+        bsa_lo, bsa_cause = mod_infos.get_bsa_lo()
+        assert _lo_names(bsa_lo) == [u'Vanilla.bsa', u'First.bsa',
+                                     u'Second.bsa']
+        assert [bsa_cause[b] for b in bsa_lo] == [
+            u'Oblivion.ini (%s)' % _ARCHIVE_KEY, u'First.esp', u'Second.esp']
+
+    def test_plugin_bsas_cached(self, bsa_env):
+        mod_infos, _bsas = bsa_env
+        first, second = mod_infos.values()
+        full_lo = mod_infos.get_bsa_lo()
+        for _i in range(3):
+            assert mod_infos.get_bsa_lo() == full_lo
+        bsa_lo, _bsa_cause = mod_infos.get_bsa_lo([second.name])
+        assert _lo_names(bsa_lo) == [u'Vanilla.bsa', u'Second.bsa']
+        assert first.mod_bsas_calls == second.mod_bsas_calls == 1
+
+    def test_partial_call_does_not_leak(self, bsa_env):
+        mod_infos, _bsas = bsa_env
+        mod_infos.get_bsa_lo([GPath(u'Second.esp')])
+        # the first call must not have modified the cached parts
+        bsa_lo, _bsa_cause = mod_infos.get_bsa_lo([GPath(u'First.esp')])
+        assert _lo_names(bsa_lo) == [u'Vanilla.bsa', u'First.bsa']
+
+    def test_ini_change_invalidates(self, bsa_env):
+        mod_infos, _bsas = bsa_env
+        mod_infos.get_bsa_lo()
+        bosh.oblivionIni.settings[_ARCHIVE_KEY] = u'Vanilla.bsa, First.bsa'
+        bsa_lo, bsa_cause = mod_infos.get_bsa_lo()
+        assert _lo_names(bsa_lo) == [u'Vanilla.bsa', u'First.bsa',
+                                     u'Second.bsa']
+        assert bsa_cause[bosh.bsaInfos[GPath(u'First.bsa')]] == \
+               u'Oblivion.ini (%s)' % _ARCHIVE_KEY
+        # the plugins were asked again, since the available BSAs changed
+        assert [p.mod_bsas_calls for p in mod_infos.values()] == [2, 2]
+
+    def test_plugin_ini_invalidates(self, bsa_env):
+        mod_infos, _bsas = bsa_env
+        mod_infos.get_bsa_lo()
+        mod_infos._plugin_inis[GPath(u'Second.ini')] = _FakeIni(
+            u'Second.ini', {_ARCHIVE_KEY: u'Second.bsa'})
+        bsa_lo, bsa_cause = mod_infos.get_bsa_lo()
+        assert _lo_names(bsa_lo) == [u'Second.bsa', u'First.bsa']
+        assert bsa_cause[bosh.bsaInfos[GPath(u'Second.bsa')]] == \
+               u'Second.ini (%s)' % _ARCHIVE_KEY
+
+    def test_reset(self, bsa_env):
+        mod_infos, bsas = bsa_env
+        mod_infos.get_bsa_lo()
+        new_bsa = _FakeBsa(u'First - Extra.bsa')
+        bsas[new_bsa.name] = new_bsa
+        # without a reset, the cached parts are used
+        assert new_bsa not in mod_infos.get_bsa_lo()[0]
+        bosh.BSAInfos._reset_bsa_lo()
+        bsa_lo, bsa_cause = mod_infos.get_bsa_lo()
+        assert new_bsa in bsa_lo
+        assert bsa_cause[new_bsa] == u'First.esp'
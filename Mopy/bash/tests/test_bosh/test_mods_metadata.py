@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests ModCleaner and OverrideIndex on small generated plugins."""
+import struct
+
+from ... import bush, load_order
+from ...bolt import GPath
+from ...bosh.mods_metadata import ModCleaner, OverrideIndex
+from ...brec import ModReader, MreRecord, RecHeader, RecordHeader, \
+    TopGrupHeader
+
+_MASTER = GPath(u'Oblivion.esm')
+
+def _record(sig, fid, data=b'DATA\x04\x00\x01\x00\x00\x00', flags=0):
+    record = MreRecord(RecHeader(sig, len(data), flags, fid, 0))
+    record.data = data
+    return record
+
+def _write_plugin(plugin_path, tops, masters=(_MASTER,)):
+    """Write a plugin with the specified masters and top groups, given as a
+    list of (signature, records) tuples."""
+    tes4 = bush.game.plugin_header_class(RecHeader())
+    tes4.masters = list(masters)
+    tes4.numRecords = sum(len(records) + 1 for _sig, records in tops)
+    tes4.setChanged()
+    tes4.getSize()
+    hsize = RecordHeader.rec_header_size
+    with plugin_path.open(u'wb') as out:
+        tes4.dump(out)
+        for top_sig, records in tops:
+            grup_size = hsize + sum(hsize + r.size for r in records)
+            out.write(TopGrupHeader(grup_size, top_sig).pack_head())
+            for record in records: record.dump(out)
+
+def _read_plugin(plugin_path):
+    """Return the header and a list of (signature, fids) tuples, one for each
+    top group of the plugin."""
+    tops = []
+    with ModReader(plugin_path.tail, plugin_path.open(u'rb')) as ins:
+        tes4 = bush.game.plugin_header_class(ins.unpackRecHeader(), ins, True)
+        while not ins.atEnd():
+            header = ins.unpackRecHeader()
+            if header.recType == b'GRUP':
+                tops.append((header.label, []))
+            else:
+                tops[-1][1].append(header.fid)
+                ins.seek(header.size, 1)
+    return tes4, tops
+
+class _PluginInfo(object):
+    """Just enough of a ModInfo for ModCleaner and OverrideIndex."""
+    def __init__(self, plugin_path, masters=(_MASTER,)):
+        self.name = plugin_path.tail
+        self.abs_path = plugin_path
+        self.masterNames = list(masters)
+        self.backed_up = self.crc_changed = False
+
+    def getPath(self): return self.abs_path
+
+    @property
+    def size(self): return self.abs_path.size
+
+    @property
+    def mtime(self): return self.abs_path.mtime
+
+    def makeBackup(self, forceBackup=False): self.backed_up = True
+
+    def setmtime(self, set_time=0.0, crc_changed=False):
+        self.crc_changed = crc_changed
+
+class TestRemoveItms(object):
+    def _cleaner(self, tmpdir):
+        plugin_path = GPath(u'%s' % tmpdir.join(u'Test.esp'))
+        _write_plugin(plugin_path, [
+            (b'MISC', [_record(b'MISC', 0x000801),
+                       _record(b'MISC', 0x01000802)]),
+            (b'WEAP', [_record(b'WEAP', 0x000803)]),
+        ])
+        return ModCleaner(_PluginInfo(plugin_path)), plugin_path
+
+    def test_remove_itms(self, tmpdir):
+        """Tests that the ITMs and the groups they leave empty are removed and
+        that the header record count is fixed."""
+        cleaner, plugin_path = self._cleaner(tmpdir)
+        cleaner.itm = {(_MASTER, 0x000801), (_MASTER, 0x000803)}
+        assert cleaner.remove_itms() == 2
+        tes4, tops = _read_plugin(plugin_path)
+        assert tops == [(b'MISC', [0x01000802])]
+        assert tes4.numRecords == 2
+        assert tes4.masters == [_MASTER]
+        assert cleaner.modInfo.backed_up and cleaner.modInfo.crc_changed
+        assert not cleaner.itm
+
+    def test_no_matches(self, tmpdir):
+        """Tests that the plugin is left alone if none of the ITMs are in
+        it."""
+        cleaner, plugin_path = self._cleaner(tmpdir)
+        with plugin_path.open(u'rb') as ins: contents = ins.read()
+        # the plugin's own record is not an override of the master's
+        cleaner.itm = {(_MASTER, 0x000802)}
+        assert cleaner.remove_itms() == 0
+        with plugin_path.open(u'rb') as ins: assert ins.read() == contents
+        assert not cleaner.modInfo.backed_up
+
+    def test_default_scan(self, tmpdir):
+        """Tests that ITMs are only scanned for when asked to."""
+        cleaner, _plugin_path = self._cleaner(tmpdir)
+        assert not ModCleaner.DEFAULT & ModCleaner.ITM
+        udr, itm, fog = cleaner.scan(ModCleaner.DEFAULT)
+        assert not udr and not itm and not fog
+
+class TestOverrideIndex(object):
+    _base = GPath(u'Base.esp')
+
+    def _plugin(self, tmpdir, plugin_name, data, flags=0, masters=()):
+        """Write a plugin overriding the record Base.esp adds."""
+        plugin_path = GPath(u'%s' % tmpdir.join(plugin_name))
+        masters = [self._base] + list(masters)
+        _write_plugin(plugin_path, [
+            (b'MISC', [_record(b'MISC', 0x000800, data, flags)])],
+                      masters=masters)
+        return _PluginInfo(plugin_path, masters=masters)
+
+    def _index(self, tmpdir, monkeypatch, plugin_infos):
+        base_path = GPath(u'%s' % tmpdir.join(self._base.s))
+        _write_plugin(base_path, [(b'MISC', [_record(b'MISC', 0x000800)])],
+                      masters=[])
+        mod_infos = {self._base: _PluginInfo(base_path, masters=[])}
+        mod_infos.update((minf.name, minf) for minf in plugin_infos)
+        self._set_lo(monkeypatch, [self._base] + [
+            minf.name for minf in plugin_infos])
+        index = OverrideIndex(GPath(u'%s' % tmpdir.join(u'Overrides.dat')))
+        assert index.refresh(mod_infos)
+        return index, mod_infos
+
+    @staticmethod
+    def _set_lo(monkeypatch, lo):
+        monkeypatch.setattr(load_order, u'cached_lord',
+                            load_order.LoadOrder(lo, lo))
+
+    def _winner(self, index):
+        return index.get_versions((self._base, 0x000800))[-1][0]
+
+    def test_reorder(self, tmpdir, monkeypatch):
+        """Tests that the winners follow the load order."""
+        first = self._plugin(tmpdir, u'First.esp', b'DATA\x00\x00')
+        second = self._plugin(tmpdir, u'Second.esp', b'DATA\x01\x00')
+        index, _mod_infos = self._index(tmpdir, monkeypatch, [first, second])
+        assert self._winner(index) == second.name
+        self._set_lo(monkeypatch, [self._base, second.name, first.name])
+        assert self._winner(index) == first.name
+        # siblings - their master tables differ, so they can't be compared
+        assert index.get_conflicts([first.name, second.name]) == ({}, {
+            second.name: [((self._base, 0x000800), b'MISC', first.name)]})
+
+    def test_conflicts(self, tmpdir, monkeypatch):
+        """Tests that records are only compared when the master table of one
+        plugin is a prefix of the other's, and that ITMs don't lose."""
+        first = self._plugin(tmpdir, u'First.esp', b'DATA\x00\x00')
+        itm = self._plugin(tmpdir, u'Itm.esp', b'DATA\x00\x00',
+                           masters=[first.name])
+        patch = self._plugin(tmpdir, u'Patch.esp', b'DATA\x01\x00',
+                             masters=[first.name])
+        index, _mod_infos = self._index(tmpdir, monkeypatch,
+                                        [first, itm, patch])
+        long_fid = (self._base, 0x000800)
+        losers, unknown = index.get_conflicts([self._base, first.name,
+                                               itm.name])
+        assert losers == {self._base: [(long_fid, b'MISC', itm.name)]}
+        assert unknown == {}
+        losers, unknown = index.get_conflicts([first.name, itm.name,
+                                               patch.name])
+        assert losers == {first.name: [(long_fid, b'MISC', patch.name)]}
+        assert unknown == {itm.name: [(long_fid, b'MISC', patch.name)]}
+        report = index.conflicts_report([first.name, itm.name, patch.name])
+        assert u'loses to Patch.esp' in report
+        assert u'unknown, cannot be compared with Patch.esp' in report
+
+    def test_bad_plugins(self, tmpdir, monkeypatch):
+        """Tests that plugins that fail to parse are skipped, whatever the
+        error."""
+        good = self._plugin(tmpdir, u'Good.esp', b'DATA\x00\x00')
+        # claims to be compressed, but isn't - zlib.error on hashing
+        bad_zlib = self._plugin(tmpdir, u'BadZlib.esp',
+            struct.pack(u'=I', 6) + b'DATA\x00\x00', flags=0x00040000)
+        truncated = self._plugin(tmpdir, u'Truncated.esp', b'DATA\x00\x00')
+        with truncated.abs_path.open(u'r+b') as out:
+            out.truncate(truncated.size - 3)
+        index, _mod_infos = self._index(tmpdir, monkeypatch,
+                                       [good, bad_zlib, truncated])
+        assert [v[0] for v in index.get_versions((self._base, 0x000800))] \
+               == [self._base, good.name]
+        assert not index.get_overrides(bad_zlib.name)
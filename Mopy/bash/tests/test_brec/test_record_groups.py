@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests the cached sizes and record counts of the record groups."""
+from ...brec import MobICells, MreRecord, RecHeader, GrupHeader, \
+    RecordHeader
+
+def _ref(fid, size=10):
+    """A reference record of the specified size that is never repacked."""
+    return MreRecord(RecHeader(b'REFR', size, 0, fid, 0))
+
+def _cell(fid):
+    """An interior cell that is packed to compute its size."""
+    cell = MreRecord.type_class[b'CELL'](RecHeader(b'CELL', 0, 0, fid, 0))
+    cell.flags.isInterior = True
+    cell.setChanged()
+    return cell
+
+def _total_size(block):
+    return block.getBsbSizes()[0]
+
+def _cells(*cells):
+    block = MobICells(GrupHeader(0, 0, 2), None)
+    block.setChanged()
+    for cell in cells: block.setCell(cell)
+    return block
+
+class TestCellCaches(object):
+    def test_cached(self):
+        """Tests that sizes and counts are only computed once."""
+        block = _cells(_cell(1))
+        cell_block = block.id_cellBlock[1]
+        cell_block.temp_refs.append(_ref(2))
+        cell_block.invalidate_caches()
+        size = _total_size(block)
+        assert block.getNumRecords() == block.getNumRecords(True) == 7
+        assert block.getNumRecords(False) == 2
+        assert _total_size(block) == size
+        # editing the list directly bypasses the caches
+        cell_block.temp_refs.append(_ref(3))
+        assert _total_size(block) == size
+
+    def test_invalidate_caches(self):
+        """Tests that invalidating a cell block drops the caches of the
+        blocks containing it."""
+        block = _cells(_cell(1))
+        cell_block = block.id_cellBlock[1]
+        size = _total_size(block)
+        cell_block.temp_refs.append(_ref(2, size=40))
+        cell_block.invalidate_caches()
+        # the cell children group, the temporary children group and the REFR
+        hsize = RecordHeader.rec_header_size
+        assert _total_size(block) == size + 3 * hsize + 40
+        assert cell_block.getTempSize() == 2 * hsize + 40
+        assert block.getNumRecords(False) == 2
+
+    def test_record_changed(self):
+        """Tests that changing a record drops the caches of its groups."""
+        ref = _ref(2, size=40)
+        block = _cells(_cell(1))
+        cell_block = block.id_cellBlock[1]
+        cell_block.persistent_refs.append(ref)
+        cell_block.invalidate_caches()
+        size = _total_size(block)
+        ref.data = b'\x00' * 10
+        ref.size = 10
+        ref.setChanged()
+        ref.changed = False # don't repack, just take the new size
+        assert _total_size(block) == size - 30
+        assert cell_block.getPersistentSize() == \
+               2 * RecordHeader.rec_header_size + 10
+
+    def test_mutators(self):
+        """Tests that the block mutators drop the caches."""
+        block = _cells(_cell(1))
+        size, count = _total_size(block), block.getNumRecords(False)
+        block.setCell(_cell(2))
+        assert block.getNumRecords(False) == count + 1
+        assert _total_size(block) > size
+        # replacing a cell invalidates the caches of its block too
+        cell_block = block.id_cellBlock[1]
+        size = _total_size(block)
+        new_cell = _cell(1)
+        new_cell.full = u'A cell with a longer record'
+        block.setCell(new_cell)
+        assert cell_block.cell is new_cell
+        assert _total_size(block) > size
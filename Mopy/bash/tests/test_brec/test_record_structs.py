@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#
+# GPL License and Copyright Notice ============================================
+#  This file is part of Wrye Bash.
+#
+#  Wrye Bash is free software: you can redistribute it and/or
+#  modify it under the terms of the GNU General Public License
+#  as published by the Free Software Foundation, either version 3
+#  of the License, or (at your option) any later version.
+#
+#  Wrye Bash is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with Wrye Bash.  If not, see <https://www.gnu.org/licenses/>.
+#
+#  Wrye Bash copyright (C) 2005-2009 Wrye, 2010-2021 Wrye Bash Team
+#  https://github.com/wrye-bash
+#
+# =============================================================================
+"""Tests the raw record helpers of MreRecord."""
+import struct
+import zlib
+
+from ...brec import MreRecord, RecHeader
+
+def _raw_record(data, flags=0, fid=0x800, sig=b'MISC'):
+    """An unpacked record with the specified raw data."""
+    record = MreRecord(RecHeader(sig, len(data), flags, fid, 0))
+    record.data = data
+    return record
+
+def _compressed_record(data, flags=0, fid=0x800, sig=b'MISC'):
+    """A record whose raw data is the compressed version of data."""
+    comp_data = struct.pack(u'=I', len(data)) + zlib.compress(data)
+    return _raw_record(comp_data, flags | MreRecord._compressed_mask, fid,
+                       sig)
+
+_DATA = b'EDID\x05\x00Test\x00DATA\x04\x00\x01\x00\x00\x00'
+
+class TestContentHash(object):
+    def test_same_contents(self):
+        """Tests that records with equal contents hash alike, wherever they
+        were read from."""
+        assert _raw_record(_DATA).content_hash() == \
+               _raw_record(_DATA, fid=0x01000800).content_hash()
+
+    def test_compressed(self):
+        """Tests that the compressed flag and compression are ignored."""
+        assert _raw_record(_DATA).content_hash() == \
+               _compressed_record(_DATA).content_hash()
+
+    def test_different_contents(self):
+        """Tests that the signature, the flags and the data are hashed."""
+        base_hash = _raw_record(_DATA).content_hash()
+        assert _raw_record(_DATA, sig=b'WEAP').content_hash() != base_hash
+        assert _raw_record(_DATA, flags=0x20).content_hash() != base_hash
+        assert _raw_record(_DATA[:-1] + b'\x02').content_hash() != base_hash